@@ -0,0 +1,295 @@
+import os
+import json
+import math
+import time
+import uuid
+import threading
+
+from log_helper import get_logger
+from metrics import Counter, Histogram
+from shared_state import RedisState, shared_state
+
+log = get_logger('web')
+
+# Admission control for routes that call xAI / ElevenLabs (all optional):
+#   ADMISSION_ENABLED          = 1     0 admits everything
+#   ADMISSION_MAX_CONCURRENT   = 4     upstream-bound requests running at once (per worker)
+#   ADMISSION_USER_CONCURRENT  = 1     of those, how many one user may hold per route class (across workers)
+#   ADMISSION_QUEUE_SIZE       = 16    requests allowed to wait for a slot; beyond this they get 429
+#   ADMISSION_MAX_WAIT_SECONDS = 15    longest wait for a slot before 429
+#   ADMISSION_SLOT_TTL_SECONDS = 600   a user slot held by a killed worker frees itself after this (>= gunicorn --timeout)
+#   ADMISSION_POLICIES         = {}    JSON overrides per route class, e.g. {"chat": {"requests_per_minute": 10}}
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1').lower() not in ('0', 'false', 'no')
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '4'))
+ADMISSION_USER_CONCURRENT = int(os.getenv('ADMISSION_USER_CONCURRENT', '1'))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '16'))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv('ADMISSION_MAX_WAIT_SECONDS', '15'))
+ADMISSION_SLOT_TTL_SECONDS = float(os.getenv('ADMISSION_SLOT_TTL_SECONDS', '600'))
+MAX_TRACKED_BUCKETS = 10000   # in-process buckets kept before full ones are pruned
+SLOT_POLL_SECONDS = 0.05
+
+# Per user and route class, shared by all workers through shared_state. Requests are
+# counted on admission; upstream cost (LLM tokens, TTS characters) is charged after the
+# fact and may push the balance negative, which holds back that user's next requests
+# until it refills.
+DEFAULT_POLICIES = {
+    'chat': {'requests_per_minute': 12, 'burst': 4, 'tokens_per_minute': 60000, 'token_burst': 60000},
+    'rewrite': {'requests_per_minute': 6, 'burst': 2, 'tokens_per_minute': 20000, 'token_burst': 20000},
+    'tts': {'requests_per_minute': 10, 'burst': 3, 'tokens_per_minute': 20000, 'token_burst': 20000},
+}
+
+ADMISSION_DECISIONS = Counter(
+    'grok_admission_total', 'Admission decisions by route class', ('policy', 'outcome'))
+ADMISSION_WAIT_SECONDS = Histogram(
+    'grok_admission_wait_seconds', 'Time admitted requests waited for an upstream slot', ('policy',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30))
+
+
+def load_policies(overrides=None):
+    policies = {name: dict(policy) for name, policy in DEFAULT_POLICIES.items()}
+    if overrides is None:
+        try:
+            overrides = json.loads(os.getenv('ADMISSION_POLICIES') or '{}')
+        except ValueError as e:
+            log.warning(f"Ignoring invalid ADMISSION_POLICIES: {e}")
+            overrides = {}
+    for name, fields in (overrides or {}).items():
+        policies.setdefault(name, {}).update(fields)
+    return policies
+
+
+class Rejected(Exception):
+    """Request not admitted; retry_after is in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity. take() never blocks; charge() may overdraw."""
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount tokens are available (0 if they are now)"""
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def take(self, amount, now):
+        wait = self.wait_time(amount, now)
+        if wait == 0:
+            self.tokens -= amount
+        return wait
+
+    def charge(self, amount, now):
+        self._refill(now)
+        self.tokens -= amount
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class LocalBuckets:
+    """TokenBuckets in a dict: exact for the in-process shared state (a single worker)"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def apply(self, key, rate, capacity, amount, mode):
+        """mode 'check': seconds until amount is available; 'take': the same, taking it
+        when it is; 'charge': deduct amount regardless (may overdraw). Returns the wait."""
+        with self._lock:
+            now = self.clock()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(rate, capacity, now)
+            if mode == 'charge':
+                bucket.charge(amount, now)
+                return 0.0
+            return bucket.take(amount, now) if mode == 'take' else bucket.wait_time(amount, now)
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as a new one
+        for key in [k for k, b in self._buckets.items() if b.full(now)]:
+            del self._buckets[key]
+
+
+# The same refill/take/charge as TokenBucket, run atomically in redis on the server's clock.
+# A key expires once it would have refilled, so idle users cost nothing.
+REDIS_BUCKET_SCRIPT = """
+local rate, capacity, amount, mode = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if mode == 'charge' then
+  tokens = tokens - amount
+elseif tokens >= amount then
+  if mode == 'take' then tokens = tokens - amount end
+else
+  wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return tostring(wait)
+"""
+
+
+class SharedBuckets:
+    """Token buckets in redis, so every worker and instance draws on the same budget"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def apply(self, key, rate, capacity, amount, mode):
+        return float(self.state.run_script(REDIS_BUCKET_SCRIPT, [key], [rate, capacity, amount, mode]))
+
+
+class Ticket:
+    """An admitted request: holds an upstream slot until released and takes cost charges"""
+
+    def __init__(self, controller, user, policy, slot):
+        self.controller = controller
+        self.user = user
+        self.policy = policy
+        self.slot = slot  # (shared state key, token) of the user's slot
+        self.released = False
+
+    def charge(self, amount):
+        if amount and amount > 0:
+            self.controller.charge(self.user, self.policy, amount)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.release(self)
+
+
+class AdmissionController:
+    """Per-user token buckets in front of a fixed number of upstream slots.
+
+    A request is first checked against its user's request bucket and upstream-cost
+    bucket for its route class (429 right away if either is empty: waiting would only
+    hold a thread for a client that is over its budget). It then needs a slot; no user
+    may hold more than user_concurrency of them per route class, so one user's burst
+    cannot starve the others. While slots are busy up to queue_size requests wait, each
+    for at most max_wait seconds; the rest get 429 with a Retry-After.
+
+    Buckets and per-user slots live in shared state, so with redis they hold across
+    workers and instances (user slots are TTL keys: a killed worker's slot frees itself
+    after slot_ttl). max_concurrent and the wait queue protect each worker's threads and
+    stay per process.
+    """
+
+    def __init__(self, policies=None, max_concurrent=ADMISSION_MAX_CONCURRENT,
+                 user_concurrency=ADMISSION_USER_CONCURRENT, queue_size=ADMISSION_QUEUE_SIZE,
+                 max_wait=ADMISSION_MAX_WAIT_SECONDS, enabled=ADMISSION_ENABLED, clock=time.monotonic,
+                 state=None, slot_ttl=ADMISSION_SLOT_TTL_SECONDS):
+        self.policies = load_policies() if policies is None else policies
+        self.max_concurrent = max_concurrent
+        self.user_concurrency = user_concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.state = shared_state if state is None else state
+        self.slot_ttl = slot_ttl
+        self.buckets = SharedBuckets(self.state) if isinstance(self.state, RedisState) else LocalBuckets(clock)
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def _bucket(self, user, policy, kind, amount, mode):
+        """Wait in seconds from the user's bucket of this kind (0 when the policy sets no rate)"""
+        spec = self.policies.get(policy, {})
+        if kind == 'requests':
+            rate, capacity = spec.get('requests_per_minute', 0), spec.get('burst', 1)
+        else:
+            rate, capacity = spec.get('tokens_per_minute', 0), spec.get('token_burst', 0)
+        if not rate:
+            return 0.0
+        return self.buckets.apply(f"admission:bucket:{policy}:{kind}:{user}", rate / 60.0, max(capacity, 1),
+                                  amount, mode)
+
+    def _reject(self, policy, outcome, retry_after):
+        ADMISSION_DECISIONS.labels(policy=policy, outcome=outcome).inc()
+        raise Rejected(outcome, max(1, int(math.ceil(retry_after))))
+
+    def admit(self, user, policy):
+        """Admit a request or raise Rejected. The returned Ticket must be released."""
+        if not self.enabled or policy not in self.policies:
+            return None
+        user = str(user or 'anonymous')
+        wait = self._bucket(user, policy, 'tokens', 0, 'check')  # only an overdrawn balance blocks
+        if wait > 0:
+            self._reject(policy, 'token_budget', wait)
+        wait = self._bucket(user, policy, 'requests', 1, 'take')
+        if wait > 0:
+            self._reject(policy, 'rate_limited', wait)
+
+        started = time.monotonic()
+        with self._cond:
+            slot = self._take_slot(user, policy)
+            if slot is None:
+                if self.waiting >= self.queue_size:
+                    self._reject(policy, 'queue_full', self.max_wait)
+                self.waiting += 1
+                try:
+                    deadline = started + self.max_wait
+                    while slot is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject(policy, 'wait_timeout', self.max_wait)
+                        # Slots held in other workers are released without notifying us: poll
+                        self._cond.wait(min(remaining, SLOT_POLL_SECONDS))
+                        slot = self._take_slot(user, policy)
+                finally:
+                    self.waiting -= 1
+        waited = time.monotonic() - started
+        ADMISSION_WAIT_SECONDS.labels(policy=policy).observe(waited)
+        ADMISSION_DECISIONS.labels(policy=policy, outcome='queued' if waited > 0.001 else 'admitted').inc()
+        return Ticket(self, user, policy, slot)
+
+    def _take_slot(self, user, policy):
+        """Claim a worker slot and one of the user's shared slots; (key, token) or None. Holds _cond."""
+        if self.in_flight >= self.max_concurrent:
+            return None
+        token = uuid.uuid4().hex
+        for n in range(self.user_concurrency):
+            key = f"admission:slot:{policy}:{user}:{n}"
+            if self.state.add(key, token, ttl=self.slot_ttl):
+                self.in_flight += 1
+                return key, token
+        return None
+
+    def release(self, ticket):
+        self.state.delete_if(*ticket.slot)
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def charge(self, user, policy, amount):
+        """Record upstream cost (tokens, characters) after a call"""
+        self._bucket(user, policy, 'tokens', amount, 'charge')
+
+
+admission = AdmissionController()
@@ -0,0 +1,248 @@
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import shutil
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single dev server process, nothing to coordinate
+    fcntl = None
+
+from log_helper import get_logger
+
+log = get_logger('audit')
+
+# Audit configuration (all optional)
+AUDIT_MAX_BYTES = int(os.getenv('AUDIT_MAX_BYTES', str(10 * 1024 * 1024)))  # rotate above this size
+AUDIT_ROTATE_HOURS = float(os.getenv('AUDIT_ROTATE_HOURS', '24'))            # ...or after this long
+AUDIT_BACKUPS = int(os.getenv('AUDIT_BACKUPS', '10'))                       # compressed files kept
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))      # seconds between batch writes
+AUDIT_QUEUE_SIZE = 10000
+
+_TAIL_BLOCK = 64 * 1024
+
+
+def reverse_lines(path, block_size=_TAIL_BLOCK):
+    """Yield the lines of a file from last to first, reading fixed-size blocks from the end"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step) + remainder
+            parts = chunk.split(b'\n')
+            remainder = parts.pop(0)  # may be a partial line; completed by the next block
+            for line in reversed(parts):
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+        if remainder:
+            yield remainder.decode('utf-8', errors='replace')
+
+
+class AuditLog:
+    """Append-only JSONL audit trail written in batches by a background thread.
+
+    write() only enqueues, so request threads never touch the disk. The active file is
+    rotated by size or age into timestamped .jsonl.gz files, keeping the newest few.
+    Every worker process appends to the same file; rotation is serialized by a lock file
+    (<path>.lock, whose mtime marks the last rotation) so only one process rotates.
+    """
+
+    def __init__(self, path, enabled=True, max_bytes=AUDIT_MAX_BYTES, rotate_hours=AUDIT_ROTATE_HOURS,
+                 backups=AUDIT_BACKUPS, flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_hours * 3600 if rotate_hours else None
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+
+    def write(self, entry):
+        """Queue one event; never blocks the caller"""
+        if not self.enabled:
+            return
+        entry.setdefault('ts', datetime.utcnow().isoformat())
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is on disk"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def tail(self, limit=50, request_id=None, event=None, include_rotated=False):
+        """Return the newest `limit` entries (oldest first), optionally filtered"""
+        self.flush(timeout=1.0)
+
+        def matching(lines):
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if request_id and entry.get('request_id') != request_id:
+                    continue
+                if event and entry.get('event') != event:
+                    continue
+                yield entry
+
+        newest_first = []
+        if os.path.exists(self.path):
+            for entry in matching(reverse_lines(self.path)):
+                newest_first.append(entry)
+                if len(newest_first) >= limit:
+                    break
+        if include_rotated:
+            for rotated in self.rotated_files():
+                if len(newest_first) >= limit:
+                    break
+                # gzip cannot be read backwards: stream it, keeping only the newest matches still needed
+                with gzip.open(rotated, 'rt', encoding='utf-8') as f:
+                    newest_first.extend(reversed(deque(matching(f), maxlen=limit - len(newest_first))))
+        newest_first.reverse()
+        return newest_first
+
+    def rotated_files(self):
+        """Compressed rotations, newest first"""
+        base, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{base}-*{ext}.gz"), reverse=True)
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush, 2.0)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_rotate()
+                continue
+            batch, waiters = [], []
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            self._maybe_rotate()
+            for waiter in waiters:
+                waiter.set()
+
+    def _open(self):
+        # Another worker may have rotated the file under us; reopen if it was renamed
+        if self._file is not None:
+            try:
+                if os.fstat(self._file.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return self._file
+            except OSError:
+                pass
+            self._file.close()
+            self._file = None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def _write_batch(self, batch):
+        try:
+            f = self._open()
+            f.write(''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in batch))
+            f.flush()
+        except Exception as e:
+            log.warning(f"audit write failed: {e}", entries=len(batch))
+
+    @contextmanager
+    def _rotation_lock(self, blocking):
+        """Yields True while holding the lock file (False if another process holds it)"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        try:
+            with self._rotation_lock(blocking=False) as held:
+                if not held:
+                    return  # another worker is rotating right now
+                # Decide from the shared file, not this process's handle: another worker may have rotated it
+                size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                rotated_at = os.path.getmtime(self.path + '.lock')
+                too_big = self.max_bytes and size >= self.max_bytes
+                too_old = self.rotate_seconds and size > 0 and time.time() - rotated_at >= self.rotate_seconds
+                if too_big or too_old:
+                    self._rotate()
+        except Exception as e:
+            log.warning(f"audit rotation failed: {e}")
+
+    def rotate(self):
+        """Compress the active file into a timestamped .gz and prune old ones"""
+        with self._rotation_lock(blocking=True):
+            return self._rotate()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.utime(self.path + '.lock')  # marks the rotation time for every worker
+        if not os.path.exists(self.path):
+            return None
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+        staged = f"{base}-{stamp}{ext}"
+        os.replace(self.path, staged)
+        with open(staged, 'rb') as src, gzip.open(staged + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(staged)
+        for old in self.rotated_files()[self.backups:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return staged + '.gz'
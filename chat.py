@@ -1,8 +1,22 @@
 import os, re
 from grok_remote import chat_with_grok
-from tts_helper import tts
+from opener_catalog import parse_front_matter
 from datetime import datetime
 
+_tts = None
+
+def get_tts():
+    """TTS helper, imported on first use so plain chatting skips its startup cost"""
+    global _tts
+    if _tts is None:
+        from tts_helper import tts
+        _tts = tts
+    return _tts
+
+def tts_enabled():
+    # No API key means TTS can never be enabled; don't import it just to find that out
+    return bool(os.getenv("ELEVENLABS_API_KEY")) and get_tts().enabled
+
 # --- Detect male climax (lets female climax pass) ---
 MALE_TRIGGER = re.compile(
     r"(?:\b(Dan|he|his)\b[^.\n\r]{0,120}\b("
@@ -97,24 +111,24 @@ def main():
         
         # TTS commands
         if low == "/tts":
-            if tts.enabled:
-                tts_status = "enabled" if tts.enabled else "disabled"
-                print(f"🎤 TTS: {tts_status} (voice: {tts.voice_id})")
+            if tts_enabled():
+                tts_status = "enabled" if tts_enabled() else "disabled"
+                print(f"🎤 TTS: {tts_status} (voice: {get_tts().voice_id})")
             else:
                 print("🔇 TTS disabled - set ELEVENLABS_API_KEY to enable")
             continue
             
         if low.startswith("/voice"):
-            if not tts.enabled:
+            if not tts_enabled():
                 print("🔇 TTS disabled - set ELEVENLABS_API_KEY to enable")
                 continue
             parts = user_input.split()
             if len(parts) > 1:
                 voice_id = parts[1].strip()
-                tts.set_voice(voice_id)
+                get_tts().set_voice(voice_id)
             else:
                 # List available voices
-                voices = tts.get_available_voices()
+                voices = get_tts().get_available_voices()
                 if voices:
                     print(f"🎤 Available voices ({len(voices)} total):")
                     for voice_id, name in voices:
@@ -124,25 +138,25 @@ def main():
             continue
             
         if low == "/save":
-            if not tts.enabled:
+            if not tts_enabled():
                 print("🔇 TTS disabled - set ELEVENLABS_API_KEY to enable")
                 continue
             # Save the last response as audio
             if history and len(history) > 2:
                 last_response = history[-1]["content"]
                 if last_response:
-                    tts.speak(last_response, save_audio=True)
+                    get_tts().speak(last_response, save_audio=True)
             else:
                 print("⚠️ No response to save")
             continue
             
         if low == "/ttsmode":
-            if not tts.enabled:
+            if not tts_enabled():
                 print("🔇 TTS disabled - set ELEVENLABS_API_KEY to enable")
                 continue
             # Toggle between auto-save and auto-play modes
-            tts.auto_save = not tts.auto_save
-            mode = "auto-save" if tts.auto_save else "auto-play"
+            get_tts().auto_save = not get_tts().auto_save
+            mode = "auto-save" if get_tts().auto_save else "auto-play"
             print(f"🎤 TTS mode changed to: {mode}")
             continue
             
@@ -168,6 +182,7 @@ def main():
             try:
                 abs_path = os.path.abspath(filename)
                 opener = open(filename, "r", encoding="utf-8").read()
+                opener = parse_front_matter(opener)[1]
                 byte_len = len(opener.encode("utf-8"))
                 if byte_len == 0 or not any(ch.strip() for ch in opener):
                     print(f"⚠️ {filename} looks empty. Path: {abs_path} (bytes={byte_len})"); continue
@@ -286,8 +301,8 @@ def main():
         print(f"\nGrok ({model_env}): {reply}")
         
         # Auto-play TTS if enabled
-        if tts.enabled and reply.strip():
-            tts.speak(reply)
+        if tts_enabled() and reply.strip():
+            get_tts().speak(reply)
         
 
         
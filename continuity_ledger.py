@@ -0,0 +1,139 @@
+import os
+import array
+import base64
+import uuid
+from scene_fingerprint import shingle_hashes
+
+# Server-side continuity ledger. The cookie session only carries the scene key; the
+# ledger itself lives in shared_state and keeps no raw reply text except the 400-char
+# anchor the prompt quotes. Recent replies are reduced to their 3-gram hashes (for the
+# rehash critic) and the established-fact phrases they contained (for the restate and
+# physical-state guards), so every list in it is bounded.
+#   LEDGER_TTL_SECONDS  = 604800   idle ledgers expire with the scene fingerprint
+LEDGER_FORMAT = 1
+LEDGER_TTL_SECONDS = int(os.getenv("LEDGER_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_SUMMARIES = 12
+MAX_BAN_PHRASES = 12
+ANCHOR_CHARS = 400
+RECENT_REPLIES = 2
+MAX_SHINGLES = 1024  # per recent reply (~1000 words); 4 bytes each
+
+
+def fold32(h):
+    """64-bit shingle hash -> 32 bits (both halves mixed)"""
+    return (h ^ (h >> 32)) & 0xFFFFFFFF
+
+
+def reply_shingles(text, limit=MAX_SHINGLES):
+    """Distinct 32-bit 3-gram hashes of text, in first-seen order"""
+    seen = set()
+    ordered = []
+    for h in shingle_hashes(text):
+        h = fold32(h)
+        if h not in seen:
+            seen.add(h)
+            ordered.append(h)
+            if len(ordered) >= limit:
+                break
+    return ordered
+
+
+def pack_hashes(hashes):
+    return base64.b64encode(array.array("I", hashes).tobytes()).decode("ascii")
+
+
+def unpack_hashes(packed):
+    values = array.array("I")
+    values.frombytes(base64.b64decode(packed or ""))
+    return values.tolist()
+
+
+def new_ledger(scene_key=None):
+    return {
+        "v": LEDGER_FORMAT,
+        "scene_key": scene_key or uuid.uuid4().hex,  # also keys the scene fingerprint index
+        "scene_step": 0,
+        "summaries": [],        # short first-sentence summaries per step
+        "anchor_tail": "",      # last ~400 chars of the prior assistant reply
+        "ban_phrases": [],      # phrases to avoid repeating verbatim
+        "recent": [],           # last two replies: {"shingles": packed hashes, "facts": [phrases]}
+    }
+
+
+def from_legacy(data, fact_phrases=()):
+    """Convert a cookie-era ledger (with last_two_replies text) to the compact form"""
+    ledger = new_ledger(data.get("scene_key"))
+    ledger["scene_step"] = int(data.get("scene_step", 0) or 0)
+    ledger["summaries"] = list(data.get("summaries") or [])[-MAX_SUMMARIES:]
+    ledger["anchor_tail"] = (data.get("anchor_tail") or "")[-ANCHOR_CHARS:]
+    ledger["ban_phrases"] = list(data.get("ban_phrases") or [])[:MAX_BAN_PHRASES]
+    ledger["recent"] = [{"shingles": pack_hashes(reply_shingles(text)),
+                         "facts": [phrase for phrase in fact_phrases if phrase in text.lower()]}
+                        for text in (data.get("last_two_replies") or [])[-RECENT_REPLIES:]]
+    return ledger
+
+
+def record_reply(ledger, reply, summary=None, ban_phrases=(), fact_phrases=()):
+    """Advance the ledger by one accepted reply. Lists are replaced, not mutated,
+    so shallow copies taken earlier (audit snapshots) keep their values."""
+    reply_lc = (reply or "").lower()
+    ledger["scene_step"] = int(ledger.get("scene_step", 0)) + 1
+    if summary:
+        ledger["summaries"] = (ledger.get("summaries", []) + [summary])[-MAX_SUMMARIES:]
+    ledger["anchor_tail"] = (reply or "")[-ANCHOR_CHARS:]
+    ledger["ban_phrases"] = (ledger.get("ban_phrases", []) + list(ban_phrases))[:MAX_BAN_PHRASES]
+    entry = {
+        "shingles": pack_hashes(reply_shingles(reply_lc)),
+        "facts": [phrase for phrase in fact_phrases if phrase in reply_lc],
+    }
+    ledger["recent"] = (ledger.get("recent", []) + [entry])[-RECENT_REPLIES:]
+    return ledger
+
+
+def previous_shingles(ledger):
+    """One list of 32-bit 3-gram hashes per recent reply, oldest first"""
+    return [unpack_hashes(entry.get("shingles")) for entry in ledger.get("recent", [])]
+
+
+def established_facts(ledger):
+    """Fact phrases found in the recent replies"""
+    facts = set()
+    for entry in ledger.get("recent", []):
+        facts.update(entry.get("facts", []))
+    return facts
+
+
+def describe(ledger):
+    """Readable view for audit events and exports (shingles as counts)"""
+    return {
+        "scene_key": ledger.get("scene_key"),
+        "scene_step": ledger.get("scene_step"),
+        "summaries": ledger.get("summaries", []),
+        "anchor_tail": ledger.get("anchor_tail", ""),
+        "ban_phrases": ledger.get("ban_phrases", []),
+        "recent": [{"shingles": len(base64.b64decode(entry.get("shingles") or "")) // 4,
+                    "facts": entry.get("facts", [])} for entry in ledger.get("recent", [])],
+    }
+
+
+class LedgerStore:
+    """Ledgers in shared_state (Redis when SHARED_STATE_URL is set), keyed by scene"""
+
+    def __init__(self, state=None, ttl=LEDGER_TTL_SECONDS):
+        if state is None:
+            from shared_state import shared_state as state
+        self.state = state
+        self.ttl = ttl
+
+    def load(self, scene_key):
+        data = self.state.get_json(f"ledger:{scene_key}") if scene_key else None
+        if not data:
+            return None
+        return data if data.get("v") == LEDGER_FORMAT else None
+
+    def save(self, ledger):
+        self.state.set_json(f"ledger:{ledger['scene_key']}", ledger, ttl=self.ttl)
+
+    def delete(self, scene_key):
+        if scene_key:
+            self.state.delete(f"ledger:{scene_key}")
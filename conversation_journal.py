@@ -0,0 +1,218 @@
+import os
+import re
+import glob
+import json
+import queue
+import atexit
+import hashlib
+import threading
+from datetime import datetime
+
+from log_helper import get_logger
+
+log = get_logger('journal')
+
+# Append-only conversation journal (all optional):
+#   CONVERSATIONS_DIR          = conversations   one directory per story, one JSONL segment per day
+#   JOURNAL_COMMIT_SECONDS     = 0.2             group commit window: one write + fsync per segment per batch
+#   JOURNAL_COMPACT_SEGMENTS   = 7               compact a story's past days into one segment beyond this many
+CONVERSATIONS_DIR = os.getenv('CONVERSATIONS_DIR', 'conversations')
+JOURNAL_COMMIT_SECONDS = float(os.getenv('JOURNAL_COMMIT_SECONDS', '0.2'))
+JOURNAL_COMPACT_SEGMENTS = int(os.getenv('JOURNAL_COMPACT_SEGMENTS', '7'))
+JOURNAL_QUEUE_SIZE = 10000
+
+
+def _digest(message):
+    return hashlib.md5(json.dumps(message, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()[:16]
+
+
+def live_records(records):
+    """Records still in effect after applying them in order. Record i replaces message i
+    and drops everything after it; a record without a message clears from i on, so a
+    rewrite from index 0 starts the conversation over."""
+    live = []
+    for record in records:
+        i = record.get('i', len(live))
+        if i > len(live):
+            continue  # gap (lost batch); keep what is consistent
+        del live[i:]
+        if 'message' in record:
+            live.append(record)
+    return live
+
+
+class ConversationJournal:
+    """One JSONL record per message, appended by a background group-commit writer.
+
+    sync() compares the conversation with the journal head (message count plus a digest
+    of the last journaled message) and appends only the new messages, so a turn costs
+    the same however long the story is. If the known part changed (a rewrite or a new
+    scene), the conversation is journaled again from index 0. Segments are per day and
+    past days are compacted into one segment once a story has too many.
+    """
+
+    def __init__(self, directory=CONVERSATIONS_DIR, state=None, commit_interval=JOURNAL_COMMIT_SECONDS,
+                 compact_segments=JOURNAL_COMPACT_SEGMENTS):
+        self.directory = directory
+        self.state = state  # shared_state for journal heads across workers (in-process dict when None)
+        self.commit_interval = commit_interval
+        self.compact_segments = compact_segments
+        self.dropped = 0
+        self.stats = {'records': 0, 'batches': 0, 'fsyncs': 0, 'rewrites': 0, 'compactions': 0}
+        self._heads = {}
+        self._queue = queue.Queue(maxsize=JOURNAL_QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # --- paths ---
+
+    def stream_dir(self, stream):
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.-]', '_', str(stream or 'general')))
+
+    def segments(self, stream):
+        """Segment files of a stream, oldest first"""
+        return sorted(glob.glob(os.path.join(self.stream_dir(stream), '*.jsonl')))
+
+    # --- writing ---
+
+    def _get_head(self, stream):
+        if self.state is not None:
+            head = self.state.get_json(f"journal_head:{stream}")
+        else:
+            head = self._heads.get(stream)
+        if head is None:
+            # First use (or expired head): recover it from the journal itself
+            self.flush()
+            history = self.read_history(stream)
+            head = {'count': len(history), 'digest': _digest(history[-1]) if history else None}
+        return head
+
+    def _set_head(self, stream, head):
+        if self.state is not None:
+            self.state.set_json(f"journal_head:{stream}", head)
+        else:
+            self._heads[stream] = head
+
+    def sync(self, stream, history):
+        """Journal whatever part of history is not journaled yet; returns the number of records queued"""
+        stream = str(stream or 'general')
+        head = self._get_head(stream)
+        count = head.get('count', 0)
+        start = count
+        if count > len(history) or (count and _digest(history[count - 1]) != head.get('digest')):
+            start = 0
+            self.stats['rewrites'] += 1
+        ts = datetime.utcnow().isoformat()
+        records = [{'i': i, 'ts': ts, 'message': history[i]} for i in range(start, len(history))]
+        if start == 0 and count and not history:
+            records = [{'i': 0, 'ts': ts}]  # conversation cleared
+        for record in records:
+            self._enqueue(stream, record)
+        if records:
+            self._set_head(stream, {'count': len(history), 'digest': _digest(history[-1]) if history else None})
+        return len(records)
+
+    def _enqueue(self, stream, record):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((stream, record))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written and fsynced"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush, 2.0)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, waiters = [], []
+            # Group commit: gather everything that arrives within the commit window
+            while len(batch) < JOURNAL_QUEUE_SIZE:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                try:
+                    item = self._queue.get_nowait() if waiters else self._queue.get(timeout=self.commit_interval)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write_batch(self, batch):
+        by_segment = {}
+        for stream, record in batch:
+            day = (record.get('ts') or datetime.utcnow().isoformat())[:10].replace('-', '')
+            by_segment.setdefault((stream, day), []).append(record)
+        for (stream, day), records in by_segment.items():
+            try:
+                directory = self.stream_dir(stream)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"{day}.jsonl")
+                new_segment = not os.path.exists(path)
+                data = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in records)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.stats['records'] += len(records)
+                self.stats['fsyncs'] += 1
+                if new_segment and self.compact_segments and len(self.segments(stream)) > self.compact_segments:
+                    self.compact(stream)
+            except Exception as e:
+                log.warning(f"journal write failed: {e}", stream=stream, records=len(records))
+        self.stats['batches'] += 1
+
+    # --- reading and compaction ---
+
+    def iter_records(self, stream, segments=None):
+        """Stream the records of a stream (or of the given segments) in order"""
+        for path in (self.segments(stream) if segments is None else segments):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+
+    def read_history(self, stream):
+        """Reconstruct the current conversation of a stream by streaming its segments"""
+        return [record['message'] for record in live_records(self.iter_records(stream))]
+
+    def compact(self, stream):
+        """Collapse every segment before today's into one holding only the live records"""
+        today = datetime.utcnow().strftime('%Y%m%d') + '.jsonl'
+        old = [p for p in self.segments(stream) if os.path.basename(p) < today]
+        if len(old) < 2:
+            return 0
+        live = live_records(self.iter_records(stream, old))
+        target = old[-1]
+        tmp = target + '.compact'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in live))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        for path in old[:-1]:
+            os.remove(path)
+        self.stats['compactions'] += 1
+        return len(old) - 1
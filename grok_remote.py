@@ -1,7 +1,17 @@
-import os, re, requests
+import os, re, time, requests
 
-API_BASE = "https://api.x.ai/v1"
+from metrics import record_upstream, record_tokens, record_llm_call
+from resilience import ResilientCaller, Outcome
+from hedging import Hedger
+from log_helper import get_logger
+
+log = get_logger('xai')
+
+API_BASE = os.getenv("XAI_API_BASE", "https://api.x.ai/v1")  # override to point at a local fake for load tests
 API_KEY  = os.getenv("XAI_API_KEY")  # set: export XAI_API_KEY=...
+XAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("XAI_CONNECT_TIMEOUT_SECONDS", "5"))
+XAI_TIMEOUT_SECONDS = float(os.getenv("XAI_TIMEOUT_SECONDS", "90"))     # one attempt
+XAI_DEADLINE_SECONDS = float(os.getenv("XAI_DEADLINE_SECONDS", "110"))  # a whole call with retries (gunicorn --timeout is 120)
 
 THINK_BLOCK_RE = re.compile(
     r"(<think>.*?</think>|<\|begin_of_thought\|>.*?<\|end_of_thought\|>|```(?:thinking|reasoning|cot|cog).*?```)",
@@ -9,6 +19,88 @@ THINK_BLOCK_RE = re.compile(
 )
 THOUGHT_PREFIX_RE = re.compile(r"^\s*(?:Thought:|Reasoning:)\s*", re.IGNORECASE | re.MULTILINE)
 
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+def _retry_after(r):
+    try:
+        return max(0.0, float(r.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None  # absent, or an HTTP date (rare from xAI): use our own backoff
+
+def _classify(r, error):
+    """Retry timeouts, connection errors, 408/429/5xx; only outages count against the breaker"""
+    if error is not None:
+        if isinstance(error, requests.Timeout):
+            return Outcome("timeout", retryable=True, failure=True)
+        if isinstance(error, requests.ConnectionError):
+            return Outcome("connection_error", retryable=True, failure=True)
+        return Outcome("error")
+    if r.status_code < 400:
+        return Outcome("ok")
+    return Outcome(f"http_{r.status_code}", retryable=r.status_code in RETRY_STATUSES,
+                   failure=r.status_code >= 500 or r.status_code == 408, retry_after=_retry_after(r))
+
+xai_caller = ResilientCaller("xai", _classify)
+xai_hedger = Hedger("xai")
+
+# Called as fn(call_class, model, usage, seconds, finish_reason) after every completed call,
+# in the caller's thread, or for a hedge's losing call in its own thread with a copy of the
+# caller's context (the web app attributes usage to the user and story; see usage_ledger)
+_usage_listeners = []
+
+def add_usage_listener(fn):
+    _usage_listeners.append(fn)
+
+def _notify_usage(call_class, model, usage, seconds, finish_reason):
+    record_llm_call(call_class, model, seconds, usage)
+    for fn in _usage_listeners:
+        try:
+            fn(call_class, model, usage, seconds, finish_reason)
+        except Exception as e:
+            log.warning(f"Usage listener failed: {e}")
+
+def _post_once(url, headers, payload, timeout):
+    """One POST to the xAI API, recording latency and outcome metrics"""
+    start = time.perf_counter()
+    try:
+        r = requests.post(url, headers=headers, json=payload, timeout=(XAI_CONNECT_TIMEOUT_SECONDS, timeout))
+    except requests.Timeout:
+        record_upstream("xai", "timeout", time.perf_counter() - start)
+        raise
+    except requests.RequestException:
+        record_upstream("xai", "connection_error", time.perf_counter() - start)
+        raise
+    outcome = "ok" if r.status_code < 400 else f"http_{r.status_code // 100}xx"
+    record_upstream("xai", outcome, time.perf_counter() - start)
+    return r
+
+def _hedge_discarded(call_class, model):
+    """discard callback for a hedged call: the losing response was still billed, so its
+    tokens are recorded under call class <class>_hedge (in the caller's request context)"""
+    def discard(r, seconds):
+        try:
+            if r.status_code < 400:
+                body = r.json()
+                usage = body.get("usage", {})
+                finish_reason = (body.get("choices") or [{}])[0].get("finish_reason", "unknown")
+                record_tokens(usage, model=model)
+                _notify_usage(f"{call_class or 'other'}_hedge", model, usage, seconds, finish_reason)
+        finally:
+            r.close()
+    return discard
+
+def _post(url, headers, payload, timeout=XAI_TIMEOUT_SECONDS, deadline=XAI_DEADLINE_SECONDS, hedge=False,
+          call_class=None):
+    """POST with retries, backoff and the circuit breaker (raises CircuitOpenError while open).
+    With hedge (and XAI_HEDGE on), each attempt is hedged by a second identical request."""
+    def attempt(t):
+        return _post_once(url, headers, payload, t)
+    if hedge:
+        def attempt(t, single=attempt):
+            return xai_hedger.run(single, t, key=payload.get("model"), accept=lambda r: r.status_code < 500,
+                                  discard=_hedge_discarded(call_class, payload.get("model")))
+    return xai_caller.call(attempt, timeout, deadline)
+
 def _clean_thinking(s: str) -> str:
     s = THINK_BLOCK_RE.sub("", s)
     s = THOUGHT_PREFIX_RE.sub("", s)
@@ -25,7 +117,13 @@ def chat_with_grok(
     hide_thinking=True,
     stop=None,
     return_usage=False,
+    response_format=None,
+    hedge=False,
+    timeout=None,
+    call_class=None,
 ):
+    """One chat completion. timeout bounds the whole call, retries included (default
+    XAI_DEADLINE_SECONDS); call_class (story, critic, ...) labels latency and token metrics."""
     if not API_KEY:
         raise RuntimeError("Missing XAI_API_KEY environment variable.")
     url = f"{API_BASE}/chat/completions"
@@ -43,8 +141,12 @@ def chat_with_grok(
     if frequency_penalty is not None:
         payload["frequency_penalty"] = float(frequency_penalty)
     if stop: payload["stop"] = stop
+    if response_format: payload["response_format"] = response_format  # e.g. {"type": "json_schema", ...}
 
-    r = requests.post(url, headers=headers, json=payload, timeout=300)  # Extended timeout for complex AI calls
+    started = time.perf_counter()
+    deadline = float(timeout) if timeout else XAI_DEADLINE_SECONDS
+    attempt_timeout = min(XAI_TIMEOUT_SECONDS, deadline)
+    r = _post(url, headers, payload, timeout=attempt_timeout, deadline=deadline, hedge=hedge, call_class=call_class)
     try:
         r.raise_for_status()
     except requests.HTTPError as http_err:
@@ -58,12 +160,12 @@ def chat_with_grok(
         except Exception:
             detail = r.text
 
-        # Optional debug logging to stdout when XAI_DEBUG is set
+        # Optional debug logging when XAI_DEBUG is set
         if os.getenv("XAI_DEBUG"):
-            # Avoid printing secrets
+            # Avoid logging secrets
             safe_payload = {k: v for k, v in payload.items() if k not in {"messages"}}
-            print(f"[xai-debug] status={status_code} model={safe_payload.get('model')} payload_keys={list(safe_payload.keys())}")
-            print(f"[xai-debug] server_error={detail}")
+            log.warning(f"[xai-debug] status={status_code} model={safe_payload.get('model')} payload_keys={list(safe_payload.keys())}")
+            log.warning(f"[xai-debug] server_error={detail}")
 
         # Retry once with a minimal payload if 400 Bad Request (likely invalid params)
         if status_code == 400 and os.getenv("XAI_RETRY_MINIMAL", "1") != "0":
@@ -73,7 +175,8 @@ def chat_with_grok(
                 "max_tokens": min(512, int(payload.get("max_tokens", 512))),
                 "stream": False,
             }
-            r2 = requests.post(url, headers=headers, json=minimal_payload, timeout=300)  # Extended timeout for complex AI calls
+            remaining = max(5.0, deadline - (time.perf_counter() - started))
+            r2 = _post(url, headers, minimal_payload, timeout=min(attempt_timeout, remaining), deadline=remaining)
             try:
                 r2.raise_for_status()
             except requests.HTTPError as http_err2:
@@ -88,14 +191,18 @@ def chat_with_grok(
                     f"{http_err} — Response: {detail} | Retry failed: {http_err2} — Response: {second_detail}"
                 )
             else:
-                text2 = r2.json()["choices"][0]["message"]["content"]
+                response_json2 = r2.json()
+                text2 = response_json2["choices"][0]["message"]["content"]
+                usage2 = response_json2.get("usage", {})
+                finish_reason2 = response_json2["choices"][0].get("finish_reason", "unknown")
                 cleaned_text2 = _clean_thinking(text2) if hide_thinking else text2
+                record_tokens(usage2, model=payload["model"])
+                _notify_usage(call_class, payload["model"], usage2, time.perf_counter() - started, finish_reason2)
                 if return_usage:
-                    # For retry case, we don't have usage info, so return minimal structure
                     return {
                         "text": cleaned_text2,
-                        "usage": {},
-                        "finish_reason": "unknown"
+                        "usage": usage2,
+                        "finish_reason": finish_reason2
                     }
                 else:
                     return cleaned_text2
@@ -106,13 +213,15 @@ def chat_with_grok(
     text = response_json["choices"][0]["message"]["content"]
     usage = response_json.get("usage", {})
     finish_reason = response_json["choices"][0].get("finish_reason", "unknown")
+    record_tokens(usage, model=payload["model"])
+    _notify_usage(call_class, payload["model"], usage, time.perf_counter() - started, finish_reason)
     
     # Debug: check if response was truncated
     if os.getenv("XAI_DEBUG"):
-        print(f"[xai-debug] finish_reason={finish_reason}")
-        print(f"[xai-debug] usage={usage}")
+        log.info(f"[xai-debug] finish_reason={finish_reason}")
+        log.info(f"[xai-debug] usage={usage}")
         if finish_reason == "length":
-            print(f"[xai-debug] Response was truncated due to max_tokens limit")
+            log.info(f"[xai-debug] Response was truncated due to max_tokens limit")
     
     # Return both text and usage information if requested
     cleaned_text = _clean_thinking(text) if hide_thinking else text
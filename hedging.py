@@ -0,0 +1,178 @@
+import os
+import time
+import queue
+import threading
+import contextvars
+from collections import deque
+
+from metrics import Counter
+from resilience import RetryBudget
+
+# Hedged upstream requests for the main story call (off by default):
+#   XAI_HEDGE                        = 0     1 enables hedging for calls that ask for it
+#   XAI_HEDGE_PERCENTILE             = 95    hedge once a call has run longer than this latency percentile ...
+#   XAI_HEDGE_MIN_DELAY_SECONDS      = 2     ... but never sooner than this
+#   XAI_HEDGE_DEFAULT_DELAY_SECONDS  = 30    delay until enough latencies have been observed
+#   XAI_HEDGE_MAX_RATIO              = 0.1   hedges may add at most this fraction of calls (plus a small reserve)
+XAI_HEDGE = os.getenv('XAI_HEDGE', '0').lower() in ('1', 'true', 'yes')
+XAI_HEDGE_PERCENTILE = float(os.getenv('XAI_HEDGE_PERCENTILE', '95'))
+XAI_HEDGE_MIN_DELAY_SECONDS = float(os.getenv('XAI_HEDGE_MIN_DELAY_SECONDS', '2'))
+XAI_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv('XAI_HEDGE_DEFAULT_DELAY_SECONDS', '30'))
+XAI_HEDGE_MAX_RATIO = float(os.getenv('XAI_HEDGE_MAX_RATIO', '0.1'))
+LATENCY_WINDOW = 200   # recent attempt latencies kept per key
+MIN_SAMPLES = 20       # before this many, the default delay is used
+
+HEDGE_EVENTS = Counter(
+    'grok_hedge_total', 'Hedged request outcomes (primary_only, hedged, hedge_won, primary_won, denied)',
+    ('service', 'event'))
+
+
+def _close(result, elapsed):
+    close = getattr(result, 'close', None)
+    if close is not None:
+        close()
+
+
+def _discard(discard, state):
+    if state.error is None:
+        try:
+            discard(state.result, state.elapsed)
+        except Exception:
+            pass  # the caller already has its answer
+
+
+class _Attempt:
+    def __init__(self, name):
+        self.name = name
+        self.cancelled = False
+        self.finished = False
+        self.lock = threading.Lock()
+        self.result = None
+        self.error = None
+        self.elapsed = None
+
+
+class Hedger:
+    """Sends a second identical request when the first is slower than usual; first good answer wins.
+
+    The hedge delay is a percentile of recently observed attempt latencies (per key,
+    e.g. model), so only the slow tail is hedged. Hedges draw on a budget so they add
+    at most max_ratio extra calls. A blocking HTTP call cannot be interrupted, so the
+    losing attempt runs to completion and was paid for: when it arrives its result goes
+    to run()'s discard callback (which can record its usage) instead of the caller.
+    Attempts run in a copy of the caller's context, so the callback sees its request.
+    """
+
+    def __init__(self, service, enabled=XAI_HEDGE, percentile=XAI_HEDGE_PERCENTILE,
+                 min_delay=XAI_HEDGE_MIN_DELAY_SECONDS, default_delay=XAI_HEDGE_DEFAULT_DELAY_SECONDS,
+                 budget=None):
+        self.service = service
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.budget = budget or RetryBudget(ratio=XAI_HEDGE_MAX_RATIO, min_reserve=5)
+        self.stats = {'calls': 0, 'primary_only': 0, 'hedged': 0, 'hedge_won': 0, 'primary_won': 0, 'denied': 0}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, seconds):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def delay(self, key):
+        """Seconds to wait for the first attempt before hedging"""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < MIN_SAMPLES:
+            return self.default_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100.0))
+        return max(self.min_delay, samples[index])
+
+    def _count(self, event):
+        self.stats[event] += 1
+        HEDGE_EVENTS.labels(service=self.service, event=event).inc()
+
+    def _launch(self, name, attempt, timeout, key, done, discard):
+        state = _Attempt(name)
+
+        def run():
+            started = time.monotonic()
+            try:
+                state.result = attempt(timeout)
+            except Exception as e:
+                state.error = e
+            state.elapsed = time.monotonic() - started
+            if state.error is None:
+                self.observe(key, state.elapsed)
+            with state.lock:
+                state.finished = True
+                cancelled = state.cancelled
+            if cancelled:
+                _discard(discard, state)
+            done.put(state)
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name=f"{self.service}-{name}", daemon=True).start()
+        return state
+
+    def run(self, attempt, timeout, key='default', accept=None, discard=None):
+        """attempt(timeout) -> result; accept(result) says whether a result may win
+        (default: any that did not raise). discard(result, elapsed) receives a result
+        that arrives after another attempt won (default: result.close()). Returns the
+        winner or re-raises."""
+        if not self.enabled:
+            return attempt(timeout)
+        self.budget.record_call()
+        self.stats['calls'] += 1
+        delay = self.delay(key)
+        started = time.monotonic()
+        done = queue.Queue()
+        discard = discard or _close
+        pending = [self._launch('primary', attempt, timeout, key, done, discard)]
+        finished = []
+        wait_for = delay if delay < timeout else None
+        while pending:
+            try:
+                state = done.get(timeout=wait_for if wait_for is not None else timeout + 30)
+            except queue.Empty:
+                if wait_for is None:
+                    break  # attempts are bounded by their own timeouts; this is a safety net
+                wait_for = None
+                if self.budget.try_spend():
+                    self._count('hedged')
+                    remaining = max(1.0, timeout - (time.monotonic() - started))
+                    pending.append(self._launch('hedge', attempt, remaining, key, done, discard))
+                else:
+                    self._count('denied')
+                continue
+            pending.remove(state)
+            finished.append(state)
+            if state.error is None and (accept is None or accept(state.result)):
+                self._cancel([s for s in pending + finished if s is not state], discard)
+                return self._finish(state, hedged=len(pending) + len(finished) > 1)
+        # No acceptable answer: report the primary's
+        primary = next((s for s in finished if s.name == 'primary'), finished[0] if finished else None)
+        self._cancel([s for s in pending + finished if s is not primary], discard)
+        if primary is None:
+            raise TimeoutError(f"{self.service} hedged call did not finish")
+        return self._finish(primary, hedged=len(finished) > 1)
+
+    @staticmethod
+    def _cancel(states, discard):
+        """Hand results the caller will not use to discard: now if already in, else when they arrive"""
+        for state in states:
+            with state.lock:
+                state.cancelled = True
+                finished = state.finished
+            if finished:
+                _discard(discard, state)
+
+    def _finish(self, state, hedged):
+        if hedged:
+            self._count('hedge_won' if state.name == 'hedge' else 'primary_won')
+        else:
+            self._count('primary_only')
+        if state.error is not None:
+            raise state.error
+        return state.result
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+import contextvars
+from datetime import datetime
+
+# Logging configuration (all optional):
+#   LOG_LEVEL   = INFO | DEBUG | WARNING ...   base level for every subsystem
+#   LOG_FORMAT  = text | json                  json emits one object per line
+#   LOG_SAMPLE  = "chat=0.1,tts=0.5"           keep this fraction of DEBUG records per subsystem
+#   LOG_LEVELS  = "tts=DEBUG,grok=WARNING"     per-subsystem level overrides
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+ROOT_LOGGER = "grok"
+
+# Per-request overrides, set by the web app for users who have debug logging switched on
+_debug_override = contextvars.ContextVar("log_debug_override", default=False)
+_request_fields = contextvars.ContextVar("log_request_fields", default=None)
+
+LEVEL_PREFIX = {
+    logging.DEBUG: "🔍 Debug:",
+    logging.INFO: "ℹ️",
+    logging.WARNING: "⚠️",
+    logging.ERROR: "❌",
+    logging.CRITICAL: "❌",
+}
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def _parse_mapping(raw):
+    mapping = {}
+    for part in (raw or "").split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+def _level(name, default=logging.INFO):
+    value = logging.getLevelName(str(name).upper())
+    return value if isinstance(value, int) else default
+
+
+_subsystem_levels = {k: _level(v) for k, v in _parse_mapping(os.getenv("LOG_LEVELS")).items()}
+_sample_rates = {}
+for _name, _rate in _parse_mapping(os.getenv("LOG_SAMPLE")).items():
+    try:
+        _sample_rates[_name] = max(0.0, min(1.0, float(_rate)))
+    except ValueError:
+        pass
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the structured fields flattened in"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(),
+            "level": record.levelname.lower(),
+            "subsystem": getattr(record, "subsystem", record.name),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and key not in entry and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Matches the existing emoji-prefixed print output, with fields appended as k=v"""
+
+    def format(self, record):
+        prefix = LEVEL_PREFIX.get(record.levelno, "")
+        subsystem = getattr(record, "subsystem", record.name)
+        text = f"{prefix} [{subsystem}] {record.getMessage()}"
+        extras = [f"{k}={v}" for k, v in record.__dict__.items()
+                  if k not in _STANDARD_ATTRS and k != "subsystem" and not k.startswith("_")]
+        if extras:
+            text += " " + " ".join(extras)
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class SubsystemLogger(logging.LoggerAdapter):
+    """Logger for one subsystem: log.debug("msg", user=..., story_id=...) attaches fields"""
+
+    def __init__(self, subsystem):
+        super().__init__(logging.getLogger(f"{ROOT_LOGGER}.{subsystem}"), {"subsystem": subsystem})
+        self.subsystem = subsystem
+
+    def isEnabledFor(self, level):
+        if level >= _subsystem_levels.get(self.subsystem, _level(LOG_LEVEL)):
+            return True
+        return _debug_override.get()
+
+    def debug_enabled(self):
+        """Use to guard expensive debug-only work such as dumping the whole history"""
+        return self.isEnabledFor(logging.DEBUG)
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.isEnabledFor(level):
+            return
+        if level < logging.INFO and not _debug_override.get():
+            rate = _sample_rates.get(self.subsystem)
+            if rate is not None and random.random() >= rate:
+                return
+        msg, kwargs = self.process(msg, kwargs)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def process(self, msg, kwargs):
+        extra = dict(self.extra)
+        request_fields = _request_fields.get()
+        if request_fields:
+            extra.update(request_fields)
+        for key in list(kwargs):
+            if key not in ("exc_info", "stack_info", "stacklevel", "extra"):
+                extra[key] = kwargs.pop(key)
+        extra.update(kwargs.pop("extra", None) or {})
+        kwargs["extra"] = extra
+        return msg, kwargs
+
+    # LoggerAdapter's helpers route through self.log so gating and sampling apply
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        self.log(logging.ERROR, msg, *args, exc_info=exc_info, **kwargs)
+
+
+_listener = None
+
+
+def configure_logging(stream=None):
+    """Install the queue handler so formatting and stdout writes happen off the request thread"""
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(logging.DEBUG)  # gating is done per subsystem in SubsystemLogger
+    root.propagate = False
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records (called at exit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(subsystem):
+    configure_logging()
+    return SubsystemLogger(subsystem)
+
+
+def set_debug_override(enabled):
+    """Force DEBUG output for the current request/context; returns a token for reset"""
+    return _debug_override.set(bool(enabled))
+
+
+def reset_debug_override(token):
+    _debug_override.reset(token)
+
+
+def bind_request_fields(**fields):
+    """Attach fields (request_id, user ...) to every record logged in this context"""
+    fields = {k: v for k, v in fields.items() if v is not None}
+    return _request_fields.set(fields or None)
+
+
+def reset_request_fields(token):
+    _request_fields.reset(token)
@@ -0,0 +1,279 @@
+import os
+import time
+import secrets
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds; upstream LLM calls routinely take tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def __init__(self):
+        super().__init__()
+        self.function = None
+
+    def set(self, value):
+        self.value = float(value)
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Compute the value at scrape time (e.g. a queue length)"""
+        self.function = function
+
+    def samples(self, name, labelnames, key):
+        if self.function is not None:
+            try:
+                self.value = float(self.function())
+            except Exception:
+                return []
+        return super().samples(name, labelnames, key)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, labelnames, key):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(list(self.buckets) + [float('inf')], counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, [('le', _format_value(bound))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Shared instruments used across modules
+HTTP_REQUEST_SECONDS = Histogram(
+    'grok_http_request_seconds', 'Flask request latency by route', ('route', 'method', 'status'))
+CHAT_STAGE_SECONDS = Histogram(
+    'grok_chat_stage_seconds', 'Time spent in each stage of a chat turn', ('stage',))
+UPSTREAM_REQUESTS = Counter(
+    'grok_upstream_requests_total', 'Calls to external APIs by outcome', ('service', 'outcome'))
+UPSTREAM_SECONDS = Histogram(
+    'grok_upstream_seconds', 'External API call latency', ('service',))
+LLM_TOKENS = Counter(
+    'grok_llm_tokens_total', 'Tokens reported by the model API', ('model', 'kind'))
+EXCHANGE_TOKENS = Counter(
+    'grok_exchange_tokens_total', 'Tokens per AI exchange type (story_generation, opener, ...)', ('exchange_type', 'kind'))
+LLM_CALL_SECONDS = Histogram(
+    'grok_llm_call_seconds', 'Model call latency, retries included, by call class and model', ('call_class', 'model'))
+LLM_CLASS_TOKENS = Counter(
+    'grok_llm_class_tokens_total', 'Tokens by call class and model', ('call_class', 'model', 'kind'))
+STARTUP_SECONDS = Gauge(
+    'grok_startup_seconds', 'Import-time phases and cold start to first request', ('phase',))
+QUEUE_DEPTH = Gauge(
+    'grok_queue_depth', 'Items waiting in background queues / in flight', ('queue',))
+
+
+def stage_timer(stage):
+    """Context manager recording the duration of one chat stage"""
+    return CHAT_STAGE_SECONDS.labels(stage=stage).time()
+
+
+def timed_stage(stage):
+    """Decorator form of stage_timer"""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_upstream(service, outcome, seconds=None):
+    UPSTREAM_REQUESTS.labels(service=service, outcome=outcome).inc()
+    if seconds is not None:
+        UPSTREAM_SECONDS.labels(service=service).observe(seconds)
+
+
+def record_tokens(usage, model=None, exchange_type=None):
+    """Count prompt/completion tokens from an API usage dict"""
+    if not isinstance(usage, dict):
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        value = usage.get(kind)
+        if isinstance(value, (int, float)) and value > 0:
+            short = kind.split('_')[0]
+            if model is not None:
+                LLM_TOKENS.labels(model=model, kind=short).inc(value)
+            if exchange_type is not None:
+                EXCHANGE_TOKENS.labels(exchange_type=exchange_type, kind=short).inc(value)
+
+
+def record_llm_call(call_class, model, seconds, usage=None):
+    """Latency and tokens of one model call, per call class (see model_routing)"""
+    if not call_class:
+        return
+    LLM_CALL_SECONDS.labels(call_class=call_class, model=model).observe(seconds)
+    if isinstance(usage, dict):
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            value = usage.get(kind)
+            if isinstance(value, (int, float)) and value > 0:
+                LLM_CLASS_TOKENS.labels(call_class=call_class, model=model, kind=kind.split('_')[0]).inc(value)
+
+
+def metrics_token_ok(auth_header):
+    """Check the optional METRICS_TOKEN bearer token for the scrape endpoint"""
+    expected = os.getenv('METRICS_TOKEN')
+    if not expected:
+        return True
+    provided = auth_header[len('Bearer '):].strip() if auth_header.startswith('Bearer ') else ''
+    return bool(provided) and secrets.compare_digest(provided, expected)
@@ -0,0 +1,28 @@
+"""Index for the projected, keyset-paginated scene listing
+
+Revision ID: 3d7a9e5c1f08
+Revises: 8c3f1a6e2b71
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7a9e5c1f08'
+down_revision = '8c3f1a6e2b71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('scenes')}
+    if 'ix_scenes_user_story_updated' in existing:
+        return
+    op.create_index('ix_scenes_user_story_updated', 'scenes',
+                    ['user_id', sa.text('lower(story_id)'), 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_scenes_user_story_updated', table_name='scenes')
@@ -0,0 +1,71 @@
+"""Scenes table, active story / default scene columns, Google id user_id on stories
+
+Revision ID: 5b1e7c2d9a40
+Revises: 934b0d3c58b2
+Create Date: 2026-10-19 09:00:00.000000
+
+Brings databases created by the initial migration up to the current models. Databases
+that were built by the old import-time create_all() already have most of this, so
+every step checks the live schema first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c2d9a40'
+down_revision = '934b0d3c58b2'
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    return {c['name']: c for c in inspector.get_columns(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'active_story_id' not in _columns(inspector, 'users'):
+        op.add_column('users', sa.Column('active_story_id', sa.String(length=80), nullable=True))
+
+    story_columns = _columns(inspector, 'stories')
+    if 'default_scene_id' not in story_columns:
+        op.add_column('stories', sa.Column('default_scene_id', sa.Integer(), nullable=True))
+
+    # stories.user_id was an Integer FK to users.id; the app stores the Google id string
+    if isinstance(story_columns['user_id']['type'], sa.Integer):
+        for fk in inspector.get_foreign_keys('stories'):
+            if fk['referred_table'] == 'users' and fk.get('name'):
+                op.drop_constraint(fk['name'], 'stories', type_='foreignkey')
+        with op.batch_alter_table('stories') as batch_op:
+            batch_op.alter_column('user_id', existing_type=sa.Integer(), type_=sa.String(length=120),
+                                  existing_nullable=False, postgresql_using='user_id::varchar')
+        op.execute(
+            "UPDATE stories SET user_id = (SELECT users.google_id FROM users "
+            "WHERE CAST(users.id AS VARCHAR(120)) = stories.user_id) "
+            "WHERE EXISTS (SELECT 1 FROM users WHERE CAST(users.id AS VARCHAR(120)) = stories.user_id)"
+        )
+
+    if 'scenes' not in inspector.get_table_names():
+        op.create_table('scenes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('story_id', sa.String(length=80), nullable=False),
+        sa.Column('user_id', sa.String(length=120), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('history', sa.JSON(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=True),
+        sa.Column('is_default', sa.Boolean(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('scenes')
+    # user_id stays a string: Google ids cannot be mapped back to integer user ids
+    op.drop_column('stories', 'default_scene_id')
+    op.drop_column('users', 'active_story_id')
@@ -0,0 +1,36 @@
+"""Scene state table for the write-behind scene state store
+
+Revision ID: 8c3f1a6e2b71
+Revises: 5b1e7c2d9a40
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f1a6e2b71'
+down_revision = '5b1e7c2d9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'scene_states' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('scene_states',
+    sa.Column('key', sa.String(length=400), nullable=False),
+    sa.Column('user_id', sa.String(length=120), nullable=False),
+    sa.Column('story_id', sa.String(length=80), nullable=True),
+    sa.Column('scene_id', sa.String(length=40), nullable=True),
+    sa.Column('state', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_scene_states_user_id'), 'scene_states', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_scene_states_user_id'), table_name='scene_states')
+    op.drop_table('scene_states')
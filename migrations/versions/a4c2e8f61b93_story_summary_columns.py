@@ -0,0 +1,74 @@
+"""Story catalog summary columns (backfilled from content) and listing index
+
+Revision ID: a4c2e8f61b93
+Revises: 3d7a9e5c1f08
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c2e8f61b93'
+down_revision = '3d7a9e5c1f08'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 200
+
+
+def _summary(content):
+    # Frozen copy of web_app.story_summary as of this revision
+    if isinstance(content, str):
+        content = json.loads(content)
+    content = content if isinstance(content, dict) else {}
+    characters = content.get('characters')
+    return {
+        'character_count': len(characters) if isinstance(characters, (dict, list)) else 0,
+        'story_type': str(content.get('story_type') or 'Unknown')[:80],
+        'maturity_level': str(content.get('maturity_level') or 'unknown')[:40],
+        'content_size': len(json.dumps(content, ensure_ascii=False).encode('utf-8')),
+    }
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c['name'] for c in inspector.get_columns('stories')}
+    with op.batch_alter_table('stories') as batch_op:
+        if 'character_count' not in columns:
+            batch_op.add_column(sa.Column('character_count', sa.Integer(), nullable=True))
+        if 'story_type' not in columns:
+            batch_op.add_column(sa.Column('story_type', sa.String(length=80), nullable=True))
+        if 'maturity_level' not in columns:
+            batch_op.add_column(sa.Column('maturity_level', sa.String(length=40), nullable=True))
+        if 'content_size' not in columns:
+            batch_op.add_column(sa.Column('content_size', sa.Integer(), nullable=True))
+    if 'ix_stories_user_updated' not in {ix['name'] for ix in inspector.get_indexes('stories')}:
+        op.create_index('ix_stories_user_updated', 'stories', ['user_id', 'updated_at', 'id'], unique=False)
+
+    # Backfill in id order, one batch of content rows in memory at a time
+    stories = sa.table('stories', sa.column('id', sa.Integer), sa.column('content', sa.JSON),
+                       sa.column('character_count', sa.Integer), sa.column('story_type', sa.String),
+                       sa.column('maturity_level', sa.String), sa.column('content_size', sa.Integer))
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.select(stories.c.id, stories.c.content)
+                            .where(stories.c.id > last_id).order_by(stories.c.id).limit(BACKFILL_BATCH)).all()
+        if not rows:
+            break
+        for row in rows:
+            bind.execute(stories.update().where(stories.c.id == row.id).values(**_summary(row.content)))
+        last_id = rows[-1].id
+
+
+def downgrade():
+    op.drop_index('ix_stories_user_updated', table_name='stories')
+    with op.batch_alter_table('stories') as batch_op:
+        batch_op.drop_column('content_size')
+        batch_op.drop_column('maturity_level')
+        batch_op.drop_column('story_type')
+        batch_op.drop_column('character_count')
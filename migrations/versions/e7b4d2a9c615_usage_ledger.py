@@ -0,0 +1,62 @@
+"""Usage ledger: per-call token usage and daily rollups
+
+Revision ID: e7b4d2a9c615
+Revises: a4c2e8f61b93
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b4d2a9c615'
+down_revision = 'a4c2e8f61b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'usage_events' not in tables:
+        op.create_table('usage_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.String(length=120), nullable=False),
+        sa.Column('story_id', sa.String(length=80), nullable=False),
+        sa.Column('stage', sa.String(length=40), nullable=False),
+        sa.Column('model', sa.String(length=80), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('cached_tokens', sa.Integer(), nullable=True),
+        sa.Column('latency_ms', sa.Integer(), nullable=True),
+        sa.Column('finish_reason', sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_usage_events_user_created', 'usage_events', ['user_id', 'created_at'], unique=False)
+        op.create_index('ix_usage_events_created', 'usage_events', ['created_at'], unique=False)
+    if 'usage_daily' not in tables:
+        op.create_table('usage_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.String(length=120), nullable=False),
+        sa.Column('story_id', sa.String(length=80), nullable=False),
+        sa.Column('stage', sa.String(length=40), nullable=False),
+        sa.Column('model', sa.String(length=80), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=True),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=True),
+        sa.Column('cached_tokens', sa.BigInteger(), nullable=True),
+        sa.Column('latency_ms', sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'user_id', 'story_id', 'stage', 'model', name='uq_usage_daily_key')
+        )
+        op.create_index('ix_usage_daily_user_day', 'usage_daily', ['user_id', 'day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_usage_daily_user_day', table_name='usage_daily')
+    op.drop_table('usage_daily')
+    op.drop_index('ix_usage_events_created', table_name='usage_events')
+    op.drop_index('ix_usage_events_user_created', table_name='usage_events')
+    op.drop_table('usage_events')
@@ -0,0 +1,95 @@
+import os
+
+# Model routing per call class. Each class gets a model, a max_tokens cap and a
+# timeout (the whole call, retries included). Defaults keep every class on XAI_MODEL;
+# point auxiliary classes at a cheaper, faster model with e.g. XAI_MODEL_CRITIC.
+#   XAI_MODEL_<CLASS>        model for the class (default XAI_MODEL, then grok-3)
+#   XAI_MAX_TOKENS_<CLASS>   cap on max_tokens (0: the caller's value)
+#   XAI_TIMEOUT_<CLASS>      seconds for the whole call
+#   XAI_MODEL_ALLOWLIST      comma-separated models a story may route to (default: the models above)
+# A story JSON can override any class with "model_routing": {"critic": {"model": "..."}}.
+# Story overrides are user input: a model must be allowed, max_tokens may only lower the
+# class cap, timeouts are clamped to XAI_DEADLINE_SECONDS and unparsable values are ignored.
+XAI_DEADLINE_SECONDS = float(os.getenv('XAI_DEADLINE_SECONDS', '110'))
+CALL_CLASSES = ('story', 'continuation', 'critic', 'analysis', 'rewrite')
+
+DEFAULT_ROUTES = {
+    'story': {'max_tokens': 0, 'timeout': 110},         # the turn the user waits on
+    'continuation': {'max_tokens': 400, 'timeout': 30},  # finishing a cut-off reply
+    'critic': {'max_tokens': 800, 'timeout': 45},        # continuity rewrite of a rehashed reply
+    'analysis': {'max_tokens': 0, 'timeout': 30},        # story points, scene state extraction
+    'rewrite': {'max_tokens': 1800, 'timeout': 60},      # /ooc rewrite previews
+}
+
+
+class Route:
+    def __init__(self, call_class, model, max_tokens, timeout):
+        self.call_class = call_class
+        self.model = model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+
+    def limit(self, max_tokens):
+        """The caller's max_tokens, capped for this class"""
+        max_tokens = int(max_tokens)
+        return min(max_tokens, self.max_tokens) if self.max_tokens else max_tokens
+
+    def as_dict(self):
+        return {'model': self.model, 'max_tokens': self.max_tokens, 'timeout': self.timeout}
+
+    def __repr__(self):
+        return f"Route({self.call_class}: {self.model}, max_tokens={self.max_tokens}, timeout={self.timeout})"
+
+
+def _env_route(call_class):
+    name = call_class.upper()
+    spec = dict(DEFAULT_ROUTES[call_class])
+    spec['model'] = os.getenv(f'XAI_MODEL_{name}') or os.getenv('XAI_MODEL', 'grok-3')
+    if os.getenv(f'XAI_MAX_TOKENS_{name}'):
+        spec['max_tokens'] = int(os.getenv(f'XAI_MAX_TOKENS_{name}'))
+    if os.getenv(f'XAI_TIMEOUT_{name}'):
+        spec['timeout'] = float(os.getenv(f'XAI_TIMEOUT_{name}'))
+    return spec
+
+
+def allowed_models():
+    """Models a story override may pick: XAI_MODEL_ALLOWLIST, else every env-configured model"""
+    allowlist = {m.strip() for m in os.getenv('XAI_MODEL_ALLOWLIST', '').split(',') if m.strip()}
+    return allowlist or {_env_route(call_class)['model'] for call_class in CALL_CLASSES}
+
+
+def _positive(value, parse):
+    try:
+        value = parse(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _apply_story_spec(spec, story_spec):
+    model = story_spec.get('model')
+    if isinstance(model, str) and model in allowed_models():
+        spec['model'] = model
+    max_tokens = _positive(story_spec.get('max_tokens'), int)
+    if max_tokens:
+        spec['max_tokens'] = min(max_tokens, spec['max_tokens']) if spec['max_tokens'] else max_tokens
+    timeout = _positive(story_spec.get('timeout'), float)
+    if timeout:
+        spec['timeout'] = timeout
+
+
+def route(call_class, overrides=None):
+    """Route for a call class; overrides is a story's "model_routing" mapping (or None)"""
+    if call_class not in DEFAULT_ROUTES:
+        raise ValueError(f"Unknown call class {call_class!r} (expected one of {', '.join(CALL_CLASSES)})")
+    spec = _env_route(call_class)
+    story_spec = (overrides or {}).get(call_class) if isinstance(overrides, dict) else None
+    if isinstance(story_spec, dict):
+        _apply_story_spec(spec, story_spec)
+    timeout = min(float(spec['timeout']), XAI_DEADLINE_SECONDS)
+    return Route(call_class, str(spec['model']), int(spec['max_tokens'] or 0), timeout)
+
+
+def routing_table(overrides=None):
+    """Every class's route, for debug endpoints"""
+    return {call_class: route(call_class, overrides).as_dict() for call_class in CALL_CLASSES}
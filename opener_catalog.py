@@ -0,0 +1,146 @@
+import os
+import re
+import glob
+import time
+import threading
+
+from log_helper import get_logger
+
+log = get_logger('web')
+
+# Opener catalog: opener*.txt files are read once and served from memory.
+#   OPENER_DIR               = .     directory holding the opener files
+#   OPENER_REFRESH_SECONDS   = 5     how often listing/loading may stat the files for changes (0: every call)
+OPENER_DIR = os.getenv('OPENER_DIR', '.')
+OPENER_REFRESH_SECONDS = float(os.getenv('OPENER_REFRESH_SECONDS', '5'))
+OPENER_PATTERN = 'opener*.txt'
+
+_FRONT_MATTER_RE = re.compile(r'\A---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+_CAST_IN_NAME_RE = re.compile(r'(\d+)\s*char|\b(\d+)$')
+
+
+def parse_front_matter(text):
+    """Split an opener into ({key: value}, body). Front-matter is an optional leading
+    block of `key: value` lines between two `---` lines."""
+    match = _FRONT_MATTER_RE.match(text)
+    if not match:
+        return {}, text
+    meta = {}
+    for line in match.group(1).splitlines():
+        key, sep, value = line.partition(':')
+        if sep and key.strip():
+            meta[key.strip().lower()] = value.strip()
+    return meta, text[match.end():]
+
+
+def display_name(filename):
+    """opener_office_3.txt -> 'office 3'"""
+    return filename.replace('.txt', '').replace('opener_', '').replace('_', ' ')
+
+
+def build_entry(filename, text, mtime=None):
+    """Catalog entry for one opener file: metadata plus the body served to the story"""
+    meta, body = parse_front_matter(text)
+    name = display_name(filename)
+    cast = [c.strip() for c in meta.get('cast', '').split(',') if c.strip()]
+    cast_size = meta.get('cast_size')
+    if cast_size is None and cast:
+        cast_size = len(cast)
+    if cast_size is None:
+        match = _CAST_IN_NAME_RE.search(name)
+        cast_size = (match.group(1) or match.group(2)) if match else None
+    try:
+        cast_size = int(cast_size) if cast_size is not None else None
+    except ValueError:
+        cast_size = None
+    return {
+        'filename': filename,
+        'name': meta.get('title') or name.title(),
+        'description': meta.get('description') or (f"{cast_size} characters" if cast_size else name),
+        'cast_size': cast_size,
+        'cast': cast,
+        'setting': meta.get('setting', ''),
+        'content': body,
+        'mtime': mtime,
+    }
+
+
+class OpenerCatalog:
+    """Opener files held in memory, refreshed when their modification times change.
+
+    list() and get() serve from memory. At most once per refresh interval they stat the
+    directory and the known files; only files whose mtime (or size) changed are read
+    again, and added or removed files show up through the directory mtime.
+    """
+
+    def __init__(self, directory=OPENER_DIR, pattern=OPENER_PATTERN, refresh_interval=OPENER_REFRESH_SECONDS):
+        self.directory = directory
+        self.pattern = pattern
+        self.refresh_interval = refresh_interval
+        self.stats = {'loads': 0, 'checks': 0}
+        self._entries = {}
+        self._stamps = {}
+        self._dir_mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _stamp(self, path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def _rescan(self):
+        """Bring the catalog in line with the directory; reads only changed files"""
+        self.stats['checks'] += 1
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            self._entries, self._stamps, self._dir_mtime = {}, {}, None
+            return
+        if dir_mtime != self._dir_mtime:
+            paths = glob.glob(os.path.join(self.directory, self.pattern))
+            names = {os.path.basename(p) for p in paths}
+            for gone in set(self._entries) - names:
+                self._entries.pop(gone, None)
+                self._stamps.pop(gone, None)
+        else:
+            names = set(self._entries)
+        for filename in names:
+            path = os.path.join(self.directory, filename)
+            try:
+                stamp = self._stamp(path)
+                if self._stamps.get(filename) == stamp:
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                log.warning(f"Opener file unreadable: {e}", filename=filename)
+                self._entries.pop(filename, None)
+                self._stamps.pop(filename, None)
+                continue
+            self._entries[filename] = build_entry(filename, text, stamp[0])
+            self._stamps[filename] = stamp
+            self.stats['loads'] += 1
+        self._dir_mtime = dir_mtime
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if force or self._checked_at is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+                self._rescan()
+                self._checked_at = time.monotonic()
+
+    def list(self):
+        """Metadata of every opener (no content), sorted by filename"""
+        self.refresh()
+        return [{k: v for k, v in entry.items() if k not in ('content', 'mtime')}
+                for _, entry in sorted(self._entries.items())]
+
+    def get(self, filename):
+        """Entry for an opener file name (a bare name; paths are not served), or None"""
+        self.refresh()
+        return self._entries.get(os.path.basename(filename or ''))
+
+
+opener_catalog = OpenerCatalog()
@@ -0,0 +1,237 @@
+import os
+import io
+import sys
+import json
+import time
+import glob
+import uuid
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+from log_helper import get_logger
+
+log = get_logger('profiling')
+
+# Profiling configuration (all optional)
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('instance', 'profiles'))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '0'))            # >0 enables auto-capture of slow requests
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))  # seconds between stack samples
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))                   # newest profiles kept on disk
+TOGGLE_CACHE_SECONDS = 5.0  # admin profiling toggles are re-read from shared state at most this often per process
+
+_SAFE_ID = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_')
+
+
+def safe_request_id(request_id):
+    """Request IDs come from headers; keep only characters that are safe in a filename"""
+    cleaned = ''.join(c for c in str(request_id or '') if c in _SAFE_ID)[:64]
+    return cleaned or None
+
+
+def new_profile_id():
+    """Profiles are stored under a server-generated id, never under a client-supplied one"""
+    return uuid.uuid4().hex[:16]
+
+
+_toggles = {}  # shared-state key -> (read at, enabled)
+_toggles_lock = threading.Lock()
+
+
+def toggle_enabled(state, user_id=None):
+    """Admin toggle (profile:all or profile:user:<id>) set, read through a short per-process cache"""
+    keys = ['profile:all'] + ([f"profile:user:{user_id}"] if user_id else [])
+    now = time.monotonic()
+    for key in keys:
+        with _toggles_lock:
+            cached = _toggles.get(key)
+        if cached is None or now - cached[0] >= TOGGLE_CACHE_SECONDS:
+            cached = (now, state.get(key) is not None)
+            with _toggles_lock:
+                if len(_toggles) > 10000:
+                    _toggles.clear()
+                _toggles[key] = cached
+        if cached[1]:
+            return True
+    return False
+
+
+def forget_toggle(key):
+    """Drop a cached toggle so this process sees a change right away (others within TOGGLE_CACHE_SECONDS)"""
+    with _toggles_lock:
+        _toggles.pop(key, None)
+
+
+class StackSampler:
+    """One background thread that samples the stacks of registered request threads.
+
+    Used for automatic slow-request capture: every request is sampled cheaply and the
+    collapsed stacks are only written out if the request turns out to be slow.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._targets = {}  # thread ident -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                targets = list(self._targets.items())
+            if not targets:
+                self._wake.clear()
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[self._collapse(frame)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _collapse(frame):
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ';'.join(reversed(parts))
+
+
+sampler = StackSampler()
+
+
+class RequestProfile:
+    """Profile for one request: cProfile when explicitly requested, stack samples for auto-capture"""
+
+    def __init__(self, profile_id, deterministic):
+        self.profile_id = profile_id
+        self.deterministic = deterministic
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.profiler = None
+        if deterministic:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            sampler.start(self.thread_id)
+
+    def finish(self, meta):
+        """Stop profiling; persist if explicit or slower than PROFILE_SLOW_MS. Returns metadata or None."""
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        if self.profiler is not None:
+            self.profiler.disable()
+            return save_cprofile(self.profile_id, self.profiler, dict(meta, duration_ms=round(duration_ms, 1)))
+        stacks = sampler.stop(self.thread_id)
+        if PROFILE_SLOW_MS and duration_ms >= PROFILE_SLOW_MS and stacks:
+            return save_samples(self.profile_id, stacks, dict(meta, duration_ms=round(duration_ms, 1)))
+        return None
+
+    def abandon(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        else:
+            sampler.stop(self.thread_id)
+
+
+def _write_meta(profile_id, meta):
+    meta['profile_id'] = profile_id
+    meta.setdefault('created', datetime.utcnow().isoformat())
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    _prune()
+    log.info(f"Saved {meta['kind']} profile", profile_id=profile_id, duration_ms=meta.get('duration_ms'))
+    return meta
+
+
+def save_cprofile(profile_id, profiler, meta):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.txt"), 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+    return _write_meta(profile_id, dict(meta, kind='cprofile', formats=['txt', 'prof']))
+
+
+def save_samples(profile_id, stacks, meta):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), 'w', encoding='utf-8') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    # Text summary: the hottest leaf frames, which is usually all that's needed at a glance
+    leaves = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    total = sum(stacks.values())
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.txt"), 'w', encoding='utf-8') as f:
+        f.write(f"{total} samples every {PROFILE_SAMPLE_INTERVAL * 1000:.1f}ms\n\n")
+        for leaf, count in leaves.most_common(40):
+            f.write(f"{count / total * 100:6.1f}%  {leaf}\n")
+    return _write_meta(profile_id, dict(meta, kind='sampled', samples=total, formats=['txt', 'folded']))
+
+
+def list_profiles(user=None, limit=50):
+    """Newest first; optionally only a single user's profiles"""
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(PROFILE_DIR, '*.json')), key=os.path.getmtime, reverse=True):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if user is not None and meta.get('user') != user:
+            continue
+        meta.setdefault('profile_id', meta.get('request_id'))  # older profiles were stored under the request id
+        profiles.append(meta)
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+
+def get_profile(profile_id):
+    profile_id = safe_request_id(profile_id)
+    if not profile_id:
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_path(profile_id, fmt):
+    """Path of a stored profile artifact, or None if it doesn't exist"""
+    profile_id = safe_request_id(profile_id)
+    if not profile_id or fmt not in ('txt', 'prof', 'folded'):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.{fmt}")
+    return path if os.path.exists(path) else None
+
+
+def _prune():
+    metas = sorted(glob.glob(os.path.join(PROFILE_DIR, '*.json')), key=os.path.getmtime, reverse=True)
+    for meta_path in metas[PROFILE_KEEP:]:
+        base = meta_path[:-len('.json')]
+        for ext in ('.json', '.txt', '.prof', '.folded'):
+            try:
+                os.remove(base + ext)
+            except OSError:
+                pass
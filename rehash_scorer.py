@@ -0,0 +1,161 @@
+import os
+import json
+import math
+from scene_fingerprint import shingle_hashes
+from continuity_ledger import fold32
+
+# Local model deciding whether a reply rehashes the scene enough to pay for a critic rewrite.
+#   REHASH_GATE     = shadow | model | heuristic
+#                     shadow: the heuristic decides, the model score is only logged (rehash_check audit events)
+#                     model: the critic runs only when the model score reaches the threshold
+#   REHASH_WEIGHTS  = rehash_weights.json   weights, bias and threshold (tests/rehash_eval.py fit writes it)
+REHASH_GATE = os.getenv("REHASH_GATE", "shadow").lower()
+REHASH_WEIGHTS = os.getenv("REHASH_WEIGHTS", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          "rehash_weights.json"))
+
+FEATURES = (
+    "overlap_ratio",    # share of the reply's 3-grams found in the last two replies
+    "lead_recap",       # repeated 3-grams weighted toward the start of the reply (recaps open replies)
+    "scene_repeat",     # share of 3-grams seen anywhere in the scene (fingerprint index)
+    "near_duplicate",   # SimHash similarity to the closest recent reply
+    "anchor_echo",      # reply contains the start of the previous reply's tail verbatim
+    "state_density",    # established-state keywords per 100 words (capped at 1.0)
+    "clothing_redo",    # undressing again after the scene established nakedness
+    "legacy_overlap",   # the old first-32-3-grams overlap count, scaled to 0-1
+)
+
+CLOTHING_REDO_PHRASES = ('remove her bikini', 'sliding the fabric', 'tugs at the strings',
+                         'peeling the bikini', 'kicking them aside')
+LEAD_DECAY = 20.0  # shingles; weight halves roughly every 14 shingles
+
+
+def _legacy_ngrams(hashes, limit=32):
+    """First `limit` distinct 3-grams, as the original critic heuristic computed them"""
+    first = []
+    seen = set()
+    for h in hashes:
+        if h not in seen:
+            seen.add(h)
+            first.append(h)
+            if len(first) >= limit:
+                break
+    return set(first)
+
+
+def extract_features(reply, previous=(), anchor_tail='', fingerprint=None, keywords=(), established=()):
+    """Feature dict for one candidate reply.
+
+    previous holds the recent replies as 32-bit 3-gram hashes (continuity_ledger.reply_shingles),
+    established the fact phrases the ledger found in them.
+    """
+    reply = reply or ''
+    reply_lc = reply.lower()
+    anchor_lc = (anchor_tail or '').lower()
+
+    full_hashes = shingle_hashes(reply_lc)
+    hashes = [fold32(h) for h in full_hashes]
+    previous_order = [h for shingles in previous or () for h in shingles]
+    previous_set = set(previous_order)
+    fingerprint_stats = fingerprint.analyze(reply) if fingerprint is not None else {}
+
+    if hashes:
+        repeated = [h in previous_set or (fingerprint is not None and fingerprint._contains(full))
+                    for h, full in zip(hashes, full_hashes)]
+        weights = [math.exp(-i / LEAD_DECAY) for i in range(len(hashes))]
+        lead_recap = sum(w for w, r in zip(weights, repeated) if r) / sum(weights)
+        overlap_ratio = sum(1 for h in hashes if h in previous_set) / len(hashes)
+    else:
+        lead_recap = overlap_ratio = 0.0
+
+    words = max(1, len(reply_lc.split()))
+    keyword_hits = sum(reply_lc.count(k) for k in keywords or ())
+    already_naked = 'already naked' in anchor_lc or 'naked' in (established or ())
+
+    return {
+        "overlap_ratio": overlap_ratio,
+        "lead_recap": lead_recap,
+        "scene_repeat": fingerprint_stats.get("repeat_ratio", 0.0),
+        "near_duplicate": fingerprint_stats.get("near_duplicate", 0.0),
+        "anchor_echo": 1.0 if anchor_lc and anchor_lc[:120] in reply_lc else 0.0,
+        "state_density": min(1.0, keyword_hits * 100.0 / words),
+        "clothing_redo": 1.0 if already_naked and any(p in reply_lc for p in CLOTHING_REDO_PHRASES) else 0.0,
+        "legacy_overlap": len(_legacy_ngrams(previous_order) & _legacy_ngrams(hashes)) / 32.0,
+    }
+
+
+def heuristic_decision(features, repeat_threshold=0.35, near_duplicate_threshold=0.92):
+    """The hand-tuned rule the critic used before the scorer (kept as the comparison baseline)"""
+    return bool(features.get("anchor_echo")
+                or features.get("legacy_overlap", 0) * 32 >= 4
+                or features.get("clothing_redo")
+                or features.get("scene_repeat", 0) >= repeat_threshold
+                or features.get("near_duplicate", 0) >= near_duplicate_threshold)
+
+
+class RehashScorer:
+    """Logistic model over FEATURES: score = sigmoid(bias + sum(weight * feature))"""
+
+    def __init__(self, weights=None, bias=0.0, threshold=0.5):
+        self.weights = {name: float((weights or {}).get(name, 0.0)) for name in FEATURES}
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+
+    def score(self, features):
+        z = self.bias + sum(self.weights[name] * float(features.get(name, 0.0)) for name in FEATURES)
+        if z < -60:
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def should_revise(self, features):
+        return self.score(features) >= self.threshold
+
+    def to_dict(self):
+        return {"weights": self.weights, "bias": self.bias, "threshold": self.threshold}
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+
+def load_scorer(path=None):
+    """Scorer from a weights file; an all-zero model (never revises) if it cannot be read"""
+    try:
+        with open(path or REHASH_WEIGHTS, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return RehashScorer(data.get("weights"), data.get("bias", 0.0), data.get("threshold", 0.5))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Rehash scorer weights unavailable ({e}) - model gate disabled")
+        return RehashScorer(bias=-60.0)
+
+
+def fit(rows, epochs=2000, learning_rate=0.5, l2=0.001):
+    """Fit a RehashScorer by batch gradient descent on [(features, label)]"""
+    scorer = RehashScorer()
+    n = len(rows)
+    if not n:
+        return scorer
+    for _ in range(epochs):
+        grad_w = dict.fromkeys(FEATURES, 0.0)
+        grad_b = 0.0
+        for features, label in rows:
+            error = scorer.score(features) - label
+            grad_b += error
+            for name in FEATURES:
+                grad_w[name] += error * float(features.get(name, 0.0))
+        scorer.bias -= learning_rate * grad_b / n
+        for name in FEATURES:
+            scorer.weights[name] -= learning_rate * (grad_w[name] / n + l2 * scorer.weights[name])
+    return scorer
+
+
+def confusion(predictions, labels):
+    """precision / recall / F1 / flag rate for boolean predictions against labels"""
+    tp = sum(1 for p, y in zip(predictions, labels) if p and y)
+    fp = sum(1 for p, y in zip(predictions, labels) if p and not y)
+    fn = sum(1 for p, y in zip(predictions, labels) if not p and y)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"tp": tp, "fp": fp, "fn": fn, "precision": precision, "recall": recall, "f1": f1,
+            "flag_rate": (tp + fp) / len(labels) if labels else 0.0}
@@ -0,0 +1,222 @@
+import os
+import time
+import random
+import threading
+
+from metrics import Counter, Gauge, record_upstream
+
+# Resilience for upstream API calls (xAI; all optional):
+#   XAI_MAX_ATTEMPTS           = 3     attempts per call, first one included
+#   XAI_BACKOFF_BASE_SECONDS   = 0.5   backoff before retry n is uniform in [0, base * 2**n] (full jitter) ...
+#   XAI_BACKOFF_MAX_SECONDS    = 8     ... capped here; a longer Retry-After ends the call instead of waiting
+#   XAI_BREAKER_FAILURES       = 5     consecutive failures (timeouts, connection errors, 5xx) that open the circuit
+#   XAI_BREAKER_RESET_SECONDS  = 30    open circuits fail fast this long, then let one probe call through
+#   XAI_RETRY_BUDGET_RATIO     = 0.2   retries may add at most this fraction of calls ...
+#   XAI_RETRY_BUDGET_MIN       = 10    ... plus this many banked retries (refilled at 1 per 10 s)
+XAI_MAX_ATTEMPTS = int(os.getenv('XAI_MAX_ATTEMPTS', '3'))
+XAI_BACKOFF_BASE_SECONDS = float(os.getenv('XAI_BACKOFF_BASE_SECONDS', '0.5'))
+XAI_BACKOFF_MAX_SECONDS = float(os.getenv('XAI_BACKOFF_MAX_SECONDS', '8'))
+XAI_BREAKER_FAILURES = int(os.getenv('XAI_BREAKER_FAILURES', '5'))
+XAI_BREAKER_RESET_SECONDS = float(os.getenv('XAI_BREAKER_RESET_SECONDS', '30'))
+XAI_RETRY_BUDGET_RATIO = float(os.getenv('XAI_RETRY_BUDGET_RATIO', '0.2'))
+XAI_RETRY_BUDGET_MIN = float(os.getenv('XAI_RETRY_BUDGET_MIN', '10'))
+
+RETRY_DECISIONS = Counter(
+    'grok_upstream_retry_decisions_total', 'What happened after a failed upstream attempt', ('service', 'decision'))
+CIRCUIT_STATE = Gauge(
+    'grok_circuit_state', 'Upstream circuit breaker state (0 closed, 1 half-open, 2 open)', ('service',))
+RETRY_BUDGET = Gauge(
+    'grok_retry_budget', 'Retries currently available in the upstream retry budget', ('service',))
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, service, retry_in):
+        super().__init__(f"{service} is unavailable (circuit open); retry in {retry_in:.0f}s")
+        self.service = service
+        self.retry_in = retry_in
+
+
+class Outcome:
+    """How one attempt went: reason ('ok', 'timeout', 'http_503', ...), whether a retry
+    may help, whether it counts against the breaker, and any Retry-After in seconds"""
+
+    def __init__(self, reason, retryable=False, failure=False, retry_after=None):
+        self.reason = reason
+        self.retryable = retryable
+        self.failure = failure
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=XAI_MAX_ATTEMPTS, base_delay=XAI_BACKOFF_BASE_SECONDS,
+                 max_delay=XAI_BACKOFF_MAX_SECONDS, rng=random.random):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng
+
+    def delay(self, retry, retry_after=None):
+        """Seconds to wait before retry number `retry` (0-based); None means don't retry"""
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return self.rng() * min(self.max_delay, self.base_delay * (2 ** retry))
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open after `threshold` failures; after
+    `reset_timeout` one probe is let through (half-open) and its result closes or
+    re-opens the circuit."""
+
+    def __init__(self, threshold=XAI_BREAKER_FAILURES, reset_timeout=XAI_BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        return HALF_OPEN if self.clock() - self.opened_at >= self.reset_timeout else OPEN
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self.probing = False
+
+
+class RetryBudget:
+    """Caps retries across all calls: each call deposits `ratio` of a retry, time adds
+    min_reserve retries per 100 s, and a retry spends one. Under a broad outage this
+    keeps retries from multiplying upstream load."""
+
+    def __init__(self, ratio=XAI_RETRY_BUDGET_RATIO, min_reserve=XAI_RETRY_BUDGET_MIN, clock=time.monotonic):
+        self.ratio = ratio
+        self.capacity = max(min_reserve, 1.0)
+        self.refill_rate = min_reserve / 100.0
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount=0.0):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + amount + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def record_call(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class ResilientCaller:
+    """Runs upstream attempts with classified retries, a circuit breaker and a retry budget.
+
+    attempt(timeout) performs one request and returns its result (or raises);
+    classify(result, error) -> Outcome. The whole call, backoff included, stays inside
+    `deadline` seconds; each attempt gets what is left, up to attempt_timeout.
+    """
+
+    def __init__(self, service, classify, policy=None, breaker=None, budget=None, sleep=time.sleep):
+        self.service = service
+        self.classify = classify
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.sleep = sleep
+        CIRCUIT_STATE.labels(service=service).set_function(lambda: _STATE_VALUES[self.breaker.state])
+        RETRY_BUDGET.labels(service=service).set_function(self.budget.available)
+
+    def call(self, attempt, attempt_timeout, deadline, min_attempt=5.0):
+        if not self.breaker.allow():
+            record_upstream(self.service, 'circuit_open')
+            raise CircuitOpenError(self.service, self.breaker.retry_in())
+        self.budget.record_call()
+        started = time.monotonic()
+        retry = 0
+        while True:
+            remaining = deadline - (time.monotonic() - started)
+            result = error = None
+            try:
+                result = attempt(min(attempt_timeout, max(remaining, min_attempt)))
+            except Exception as e:
+                error = e
+            outcome = self.classify(result, error)
+            if outcome.failure:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # the upstream answered (a 4xx or 429 is not an outage)
+            if not outcome.retryable:
+                break
+            delay = self._retry_delay(retry, outcome, deadline - (time.monotonic() - started), min_attempt)
+            if delay is None:
+                break
+            self.sleep(delay)
+            retry += 1
+            if not self.breaker.allow():
+                break  # opened while we were backing off (other calls failing too)
+        if error is not None:
+            raise error
+        return result
+
+    def _retry_delay(self, retry, outcome, remaining, min_attempt):
+        """Backoff seconds before the next attempt, or None to give up (the reason is counted)"""
+        delay = self.policy.delay(retry, outcome.retry_after)
+        if retry + 1 >= self.policy.max_attempts:
+            decision = 'attempts_exhausted'
+        elif delay is None:
+            decision = 'retry_after_too_long'
+        elif remaining - delay < min_attempt:
+            decision = 'deadline'
+        elif self.breaker.state != CLOSED:
+            decision = 'circuit_open'
+        elif not self.budget.try_spend():
+            decision = 'budget_exhausted'
+        else:
+            decision = 'retried'
+        RETRY_DECISIONS.labels(service=self.service, decision=decision).inc()
+        return delay if decision == 'retried' else None
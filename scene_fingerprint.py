@@ -0,0 +1,130 @@
+import os
+import re
+import base64
+import zlib
+
+# Per-scene repetition index. Every accepted reply's word 3-grams are hashed into a
+# Bloom filter, so "how much of this reply was already said in the scene" costs one
+# pass over the reply, whatever the scene length. A MinHash signature summarises the
+# scene vocabulary and per-reply SimHashes catch near-duplicate whole replies.
+#   FINGERPRINT_BITS     = 131072   Bloom filter size (16 KB; ~2% false positives at 15k shingles)
+#   FINGERPRINT_HASHES   = 4
+FINGERPRINT_BITS = int(os.getenv("FINGERPRINT_BITS", str(1 << 17)))
+FINGERPRINT_HASHES = int(os.getenv("FINGERPRINT_HASHES", "4"))
+MINHASH_PERMUTATIONS = 32
+SIMHASH_KEEP = 8  # recent replies kept for near-duplicate checks
+
+_WORD_RE = re.compile(r"[a-z']+")
+_MASK64 = (1 << 64) - 1
+_MERSENNE = (1 << 61) - 1
+_PRIME = 1099511628211  # FNV prime, mixes word hashes into shingle hashes
+# Fixed (a, b) pairs so signatures stay comparable across processes
+_PERMUTATIONS = [((i * 0x9E3779B97F4A7C15 + 1) % _MERSENNE | 1, (i * 0xC2B2AE3D27D4EB4F + 7) % _MERSENNE)
+                 for i in range(1, MINHASH_PERMUTATIONS + 1)]
+
+
+def shingle_hashes(text, n=3):
+    """64-bit hashes of the lowercased word n-grams of text, in order"""
+    words = [zlib.crc32(w.encode()) for w in _WORD_RE.findall((text or "").lower())]
+    hashes = []
+    for i in range(len(words) - n + 1):
+        h = 0
+        for w in words[i:i + n]:
+            h = ((h ^ w) * _PRIME) & _MASK64
+        hashes.append(h)
+    return hashes
+
+
+def simhash(hashes):
+    """64-bit SimHash over shingle hashes (similar texts differ in few bits)"""
+    if not hashes:
+        return 0
+    counts = [0] * 64
+    for h in hashes:
+        for bit in range(64):
+            counts[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(64) if counts[bit] > 0)
+
+
+def simhash_similarity(a, b):
+    return 1.0 - bin(a ^ b).count("1") / 64.0
+
+
+class SceneFingerprint:
+    """Incrementally updated shingle index for one scene (see module comment)"""
+
+    def __init__(self, bits=FINGERPRINT_BITS, hashes=FINGERPRINT_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self.bloom = bytearray((bits + 7) // 8)
+        self.minhash = [_MERSENNE] * MINHASH_PERMUTATIONS
+        self.simhashes = []
+        self.shingles = 0
+        self.replies = 0
+
+    def _positions(self, h):
+        # Double hashing: k positions from two halves of the 64-bit shingle hash
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _contains(self, h):
+        bloom = self.bloom
+        return all(bloom[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+    def add(self, text):
+        """Index a reply that became part of the scene"""
+        hashes = shingle_hashes(text)
+        bloom = self.bloom
+        for h in hashes:
+            for p in self._positions(h):
+                bloom[p >> 3] |= 1 << (p & 7)
+        if hashes:
+            self.minhash = [min(current, min((a * h + b) % _MERSENNE for h in hashes))
+                            for current, (a, b) in zip(self.minhash, _PERMUTATIONS)]
+            self.simhashes = (self.simhashes + [simhash(hashes)])[-SIMHASH_KEEP:]
+        self.shingles += len(hashes)
+        self.replies += 1
+
+    def repeat_ratio(self, text):
+        """Fraction of text's 3-grams already seen anywhere in the scene (0.0 - 1.0)"""
+        hashes = shingle_hashes(text)
+        if not hashes or not self.shingles:
+            return 0.0
+        return sum(1 for h in hashes if self._contains(h)) / len(hashes)
+
+    def analyze(self, text):
+        """repeat_ratio plus the closest recent reply by SimHash, in one pass over text"""
+        hashes = shingle_hashes(text)
+        if not hashes or not self.shingles:
+            return {"repeat_ratio": 0.0, "near_duplicate": 0.0, "shingles": len(hashes)}
+        repeated = sum(1 for h in hashes if self._contains(h))
+        reply_simhash = simhash(hashes)
+        nearest = max((simhash_similarity(reply_simhash, s) for s in self.simhashes), default=0.0)
+        return {"repeat_ratio": repeated / len(hashes), "near_duplicate": nearest, "shingles": len(hashes)}
+
+    def jaccard(self, other):
+        """Estimated vocabulary overlap with another scene's fingerprint (MinHash)"""
+        return sum(1 for a, b in zip(self.minhash, other.minhash) if a == b) / MINHASH_PERMUTATIONS
+
+    def to_dict(self):
+        return {
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "bloom": base64.b64encode(zlib.compress(bytes(self.bloom), 1)).decode("ascii"),
+            "minhash": self.minhash,
+            "simhashes": self.simhashes,
+            "shingles": self.shingles,
+            "replies": self.replies,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        fingerprint = cls(bits=int(data["bits"]), hashes=int(data["hashes"]))
+        bloom = zlib.decompress(base64.b64decode(data["bloom"]))
+        if len(bloom) == len(fingerprint.bloom):
+            fingerprint.bloom = bytearray(bloom)
+        fingerprint.minhash = list(data.get("minhash") or fingerprint.minhash)
+        fingerprint.simhashes = list(data.get("simhashes") or [])
+        fingerprint.shingles = int(data.get("shingles", 0))
+        fingerprint.replies = int(data.get("replies", 0))
+        return fingerprint
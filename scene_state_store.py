@@ -0,0 +1,288 @@
+import os
+import re
+import copy
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from log_helper import get_logger
+
+log = get_logger('story_state')
+
+# Scene state persistence (all optional):
+#   SCENE_STATE_BACKEND        = auto | db | kv | file   (auto: db when the web app has a database, else file)
+#   SCENE_STATE_DIR            = instance/scene_state    (file backend)
+#   SCENE_STATE_FLUSH_SECONDS  = 2                       how long updates are coalesced before a write
+#   SCENE_STATE_CACHE_SECONDS  = 60                      clean entries are re-read (and evicted) after this
+SCENE_STATE_BACKEND = os.getenv("SCENE_STATE_BACKEND", "auto").lower()
+SCENE_STATE_DIR = os.getenv("SCENE_STATE_DIR", os.path.join("instance", "scene_state"))
+SCENE_STATE_FLUSH_SECONDS = float(os.getenv("SCENE_STATE_FLUSH_SECONDS", "2"))
+SCENE_STATE_CACHE_SECONDS = float(os.getenv("SCENE_STATE_CACHE_SECONDS", "60"))
+
+
+def scene_state_key(user_id, story_id=None, scene_id=None):
+    """Store key for one scene's state: user:story:scene ('-' for unknown parts)"""
+    return ":".join(str(part) if part not in (None, "") else "-" for part in (user_id or "default", story_id, scene_id))
+
+
+def _split_key(key):
+    user_id, story_id, scene_id = (key.split(":", 2) + ["-", "-"])[:3]
+    return [None if part == "-" else part for part in (user_id, story_id, scene_id)]
+
+
+class FileBackend:
+    """One compact JSON file per key, written atomically"""
+
+    def __init__(self, directory=SCENE_STATE_DIR):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, "scene_state_" + re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".json")
+
+    def load(self, key):
+        paths = [self._path(key)]
+        user_id, story_id, scene_id = _split_key(key)
+        if story_id is None and scene_id is None:
+            paths.append(f"scene_state_{user_id}.json")  # pre-store location in the working directory
+        for path in paths:
+            try:
+                with open(path, "r") as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def save_many(self, items):
+        os.makedirs(self.directory, exist_ok=True)
+        for key, serialized in items:
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(serialized)
+            os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class KVBackend:
+    """Scene state in shared_state (Redis when SHARED_STATE_URL is set)"""
+
+    def __init__(self, state=None, ttl=None):
+        if state is None:
+            from shared_state import shared_state as state
+        self.state = state
+        self.ttl = ttl
+
+    def load(self, key):
+        raw = self.state.get(f"scene_state:{key}")
+        return json.loads(raw) if raw else None
+
+    def save_many(self, items):
+        for key, serialized in items:
+            self.state.set(f"scene_state:{key}", serialized, ttl=self.ttl)
+
+    def delete(self, key):
+        self.state.delete(f"scene_state:{key}")
+
+
+class ModelBackend:
+    """Rows of a Flask-SQLAlchemy model with key/user_id/story_id/scene_id/state/updated_at columns"""
+
+    def __init__(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+
+    def load(self, key):
+        with self.app.app_context():
+            row = self.db.session.get(self.model, key)
+            return copy.deepcopy(row.state) if row is not None else None
+
+    def save_many(self, items):
+        # One transaction per flush, however many scenes changed
+        with self.app.app_context():
+            try:
+                now = datetime.utcnow()
+                for key, serialized in items:
+                    user_id, story_id, scene_id = _split_key(key)
+                    self.db.session.merge(self.model(key=key, user_id=user_id, story_id=story_id,
+                                                     scene_id=scene_id, state=json.loads(serialized),
+                                                     updated_at=now))
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+
+    def delete(self, key):
+        with self.app.app_context():
+            self.db.session.query(self.model).filter_by(key=key).delete()
+            self.db.session.commit()
+
+
+class _Entry:
+    __slots__ = ("state", "serialized", "written", "loaded_at", "dirty_since")
+
+    def __init__(self, state, serialized, loaded_at):
+        self.state = state
+        self.serialized = serialized  # JSON of state as last put/loaded
+        self.written = serialized     # JSON the backend is known to hold
+        self.loaded_at = loaded_at
+        self.dirty_since = None
+
+
+class SceneStateStore:
+    """Write-behind cache for scene state.
+
+    get() loads a key lazily and keeps it in memory; put() only records the new state
+    and marks the key dirty. A background thread writes dirty keys in one batch every
+    flush_interval seconds, so several updates to a scene cost one backend write, and
+    writes that would not change anything are skipped. Each flush also drops clean
+    entries older than cache_seconds, so memory stays bounded by the recently used scenes.
+    """
+
+    def __init__(self, backend, flush_interval=SCENE_STATE_FLUSH_SECONDS, cache_seconds=SCENE_STATE_CACHE_SECONDS):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.cache_seconds = cache_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.stats = {"puts": 0, "writes": 0, "flushes": 0, "loads": 0, "errors": 0, "evictions": 0}
+
+    def _ensure_thread(self):
+        if self._thread is None and self.flush_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="scene-state-flusher", daemon=True)
+            self._thread.start()
+
+    def get(self, key):
+        """Copy of the stored state for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = entry is not None and (entry.dirty_since is not None
+                                           or time.monotonic() - entry.loaded_at < self.cache_seconds)
+            if fresh:
+                return copy.deepcopy(entry.state) if entry.state is not None else None
+        try:
+            state = self.backend.load(key)
+            self.stats["loads"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            log.warning(f"Scene state load failed: {e}", key=key)
+            state = None
+        serialized = json.dumps(state, separators=(",", ":")) if state is not None else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.dirty_since is not None:
+                return copy.deepcopy(entry.state)  # a put won the race; it is newer than the backend
+            self._entries[key] = _Entry(state, serialized, time.monotonic())
+        self._ensure_thread()  # the flusher also evicts stale entries
+        return copy.deepcopy(state) if state is not None else None
+
+    def put(self, key, state):
+        """Record new state for key; the backend write happens on the next flush"""
+        serialized = json.dumps(state, separators=(",", ":"))
+        with self._lock:
+            self.stats["puts"] += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(None, None, time.monotonic())
+            entry.state = copy.deepcopy(state)
+            entry.serialized = serialized
+            entry.loaded_at = time.monotonic()
+            if serialized != entry.written and entry.dirty_since is None:
+                entry.dirty_since = time.monotonic()
+        if self.flush_interval > 0:
+            self._ensure_thread()
+        else:
+            self.flush()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            log.warning(f"Scene state delete failed: {e}", key=key)
+
+    def dirty_count(self):
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.dirty_since is not None)
+
+    def flush(self):
+        """Write every dirty key in one backend batch; returns the number written"""
+        with self._lock:
+            self._evict_stale()
+            batch = [(key, entry.serialized) for key, entry in self._entries.items()
+                     if entry.dirty_since is not None and entry.serialized != entry.written]
+            for key, entry in self._entries.items():
+                if entry.dirty_since is not None and entry.serialized == entry.written:
+                    entry.dirty_since = None
+        if not batch:
+            return 0
+        try:
+            self.backend.save_many(batch)
+        except Exception as e:
+            self.stats["errors"] += 1
+            log.warning(f"Scene state flush failed, will retry: {e}", keys=len(batch))
+            return 0
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["writes"] += len(batch)
+            for key, serialized in batch:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                entry.written = serialized
+                if entry.serialized == serialized:
+                    entry.dirty_since = None  # otherwise it changed again during the write
+        return len(batch)
+
+    def _evict_stale(self):
+        """Drop clean entries past cache_seconds (a later get() would re-read them anyway); caller holds _lock"""
+        now = time.monotonic()
+        stale = [key for key, entry in self._entries.items()
+                 if entry.dirty_since is None and now - entry.loaded_at >= self.cache_seconds]
+        for key in stale:
+            del self._entries[key]
+        self.stats["evictions"] += len(stale)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write anything still dirty (called at exit)"""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+def create_store(backend=None):
+    if backend is None:
+        backend = KVBackend() if SCENE_STATE_BACKEND == "kv" else FileBackend()
+    return SceneStateStore(backend)
+
+
+# Global store; the web app swaps in the database backend once its models exist (see configure)
+store = create_store()
+atexit.register(lambda: store.close())
+
+
+def configure(backend):
+    """Switch the global store to another backend, flushing pending writes first"""
+    global store
+    previous = store
+    store = create_store(backend)
+    previous.close()
+    return store
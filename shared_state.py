@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import threading
+import importlib.util
+from contextlib import contextmanager
+
+from log_helper import get_logger
+
+log = get_logger('shared_state')
+
+# redis is only imported when a redis URL is configured (it costs ~100ms at startup)
+REDIS_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+
+class LockTimeout(Exception):
+    """Raised when a shared lock could not be acquired in time"""
+
+
+class SharedState:
+    """Coordination state shared by every worker (dedup keys, counters, locks, caches).
+
+    Values are strings; use get_json/set_json for structured data. A ttl is in
+    seconds and None means the key never expires.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it does not exist. Returns True if the key was set."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key, amount=1, ttl=None):
+        """Atomically add amount to an integer key and return the new value.
+
+        ttl is applied only when the key is created by this call.
+        """
+        raise NotImplementedError
+
+    def keys(self, prefix):
+        raise NotImplementedError
+
+    def _release_lock(self, key, token):
+        raise NotImplementedError
+
+    def delete_if(self, key, value):
+        """Delete key only if it still holds value (a token we set with add)"""
+        self._release_lock(key, value)
+
+    def get_json(self, key, default=None):
+        raw = self.get(key)
+        if raw is None:
+            return default
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return default
+
+    def set_json(self, key, value, ttl=None):
+        self.set(key, json.dumps(value, ensure_ascii=False), ttl=ttl)
+
+    @contextmanager
+    def lock(self, name, ttl=30, blocking_timeout=10.0, poll_interval=0.05):
+        """Hold a named lock across workers.
+
+        The lock expires after ttl seconds so a crashed worker cannot hold it forever.
+        """
+        key = f"lock:{name}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + blocking_timeout
+        while not self.add(key, token, ttl=ttl):
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Could not acquire lock {name} within {blocking_timeout}s")
+            time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            self._release_lock(key, token)
+
+
+class InProcessState(SharedState):
+    """Thread-safe dict backend. Only correct with a single worker process."""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at or None)
+        self._mutex = threading.RLock()
+
+    def _alive(self, key, now=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and (now or time.monotonic()) >= expires_at:
+            del self._data[key]
+            return None
+        return value
+
+    def _expiry(self, ttl):
+        return time.monotonic() + ttl if ttl is not None else None
+
+    def get(self, key):
+        with self._mutex:
+            return self._alive(key)
+
+    def set(self, key, value, ttl=None):
+        with self._mutex:
+            self._data[key] = (str(value), self._expiry(ttl))
+
+    def add(self, key, value, ttl=None):
+        with self._mutex:
+            if self._alive(key) is not None:
+                return False
+            self._data[key] = (str(value), self._expiry(ttl))
+            return True
+
+    def delete(self, key):
+        with self._mutex:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._mutex:
+            current = self._alive(key)
+            if current is None:
+                value = int(amount)
+                self._data[key] = (str(value), self._expiry(ttl))
+            else:
+                value = int(current) + int(amount)
+                self._data[key] = (str(value), self._data[key][1])
+            return value
+
+    def keys(self, prefix):
+        with self._mutex:
+            now = time.monotonic()
+            return [k for k in list(self._data) if k.startswith(prefix) and self._alive(k, now) is not None]
+
+    def _release_lock(self, key, token):
+        with self._mutex:
+            if self._alive(key) == token:
+                del self._data[key]
+
+
+class RedisState(SharedState):
+    """Redis backend so several gunicorn workers (or instances) share coordination state."""
+
+    def __init__(self, url=None, client=None, namespace="grok"):
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("redis package not installed")
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=5)
+        self.client = client
+        self.namespace = namespace
+        self._scripts = {}
+
+    def _k(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        return self.client.get(self._k(key))
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._k(key), value, ex=self._ttl(ttl))
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self._k(key), value, ex=self._ttl(ttl), nx=True))
+
+    def delete(self, key):
+        self.client.delete(self._k(key))
+
+    def incr(self, key, amount=1, ttl=None):
+        pipe = self.client.pipeline()
+        if ttl is not None:
+            # Create the key with its expiry first; NX leaves an existing counter untouched
+            pipe.set(self._k(key), 0, ex=self._ttl(ttl), nx=True)
+        pipe.incrby(self._k(key), int(amount))
+        return int(pipe.execute()[-1])
+
+    def keys(self, prefix):
+        strip = len(self.namespace) + 1
+        return [k[strip:] for k in self.client.scan_iter(match=self._k(prefix) + "*", count=500)]
+
+    def run_script(self, source, keys, args):
+        """Run a Lua script atomically on the server against namespaced keys (cached by SHA)"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self.client.register_script(source)
+        return script(keys=[self._k(k) for k in keys], args=args)
+
+    def _release_lock(self, key, token):
+        # Compare-and-delete so we never release a lock that expired and was re-acquired
+        from redis import WatchError
+        full_key = self._k(key)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(full_key)
+                if pipe.get(full_key) == token:
+                    pipe.multi()
+                    pipe.delete(full_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+            except WatchError:
+                pass
+
+    @staticmethod
+    def _ttl(ttl):
+        if ttl is None:
+            return None
+        return max(1, int(round(ttl)))
+
+
+def create_shared_state(url=None, workers=None):
+    """Build the configured backend: SHARED_STATE_URL=redis://... or in-process by default.
+
+    If Redis is configured but unreachable, a single worker falls back to in-process state;
+    with several workers (WEB_CONCURRENCY > 1) startup fails instead, since per-worker state
+    would silently split dedup keys, TTS jobs, admission slots and ledgers.
+    """
+    url = url if url is not None else (os.getenv("SHARED_STATE_URL") or os.getenv("REDIS_URL", ""))
+    workers = workers if workers is not None else int(os.getenv("WEB_CONCURRENCY", "1") or 1)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            backend = RedisState(url=url)
+            backend.client.ping()
+            log.info(f"Shared state: redis ({url.split('@')[-1]})")
+            return backend
+        except Exception as e:
+            if workers > 1:
+                raise RuntimeError(f"Shared state redis unavailable ({e}) with WEB_CONCURRENCY={workers}; "
+                                   f"workers cannot share in-process state") from e
+            log.error(f"Shared state redis unavailable ({e}) - falling back to in-process state")
+    return InProcessState()
+
+
+# Global shared state instance
+shared_state = create_shared_state()
@@ -0,0 +1,68 @@
+import os
+import time
+import threading
+
+# Cold start budget: process start -> first request served
+STARTUP_TARGET_MS = float(os.getenv('STARTUP_TARGET_MS', '1500'))
+
+
+def _process_start_time():
+    """Wall-clock time this process started (Linux /proc), or None if unavailable"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])  # field 22 overall: starttime in clock ticks since boot
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTimer:
+    """Records named startup phases and the cold-start-to-first-request time"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_wall = time.time()
+        self.process_started = _process_start_time() or self.started_wall
+        self._last = time.perf_counter()
+        self._origin = self._last
+        self.phases = []  # [(phase, ms)]
+        self.first_request_ms = None
+        self._first_request_lock = threading.Lock()
+
+    def mark(self, phase):
+        """Close the current phase (time since the previous mark)"""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def total_ms(self):
+        return (self._last - self._origin) * 1000
+
+    def breakdown(self):
+        return {
+            'module': self.name,
+            'phases_ms': {phase: round(ms, 1) for phase, ms in self.phases},
+            'import_total_ms': round(self.total_ms(), 1),
+            'interpreter_before_import_ms': round((self.started_wall - self.process_started) * 1000, 1),
+            'first_request_ms': round(self.first_request_ms, 1) if self.first_request_ms is not None else None,
+            'target_ms': STARTUP_TARGET_MS,
+        }
+
+    def report(self):
+        parts = ', '.join(f"{phase} {ms:.0f}ms" for phase, ms in self.phases)
+        print(f"⏱️ Startup {self.name}: {parts} (total {self.total_ms():.0f}ms)")
+
+    def first_request(self):
+        """Call at the start of the first request; returns cold-start ms once, then None"""
+        if self.first_request_ms is not None:
+            return None
+        with self._first_request_lock:
+            if self.first_request_ms is not None:
+                return None
+            self.first_request_ms = (time.time() - self.process_started) * 1000
+        status = "✅" if self.first_request_ms <= STARTUP_TARGET_MS else "⚠️"
+        print(f"{status} Cold start to first request: {self.first_request_ms:.0f}ms (target {STARTUP_TARGET_MS:.0f}ms)")
+        return self.first_request_ms
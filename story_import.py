@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import glob
+from datetime import datetime
+
+from log_helper import get_logger
+
+log = get_logger('web')
+
+# Bulk story import (CLI: upload_story.py, endpoint: /api/bulk-import-stories):
+#   STORY_IMPORT_BATCH    = 100   stories upserted per transaction
+#   STORY_IMPORT_WORKERS  = 0     validation processes for the CLI (0: one per CPU)
+STORY_IMPORT_BATCH = int(os.getenv('STORY_IMPORT_BATCH', '100'))
+STORY_IMPORT_WORKERS = int(os.getenv('STORY_IMPORT_WORKERS', '0'))
+PARALLEL_MIN_ITEMS = 32  # below this, process start-up costs more than it saves
+
+# field: (allowed types, required). Checked by the validator compile_schema builds.
+STORY_SCHEMA = {
+    'story_id': ((str,), True),
+    'title': ((str,), False),
+    'summary': ((str,), False),
+    'opener_text': ((str,), False),
+    'story_type': ((str,), False),
+    'maturity_level': ((str,), False),
+    'estimated_duration': ((str,), False),
+    'setting': ((dict, str), False),
+    'narrative_guidelines': ((dict, list, str), False),
+    'characters': ((dict, list), False),
+    'story_elements': ((dict, list), False),
+    'writing_rules': ((dict, list, str), False),
+    'metadata': ((dict,), False),
+    'is_public': ((bool,), False),
+}
+STORY_ID_RE = re.compile(r'^[A-Za-z0-9_.-]{1,80}$')
+TITLE_MAX = 200
+
+
+def compile_schema(schema):
+    """Turn a {field: (types, required)} spec into one validator function (errors list)"""
+    checks = []
+    for field, (types, required) in schema.items():
+        names = '/'.join(t.__name__ for t in types)
+
+        def check(data, field=field, types=types, required=required, names=names):
+            if field not in data:
+                return f"missing required field '{field}'" if required else None
+            if not isinstance(data[field], types):
+                return f"'{field}' must be {names}"
+            return None
+        checks.append(check)
+
+    def validate(data):
+        if not isinstance(data, dict):
+            return ['story must be a JSON object']
+        errors = [e for e in (check(data) for check in checks) if e]
+        story_id = data.get('story_id')
+        if isinstance(story_id, str) and not STORY_ID_RE.match(story_id):
+            errors.append("'story_id' may only contain letters, digits, '_', '-', '.' (max 80)")
+        if isinstance(data.get('title'), str) and len(data['title']) > TITLE_MAX:
+            errors.append(f"'title' is longer than {TITLE_MAX} characters")
+        return errors
+    return validate
+
+
+validate_story = compile_schema(STORY_SCHEMA)
+
+
+def parse_item(item):
+    """(name, JSON text or decoded story) -> (name, story or None, errors); runs in the worker pool"""
+    name, raw = item
+    try:
+        data = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    except ValueError as e:
+        return name, None, [f'invalid JSON: {e}']
+    errors = validate_story(data)
+    return name, (None if errors else data), errors
+
+
+def iter_directory(path):
+    """(file name, text) for each *.json file in a directory, in name order"""
+    for file_path in sorted(glob.glob(os.path.join(path, '*.json'))):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield os.path.basename(file_path), f.read()
+
+
+def iter_ndjson(lines):
+    """(line label, text) for each non-blank line of an NDJSON stream (str or bytes lines)"""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.strip():
+            yield f'line {number}', line
+
+
+def parse_all(items, workers=STORY_IMPORT_WORKERS):
+    """Parse and validate items, in a process pool when there are enough of them"""
+    items = list(items)
+    if workers == 1 or len(items) < PARALLEL_MIN_ITEMS:
+        return [parse_item(item) for item in items]
+    from concurrent.futures import ProcessPoolExecutor  # multiprocessing is only loaded for the CLI
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        return list(pool.map(parse_item, items, chunksize=16))
+
+
+class StoryImporter:
+    """Upserts validated stories for one user in batched transactions.
+
+    Each batch costs one query for the existing rows (content deferred), one flush for
+    the new stories' Opening scenes and one commit. A failing batch is rolled back and
+    reported per item; other batches are unaffected.
+    """
+
+    def __init__(self, db, story_model, scene_model, batch_size=STORY_IMPORT_BATCH):
+        self.db = db
+        self.Story = story_model
+        self.Scene = scene_model
+        self.batch_size = batch_size
+
+    def run(self, parsed, user_id):
+        """parsed: [(name, story or None, errors)] -> per-item result dicts, in input order"""
+        results = []
+        valid = []
+        seen = set()
+        for name, story, errors in parsed:
+            story_id = story.get('story_id') if story else None
+            if errors:
+                results.append({'item': name, 'story_id': story_id, 'status': 'invalid', 'errors': errors})
+            elif story_id in seen:
+                results.append({'item': name, 'story_id': story_id, 'status': 'invalid',
+                                'errors': ['duplicate story_id in this import']})
+            else:
+                seen.add(story_id)
+                result = {'item': name, 'story_id': story_id, 'status': None, 'errors': []}
+                results.append(result)
+                valid.append((result, story))
+        for start in range(0, len(valid), self.batch_size):
+            self._upsert_batch(valid[start:start + self.batch_size], user_id)
+        return results
+
+    def _upsert_batch(self, batch, user_id):
+        Story, Scene, session = self.Story, self.Scene, self.db.session
+        now = datetime.utcnow()
+        try:
+            ids = [story['story_id'] for _, story in batch]
+            existing = {row.story_id: row for row in
+                        Story.query.options(self.db.defer(Story.content)).filter(Story.story_id.in_(ids))}
+            created = []
+            for result, story in batch:
+                row = existing.get(story['story_id'])
+                title = story.get('title') or story['story_id']
+                if row is not None and row.user_id != user_id:
+                    result.update(status='error', errors=['story_id belongs to another user'])
+                    continue
+                if row is not None:
+                    row.title = title
+                    row.content = story
+                    row.updated_at = now
+                    if 'is_public' in story:
+                        row.is_public = story['is_public']
+                    result['status'] = 'updated'
+                else:
+                    row = Story(story_id=story['story_id'], title=title, user_id=user_id, content=story,
+                                is_public=story.get('is_public', False))
+                    scene = Scene(story_id=story['story_id'], user_id=user_id, title="Opening", history=[],
+                                  message_count=0, is_default=True, is_active=True)
+                    session.add(row)
+                    session.add(scene)
+                    created.append((row, scene))
+                    result['status'] = 'created'
+            if created:
+                session.flush()  # scene ids for default_scene_id
+                for row, scene in created:
+                    row.default_scene_id = scene.id
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            log.warning(f"Story import batch failed: {e}", stories=len(batch))
+            for result, _ in batch:
+                if result['status'] != 'error':
+                    result.update(status='error', errors=[f'batch rolled back: {e}'])
+
+
+def summarize(results):
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
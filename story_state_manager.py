@@ -3,10 +3,204 @@ import os
 import re
 from typing import Dict, List, Any
 from grok_remote import chat_with_grok
+import model_routing
+from log_helper import get_logger
+import scene_state_store
+from scene_state_store import scene_state_key
+
+log = get_logger('story_state')
+
+# Called as fn(exchange_type, payload, response, usage, finish_reason) after each analysis;
+# the web app sets it to store_ai_payload so the exchange shows up in its debug payloads
+payload_recorder = None
+
+# Scene analysis adds an AI round trip per reply, so it is opt-in
+SCENE_STATE_TRACKING = os.getenv("SCENE_STATE_TRACKING", "0") == "1"
+
+# Scene state fields the analysis may update, with their JSON types
+STATE_FIELD_TYPES = {
+    "characters": dict,
+    "location": str,
+    "positions": str,
+    "physical_contact": str,
+    "mood_atmosphere": str,
+    "key_objects": list,
+    "story_progress": list,
+    "arousal_levels": dict,
+    "clothing_removed": list,
+    "body_positions": dict,
+}
+CHARACTER_FIELD_TYPES = {
+    "clothing": str,
+    "position": str,
+    "mood": str,
+    "physical_state": str,
+    "body_parts_exposed": list,
+    "interactions": str,
+}
+PROGRESSION_FIELD_TYPES = {
+    "new_milestones": list,
+    "new_actions": list,
+    "scene_elements": list,
+    "momentum": str,
+    "repetition_detected": bool,
+}
+MOMENTUM_VALUES = ("building", "peak", "resolution")
+
+_JSON_TYPES = {str: "string", list: "array", dict: "object", bool: "boolean"}
+
+
+def _schema_for(field_types):
+    properties = {}
+    for name, kind in field_types.items():
+        properties[name] = {"type": _JSON_TYPES[kind]}
+        if kind is list:
+            properties[name]["items"] = {"type": "string"}
+        elif kind is dict and name != "characters":
+            properties[name]["additionalProperties"] = {"type": "string"}
+    return {"type": "object", "properties": properties, "additionalProperties": False}
+
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "state": _schema_for(STATE_FIELD_TYPES),
+        "progression": _schema_for(PROGRESSION_FIELD_TYPES),
+    },
+    "required": ["state", "progression"],
+    "additionalProperties": False,
+}
+ANALYSIS_SCHEMA["properties"]["state"]["properties"]["characters"]["additionalProperties"] = _schema_for(CHARACTER_FIELD_TYPES)
+ANALYSIS_SCHEMA["properties"]["progression"]["properties"]["momentum"]["enum"] = list(MOMENTUM_VALUES)
+
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "scene_analysis", "schema": ANALYSIS_SCHEMA},
+}
+
+ANALYSIS_PROMPT = """
+You are a detailed story state analyzer for erotic fiction. Compare the conversation with the current scene state and return ONLY a JSON object with what CHANGED.
+
+CURRENT SCENE STATE:
+{current_state}
+
+CONVERSATION CONTEXT (the last assistant message is the newest response):
+{context}
+
+RETURN THIS JSON STRUCTURE:
+{{
+    "state": {{
+        "characters": {{
+            "character_name": {{
+                "clothing": "detailed clothing state (what's on/off, partially removed, etc.)",
+                "position": "specific body position and orientation",
+                "mood": "emotional/arousal state",
+                "physical_state": "body condition (sweating, trembling, etc.)",
+                "body_parts_exposed": ["specific body parts that are visible/touched"],
+                "interactions": "what they're doing with their hands/body"
+            }}
+        }},
+        "location": "current location/setting with specific details",
+        "positions": "detailed body positions and spatial relationships",
+        "physical_contact": "specific level and type of physical contact",
+        "mood_atmosphere": "overall mood/atmosphere with sexual tension level",
+        "key_objects": ["important objects in the scene and their state"],
+        "story_progress": ["key plot points and sexual milestones achieved"],
+        "arousal_levels": {{"character_name": "low/medium/high/peak"}},
+        "clothing_removed": ["specific items of clothing that have been removed"],
+        "body_positions": {{"character_name": "detailed body position and what they're doing"}}
+    }},
+    "progression": {{
+        "new_milestones": ["story progression milestones first reached in the newest response"],
+        "new_actions": ["new actions that happened in the newest response"],
+        "scene_elements": ["key scene elements described in the newest response"],
+        "momentum": "building/peak/resolution",
+        "repetition_detected": false
+    }}
+}}
+
+RULES:
+- "state" is a DELTA: include only fields (and only characters/character fields) that changed; omit everything unchanged
+- A list field, when included, is the complete new list
+- Only include characters that are actively present in the scene
+- Be VERY specific about clothing states, positions, exposed body parts and physical contact
+- Milestones are progression points such as "first kiss", "clothing removal", "oral contact", "penetration"
+- Only include NEW milestones and actions; never repeat ones already in the current state
+- Momentum: "building" (tension increasing), "peak" (climactic moment), "resolution" (winding down)
+- Set "repetition_detected" to true if the newest response rehashes earlier content or restarts the scene setup
+- Return ONLY the JSON object, no other text
+"""
+
+
+def _parse_json_object(text):
+    """Parse a JSON object from a model reply, tolerating code fences and surrounding prose"""
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group())
+        except json.JSONDecodeError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
+def _clean_fields(data, field_types):
+    """Keep only known fields of the right type (string lists and string maps are filtered)"""
+    cleaned = {}
+    for name, kind in field_types.items():
+        value = data.get(name)
+        if not isinstance(value, kind):
+            continue
+        if kind is list:
+            value = [item for item in value if isinstance(item, str)]
+        elif kind is dict and field_types is STATE_FIELD_TYPES and name != "characters":
+            value = {k: v for k, v in value.items() if isinstance(v, str)}
+        cleaned[name] = value
+    return cleaned
+
+
+def validate_analysis(data):
+    """Split an analysis response into (state_delta, progression), dropping invalid fields.
+
+    Replies without the "state"/"progression" wrapper are treated as a bare state object.
+    """
+    if "state" in data or "progression" in data:
+        state = data.get("state") if isinstance(data.get("state"), dict) else {}
+        progression = data.get("progression") if isinstance(data.get("progression"), dict) else {}
+    else:
+        state, progression = data, {}
+
+    state_delta = _clean_fields(state, STATE_FIELD_TYPES)
+    if "characters" in state_delta:
+        state_delta["characters"] = {
+            name: _clean_fields(fields, CHARACTER_FIELD_TYPES)
+            for name, fields in state_delta["characters"].items()
+            if isinstance(name, str) and isinstance(fields, dict)
+        }
+
+    # Older prompt shape used the string "true"/"false" and "momentum_change"
+    if isinstance(progression.get("repetition_detected"), str):
+        progression["repetition_detected"] = progression["repetition_detected"].strip().lower() == "true"
+    if "momentum" not in progression and "momentum_change" in progression:
+        progression["momentum"] = progression["momentum_change"]
+    progression = _clean_fields(progression, PROGRESSION_FIELD_TYPES)
+    if progression.get("momentum") not in MOMENTUM_VALUES:
+        progression.pop("momentum", None)
+    return state_delta, progression
+
 
 class StoryStateManager:
-    def __init__(self, session_id=None):
+    def __init__(self, session_id=None, story_id=None, scene_id=None):
         self.session_id = session_id or 'default'
+        self.state_key = scene_state_key(self.session_id, story_id, scene_id)
         self.current_state = {
             "characters": {},
             "location": "unknown",
@@ -24,125 +218,76 @@ class StoryStateManager:
             "scene_momentum": "building"  # Track scene momentum: building, peak, resolution
         }
     
-    def extract_state_from_messages(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
-        """
-        Use AI to intelligently extract story state from conversation messages
-        """
-        try:
-            # Create a focused prompt for state extraction
-            recent_messages = messages[-4:] if len(messages) > 4 else messages
-            
-            # Deduplicate messages to prevent repeated context
-            seen_content = set()
-            deduplicated_messages = []
-            for msg in recent_messages:
-                content_key = f"{msg['role']}:{msg['content'][:100]}"  # Use first 100 chars as key
-                if content_key not in seen_content:
-                    seen_content.add(content_key)
-                    deduplicated_messages.append(msg)
-            
-            # Build context from deduplicated messages, but ensure the most recent user message is always included
-            context_parts = []
-            total_length = 0
-            max_context_length = 3000  # Limit context to prevent token overflow and confusion
-            
-            # First, ensure we have the most recent user message
-            most_recent_user_msg = None
-            for msg in reversed(deduplicated_messages):
-                if msg['role'] == 'user':
-                    most_recent_user_msg = msg
-                    break
-            
-            # Build context, prioritizing the most recent user message
-            for msg in deduplicated_messages:
-                msg_text = f"{msg['role']}: {msg['content']}"
-                
-                # Always include the most recent user message, even if it means truncating others
-                if msg == most_recent_user_msg:
-                    context_parts.append(msg_text)
-                    total_length += len(msg_text)
-                    continue
-                
-                # For other messages, check if we have space
-                if total_length + len(msg_text) > max_context_length:
-                    # If we don't have space, truncate this message
-                    remaining_space = max_context_length - total_length
-                    if remaining_space > 100:  # Only include if there's meaningful space
-                        truncated_msg = f"{msg['role']}: {msg['content'][:remaining_space-50]}..."
-                        context_parts.append(truncated_msg)
-                    break
+    def _build_context(self, messages: List[Dict[str, str]], max_context_length: int = 3000) -> str:
+        """Recent, deduplicated conversation text, always keeping the latest user message"""
+        recent_messages = messages[-4:] if len(messages) > 4 else messages
+
+        # Deduplicate messages to prevent repeated context
+        seen_content = set()
+        deduplicated_messages = []
+        for msg in recent_messages:
+            content_key = f"{msg['role']}:{msg['content'][:100]}"  # Use first 100 chars as key
+            if content_key not in seen_content:
+                seen_content.add(content_key)
+                deduplicated_messages.append(msg)
+
+        most_recent_user_msg = None
+        for msg in reversed(deduplicated_messages):
+            if msg['role'] == 'user':
+                most_recent_user_msg = msg
+                break
+
+        # Build context, prioritizing the most recent user message
+        context_parts = []
+        total_length = 0
+        for msg in deduplicated_messages:
+            msg_text = f"{msg['role']}: {msg['content']}"
+
+            # Always include the most recent user message, even if it means truncating others
+            if msg is most_recent_user_msg:
                 context_parts.append(msg_text)
                 total_length += len(msg_text)
-            
-            context = "\n".join(context_parts)
-            
-            extraction_prompt = f"""
-You are a detailed story state analyzer for erotic fiction. Extract the current story state from this conversation and return ONLY a JSON object.
+                continue
 
-CONVERSATION CONTEXT:
-{context}
+            if total_length + len(msg_text) > max_context_length:
+                remaining_space = max_context_length - total_length
+                if remaining_space > 100:  # Only include if there's meaningful space
+                    context_parts.append(f"{msg['role']}: {msg['content'][:remaining_space-50]}...")
+                break
+            context_parts.append(msg_text)
+            total_length += len(msg_text)
 
-EXTRACT AND RETURN THIS JSON STRUCTURE:
-{{
-    "characters": {{
-        "character_name": {{
-            "clothing": "detailed clothing state (what's on/off, partially removed, etc.)",
-            "position": "specific body position and orientation",
-            "mood": "emotional/arousal state",
-            "physical_state": "body condition (sweating, trembling, etc.)",
-            "body_parts_exposed": ["specific body parts that are visible/touched"],
-            "interactions": "what they're doing with their hands/body"
-        }}
-    }},
-    "location": "current location/setting with specific details",
-    "positions": "detailed body positions and spatial relationships",
-    "physical_contact": "specific level and type of physical contact",
-    "mood_atmosphere": "overall mood/atmosphere with sexual tension level",
-    "key_objects": ["important objects in the scene and their state"],
-    "story_progress": ["key plot points and sexual milestones achieved"],
-    "arousal_levels": {{
-        "character_name": "arousal level (low/medium/high/peak)"
-    }},
-    "clothing_removed": ["specific items of clothing that have been removed"],
-    "body_positions": {{
-        "character_name": "detailed body position and what they're doing"
-    }},
-    "last_scene_elements": ["specific elements described in the most recent response"],
-    "progression_milestones": ["story progression points that have been reached"],
-    "recent_actions": ["actions that happened in the last 1-2 responses"],
-    "scene_momentum": "current scene momentum (building/peak/resolution)"
-}}
+        return "\n".join(context_parts)
 
-RULES:
-- Only include characters that are actively present in the scene
-- Be VERY specific about clothing states (e.g., "shirt unbuttoned, bra visible", "pants around ankles", "completely naked")
-- Be VERY specific about positions (e.g., "sitting on edge of bed, legs spread", "kneeling between legs", "lying on back, arms above head")
-- Track specific body parts that are exposed, touched, or involved in actions
-- Be specific about physical contact (e.g., "fingering pussy", "sucking cock", "grinding against thigh")
-- Track arousal levels for each character
-- Note any clothing items that have been removed and where they are
-- Track what was described in the last response to avoid repetition
-- Identify story progression milestones (e.g., "first kiss", "clothing removal", "oral contact", "penetration")
-- Track recent actions to prevent rehashing the same events
-- Assess scene momentum: "building" (tension increasing), "peak" (climactic moment), "resolution" (winding down)
-- Use "unknown" for any state you cannot determine
-- Return ONLY the JSON object, no other text
-"""
-            
-            # Prepare payload for state extraction
-            extraction_payload = [{"role": "user", "content": extraction_prompt}]
-            
-            # Call AI to extract state
+    def analyze(self, messages: List[Dict[str, str]], new_response: str = None) -> Dict[str, Any]:
+        """
+        One structured AI call returning both the scene state changes and the
+        progression of the newest response, merged into the current state
+        """
+        try:
+            context = self._build_context(messages)
+            if new_response and not any(m.get('content') == new_response for m in messages[-4:]):
+                context += f"\nassistant: {new_response}"
+
+            analysis_prompt = ANALYSIS_PROMPT.format(
+                current_state=json.dumps(self._state_for_prompt(), ensure_ascii=False, separators=(',', ':')),
+                context=context,
+            )
+            analysis_payload = [{"role": "user", "content": analysis_prompt}]
+
+            route = model_routing.route('analysis')
             ai_response = chat_with_grok(
-                extraction_payload,
-                model="grok-3",
+                analysis_payload,
+                model=route.model,
                 temperature=0.1,  # Low temperature for consistent extraction
-                max_tokens=800,  # Increased to prevent JSON truncation
+                max_tokens=route.limit(900),
                 hide_thinking=True,
-                return_usage=True
+                return_usage=True,
+                response_format=ANALYSIS_RESPONSE_FORMAT,
+                timeout=route.timeout,
+                call_class='analysis',
             )
-            
-            # Extract response text and usage info
+
             if isinstance(ai_response, dict):
                 response = ai_response['text']
                 usage = ai_response['usage']
@@ -151,57 +296,76 @@ RULES:
                 response = ai_response
                 usage = {}
                 finish_reason = 'unknown'
-            
-            # Store payload for debugging
-            try:
-                from web_app import store_ai_payload
-                store_ai_payload('state_extraction', extraction_payload, response, usage, finish_reason)
-            except:
-                pass  # Ignore if web_app not available
-            
-            # Clean and parse the response
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.endswith("```"):
-                response = response[:-3]
-            
-            # Try to parse JSON with better error handling
-            try:
-                extracted_state = json.loads(response)
-            except json.JSONDecodeError as json_error:
-                print(f"🔍 Debug: JSON parsing failed: {json_error}")
-                print(f"🔍 Debug: Raw response: {response}")
-                
-                # Try to extract JSON from the response if it's embedded in text
-                import re
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    try:
-                        extracted_state = json.loads(json_match.group())
-                        print(f"🔍 Debug: Successfully extracted JSON from text")
-                    except json.JSONDecodeError:
-                        print(f"🔍 Debug: Failed to extract valid JSON from text")
-                        return self.current_state
-                else:
-                    print(f"🔍 Debug: No JSON found in response")
-                    return self.current_state
-            
-            # Validate and merge with current state
-            self._merge_state(extracted_state)
-            
-            print(f"🔍 Debug: AI extracted state: {json.dumps(self.current_state, indent=2)}")
-            
+
+            # Store payload for debugging (when the web app has registered its recorder)
+            if payload_recorder is not None:
+                try:
+                    payload_recorder('state_extraction', analysis_payload, response, usage, finish_reason)
+                except Exception as e:
+                    log.debug(f"Could not record analysis payload: {e}")
+
+            analysis = _parse_json_object(response)
+            if analysis is None:
+                log.debug(f"Scene analysis returned no usable JSON", finish_reason=finish_reason)
+                return self.current_state
+
+            state_delta, progression = validate_analysis(analysis)
+            self._merge_state(state_delta, save=False)
+            self._apply_progression(progression)
+            self._save_state()
+
+            if log.debug_enabled():
+                log.debug(f"AI analyzed state: {json.dumps(self.current_state, indent=2)}")
             return self.current_state
-            
+
         except Exception as e:
-            print(f"🔍 Debug: State extraction failed: {e}")
-            # Return current state if extraction fails
+            log.warning(f"Scene analysis failed: {e}")
             return self.current_state
-    
-    def _merge_state(self, new_state: Dict[str, Any]):
+
+    def extract_state_from_messages(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Use AI to intelligently extract story state from conversation messages
+        """
+        return self.analyze(messages)
+
+    def update_state_from_response(self, new_response: str, messages: List[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Update persisted state after an AI reply (state and progression in one call)
+        """
+        self.get_current_state()
+        return self.analyze(messages or [], new_response=new_response)
+
+    def _state_for_prompt(self) -> Dict[str, Any]:
+        """Current state without the bookkeeping fields, as the baseline for a delta"""
+        keep = set(STATE_FIELD_TYPES) | {"progression_milestones", "recent_actions", "scene_momentum"}
+        return {k: v for k, v in self.current_state.items() if k in keep}
+
+    def _apply_progression(self, progression: Dict[str, Any]):
+        """Append new milestones/actions (bounded) and record momentum and repetition"""
+        if progression.get("new_milestones"):
+            self.current_state.setdefault("progression_milestones", []).extend(progression["new_milestones"])
+            # Keep only last 10 milestones to prevent bloat
+            self.current_state["progression_milestones"] = self.current_state["progression_milestones"][-10:]
+
+        if progression.get("new_actions"):
+            self.current_state.setdefault("recent_actions", []).extend(progression["new_actions"])
+            # Keep only last 8 actions to prevent bloat
+            self.current_state["recent_actions"] = self.current_state["recent_actions"][-8:]
+
+        if "scene_elements" in progression:
+            self.current_state["last_scene_elements"] = progression["scene_elements"]
+
+        if progression.get("momentum"):
+            self.current_state["scene_momentum"] = progression["momentum"]
+
+        self.current_state["repetition_warning"] = bool(progression.get("repetition_detected"))
+        if self.current_state["repetition_warning"]:
+            log.debug(f"REPETITION DETECTED in AI response - this may indicate back-skipping issue")
+
+    def _merge_state(self, new_state: Dict[str, Any], save: bool = True):
         """
-        Intelligently merge new state with current state
+        Intelligently merge new state with current state. new_state is a delta:
+        missing, null and "unknown" fields leave the current value untouched.
         """
         # Merge characters with enhanced fields
         if "characters" in new_state:
@@ -218,17 +382,17 @@ RULES:
                 
                 # Update character data
                 for key, value in char_data.items():
-                    if value != "unknown" and value != []:
+                    if value is not None and value != "unknown" and value != []:
                         self.current_state["characters"][char_name][key] = value
         
         # Update other state fields
         for key in ["location", "positions", "physical_contact", "mood_atmosphere"]:
-            if key in new_state and new_state[key] != "unknown":
+            if new_state.get(key) not in (None, "unknown"):
                 self.current_state[key] = new_state[key]
         
         # Update enhanced fields
         for key in ["key_objects", "story_progress", "clothing_removed", "last_scene_elements", "progression_milestones", "recent_actions", "scene_momentum"]:
-            if key in new_state:
+            if new_state.get(key) is not None:
                 self.current_state[key] = new_state[key]
         
         # Update arousal levels
@@ -244,7 +408,8 @@ RULES:
             self.current_state["body_positions"].update(new_state["body_positions"])
         
         # Save updated state to file
-        self._save_state()
+        if save:
+            self._save_state()
     
     def get_state_as_prompt(self) -> str:
         """
@@ -375,40 +540,32 @@ Continue the story while maintaining accurate physical state tracking and avoidi
     
     def _save_state(self):
         """
-        Save current state to file for persistence (session-specific)
+        Hand current state to the write-behind store (written on its next flush)
         """
         try:
-            # Use session-specific filename to prevent cross-session contamination
-            session_id = getattr(self, 'session_id', 'default')
-            filename = f"scene_state_{session_id}.json"
-            with open(filename, "w") as f:
-                json.dump(self.current_state, f, indent=2)
-            print(f"🔍 Debug: Scene state saved to file: {filename}")
+            scene_state_store.store.put(self.state_key, self.current_state)
+            log.debug(f"Scene state updated: {self.state_key}")
         except Exception as e:
-            print(f"🔍 Debug: Error saving scene state: {e}")
+            log.warning(f"Error saving scene state: {e}")
     
     def _load_state(self):
         """
-        Load state from file if it exists (session-specific)
+        Load state for this user/story/scene if it was stored before
         """
         try:
-            # Use session-specific filename to prevent cross-session contamination
-            session_id = getattr(self, 'session_id', 'default')
-            filename = f"scene_state_{session_id}.json"
-            if os.path.exists(filename):
-                with open(filename, "r") as f:
-                    loaded_state = json.load(f)
-                    self.current_state = loaded_state
-                print(f"🔍 Debug: Scene state loaded from file: {filename}")
-                print(f"🔍 Debug: Loaded characters: {list(self.current_state['characters'].keys())}")
+            loaded_state = scene_state_store.store.get(self.state_key)
+            if loaded_state:
+                self.current_state = loaded_state
+                log.debug(f"Scene state loaded: {self.state_key}")
+                log.debug(f"Loaded characters: {list(self.current_state.get('characters', {}).keys())}")
             else:
-                print(f"🔍 Debug: No scene state file found for session {session_id}, using default state")
+                log.debug(f"No scene state stored for {self.state_key}, using default state")
         except Exception as e:
-            print(f"🔍 Debug: Error loading scene state: {e}")
+            log.warning(f"Error loading scene state: {e}")
     
     def get_current_state(self):
         """
-        Get current state (load from file if needed)
+        Get current state (load from the store if needed)
         """
         if not self.current_state.get("characters"):
             self._load_state()
@@ -418,91 +575,4 @@ Continue the story while maintaining accurate physical state tracking and avoidi
         """
         Track story progression and update state to prevent repetition
         """
-        try:
-            # Extract key elements from the new response
-            progression_prompt = f"""
-Analyze this story response and extract progression information. Return ONLY a JSON object.
-
-RESPONSE TO ANALYZE:
-{new_response}
-
-EXTRACT AND RETURN THIS JSON STRUCTURE:
-{{
-    "new_milestones": ["new story progression milestones reached in this response"],
-    "new_actions": ["new actions that happened in this response"],
-    "scene_elements": ["key scene elements described in this response"],
-    "momentum_change": "how the scene momentum changed (building/peak/resolution)",
-    "repetition_detected": "true/false - whether this response repeats previous content"
-}}
-
-RULES:
-- Only include NEW milestones, actions, and elements from this response
-- Do not repeat elements that were already established
-- Focus on progression points: first contact, clothing removal, new positions, new sensations, climax, etc.
-- Track momentum changes: building (tension increasing), peak (climactic), resolution (winding down)
-- Detect if this response is repeating previous content (rehashing same scene elements, restarting scene setup, etc.)
-- If repetition is detected, mark "repetition_detected": true
-- Return ONLY the JSON object, no other text
-"""
-            
-            progression_payload = [{"role": "user", "content": progression_prompt}]
-            
-            ai_response = chat_with_grok(
-                progression_payload,
-                model="grok-3",
-                temperature=0.1,
-                max_tokens=400,
-                hide_thinking=True,
-                return_usage=True
-            )
-            
-            if isinstance(ai_response, dict):
-                response = ai_response['text']
-            else:
-                response = ai_response
-            
-            # Clean and parse the response
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.endswith("```"):
-                response = response[:-3]
-            
-            try:
-                progression_data = json.loads(response)
-                
-                # Update state with new progression data
-                if "new_milestones" in progression_data:
-                    self.current_state["progression_milestones"].extend(progression_data["new_milestones"])
-                    # Keep only last 10 milestones to prevent bloat
-                    self.current_state["progression_milestones"] = self.current_state["progression_milestones"][-10:]
-                
-                if "new_actions" in progression_data:
-                    self.current_state["recent_actions"].extend(progression_data["new_actions"])
-                    # Keep only last 8 actions to prevent bloat
-                    self.current_state["recent_actions"] = self.current_state["recent_actions"][-8:]
-                
-                if "scene_elements" in progression_data:
-                    self.current_state["last_scene_elements"] = progression_data["scene_elements"]
-                
-                if "momentum_change" in progression_data:
-                    self.current_state["scene_momentum"] = progression_data["momentum_change"]
-                
-                # Handle repetition detection
-                if progression_data.get("repetition_detected") == "true":
-                    print(f"🔍 Debug: REPETITION DETECTED in AI response - this may indicate back-skipping issue")
-                    # Add a flag to the state to help identify problematic responses
-                    self.current_state["repetition_warning"] = True
-                else:
-                    self.current_state["repetition_warning"] = False
-                
-                # Save updated state
-                self._save_state()
-                
-                print(f"🔍 Debug: Progression tracked - milestones: {len(self.current_state['progression_milestones'])}, actions: {len(self.current_state['recent_actions'])}")
-                
-            except json.JSONDecodeError as e:
-                print(f"🔍 Debug: Failed to parse progression data: {e}")
-                
-        except Exception as e:
-            print(f"🔍 Debug: Progression tracking failed: {e}")
+        return self.update_state_from_response(new_response)
@@ -0,0 +1,48 @@
+import os
+import json
+
+# Streaming exports: reports are generated section by section and sent with chunked
+# transfer encoding, so a worker never holds a whole export in memory.
+#   EXPORT_CHUNK_BYTES = 65536   small pieces are buffered up to about this size per chunk
+EXPORT_CHUNK_BYTES = int(os.getenv('EXPORT_CHUNK_BYTES', str(64 * 1024)))
+
+_pretty = json.JSONEncoder(indent=2, ensure_ascii=False, default=str)
+
+
+def json_pieces(obj):
+    """Pretty JSON for obj, produced incrementally"""
+    return _pretty.iterencode(obj)
+
+
+def ndjson(record):
+    return json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def banner(title):
+    rule = '=' * 80
+    return f"{rule}\n{title}\n{rule}\n"
+
+
+def file_pieces(path, block_size=EXPORT_CHUNK_BYTES):
+    """Contents of a text file in blocks"""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def chunked(pieces, size=EXPORT_CHUNK_BYTES):
+    """Coalesce many small strings into ~size-byte UTF-8 chunks"""
+    buffer, buffered = [], 0
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
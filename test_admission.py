@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Tests for per-user admission control"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from admission import AdmissionController, Rejected, TokenBucket
+from shared_state import InProcessState
+
+POLICIES = {'chat': {'requests_per_minute': 60, 'burst': 2, 'tokens_per_minute': 600, 'token_burst': 100}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_and_overdraws():
+    bucket = TokenBucket(rate=1.0, capacity=2, now=0)
+    assert bucket.take(1, 0) == 0 and bucket.take(1, 0) == 0
+    assert bucket.take(1, 0) == pytest.approx(1.0)
+    assert bucket.take(1, 1.0) == 0
+    bucket.charge(5, 1.0)
+    assert bucket.wait_time(0, 1.0) == pytest.approx(5.0)
+
+
+def test_request_budget_rejects_with_retry_after():
+    clock = FakeClock()
+    controller = AdmissionController(POLICIES, clock=clock, state=InProcessState())
+    for _ in range(2):
+        controller.admit('alice', 'chat').release()
+    with pytest.raises(Rejected) as info:
+        controller.admit('alice', 'chat')
+    assert info.value.reason == 'rate_limited' and info.value.retry_after == 1
+    controller.admit('bob', 'chat').release()  # other users keep their own budget
+    clock.now += 1
+    controller.admit('alice', 'chat').release()
+    assert controller.admit('alice', 'unlisted') is None  # routes without a policy pass through
+
+
+def test_upstream_tokens_are_charged_after_the_call():
+    clock = FakeClock()
+    controller = AdmissionController(POLICIES, clock=clock, state=InProcessState())
+    ticket = controller.admit('alice', 'chat')
+    ticket.charge(400)
+    ticket.release()
+    with pytest.raises(Rejected) as info:
+        controller.admit('alice', 'chat')
+    assert info.value.reason == 'token_budget' and info.value.retry_after == 30  # 300 over at 10/s
+    clock.now += 30
+    controller.admit('alice', 'chat').release()
+
+
+def test_one_user_cannot_hold_every_slot():
+    controller = AdmissionController({'chat': {}}, max_concurrent=2, user_concurrency=1, queue_size=1, max_wait=0.05,
+                                     state=InProcessState())
+    held = controller.admit('alice', 'chat')
+    with pytest.raises(Rejected) as info:
+        controller.admit('alice', 'chat')  # waits for alice's own slot, then gives up
+    assert info.value.reason == 'wait_timeout'
+    other = controller.admit('bob', 'chat')  # the second slot is still free for someone else
+    assert controller.in_flight == 2
+    held.release()
+    other.release()
+    assert controller.in_flight == 0
+
+
+def test_waiters_are_admitted_in_turn_and_queue_is_bounded():
+    controller = AdmissionController({'chat': {}}, max_concurrent=1, user_concurrency=1, queue_size=1, max_wait=2,
+                                     state=InProcessState())
+    first = controller.admit('alice', 'chat')
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.admit('bob', 'chat')))
+    waiter.start()
+    while controller.waiting == 0:
+        time.sleep(0.001)
+    with pytest.raises(Rejected) as info:
+        controller.admit('carol', 'chat')
+    assert info.value.reason == 'queue_full'
+    first.release()
+    waiter.join(1)
+    assert len(admitted) == 1 and controller.in_flight == 1
+    admitted[0].release()
+
+
+def test_workers_sharing_state_share_user_slots():
+    state = InProcessState()
+    workers = [AdmissionController({'chat': {}}, user_concurrency=1, max_wait=0.2, state=state) for _ in range(2)]
+    held = workers[0].admit('alice', 'chat')
+    with pytest.raises(Rejected):
+        workers[1].admit('alice', 'chat')  # the other worker sees alice's slot
+    threading.Timer(0.05, held.release).start()
+    workers[1].admit('alice', 'chat').release()  # ...and notices its release without a notify
+
+
+def test_killed_worker_slot_expires():
+    state = InProcessState()
+    controller = AdmissionController({'chat': {}}, user_concurrency=1, max_wait=0.01, state=state, slot_ttl=30)
+    controller.admit('alice', 'chat')  # never released
+    key = 'admission:slot:chat:alice:0'
+    state._data[key] = (state._data[key][0], time.monotonic() - 1)
+    controller.in_flight = 0
+    controller.admit('alice', 'chat').release()
+
+
+def test_redis_buckets_are_shared_between_workers():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')  # fakeredis needs it for Lua scripts
+    from shared_state import RedisState
+    state = RedisState(client=fakeredis.FakeRedis(decode_responses=True))
+    workers = [AdmissionController(POLICIES, state=state) for _ in range(2)]
+    workers[0].admit('alice', 'chat').release()
+    workers[1].admit('alice', 'chat').release()
+    with pytest.raises(Rejected) as info:
+        workers[0].admit('alice', 'chat')  # burst of 2 spent across both workers
+    assert info.value.reason == 'rate_limited'
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Tests for the batching audit writer, rotation and reverse tail"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audit_log import AuditLog, reverse_lines
+
+
+def test_reverse_lines_across_blocks(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("".join(f"line-{i:04d}\n" for i in range(500)))
+    lines = list(reverse_lines(str(path), block_size=37))
+    assert lines[0] == "line-0499"
+    assert lines[-1] == "line-0000"
+    assert len(lines) == 500
+
+
+def test_tail_filters_and_order(tmp_path):
+    audit = AuditLog(str(tmp_path / "audit.jsonl"), max_bytes=0, rotate_hours=0, flush_interval=0.05)
+    for i in range(30):
+        audit.write({'event': 'ai_payload' if i % 2 else 'chat_before', 'request_id': f"r{i % 3}", 'n': i})
+
+    last = audit.tail(limit=5)
+    assert [e['n'] for e in last] == [25, 26, 27, 28, 29]
+
+    filtered = audit.tail(limit=3, request_id='r1', event='ai_payload')
+    assert [e['n'] for e in filtered] == [13, 19, 25]
+
+
+def test_rotation_compresses_and_prunes(tmp_path):
+    audit = AuditLog(str(tmp_path / "audit.jsonl"), max_bytes=200, rotate_hours=0, backups=2, flush_interval=0.05)
+    for round_no in range(4):
+        for i in range(5):
+            audit.write({'event': 'chat_after', 'round': round_no, 'i': i, 'pad': 'x' * 20})
+        assert audit.flush()
+
+    rotated = audit.rotated_files()
+    assert len(rotated) == 2
+    assert all(p.endswith('.jsonl.gz') for p in rotated)
+
+    entries = audit.tail(limit=10, include_rotated=True)
+    assert entries[-1]['round'] == 3
+    assert len(entries) == 10
+
+
+def test_rotation_waits_for_the_process_holding_the_lock(tmp_path):
+    pytest.importorskip('fcntl')
+    audit = AuditLog(str(tmp_path / "audit.jsonl"), max_bytes=100, rotate_hours=0, flush_interval=0.05)
+    with audit._rotation_lock(blocking=True):  # another worker rotating
+        for i in range(5):
+            audit.write({'event': 'chat_after', 'i': i, 'pad': 'x' * 20})
+        assert audit.flush()
+        assert audit.rotated_files() == []
+    audit.write({'event': 'chat_after', 'i': 5})
+    assert audit.flush()
+    assert len(audit.rotated_files()) == 1
+    assert [e['i'] for e in audit.tail(limit=3, include_rotated=True)] == [3, 4, 5]
+
+
+def test_disabled_writes_nothing(tmp_path):
+    audit = AuditLog(str(tmp_path / "audit.jsonl"), enabled=False)
+    audit.write({'event': 'chat_before'})
+    assert audit.tail() == []
+    assert not os.path.exists(tmp_path / "audit.jsonl")
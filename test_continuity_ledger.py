@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the compact server-side continuity ledger"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import continuity_ledger
+from continuity_ledger import (LedgerStore, new_ledger, record_reply, previous_shingles, established_facts,
+                               reply_shingles, from_legacy)
+from shared_state import InProcessState
+
+FACTS = ('naked', 'already naked', 'pontoon', 'cabin')
+REPLY = "She was already naked on the pontoon, laughing as the wind picked up. " * 20
+
+
+def test_record_reply_keeps_hashes_and_facts_not_text():
+    ledger = new_ledger()
+    for i in range(5):
+        record_reply(ledger, f"Reply {i}. " + REPLY, summary=f"beat {i}", ban_phrases=[f'p{i}a', f'p{i}b', f'p{i}c'],
+                     fact_phrases=FACTS)
+
+    assert ledger['scene_step'] == 5
+    assert len(ledger['recent']) == continuity_ledger.RECENT_REPLIES
+    assert len(ledger['ban_phrases']) == continuity_ledger.MAX_BAN_PHRASES
+    assert ledger['summaries'][-1] == 'beat 4'
+    assert established_facts(ledger) == {'naked', 'already naked', 'pontoon'}
+    assert previous_shingles(ledger)[-1] == reply_shingles("Reply 4. " + REPLY)
+    serialized = json.dumps(ledger)
+    assert 'laughing as the wind' not in serialized.replace(ledger['anchor_tail'], '')
+    assert len(serialized) < len(REPLY) * 2
+
+
+def test_audit_snapshot_is_not_mutated_by_later_updates():
+    ledger = new_ledger()
+    record_reply(ledger, "First reply on the pontoon.", summary='first', fact_phrases=FACTS)
+    snapshot = dict(ledger)
+    record_reply(ledger, "Second reply in the cabin.", summary='second', fact_phrases=FACTS)
+    assert snapshot['summaries'] == ['first']
+    assert established_facts(snapshot) == {'pontoon'}
+
+
+def test_store_round_trip_and_legacy_conversion():
+    store = LedgerStore(InProcessState())
+    ledger = record_reply(new_ledger('scene1'), REPLY, fact_phrases=FACTS)
+    store.save(ledger)
+    assert store.load('scene1') == ledger
+    store.delete('scene1')
+    assert store.load('scene1') is None
+
+    legacy = {'scene_step': 3, 'summaries': ['a'], 'anchor_tail': 'x' * 900, 'ban_phrases': ['b'],
+              'last_two_replies': [REPLY.lower()], 'scene_key': 'old'}
+    converted = from_legacy(legacy, FACTS)
+    assert converted['scene_key'] == 'old' and converted['scene_step'] == 3
+    assert len(converted['anchor_tail']) == continuity_ledger.ANCHOR_CHARS
+    assert previous_shingles(converted) == [reply_shingles(REPLY)]
+    assert established_facts(converted) == {'naked', 'already naked', 'pontoon'}
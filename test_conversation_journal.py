@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tests for the append-only conversation journal"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conversation_journal import ConversationJournal
+
+
+def _msg(i, role='user'):
+    return {'role': role, 'content': f'message {i}'}
+
+
+def _records(journal, stream):
+    return [json.loads(line) for path in journal.segments(stream) for line in open(path)]
+
+
+def test_sync_appends_only_new_messages(tmp_path):
+    journal = ConversationJournal(str(tmp_path), commit_interval=0.5)
+    history = []
+    for i in range(6):
+        history.append(_msg(i))
+        assert journal.sync('farm', history) == 1
+    assert journal.sync('farm', history) == 0
+    assert journal.flush()
+
+    assert len(_records(journal, 'farm')) == 6
+    assert journal.read_history('farm') == history
+    assert journal.stats['fsyncs'] <= 2  # group commit: the turns share a write + fsync
+
+
+def test_rewrite_and_clear_replay(tmp_path):
+    journal = ConversationJournal(str(tmp_path), commit_interval=0.01)
+    history = [_msg(0), _msg(1, 'assistant')]
+    journal.sync('s', history)
+    history[-1] = {'role': 'assistant', 'content': 'rewritten'}
+    assert journal.sync('s', history) == 2  # known part changed: journaled again from 0
+    journal.flush()
+    assert journal.read_history('s') == history
+
+    journal.sync('s', [])
+    journal.flush()
+    assert journal.read_history('s') == []
+
+    # A fresh journal (another process) recovers the head from disk
+    other = ConversationJournal(str(tmp_path), commit_interval=0.01)
+    assert other.sync('s', [_msg(9)]) == 1
+    other.flush()
+    assert other.read_history('s') == [_msg(9)]
+
+
+def test_users_in_the_same_story_keep_separate_streams(tmp_path):
+    from shared_state import InProcessState
+    journal = ConversationJournal(str(tmp_path), state=InProcessState(), commit_interval=0.01)
+    alice, bob = [], []
+    for i in range(3):
+        alice.append(_msg(f'a{i}'))
+        bob.append(_msg(f'b{i}'))
+        assert journal.sync('alice:farm', alice) == 1  # the other user's turn never forces a rewrite
+        assert journal.sync('bob@example.com:farm', bob) == 1
+    assert journal.flush()
+
+    assert journal.read_history('alice:farm') == alice
+    assert journal.read_history('bob@example.com:farm') == bob
+    assert journal.stats['rewrites'] == 0
+
+
+def test_compaction_keeps_live_records(tmp_path):
+    journal = ConversationJournal(str(tmp_path), compact_segments=0)
+    directory = tmp_path / 's'
+    directory.mkdir()
+    days = {
+        '20240101.jsonl': [{'i': 0, 'message': _msg(0)}, {'i': 1, 'message': _msg(1)}],
+        '20240102.jsonl': [{'i': 0, 'message': _msg(5)}, {'i': 1, 'message': _msg(6)}],
+        '20240103.jsonl': [{'i': 2, 'message': _msg(7)}, '{"i": 3, "mess'],  # torn line after a crash
+    }
+    for name, records in days.items():
+        (directory / name).write_text(''.join((r if isinstance(r, str) else json.dumps(r)) + '\n' for r in records))
+
+    before = journal.read_history('s')
+    assert journal.compact('s') == 2
+    assert [os.path.basename(p) for p in journal.segments('s')] == ['20240103.jsonl']
+    assert journal.read_history('s') == before == [_msg(5), _msg(6), _msg(7)]
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Tests for hedged upstream requests"""
+
+import os
+import sys
+import time
+import queue
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests'))
+
+import pytest
+
+from hedging import Hedger
+from resilience import RetryBudget
+
+
+class Closable:
+    def __init__(self, value):
+        self.value = value
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _hedger(**kwargs):
+    kwargs.setdefault('budget', RetryBudget(ratio=1.0, min_reserve=5))
+    return Hedger('hedge_test', enabled=True, default_delay=0.05, min_delay=0.01, **kwargs)
+
+
+def test_delay_follows_observed_latency_percentile():
+    hedger = _hedger(percentile=90)
+    assert hedger.delay('m') == 0.05  # too few samples: default
+    for i in range(100):
+        hedger.observe('m', i / 100.0)
+    assert hedger.delay('m') == pytest.approx(0.90)
+    assert hedger.delay('other') == 0.05
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = _hedger()
+    calls = []
+    assert hedger.run(lambda t: calls.append(t) or 'ok', timeout=5) == 'ok'
+    assert len(calls) == 1 and hedger.stats['primary_only'] == 1 and hedger.stats['hedged'] == 0
+
+
+def test_slow_primary_loses_to_hedge_and_is_cancelled():
+    hedger = _hedger()
+    calls = []
+    release = threading.Event()
+    primary_result = Closable('slow')
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            release.wait(2)
+            return primary_result
+        return Closable('fast')
+
+    started = time.monotonic()
+    result = hedger.run(attempt, timeout=5)
+    assert result.value == 'fast' and time.monotonic() - started < 1
+    assert hedger.stats['hedged'] == 1 and hedger.stats['hedge_won'] == 1
+    release.set()
+    deadline = time.monotonic() + 2
+    while not primary_result.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert primary_result.closed  # the loser's response is closed, not used
+
+
+def test_loser_goes_to_discard_in_the_callers_context():
+    import contextvars
+    request = contextvars.ContextVar('request', default=None)
+    hedger = _hedger()
+    calls = []
+    discarded = queue.Queue()
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            return 'slow'
+        return 'fast'
+
+    request.set('req-1')
+    assert hedger.run(attempt, timeout=5, discard=lambda result, elapsed: discarded.put((result, request.get()))) == 'fast'
+    assert discarded.get(timeout=2) == ('slow', 'req-1')
+
+
+def test_unacceptable_result_waits_for_the_other_attempt():
+    hedger = _hedger()
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            return 503
+        time.sleep(0.2)
+        return 200
+
+    assert hedger.run(attempt, timeout=5, accept=lambda status: status < 500) == 200
+
+
+def test_budget_bounds_hedges():
+    hedger = _hedger(budget=RetryBudget(ratio=0.0, min_reserve=1))
+    slow = lambda t: time.sleep(0.1) or 'ok'
+    assert hedger.run(slow, timeout=5) == 'ok' and hedger.stats['hedged'] == 1
+    assert hedger.run(slow, timeout=5) == 'ok' and hedger.stats['denied'] == 1
+    assert hedger.stats['hedged'] == 1
+
+
+def test_disabled_hedger_calls_once():
+    hedger = Hedger('hedge_test', enabled=False)
+    assert hedger.run(lambda t: t, timeout=3) == 3
+    assert hedger.stats['calls'] == 0
+
+
+def test_grok_client_hedges_slow_upstream(monkeypatch):
+    import grok_remote
+    from fake_upstreams import FakeUpstream, FakeXAIHandler, UpstreamConfig
+
+    upstream = FakeUpstream(FakeXAIHandler, UpstreamConfig(latency=0.3, jitter=0, completion_tokens=20)).start()
+    try:
+        monkeypatch.setattr(grok_remote, 'API_BASE', f"{upstream.url}/v1")
+        monkeypatch.setattr(grok_remote, 'API_KEY', 'fake-key')
+        hedger = _hedger()
+        monkeypatch.setattr(grok_remote, 'xai_hedger', hedger)
+        usage = queue.Queue()
+        monkeypatch.setattr(grok_remote, '_usage_listeners', [lambda call_class, *args: usage.put(call_class)])
+        reply = grok_remote.chat_with_grok([{'role': 'user', 'content': 'hi'}], return_usage=True, hedge=True,
+                                           call_class='story')
+        assert reply['usage']['completion_tokens'] == 20
+        assert upstream.stats['requests'] == 2 and hedger.stats['hedged'] == 1
+        assert sorted([usage.get(timeout=2), usage.get(timeout=2)]) == ['story', 'story_hedge']  # the loser is billed too
+        grok_remote.chat_with_grok([{'role': 'user', 'content': 'hi'}])  # not hedged unless asked
+        assert upstream.stats['requests'] == 3
+    finally:
+        upstream.stop()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Tests for the structured logging helper"""
+
+import os
+import sys
+import json
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import log_helper
+from log_helper import get_logger, set_debug_override, reset_debug_override, JsonFormatter
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _capture(subsystem):
+    handler = _Capture()
+    logging.getLogger(f"grok.{subsystem}").addHandler(handler)
+    return handler
+
+
+def test_debug_is_gated_until_override(monkeypatch):
+    monkeypatch.setattr(log_helper, "LOG_LEVEL", "INFO")
+    log = get_logger("gate")
+    handler = _capture("gate")
+
+    log.debug("hidden")
+    log.info("shown")
+    assert [r.getMessage() for r in handler.records] == ["shown"]
+    assert not log.debug_enabled()
+
+    token = set_debug_override(True)
+    try:
+        assert log.debug_enabled()
+        log.debug("history %s", 3)
+    finally:
+        reset_debug_override(token)
+    assert handler.records[-1].getMessage() == "history 3"
+
+
+def test_fields_and_json_format():
+    log = get_logger("fields")
+    handler = _capture("fields")
+    log.warning("upstream slow", story_id=7, elapsed_ms=812)
+
+    entry = json.loads(JsonFormatter().format(handler.records[-1]))
+    assert entry["level"] == "warning"
+    assert entry["subsystem"] == "fields"
+    assert entry["story_id"] == 7 and entry["elapsed_ms"] == 812
+
+
+def test_sampling_drops_debug(monkeypatch):
+    monkeypatch.setattr(log_helper, "LOG_LEVEL", "DEBUG")
+    monkeypatch.setitem(log_helper._sample_rates, "sampled", 0.0)
+    log = get_logger("sampled")
+    handler = _capture("sampled")
+    for _ in range(20):
+        log.debug("noisy")
+    log.info("kept")
+    assert [r.getMessage() for r in handler.records] == ["kept"]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Tests for the in-process metrics registry and Prometheus rendering"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import Registry, Counter, Gauge, Histogram, record_tokens, EXCHANGE_TOKENS
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    calls = Counter('t_calls_total', 'Calls', ('outcome',), registry=registry)
+    depth = Gauge('t_depth', 'Depth', ('queue',), registry=registry)
+    calls.labels(outcome='ok').inc()
+    calls.labels(outcome='ok').inc(2)
+    calls.labels(outcome='http_5xx').inc()
+    depth.labels(queue='audit').set_function(lambda: 7)
+
+    text = registry.render()
+    assert '# TYPE t_calls_total counter' in text
+    assert 't_calls_total{outcome="ok"} 3' in text
+    assert 't_calls_total{outcome="http_5xx"} 1' in text
+    assert 't_depth{queue="audit"} 7' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    stage = Histogram('t_stage_seconds', 'Stage', ('stage',), buckets=(0.1, 1, 10), registry=registry)
+    for value in (0.05, 0.5, 0.7, 5, 50):
+        stage.labels(stage='critic').observe(value)
+
+    text = registry.render()
+    assert 't_stage_seconds_bucket{stage="critic",le="0.1"} 1' in text
+    assert 't_stage_seconds_bucket{stage="critic",le="1"} 3' in text
+    assert 't_stage_seconds_bucket{stage="critic",le="10"} 4' in text
+    assert 't_stage_seconds_bucket{stage="critic",le="+Inf"} 5' in text
+    assert 't_stage_seconds_count{stage="critic"} 5' in text
+
+
+def test_record_tokens_by_exchange_type():
+    record_tokens({'prompt_tokens': 120, 'completion_tokens': 30}, exchange_type='t_exchange')
+    assert EXCHANGE_TOKENS.labels(exchange_type='t_exchange', kind='prompt').value == 120
+    assert EXCHANGE_TOKENS.labels(exchange_type='t_exchange', kind='completion').value == 30
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Tests for per-call-class model routing"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import model_routing
+from model_routing import route, routing_table
+
+
+def test_defaults_follow_xai_model(monkeypatch):
+    monkeypatch.setenv('XAI_MODEL', 'grok-3')
+    critic = route('critic')
+    assert critic.model == 'grok-3' and critic.limit(1500) == 800 and critic.timeout == 45
+    assert route('story').limit(1500) == 1500  # no cap on the main turn
+    assert set(routing_table()) == set(model_routing.CALL_CLASSES)
+
+
+def test_env_and_story_overrides(monkeypatch):
+    monkeypatch.setenv('XAI_MODEL_ANALYSIS', 'grok-3-mini')
+    monkeypatch.setenv('XAI_MAX_TOKENS_ANALYSIS', '200')
+    monkeypatch.setenv('XAI_TIMEOUT_ANALYSIS', '12')
+    analysis = route('analysis')
+    assert (analysis.model, analysis.limit(900), analysis.timeout) == ('grok-3-mini', 200, 12.0)
+
+    monkeypatch.setenv('XAI_MODEL_ALLOWLIST', 'grok-3,grok-4-fast')
+    story_routing = {'analysis': {'model': 'grok-4-fast', 'max_tokens': 150}, 'critic': 'not a dict'}
+    analysis = route('analysis', story_routing)
+    assert analysis.model == 'grok-4-fast' and analysis.limit(900) == 150
+    assert route('critic', story_routing).limit(2000) == 800
+
+
+def test_story_overrides_cannot_lift_limits(monkeypatch):
+    monkeypatch.delenv('XAI_MODEL_ALLOWLIST', raising=False)
+    monkeypatch.setenv('XAI_MODEL', 'grok-3')
+    monkeypatch.setenv('XAI_MODEL_CRITIC', 'grok-3-mini')
+    story_routing = {'critic': {'model': 'grok-4-heavy', 'max_tokens': 0, 'timeout': 9999},
+                     'rewrite': {'model': 'grok-3-mini', 'max_tokens': 5000, 'timeout': 'soon'},
+                     'story': {'max_tokens': 'lots', 'timeout': -1}}
+    critic = route('critic', story_routing)
+    assert (critic.model, critic.limit(2000), critic.timeout) == ('grok-3-mini', 800, model_routing.XAI_DEADLINE_SECONDS)
+    rewrite = route('rewrite', story_routing)
+    assert (rewrite.model, rewrite.limit(9000), rewrite.timeout) == ('grok-3-mini', 1800, 60)  # an env model is allowed
+    story = route('story', story_routing)
+    assert story.limit(1500) == 1500 and story.timeout == 110
+
+
+def test_unknown_class_is_rejected():
+    with pytest.raises(ValueError):
+        route('summarize')
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Tests for the in-memory opener catalog"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from opener_catalog import OpenerCatalog, parse_front_matter
+
+
+def _write(path, text, mtime):
+    path.write_text(text)
+    os.utime(str(path), ns=(mtime, mtime))
+
+
+def test_front_matter_is_parsed_and_stripped():
+    meta, body = parse_front_matter("---\ndescription: Two friends\ncast: Ann, Bo\n---\nOnce upon a time")
+    assert meta == {'description': 'Two friends', 'cast': 'Ann, Bo'}
+    assert body == "Once upon a time"
+    assert parse_front_matter("No front-matter --- here") == ({}, "No front-matter --- here")
+
+
+def test_catalog_serves_metadata_and_content(tmp_path):
+    _write(tmp_path / 'opener_2char.txt', "---\ndescription: Dinner date\ncast: Emma, Max\n---\nEmma sat.", 10**18)
+    _write(tmp_path / 'opener_party_4.txt', "Taylor walked in.", 10**18)
+    (tmp_path / 'notes.txt').write_text("not an opener")
+    catalog = OpenerCatalog(str(tmp_path), refresh_interval=3600)
+
+    listing = catalog.list()
+    assert [o['filename'] for o in listing] == ['opener_2char.txt', 'opener_party_4.txt']
+    assert listing[0]['description'] == 'Dinner date' and listing[0]['cast_size'] == 2
+    assert listing[1]['cast_size'] == 4 and 'content' not in listing[1]
+    assert catalog.get('opener_2char.txt')['content'] == "Emma sat."
+    assert catalog.get('../opener_2char.txt')['content'] == "Emma sat."  # bare names only
+    assert catalog.get('notes.txt') is None
+    assert catalog.stats == {'loads': 2, 'checks': 1}  # later calls stayed in memory
+
+
+def test_catalog_reloads_only_changed_files(tmp_path):
+    _write(tmp_path / 'opener_a.txt', "first", 10**18)
+    _write(tmp_path / 'opener_b.txt', "other", 10**18)
+    catalog = OpenerCatalog(str(tmp_path), refresh_interval=0)
+    assert catalog.get('opener_a.txt')['content'] == "first"
+
+    _write(tmp_path / 'opener_a.txt', "second", 10**18 + 10**9)
+    assert catalog.get('opener_a.txt')['content'] == "second"
+    assert catalog.stats['loads'] == 3  # a, b, then a again
+
+    (tmp_path / 'opener_b.txt').unlink()
+    _write(tmp_path / 'opener_c.txt', "new", 10**18)
+    assert [o['filename'] for o in catalog.list()] == ['opener_a.txt', 'opener_c.txt']
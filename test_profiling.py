@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Tests for per-request profiling capture and storage"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import profiling
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+
+def test_explicit_cprofile_is_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    prof = profiling.RequestProfile('req-explicit', deterministic=True)
+    _busy(0.02)
+    meta = prof.finish({'route': '/api/chat', 'user': 'u1'})
+
+    assert meta['kind'] == 'cprofile'
+    assert profiling.profile_path('req-explicit', 'prof')
+    with open(profiling.profile_path('req-explicit', 'txt')) as f:
+        assert '_busy' in f.read()
+    assert [p['profile_id'] for p in profiling.list_profiles(user='u1')] == ['req-explicit']
+    assert profiling.list_profiles(user='someone-else') == []
+
+
+def test_sampled_capture_only_when_slow(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'PROFILE_SLOW_MS', 30)
+
+    fast = profiling.RequestProfile('req-fast', deterministic=False)
+    assert fast.finish({'route': '/api/chat'}) is None
+
+    slow = profiling.RequestProfile('req-slow', deterministic=False)
+    _busy(0.08)
+    meta = slow.finish({'route': '/api/chat'})
+    assert meta['kind'] == 'sampled' and meta['samples'] > 0
+    with open(profiling.profile_path('req-slow', 'folded')) as f:
+        assert '_busy' in f.read()
+
+
+def test_toggles_are_cached_per_process(monkeypatch):
+    from shared_state import InProcessState
+    state = InProcessState()
+    reads = []
+    original = state.get
+    monkeypatch.setattr(state, 'get', lambda key: reads.append(key) or original(key))
+    monkeypatch.setattr(profiling, '_toggles', {})
+    assert not profiling.toggle_enabled(state, 'u1')
+    assert not profiling.toggle_enabled(state, 'u1')
+    assert reads == ['profile:all', 'profile:user:u1']  # second check served from the cache
+
+    state.set('profile:user:u1', 'on')
+    profiling.forget_toggle('profile:user:u1')
+    assert profiling.toggle_enabled(state, 'u1')
+    assert profiling.new_profile_id() != profiling.new_profile_id()
+
+
+def test_request_ids_are_sanitized():
+    assert profiling.safe_request_id('../../etc/passwd') == 'etcpasswd'
+    assert profiling.safe_request_id('') is None
+    assert profiling.profile_path('abc', 'exe') is None
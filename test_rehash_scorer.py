@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Tests for the local rehash scorer that gates the continuity critic"""
+
+import os
+import sys
+import json
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rehash_scorer import (FEATURES, RehashScorer, extract_features, heuristic_decision, fit,
+                           confusion, load_scorer)
+from scene_fingerprint import SceneFingerprint
+from continuity_ledger import reply_shingles
+
+PREVIOUS = ("She leaned against the railing of the pontoon, the lake glittering behind her. "
+            "Dan handed her a towel and she laughed, shaking water from her hair.")
+RECAP = ("She leaned against the railing of the pontoon, the lake glittering behind her, "
+         "and Dan handed her a towel. Then she turned toward the cabin.")
+FRESH = ("The storm rolled in faster than either of them expected, and they sprinted up the dock "
+         "toward the cabin, shrieking as the first heavy drops hit the boards.")
+
+
+def test_recap_scores_higher_than_fresh_reply():
+    fingerprint = SceneFingerprint()
+    fingerprint.add(PREVIOUS)
+    previous = [reply_shingles(PREVIOUS)]
+    recap = extract_features(RECAP, previous, PREVIOUS[-400:], fingerprint, ['pontoon', 'lake'])
+    fresh = extract_features(FRESH, previous, PREVIOUS[-400:], fingerprint, ['pontoon', 'lake'])
+
+    assert set(recap) == set(FEATURES)
+    assert recap['lead_recap'] > 0.6 and fresh['lead_recap'] < 0.1
+    assert recap['scene_repeat'] > fresh['scene_repeat']
+    assert recap['state_density'] > 0 and fresh['state_density'] == 0
+
+    scorer = load_scorer()  # shipped rehash_weights.json
+    assert scorer.score(recap) > 0.5 > scorer.score(fresh)
+    assert heuristic_decision(recap) and not heuristic_decision(fresh)
+
+
+def test_legacy_overlap_matches_old_heuristic():
+    import re
+
+    def old_ngrams(text):
+        words = re.findall(r"[a-zA-Z']+", re.sub(r'\s+', ' ', text).strip().lower())
+        grams = set()
+        for i in range(max(0, len(words) - 2)):
+            grams.add(' '.join(words[i:i + 3]))
+            if len(grams) >= 32:
+                break
+        return grams
+
+    features = extract_features(RECAP, [reply_shingles(PREVIOUS)])
+    assert round(features['legacy_overlap'] * 32) == len(old_ngrams(PREVIOUS) & old_ngrams(RECAP))
+
+
+def test_fit_separates_labeled_rows_and_round_trips(tmp_path):
+    rng = random.Random(7)
+    rows = []
+    for _ in range(200):
+        label = rng.random() < 0.3
+        base = 0.6 if label else 0.1
+        rows.append(({name: min(1.0, max(0.0, base + rng.uniform(-0.1, 0.1))) for name in FEATURES}, int(label)))
+    scorer = fit(rows, epochs=500)
+    metrics = confusion([scorer.should_revise(f) for f, _ in rows], [y for _, y in rows])
+    assert metrics['precision'] > 0.95 and metrics['recall'] > 0.95
+
+    path = tmp_path / 'weights.json'
+    scorer.save(str(path))
+    restored = load_scorer(str(path))
+    assert abs(restored.score(rows[0][0]) - scorer.score(rows[0][0])) < 1e-9
+
+
+def test_missing_weights_never_revise(tmp_path):
+    scorer = load_scorer(str(tmp_path / 'missing.json'))
+    assert not scorer.should_revise({name: 1.0 for name in FEATURES})
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Tests for upstream retries, the circuit breaker and the retry budget"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests'))
+
+import pytest
+
+from resilience import (CircuitBreaker, CircuitOpenError, Outcome, ResilientCaller, RetryBudget, RetryPolicy,
+                        CLOSED, HALF_OPEN, OPEN)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _caller(results, **kwargs):
+    """A caller whose attempts return/raise the given results in order"""
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        result = results[min(len(calls), len(results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def classify(result, error):
+        if error is not None:
+            return Outcome('timeout', retryable=True, failure=True)
+        if result == 'busy':
+            return Outcome('http_429', retryable=True, retry_after=1.5)
+        return Outcome('ok' if result == 'ok' else 'http_400')
+
+    sleeps = []
+    kwargs.setdefault('policy', RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=8, rng=lambda: 1.0))
+    caller = ResilientCaller('test', classify, sleep=sleeps.append, **kwargs)
+    return caller, attempt, calls, sleeps
+
+
+def test_backoff_is_jittered_exponential_and_honors_retry_after():
+    policy = RetryPolicy(base_delay=0.5, max_delay=8, rng=lambda: 0.5)
+    assert [policy.delay(n) for n in range(6)] == [0.25, 0.5, 1.0, 2.0, 4.0, 4.0]
+    assert policy.delay(0, retry_after=3) == 3
+    assert policy.delay(0, retry_after=30) is None  # longer than we are willing to wait
+
+
+def test_retries_transient_errors_then_succeeds():
+    caller, attempt, calls, sleeps = _caller([TimeoutError(), 'busy', 'ok'])
+    assert caller.call(attempt, attempt_timeout=90, deadline=110) == 'ok'
+    assert len(calls) == 3 and sleeps == [0.5, 1.5]  # backoff, then the server's Retry-After
+
+
+def test_non_retryable_response_is_returned_and_attempts_are_bounded():
+    caller, attempt, calls, _ = _caller(['bad request'])
+    assert caller.call(attempt, 90, 110) == 'bad request' and len(calls) == 1
+    caller, attempt, calls, _ = _caller([TimeoutError()])
+    with pytest.raises(TimeoutError):
+        caller.call(attempt, 90, 110)
+    assert len(calls) == 3
+
+
+def test_deadline_limits_retries_and_attempt_timeouts():
+    caller, attempt, calls, _ = _caller([TimeoutError()])
+    with pytest.raises(TimeoutError):
+        caller.call(attempt, attempt_timeout=90, deadline=6, min_attempt=5.8)
+    assert len(calls) == 1 and calls[0] == pytest.approx(6, abs=0.1)  # 0.5s backoff leaves < min_attempt
+
+
+def test_circuit_breaker_opens_fails_fast_and_probes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30, clock=clock)
+    caller, attempt, calls, _ = _caller([TimeoutError()], breaker=breaker,
+                                        policy=RetryPolicy(max_attempts=1))
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            caller.call(attempt, 90, 110)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as info:
+        caller.call(attempt, 90, 110)
+    assert info.value.retry_in == 30 and len(calls) == 2  # failed fast, no upstream call
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()  # a single probe
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_retry_budget_caps_retries_across_calls():
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0.5, min_reserve=1, clock=clock)
+    caller, attempt, calls, _ = _caller([TimeoutError()], budget=budget,
+                                        breaker=CircuitBreaker(threshold=100))
+    with pytest.raises(TimeoutError):
+        caller.call(attempt, 90, 110)
+    assert len(calls) == 2  # one banked retry spent (and the call's deposit was too small for another)
+    with pytest.raises(TimeoutError):
+        caller.call(attempt, 90, 110)
+    assert len(calls) == 3  # deposits alone: no retry this time
+
+
+def test_grok_client_retries_fake_upstream_errors(monkeypatch):
+    import grok_remote
+    from fake_upstreams import FakeUpstream, FakeXAIHandler, UpstreamConfig
+
+    upstream = FakeUpstream(FakeXAIHandler, UpstreamConfig(latency=0, jitter=0, error_rate=1.0,
+                                                           error_status=503)).start()
+    try:
+        monkeypatch.setattr(grok_remote, 'API_BASE', f"{upstream.url}/v1")
+        monkeypatch.setattr(grok_remote, 'API_KEY', 'fake-key')
+        caller = ResilientCaller('xai_test', grok_remote._classify, sleep=lambda s: None,
+                                 policy=RetryPolicy(max_attempts=3), breaker=CircuitBreaker(threshold=3))
+        monkeypatch.setattr(grok_remote, 'xai_caller', caller)
+        with pytest.raises(Exception):
+            grok_remote.chat_with_grok([{'role': 'user', 'content': 'hi'}])
+        assert upstream.stats['requests'] == 3 and caller.breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            grok_remote.chat_with_grok([{'role': 'user', 'content': 'hi'}])
+        assert upstream.stats['requests'] == 3
+    finally:
+        upstream.stop()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Tests for the per-scene shingle fingerprint index"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_fingerprint import SceneFingerprint, shingle_hashes
+
+EARLY = ("Rain tapped against the window while the kettle began to whistle. "
+         "She set two cups on the table and pushed one toward him without a word.")
+MIDDLE = ("Outside, a car door slammed and footsteps faded toward the corner. "
+          "He laughed under his breath and pulled the blanket over her shoulders.")
+FRESH = ("The barn smelled of hay and diesel, and the tractor ticked as it cooled "
+         "while the dog circled twice before settling in the straw.")
+
+
+def test_repetition_from_early_in_scene_is_detected():
+    fingerprint = SceneFingerprint()
+    fingerprint.add(EARLY)
+    fingerprint.add(MIDDLE)
+    for _ in range(5):
+        fingerprint.add(FRESH + " Another quiet minute passed between them.")
+
+    # The first reply is far outside a last-two-replies window but still counts
+    assert fingerprint.repeat_ratio(EARLY) == 1.0
+    assert fingerprint.repeat_ratio("Totally different words describing sunrise over distant mountains today") == 0.0
+    mixed = fingerprint.analyze(EARLY + " Then something new: she opened the letter from her sister in Denver.")
+    assert 0.4 < mixed['repeat_ratio'] < 0.8
+
+
+def test_near_duplicate_reply_has_high_simhash_similarity():
+    fingerprint = SceneFingerprint()
+    fingerprint.add(EARLY + " " + MIDDLE)
+    assert fingerprint.analyze(EARLY + " " + MIDDLE.replace("laughed", "chuckled"))['near_duplicate'] > 0.85
+    assert fingerprint.analyze(FRESH)['near_duplicate'] < 0.75
+
+
+def test_round_trip_is_compact_and_equivalent():
+    fingerprint = SceneFingerprint()
+    for text in (EARLY, MIDDLE):
+        fingerprint.add(text)
+    data = json.loads(json.dumps(fingerprint.to_dict()))
+    assert len(json.dumps(data)) < 4000  # mostly-empty bloom compresses well
+    restored = SceneFingerprint.from_dict(data)
+    assert restored.repeat_ratio(MIDDLE) == 1.0
+    assert restored.replies == 2
+    assert restored.jaccard(fingerprint) == 1.0
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingle_hashes("She smiled, slowly.") == shingle_hashes("she SMILED slowly")
+    assert shingle_hashes("two words") == []
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Tests for the write-behind scene state store"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scene_state_store import SceneStateStore, FileBackend, KVBackend, scene_state_key
+from shared_state import InProcessState
+
+
+class CountingBackend(KVBackend):
+    def __init__(self):
+        super().__init__(InProcessState())
+        self.batches = []
+
+    def save_many(self, items):
+        self.batches.append(dict(items))
+        super().save_many(items)
+
+
+def test_updates_are_coalesced_until_flush():
+    backend = CountingBackend()
+    store = SceneStateStore(backend, flush_interval=60)
+    key = scene_state_key('u1', 'story', 7)
+    assert key == 'u1:story:7'
+
+    for step in range(5):
+        store.put(key, {'location': 'kitchen', 'step': step})
+    assert backend.batches == []
+    assert store.get(key)['step'] == 4  # served from memory before any write
+    assert store.dirty_count() == 1
+
+    assert store.flush() == 1
+    assert len(backend.batches) == 1
+    assert json.loads(backend.batches[0][key])['step'] == 4
+    assert store.flush() == 0
+
+    # Re-putting identical state is not a write
+    store.put(key, {'location': 'kitchen', 'step': 4})
+    assert store.flush() == 0
+    store.close()
+
+
+def test_state_loads_lazily_and_is_isolated_per_key():
+    backend = CountingBackend()
+    backend.state.set('scene_state:u1:s:-', json.dumps({'location': 'barn'}))
+    store = SceneStateStore(backend, flush_interval=60)
+
+    state = store.get('u1:s:-')
+    assert state == {'location': 'barn'}
+    state['location'] = 'mutated'  # callers get copies
+    assert store.get('u1:s:-') == {'location': 'barn'}
+    assert store.get('u2:s:-') is None
+    store.close()
+
+
+def test_flush_evicts_clean_entries_past_cache_seconds():
+    backend = CountingBackend()
+    store = SceneStateStore(backend, flush_interval=60, cache_seconds=0)
+    store.put('u1:s:1', {'step': 1})
+    assert store.flush() == 1  # dirty entries are kept until written
+    store.get('u1:s:2')
+    store.flush()
+    assert store._entries == {} and store.stats['evictions'] == 2
+    assert store.get('u1:s:1') == {'step': 1}  # re-read from the backend
+    store.close()
+
+
+def test_background_flusher_and_file_backend(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    store = SceneStateStore(backend, flush_interval=0.05)
+    store.put('u1:s:-', {'location': 'porch'})
+    store.close()  # flushes whatever the thread has not written yet
+
+    files = os.listdir(tmp_path)
+    assert files == ['scene_state_u1_s_-.json']
+    assert FileBackend(str(tmp_path)).load('u1:s:-') == {'location': 'porch'}
+
+
+def test_failed_flush_keeps_entry_dirty():
+    class Flaky(CountingBackend):
+        fail = True
+
+        def save_many(self, items):
+            if self.fail:
+                raise IOError('read-only filesystem')
+            super().save_many(items)
+
+    backend = Flaky()
+    store = SceneStateStore(backend, flush_interval=60)
+    store.put('k:-:-', {'a': 1})
+    assert store.flush() == 0
+    assert store.dirty_count() == 1
+    backend.fail = False
+    assert store.flush() == 1
+    assert store.dirty_count() == 0
+    store.close()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests for the shared state backends (in-process and redis via fakeredis)"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shared_state import InProcessState, RedisState, LockTimeout, create_shared_state
+
+
+def _backends():
+    backends = [InProcessState()]
+    try:
+        import fakeredis
+        backends.append(RedisState(client=fakeredis.FakeRedis(decode_responses=True)))
+    except ImportError:
+        pass
+    return backends
+
+
+@pytest.fixture(params=_backends(), ids=lambda b: type(b).__name__)
+def state(request):
+    return request.param
+
+
+def test_add_is_exclusive(state):
+    assert state.add("dedup:abc", "1", ttl=30) is True
+    assert state.add("dedup:abc", "2", ttl=30) is False
+    assert state.get("dedup:abc") == "1"
+    state.delete("dedup:abc")
+    assert state.add("dedup:abc", "3", ttl=30) is True
+
+
+def test_ttl_expiry(state):
+    state.set("short", "x", ttl=1)
+    assert state.get("short") == "x"
+    if isinstance(state, InProcessState):
+        state._data["short"] = ("x", time.monotonic() - 1)
+    else:
+        state.client.delete(state._k("short"))
+    assert state.get("short") is None
+
+
+def test_incr_and_json(state):
+    assert state.incr("count", ttl=60) == 1
+    assert state.incr("count", 4) == 5
+    state.set_json("payloads:u1:story_generation", {"response": "hi", "usage": {"total_tokens": 3}})
+    state.set_json("payloads:u1:opener", {"response": "yo"})
+    assert state.get_json("payloads:u1:story_generation")["usage"]["total_tokens"] == 3
+    assert sorted(state.keys("payloads:u1:")) == ["payloads:u1:opener", "payloads:u1:story_generation"]
+    assert state.get_json("missing", []) == []
+
+
+def test_lock(state):
+    with state.lock("story", ttl=5):
+        with pytest.raises(LockTimeout):
+            with state.lock("story", ttl=5, blocking_timeout=0.1):
+                pass
+    with state.lock("story", ttl=5, blocking_timeout=0.1):
+        pass
+
+
+def test_unreachable_redis_fails_startup_with_several_workers():
+    url = "redis://127.0.0.1:1/0"  # nothing listens on port 1
+    assert isinstance(create_shared_state(url, workers=1), InProcessState)
+    with pytest.raises(RuntimeError):
+        create_shared_state(url, workers=2)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Tests for the bulk story import pipeline"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from story_import import StoryImporter, iter_ndjson, parse_all, parse_item, summarize
+
+
+def _models():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = SQLAlchemy(app)
+
+    class Story(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        story_id = db.Column(db.String(80), unique=True, nullable=False)
+        title = db.Column(db.String(200), nullable=False)
+        user_id = db.Column(db.String(120), nullable=False)
+        content = db.Column(db.JSON, nullable=False)
+        default_scene_id = db.Column(db.Integer)
+        is_public = db.Column(db.Boolean, default=False)
+        updated_at = db.Column(db.DateTime)
+
+    class Scene(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        story_id = db.Column(db.String(80), nullable=False)
+        user_id = db.Column(db.String(120), nullable=False)
+        title = db.Column(db.String(200), nullable=False)
+        history = db.Column(db.JSON, nullable=False)
+        message_count = db.Column(db.Integer, default=0)
+        is_default = db.Column(db.Boolean, default=False)
+        is_active = db.Column(db.Boolean, default=False)
+
+    with app.app_context():
+        db.create_all()
+    return app, db, Story, Scene
+
+
+def test_validation_reports_each_problem():
+    assert parse_item(('a', '{"story_id": "ok_1", "characters": {}}'))[2] == []
+    _, story, errors = parse_item(('b', '{"story_id": "bad id!", "characters": "x", "title": 3}'))
+    assert story is None and len(errors) == 3
+    assert parse_item(('c', '{not json'))[2][0].startswith('invalid JSON')
+    assert parse_item(('d', '[1, 2]'))[2] == ['story must be a JSON object']
+
+
+def test_batched_upsert_with_per_item_results():
+    app, db, Story, Scene = _models()
+    lines = [json.dumps({'story_id': f's{i}', 'title': f'Story {i}', 'characters': {}}) for i in range(7)]
+    lines += ['', '{"title": "no id"}', json.dumps({'story_id': 's1'})]
+    parsed = parse_all(iter_ndjson(lines), workers=1)
+
+    with app.app_context():
+        db.session.add(Story(story_id='s6', title='theirs', user_id='other', content={}))
+        db.session.commit()
+        statements = []
+        from sqlalchemy import event
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+        results = StoryImporter(db, Story, Scene, batch_size=3).run(parsed, 'me')
+
+        assert [r['status'] for r in results] == ['created'] * 6 + ['error', 'invalid', 'invalid']
+        assert results[6]['errors'] == ['story_id belongs to another user']
+        assert results[7]['item'] == 'line 9'
+        assert summarize(results) == {'created': 6, 'error': 1, 'invalid': 2}
+        assert sum(1 for s in statements if s.startswith('SELECT')) == 3  # one lookup per batch
+        story = Story.query.filter_by(story_id='s2').one()
+        assert db.session.get(Scene, story.default_scene_id).title == 'Opening'
+
+        again = StoryImporter(db, Story, Scene).run(parse_all([('x', {'story_id': 's2', 'title': 'New'})]), 'me')
+        assert again[0]['status'] == 'updated'
+        assert Story.query.filter_by(story_id='s2').one().title == 'New'
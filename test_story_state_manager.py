@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Tests for the combined scene analysis call and delta merge"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import scene_state_store
+import story_state_manager
+from story_state_manager import StoryStateManager, validate_analysis
+
+
+@pytest.fixture(autouse=True)
+def memory_store(monkeypatch):
+    store = scene_state_store.SceneStateStore(MemoryBackend(), flush_interval=0)
+    monkeypatch.setattr(scene_state_store, 'store', store)
+    return store
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.data = {}
+        self.batches = []
+
+    def load(self, key):
+        return json.loads(self.data[key]) if key in self.data else None
+
+    def save_many(self, items):
+        self.batches.append([key for key, _ in items])
+        self.data.update(items)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def _fake_grok(reply, calls):
+    def fake(messages, **kwargs):
+        calls.append(kwargs)
+        return {'text': reply, 'usage': {}, 'finish_reason': 'stop'}
+    return fake
+
+
+def test_single_call_merges_state_delta_and_progression(memory_store, monkeypatch):
+    calls = []
+    reply = json.dumps({
+        'state': {'location': 'the farmhouse kitchen',
+                  'characters': {'Emma': {'clothing': 'apron untied', 'mood': 'unknown'}}},
+        'progression': {'new_milestones': ['first kiss'], 'new_actions': ['Emma unties her apron'],
+                        'scene_elements': ['kitchen table'], 'momentum': 'building',
+                        'repetition_detected': False},
+    })
+    monkeypatch.setattr(story_state_manager, 'chat_with_grok', _fake_grok(reply, calls))
+
+    manager = StoryStateManager(session_id='t1', story_id='farm')
+    manager.current_state['physical_contact'] = 'holding hands'
+    state = manager.update_state_from_response('She untied her apron and kissed him.')
+
+    assert len(calls) == 1
+    assert calls[0]['response_format']['type'] == 'json_schema'
+    assert state['location'] == 'the farmhouse kitchen'
+    assert state['physical_contact'] == 'holding hands'  # omitted from the delta, so unchanged
+    assert state['characters']['Emma']['clothing'] == 'apron untied'
+    assert state['characters']['Emma']['mood'] == 'neutral'  # "unknown" does not overwrite
+    assert state['progression_milestones'] == ['first kiss']
+    assert state['recent_actions'] == ['Emma unties her apron']
+    assert state['repetition_warning'] is False
+    assert json.loads(memory_store.backend.data['t1:farm:-'])['location'] == 'the farmhouse kitchen'
+    assert StoryStateManager(session_id='t1', story_id='farm').get_current_state()['location'] == 'the farmhouse kitchen'
+    assert StoryStateManager(session_id='t1', story_id='other').get_current_state()['location'] == 'unknown'
+
+
+def test_progression_lists_are_bounded(monkeypatch):
+    reply = json.dumps({'state': {}, 'progression': {'new_actions': [f'a{i}' for i in range(5)]}})
+    monkeypatch.setattr(story_state_manager, 'chat_with_grok', _fake_grok(reply, []))
+
+    manager = StoryStateManager(session_id='t2')
+    manager.current_state['recent_actions'] = [f'old{i}' for i in range(6)]
+    manager.track_progression('more')
+    assert manager.current_state['recent_actions'] == ['old3', 'old4', 'old5', 'a0', 'a1', 'a2', 'a3', 'a4']
+
+
+def test_validate_analysis_drops_invalid_fields():
+    state, progression = validate_analysis({
+        'state': {'location': 12, 'key_objects': ['rope', 3], 'mystery': 'x',
+                  'arousal_levels': {'Emma': 'high', 'Dan': None},
+                  'characters': {'Emma': {'clothing': 'dress', 'position': ['bad']}}},
+        'progression': {'momentum': 'sideways', 'repetition_detected': 'true', 'new_actions': 'not a list'},
+    })
+    assert state == {'key_objects': ['rope'], 'arousal_levels': {'Emma': 'high'},
+                     'characters': {'Emma': {'clothing': 'dress'}}}
+    assert progression == {'repetition_detected': True}
+
+
+def test_fenced_bare_state_reply_is_accepted(monkeypatch):
+    reply = '```json\n{"location": "barn", "positions": "unknown"}\n```'
+    monkeypatch.setattr(story_state_manager, 'chat_with_grok', _fake_grok(reply, []))
+
+    manager = StoryStateManager(session_id='t3')
+    state = manager.extract_state_from_messages([{'role': 'user', 'content': 'Go to the barn'}])
+    assert state['location'] == 'barn'
+    assert state['positions'] == 'unknown'
+
+
+def test_unparseable_reply_leaves_state_untouched(monkeypatch):
+    monkeypatch.setattr(story_state_manager, 'chat_with_grok', _fake_grok('no json here', []))
+
+    manager = StoryStateManager(session_id='t4')
+    before = json.dumps(manager.current_state, sort_keys=True)
+    manager.update_state_from_response('reply')
+    assert json.dumps(manager.current_state, sort_keys=True) == before
+
+
+def test_scenes_of_a_story_keep_separate_state_and_analysis_is_recorded(memory_store, monkeypatch):
+    monkeypatch.setattr(story_state_manager, 'chat_with_grok', _fake_grok('{"location": "barn"}', []))
+    recorded = []
+    monkeypatch.setattr(story_state_manager, 'payload_recorder', lambda *args: recorded.append(args[0]))
+    web_app_loaded = 'web_app' in sys.modules
+
+    StoryStateManager(session_id='t5', story_id='farm', scene_id='7').update_state_from_response('To the barn.')
+    assert StoryStateManager(session_id='t5', story_id='farm', scene_id='7').get_current_state()['location'] == 'barn'
+    assert StoryStateManager(session_id='t5', story_id='farm', scene_id='8').get_current_state()['location'] == 'unknown'
+    assert recorded == ['state_extraction']
+    assert ('web_app' in sys.modules) == web_app_loaded  # analysis never imports the web app
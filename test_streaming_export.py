@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Tests for the streaming export helpers"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streaming_export import chunked, json_pieces, ndjson, file_pieces
+
+
+def test_chunked_coalesces_pieces_and_keeps_content():
+    pieces = (f"line {i}\n" for i in range(10000))
+    chunks = list(chunked(pieces, size=4096))
+    assert all(len(c) < 4096 + 20 for c in chunks)
+    assert b''.join(chunks).decode().splitlines()[-1] == 'line 9999'
+    assert len(chunks) > 10
+
+
+def test_json_pieces_match_indented_dumps():
+    data = {'payload': [{'role': 'user', 'content': 'héllo'}] * 50, 'n': 1}
+    assert ''.join(json_pieces(data)) == json.dumps(data, indent=2, ensure_ascii=False)
+    assert json.loads(ndjson(data)) == data and ndjson(data).count('\n') == 1
+
+
+def test_file_pieces_reads_in_blocks(tmp_path):
+    path = tmp_path / 'summary.txt'
+    path.write_text('x' * 1000)
+    blocks = list(file_pieces(str(path), block_size=300))
+    assert [len(b) for b in blocks] == [300, 300, 300, 100]
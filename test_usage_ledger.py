@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Tests for the token usage ledger"""
+
+import os
+import sys
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests'))
+
+import pytest
+
+from usage_ledger import ModelSink, UsageLedger, rollup, usage_event
+
+
+class ListSink:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def write(self, events):
+        if self.fail:
+            raise RuntimeError('database down')
+        self.batches.append(list(events))
+
+
+def _event(stage='story', prompt=100, completion=50, story='s1', user='u1', seconds=1.0, day=19):
+    usage = {'prompt_tokens': prompt, 'completion_tokens': completion,
+             'prompt_tokens_details': {'cached_tokens': prompt // 2}}
+    return usage_event(user, story, stage, 'grok-3', usage, seconds, 'stop', created_at=datetime(2026, 10, day, 12))
+
+
+def test_usage_event_normalizes_usage():
+    event = _event()
+    assert (event['prompt_tokens'], event['completion_tokens'], event['cached_tokens'], event['latency_ms']) == (100, 50, 50, 1000)
+    bare = usage_event(None, None, None, None, {}, 0.25)
+    assert (bare['user_id'], bare['story_id'], bare['stage'], bare['model']) == ('system', '', 'other', 'unknown')
+    assert bare['prompt_tokens'] == 0 and bare['latency_ms'] == 250
+
+
+def test_rollup_sums_per_day_user_story_stage_and_model():
+    totals = rollup([_event(), _event(prompt=10, completion=5, seconds=0.5), _event(stage='critic'), _event(day=20)])
+    story = totals[(datetime(2026, 10, 19).date(), 'u1', 's1', 'story', 'grok-3')]
+    assert story == {'calls': 2, 'prompt_tokens': 110, 'completion_tokens': 55, 'cached_tokens': 55, 'latency_ms': 1500}
+    assert len(totals) == 3
+
+
+def test_ledger_batches_events_until_flushed():
+    sink = ListSink()
+    ledger = UsageLedger(sink, flush_interval=30, batch_size=100)
+    for _ in range(5):
+        ledger.record(_event())
+    assert ledger.flush(timeout=2)
+    assert [len(batch) for batch in sink.batches] == [5]  # one write for the lot
+    assert ledger.stats['written'] == 5 and ledger.pending() == 0
+
+
+def test_ledger_writes_full_batches_without_waiting():
+    sink = ListSink()
+    ledger = UsageLedger(sink, flush_interval=30, batch_size=2)
+    written = threading.Event()
+    original = sink.write
+    sink.write = lambda events: (original(events), written.set())
+    ledger.record(_event())
+    ledger.record(_event())
+    assert written.wait(2) and len(sink.batches[0]) == 2
+
+
+def test_failed_write_is_counted_and_dropped():
+    ledger = UsageLedger(ListSink(fail=True), flush_interval=0.01)
+    ledger.record(_event())
+    assert ledger.flush(timeout=2)
+    assert ledger.stats['errors'] == 1 and ledger.dropped == 1
+
+
+def test_ledger_without_sink_records_nothing():
+    ledger = UsageLedger()
+    ledger.record(_event())
+    assert not ledger.enabled and ledger.stats['recorded'] == 0 and ledger._thread is None
+
+
+def test_model_sink_writes_events_and_increments_rollups():
+    flask = pytest.importorskip('flask')
+    flask_sqlalchemy = pytest.importorskip('flask_sqlalchemy')
+    app = flask.Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = flask_sqlalchemy.SQLAlchemy(app)
+
+    class Event(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        created_at = db.Column(db.DateTime)
+        user_id, story_id, stage, model, finish_reason = (db.Column(db.String(120)) for _ in range(5))
+        prompt_tokens, completion_tokens, cached_tokens, latency_ms = (db.Column(db.Integer) for _ in range(4))
+
+    class Daily(db.Model):
+        __table_args__ = (db.UniqueConstraint('day', 'user_id', 'story_id', 'stage', 'model'),)
+        id = db.Column(db.Integer, primary_key=True)
+        day = db.Column(db.Date)
+        user_id, story_id, stage, model = (db.Column(db.String(120)) for _ in range(4))
+        calls, prompt_tokens, completion_tokens, cached_tokens, latency_ms = (db.Column(db.Integer) for _ in range(5))
+
+    with app.app_context():
+        db.create_all()
+        sink = ModelSink(app, db, Event, Daily, retention_days=0)
+        sink.write([_event(), _event(stage='critic')])
+        sink.write([_event(prompt=1, completion=1)])
+        db.session.execute(db.text("UPDATE daily SET calls = calls + 10 WHERE stage = 'critic'"))  # another worker
+        db.session.commit()
+        sink.write([_event(stage='critic')])
+        assert Event.query.count() == 4
+        assert Daily.query.filter_by(stage='critic').one().calls == 12
+        story = Daily.query.filter_by(stage='story').one()
+        assert (story.calls, story.prompt_tokens, story.completion_tokens) == (2, 101, 51)
+        assert Daily.query.count() == 2
+
+
+def test_grok_client_reports_usage_to_listeners(monkeypatch):
+    import grok_remote
+    from fake_upstreams import FakeUpstream, FakeXAIHandler, UpstreamConfig
+
+    upstream = FakeUpstream(FakeXAIHandler, UpstreamConfig(latency=0, jitter=0, completion_tokens=20)).start()
+    try:
+        monkeypatch.setattr(grok_remote, 'API_BASE', f"{upstream.url}/v1")
+        monkeypatch.setattr(grok_remote, 'API_KEY', 'fake-key')
+        calls = []
+        monkeypatch.setattr(grok_remote, '_usage_listeners', [lambda *args: calls.append(args), lambda *args: 1 / 0])
+        grok_remote.chat_with_grok([{'role': 'user', 'content': 'hi'}], call_class='critic')
+        call_class, model, usage, seconds, finish_reason = calls[0]
+        assert call_class == 'critic' and usage['completion_tokens'] == 20 and seconds >= 0  # a failing listener is ignored
+    finally:
+        upstream.stop()
+
+
+def test_minimal_retry_after_400_reports_its_usage(monkeypatch):
+    import json
+    import requests
+    import grok_remote
+
+    def response(status, body):
+        r = requests.Response()
+        r.status_code, r._content = status, json.dumps(body).encode()
+        return r
+
+    replies = [response(400, {'error': 'bad param'}),
+               response(200, {'choices': [{'message': {'content': 'hi'}, 'finish_reason': 'stop'}],
+                              'usage': {'prompt_tokens': 7, 'completion_tokens': 3, 'total_tokens': 10}})]
+    monkeypatch.setattr(grok_remote, '_post', lambda *args, **kwargs: replies.pop(0))
+    monkeypatch.setattr(grok_remote, 'API_KEY', 'fake-key')
+    calls = []
+    monkeypatch.setattr(grok_remote, '_usage_listeners', [lambda *args: calls.append(args)])
+    reply = grok_remote.chat_with_grok([{'role': 'user', 'content': 'hi'}], return_usage=True, call_class='story')
+    assert reply['usage']['total_tokens'] == 10 and reply['finish_reason'] == 'stop'
+    assert calls[0][2]['completion_tokens'] == 3 and calls[0][4] == 'stop'
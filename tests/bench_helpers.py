@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Microbenchmarks for the per-turn pure-Python helpers.
+
+Runs each helper over a seeded corpus of realistic reply sizes (1-20 KB) plus
+pathological inputs aimed at the regexes, and reports ops/sec per case.
+
+    python tests/bench_helpers.py                  # run and compare to the saved baseline
+    python tests/bench_helpers.py --save-baseline  # record a new baseline for this machine
+    python tests/bench_helpers.py --filter cutoff --threshold 0.15
+    python tests/bench_helpers.py --ci --baseline path/to/runner_baseline.json
+
+Baselines are machine-specific, so they live in .bench/ (not committed). The run exits
+with status 1 if any case is slower than baseline by more than --threshold. Without a
+baseline nothing is compared; --ci turns that (and cases missing from the baseline)
+into a failure, so a gate whose baseline went missing cannot pass silently.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, ".bench", "helpers_baseline.json")
+REPLY_SIZES_KB = (1, 2, 5, 10, 20)
+
+SENTENCES = [
+    "She leaned closer, the lamplight catching the edge of her smile.",
+    "\"You came back,\" she said, voice low and uneven.",
+    "He set the glass down carefully, as if it might answer back.",
+    "Rain tapped against the window while the kettle began to whistle.",
+    "Her fingers traced the seam of his sleeve, slow and deliberate.",
+    "For a moment neither of them spoke, and the silence felt earned.",
+    "Dan laughed under his breath and pulled the blanket over her shoulders.",
+    "**She didn't answer**, only tilted her head toward the door.",
+    "The hallway smelled of cedar and something sweeter underneath...",
+    "He kissed her neck, and she shivered — not from the cold.",
+]
+
+
+def make_reply(size_bytes, rng):
+    parts, size = [], 0
+    while size < size_bytes:
+        sentence = rng.choice(SENTENCES)
+        if rng.random() < 0.15:
+            sentence += "\n\n"
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)[:size_bytes]
+
+
+def build_corpus(seed=1234):
+    """Name -> text. Sizes cover normal replies; 'patho_*' target regex worst cases."""
+    rng = random.Random(seed)
+    corpus = {f"reply_{kb}kb": make_reply(kb * 1024, rng) for kb in REPLY_SIZES_KB}
+    # Many trigger subjects with no climax verb inside the 120-char window: maximal scanning
+    corpus["patho_trigger_no_match"] = ("he his Dan " + "x" * 110 + " ") * 160
+    # 20 KB with no sentence punctuation: cutoff check and sentence splitter see one huge sentence
+    corpus["patho_no_punctuation"] = " ".join(rng.choice(["and", "she", "slowly", "the", "door"])
+                                              for _ in range(4000))[:20 * 1024]
+    # Unterminated think block / code fence: lazy .*? scans to the end from every opener
+    corpus["patho_unclosed_think"] = ("<think> planning the scene " * 200 + make_reply(10 * 1024, rng))
+    corpus["patho_many_fences"] = "```thinking\n" + "```reasoning " * 1500
+    # Unbalanced markdown emphasis and link brackets for the TTS cleaner
+    corpus["patho_markdown"] = "*" * 3000 + "[" * 3000 + "**bold** " * 1000
+    # Whitespace runs
+    corpus["patho_whitespace"] = ("word" + " \n\t" * 200) * 40
+    return corpus
+
+
+def _ledger_for(text):
+    import continuity_ledger
+    from web_app import _extract_ban_phrases_from_reply, LEDGER_FACT_PHRASES
+    ledger = continuity_ledger.new_ledger("bench")
+    for reply in (text[:4000], text[-4000:]):
+        continuity_ledger.record_reply(ledger, reply, None, _extract_ban_phrases_from_reply(reply), LEDGER_FACT_PHRASES)
+    ledger["scene_step"] = 7
+    ledger["summaries"] = [text[i:i + 160] for i in range(0, min(len(text), 1600), 320)]
+    return ledger
+
+
+def build_cases(corpus):
+    """List of (case name, zero-arg callable)"""
+    import web_app
+    import grok_remote
+    from tts_helper import TTSHelper
+
+    cleaner = TTSHelper.__new__(TTSHelper)
+    cleaner.max_tts_length = 0  # measure the regexes, not the truncation
+
+    cases = []
+    for name, text in corpus.items():
+        hit = len(text) // 2
+        ledger = _ledger_for(text)
+        cases += [
+            (f"_extract_ngrams/{name}", lambda t=text: web_app._extract_ngrams(t, n=4, max_phrases=8)),
+            (f"_extract_ban_phrases_from_reply/{name}", lambda t=text: web_app._extract_ban_phrases_from_reply(t)),
+            (f"build_prompt_from_ledger/{name}", lambda l=ledger: web_app.build_prompt_from_ledger(l)),
+            (f"_looks_cutoff/{name}", lambda t=text: web_app._looks_cutoff(t)),
+            (f"find_male_climax_span/{name}", lambda t=text: web_app.find_male_climax_span(t)),
+            (f"trim_before_sentence_with_index/{name}",
+             lambda t=text, h=hit: web_app.trim_before_sentence_with_index(t, h)),
+            (f"_clean_text_for_tts/{name}", lambda t=text: cleaner._clean_text_for_tts(t)),
+            (f"_clean_thinking/{name}", lambda t=text: grok_remote._clean_thinking(t)),
+        ]
+    return cases
+
+
+def measure(fn, min_time=0.2, repeat=3):
+    """Best-of-`repeat` ops/sec, each run lasting at least `min_time` seconds"""
+    fn()  # warm caches (re module, lazy imports)
+    best = 0.0
+    for _ in range(repeat):
+        loops, elapsed = 0, 0.0
+        batch = 1
+        start = time.perf_counter()
+        while elapsed < min_time:
+            for _ in range(batch):
+                fn()
+            loops += batch
+            elapsed = time.perf_counter() - start
+            batch = min(batch * 2, 10000)
+        best = max(best, loops / elapsed)
+    return best
+
+
+def compare(results, baseline, threshold):
+    """Return [(case, baseline ops, current ops, ratio)] for cases slower than allowed"""
+    regressions = []
+    for case, ops in results.items():
+        base = baseline.get(case)
+        if base and ops < base * (1 - threshold):
+            regressions.append((case, base, ops, ops / base))
+    return regressions
+
+
+def import_app_isolated():
+    """Import web_app against a scratch directory and SQLite DB so benchmarks have no side effects"""
+    workdir = tempfile.mkdtemp(prefix="grok-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import web_app
+    finally:
+        os.chdir(cwd)
+    return web_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn helper functions")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed ops/sec drop vs baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--filter", default="", help="Only run cases containing this substring")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_out", help="Also write results to this file")
+    parser.add_argument("--ci", action="store_true",
+                        help="Fail if the baseline is missing or lacks any of the cases run")
+    args = parser.parse_args()
+
+    web_app = import_app_isolated()
+    results = {}
+    with web_app.app.test_request_context():  # build_prompt_from_ledger reads the session
+        for case, fn in build_cases(build_corpus()):
+            if args.filter and args.filter not in case:
+                continue
+            results[case] = measure(fn, args.min_time, args.repeat)
+            print(f"{case:62} {results[case]:>14,.0f} ops/s")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        existing = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                existing = json.load(f).get("results", {})
+        existing.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.node(),
+                       "saved": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": existing}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        if args.ci:
+            print(f"\n❌ No baseline at {args.baseline}; nothing to compare against (save one with --save-baseline).")
+            return 1
+        print(f"\n⚠️ No baseline at {args.baseline}: NOTHING WAS COMPARED. Run with --save-baseline first.")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f).get("results", {})
+    unbaselined = sorted(case for case in results if not baseline.get(case))
+    if unbaselined:
+        print(f"\n{'❌' if args.ci else '⚠️'} {len(unbaselined)} case(s) have no baseline and were not compared:")
+        for case in unbaselined:
+            print(f"  {case}")
+        if args.ci:
+            return 1
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) regressed more than {args.threshold:.0%}:")
+        for case, base, ops, ratio in regressions:
+            print(f"  {case}: {base:,.0f} -> {ops:,.0f} ops/s ({ratio:.0%} of baseline)")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%} ({len(results)} cases)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Local stand-ins for the xAI chat-completions and ElevenLabs APIs.
+
+Used by tests/loadgen.py so load can be generated on a laptop without real upstream
+calls. Point the app at them with:
+
+    XAI_API_BASE=http://127.0.0.1:<xai_port>/v1
+    ELEVENLABS_API_BASE=http://127.0.0.1:<tts_port>
+
+Behaviour is configurable (latency, token rate, finish_reason, error rate) so the
+effect of slow or failing upstreams on the app can be measured too.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_SENTENCES = [
+    "She leaned closer, the lamplight catching the edge of her smile.",
+    "Rain tapped against the window while the kettle began to whistle.",
+    "He set the glass down carefully, as if it might answer back.",
+    "The hallway smelled of cedar and something sweeter underneath.",
+    "For a moment neither of them spoke, and the silence felt earned.",
+    "Outside, a car door slammed and footsteps faded toward the corner.",
+]
+
+# Minimal MP3 frame header followed by padding; enough for the app's header sniffing
+FAKE_MP3 = b"\xff\xfb\x90\x64" + b"\x00" * 4096
+
+
+@dataclass
+class UpstreamConfig:
+    latency: float = 0.2          # fixed seconds before responding
+    jitter: float = 0.1           # extra uniform random seconds
+    tokens_per_second: float = 0  # >0 adds completion_tokens / rate seconds (simulated generation)
+    completion_tokens: int = 400  # tokens per reply (~4 chars each)
+    finish_reason: str = "stop"   # stop | length | random
+    error_rate: float = 0.0       # fraction of requests answered with error_status
+    error_status: int = 503
+
+    def delay(self, tokens=0):
+        seconds = self.latency + random.uniform(0, self.jitter)
+        if self.tokens_per_second > 0:
+            seconds += tokens / self.tokens_per_second
+        time.sleep(seconds)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    config = UpstreamConfig()
+    stats = None
+
+    def log_message(self, format, *args):  # keep load test output readable
+        pass
+
+    def _json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def _count(self, key):
+        if self.stats is not None:
+            with self.stats["lock"]:
+                self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _fail(self):
+        self._count("errors")
+        retry = {"Retry-After": "1"} if self.config.error_status in (429, 503) else None
+        self._json(self.config.error_status, {"error": {"message": "fake upstream error"}}, retry)
+
+
+class FakeXAIHandler(_Handler):
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": "not found"})
+        payload = self._read_json()
+        self._count("requests")
+        if self.config.should_fail():
+            return self._fail()
+
+        max_tokens = int(payload.get("max_tokens") or self.config.completion_tokens)
+        tokens = min(max_tokens, self.config.completion_tokens)
+        self.config.delay(tokens)
+
+        finish_reason = self.config.finish_reason
+        if finish_reason == "random":
+            finish_reason = random.choice(["stop", "stop", "stop", "length"])
+        text = self._reply_text(tokens, payload)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in payload.get("messages", [])) // 4
+        self._json(200, {
+            "id": f"fake-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "model": payload.get("model", "grok-3"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                      "total_tokens": prompt_tokens + tokens},
+        })
+
+    @staticmethod
+    def _reply_text(tokens, payload):
+        # Structured-output callers (state extraction / critics) get valid JSON back
+        if payload.get("response_format"):
+            return json.dumps({"state": {"location": "unknown"},
+                               "progression": {"new_actions": [], "repetition_detected": False}})
+        target_chars = tokens * 4
+        parts, size = [], 0
+        while size < target_chars:
+            sentence = random.choice(SAMPLE_SENTENCES)
+            parts.append(sentence)
+            size += len(sentence) + 1
+        return " ".join(parts)
+
+
+class FakeElevenLabsHandler(_Handler):
+    def do_GET(self):
+        self._count("requests")
+        if self.path.rstrip("/") == "/v1/voices":
+            return self._json(200, {"voices": [
+                {"voice_id": "fake-voice", "name": "Fake Voice",
+                 "fine_tuning": {"state": {"eleven_flash_v2_5": "fine_tuned"}}},
+            ]})
+        if self.path.startswith("/v1/voices/"):
+            return self._json(200, {"voice_id": self.path.rsplit("/", 1)[-1],
+                                    "fine_tuning": {"state": {"eleven_flash_v2_5": "fine_tuned"}}})
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.path.startswith("/v1/text-to-speech/"):
+            return self._json(404, {"error": "not found"})
+        payload = self._read_json()
+        self._count("requests")
+        if self.config.should_fail():
+            return self._fail()
+        # Treat characters like tokens for the simulated synthesis rate
+        self.config.delay(len(payload.get("text", "")) // 4)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(FAKE_MP3)))
+        self.end_headers()
+        self.wfile.write(FAKE_MP3)
+
+
+class FakeUpstream:
+    """A fake server running on a background thread"""
+
+    def __init__(self, handler_cls, config=None, host="127.0.0.1", port=0):
+        self.stats = {"lock": threading.Lock(), "requests": 0, "errors": 0}
+        handler = type(handler_cls.__name__, (handler_cls,), {"config": config or UpstreamConfig(),
+                                                              "stats": self.stats})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_fake_upstreams(xai_config=None, tts_config=None):
+    """Start both fakes; returns (xai, elevenlabs) with .url set"""
+    xai = FakeUpstream(FakeXAIHandler, xai_config).start()
+    tts = FakeUpstream(FakeElevenLabsHandler, tts_config or UpstreamConfig(latency=0.05, jitter=0.05)).start()
+    return xai, tts
+
+
+def add_config_args(parser, prefix, defaults):
+    parser.add_argument(f"--{prefix}-latency", type=float, default=defaults.latency)
+    parser.add_argument(f"--{prefix}-jitter", type=float, default=defaults.jitter)
+    parser.add_argument(f"--{prefix}-tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument(f"--{prefix}-error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument(f"--{prefix}-error-status", type=int, default=defaults.error_status)
+
+
+def config_from_args(args, prefix, **extra):
+    p = prefix.replace("-", "_")
+    return UpstreamConfig(
+        latency=getattr(args, f"{p}_latency"),
+        jitter=getattr(args, f"{p}_jitter"),
+        tokens_per_second=getattr(args, f"{p}_tokens_per_second"),
+        error_rate=getattr(args, f"{p}_error_rate"),
+        error_status=getattr(args, f"{p}_error_status"),
+        **extra,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fake xAI and ElevenLabs servers")
+    parser.add_argument("--xai-port", type=int, default=int(os.getenv("FAKE_XAI_PORT", "8901")))
+    parser.add_argument("--tts-port", type=int, default=int(os.getenv("FAKE_TTS_PORT", "8902")))
+    parser.add_argument("--completion-tokens", type=int, default=400)
+    parser.add_argument("--finish-reason", default="stop", choices=["stop", "length", "random"])
+    add_config_args(parser, "xai", UpstreamConfig())
+    add_config_args(parser, "tts", UpstreamConfig(latency=0.05, jitter=0.05))
+    args = parser.parse_args()
+
+    xai = FakeUpstream(FakeXAIHandler, config_from_args(
+        args, "xai", completion_tokens=args.completion_tokens, finish_reason=args.finish_reason),
+        port=args.xai_port).start()
+    tts = FakeUpstream(FakeElevenLabsHandler, config_from_args(args, "tts"), port=args.tts_port).start()
+    print(f"XAI_API_BASE={xai.url}/v1")
+    print(f"ELEVENLABS_API_BASE={tts.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        xai.stop()
+        tts.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Concurrent load generator for the web app.
+
+By default everything runs locally: fake xAI/ElevenLabs servers (tests/fake_upstreams.py)
+and the Flask app itself on a throwaway SQLite database, authenticated through the
+TEST_API_KEY bypass, one X-Test-User identity per client. Use --target to drive an already running instance instead.
+
+    python tests/loadgen.py --concurrency 8 --duration 30
+    python tests/loadgen.py --target http://localhost:8080 --api-key $TEST_API_KEY
+
+Reports throughput and p50/p95/p99 latency per route.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_upstreams import UpstreamConfig, start_fake_upstreams, add_config_args, config_from_args
+
+PROMPTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.txt")
+
+# Relative weights of the request mix; chat dominates like in real sessions
+DEFAULT_MIX = "chat=6,tts=1,tts_status=3,audio_files=3,active_session=1"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def load_prompts():
+    try:
+        with open(PROMPTS_FILE, "r", encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError:
+        prompts = []
+    return prompts or ["Continue the scene.", "Describe the room as she walks in.", "He answers the door."]
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def report(self, elapsed):
+        rows = []
+        for route in sorted(self.latencies):
+            values = self.latencies[route]
+            rows.append({
+                "route": route,
+                "requests": len(values),
+                "errors": self.errors[route],
+                "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+            })
+        total = sum(r["requests"] for r in rows)
+        return {"elapsed_s": round(elapsed, 2), "total_requests": total,
+                "total_rps": round(total / elapsed, 2) if elapsed else 0.0, "routes": rows}
+
+
+class Client:
+    """One simulated user session (own cookie jar)"""
+
+    def __init__(self, base_url, api_key, worker_id, prompts, beats, max_tokens):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        # Each client is its own user, so per-user admission budgets apply per client
+        self.session.headers.update({"X-Test-Api-Key": api_key, "X-Test-User": f"loadgen-{worker_id}",
+                                     "Content-Type": "application/json"})
+        self.worker_id = worker_id
+        self.prompts = prompts
+        self.beats = beats
+        self.max_tokens = max_tokens
+        self.sent = 0
+
+    def call(self, action):
+        if action == "chat":
+            self.sent += 1
+            # Unique text per call so the server's duplicate-request guard doesn't short-circuit
+            message = f"{random.choice(self.prompts)} [w{self.worker_id}-{self.sent}]"
+            return "POST /api/chat", self.session.post(f"{self.base_url}/api/chat", json={
+                "message": message, "beats": self.beats, "word_count": self.max_tokens}, timeout=120)
+        if action == "tts":
+            text = " ".join(random.choice(self.prompts) for _ in range(6))
+            return "POST /api/tts-generate", self.session.post(
+                f"{self.base_url}/api/tts-generate", json={"message_content": text}, timeout=120)
+        if action == "tts_status":
+            return "GET /api/tts-status", self.session.get(f"{self.base_url}/api/tts-status", timeout=30)
+        if action == "audio_files":
+            return "GET /api/audio-files", self.session.get(f"{self.base_url}/api/audio-files", timeout=30)
+        if action == "active_session":
+            return "GET /api/active-session", self.session.get(f"{self.base_url}/api/active-session", timeout=30)
+        raise ValueError(f"Unknown action {action}")
+
+
+def parse_mix(raw):
+    mix = []
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def run_load(base_url, api_key, concurrency, duration, requests_limit, mix, prompts, beats, max_tokens):
+    results = Results()
+    deadline = time.monotonic() + duration if duration else None
+    remaining = [requests_limit] if requests_limit else None
+    remaining_lock = threading.Lock()
+    names, weights = zip(*mix)
+
+    def take_ticket():
+        if remaining is None:
+            return True
+        with remaining_lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(worker_id):
+        client = Client(base_url, api_key, worker_id, prompts, beats, max_tokens)
+        while (deadline is None or time.monotonic() < deadline) and take_ticket():
+            action = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                route, response = client.call(action)
+                ok = response.status_code < 400 and not _is_error_body(response)
+            except requests.RequestException:
+                route, ok = action, False
+            results.record(route, time.perf_counter() - start, ok)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results.report(time.perf_counter() - started)
+
+
+def _is_error_body(response):
+    # Several routes report failures as 200 + {"error": ...}
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and bool(body.get("error"))
+
+
+def start_local_app(xai_url, tts_url, api_key, port=0):
+    """Import the app against the fakes and serve it with werkzeug on a background thread"""
+    workdir = tempfile.mkdtemp(prefix="grok-loadgen-")
+    os.environ.update({
+        "XAI_API_BASE": f"{xai_url}/v1",
+        "XAI_API_KEY": "fake-xai-key",
+        "ELEVENLABS_API_BASE": tts_url,
+        "ELEVENLABS_API_KEY": "fake-elevenlabs-key",
+        "TEST_API_KEY": api_key,
+        "DATABASE_URL": os.getenv("LOADGEN_DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'loadgen.db')}"),
+    })
+    # The scratch database starts empty; let the app create its tables (no migrations to run)
+    os.environ.setdefault("STARTUP_SCHEMA_MODE", "create")
+    # Clients send far more than a person's 12 chats a minute; export ADMISSION_ENABLED=1 to load-test the 429 path
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    # Audio files, voice id and audit/profile output land in the scratch dir, not the checkout
+    os.chdir(workdir)
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    import web_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", port, web_app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_report(report):
+    print(f"\n{'route':28} {'reqs':>6} {'errs':>5} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for row in report["routes"]:
+        print(f"{row['route']:28} {row['requests']:>6} {row['errors']:>5} {row['rps']:>7} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    print(f"\nTotal: {report['total_requests']} requests in {report['elapsed_s']}s ({report['total_rps']} rps)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat, TTS and polling routes")
+    parser.add_argument("--target", default=os.getenv("LOADGEN_TARGET"),
+                        help="Base URL of a running app; omit to start the app and fake upstreams locally")
+    parser.add_argument("--api-key", default=os.getenv("TEST_API_KEY", "loadgen-key"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run (0 = use --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests across all workers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted actions (default: {DEFAULT_MIX})")
+    parser.add_argument("--beats", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=800)
+    parser.add_argument("--completion-tokens", type=int, default=400)
+    parser.add_argument("--finish-reason", default="stop", choices=["stop", "length", "random"])
+    parser.add_argument("--json", dest="json_out", help="Also write the report to this file")
+    add_config_args(parser, "xai", UpstreamConfig())
+    add_config_args(parser, "tts", UpstreamConfig(latency=0.05, jitter=0.05))
+    args = parser.parse_args()
+
+    fakes, server = (), None
+    base_url = args.target
+    if not base_url:
+        fakes = start_fake_upstreams(
+            config_from_args(args, "xai", completion_tokens=args.completion_tokens, finish_reason=args.finish_reason),
+            config_from_args(args, "tts"))
+        server, base_url = start_local_app(fakes[0].url, fakes[1].url, args.api_key)
+        print(f"App: {base_url}  fake xAI: {fakes[0].url}  fake ElevenLabs: {fakes[1].url}")
+
+    try:
+        report = run_load(base_url, args.api_key, args.concurrency, args.duration, args.requests,
+                          parse_mix(args.mix), load_prompts(), args.beats, args.max_tokens)
+    finally:
+        if server is not None:
+            server.shutdown()
+        for fake in fakes:
+            fake.stop()
+
+    if fakes:
+        report["upstream_calls"] = {"xai": fakes[0].stats["requests"], "elevenlabs": fakes[1].stats["requests"]}
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
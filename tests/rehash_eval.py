@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Build, label and evaluate the rehash scorer that gates the continuity critic.
+
+The chat route logs a `rehash_check` audit event (DEBUG_AUDIT=1) for every candidate
+reply, with its features, the model score and the heuristic decision. This tool turns
+those into a labeled evaluation set and compares the scorer with the old heuristic:
+
+    python tests/rehash_eval.py build-eval                  # collect rehash_check events (keeps existing labels)
+    python tests/rehash_eval.py label                       # label unlabeled rows interactively (y/n)
+    python tests/rehash_eval.py evaluate                    # precision/recall: heuristic vs rehash_weights.json
+    python tests/rehash_eval.py fit --out rehash_weights.json
+
+A positive label means the reply rehashed enough that a critic rewrite was worth an
+upstream call. The eval set contains story text, so it lives in instance/ (not committed).
+"""
+import os
+import sys
+import json
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from audit_log import AuditLog
+from rehash_scorer import REHASH_WEIGHTS, FEATURES, confusion, fit, load_scorer
+
+DEFAULT_AUDIT = os.path.join(REPO_ROOT, "instance", "audit.jsonl")
+DEFAULT_EVAL = os.path.join(REPO_ROOT, "instance", "rehash_eval.jsonl")
+
+
+def read_rows(path):
+    rows = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return rows
+
+
+def write_rows(path, rows):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def build_eval(audit_path, eval_path):
+    """Merge rehash_check events into the eval set; existing rows (and labels) win"""
+    rows = read_rows(eval_path)
+    known = {row["id"] for row in rows}
+    events = AuditLog(audit_path, enabled=False).tail(limit=10 ** 9, event="rehash_check", include_rotated=True)
+    added = 0
+    for event in events:
+        row_id = f"{event.get('request_id')}:{event.get('ts')}"
+        if row_id in known or not event.get("features"):
+            continue
+        known.add(row_id)
+        rows.append({
+            "id": row_id,
+            "ts": event.get("ts"),
+            "features": event["features"],
+            "heuristic": bool(event.get("heuristic")),
+            "reply": event.get("reply", ""),
+            "previous_tail": event.get("previous_tail", ""),
+            "label": None,
+        })
+        added += 1
+    write_rows(eval_path, rows)
+    labeled = sum(1 for row in rows if row.get("label") is not None)
+    print(f"Added {added} rows; {len(rows)} total, {labeled} labeled -> {eval_path}")
+
+
+def label(eval_path):
+    rows = read_rows(eval_path)
+    try:
+        for row in rows:
+            if row.get("label") is not None:
+                continue
+            print("\n" + "=" * 80)
+            print(f"PREVIOUS (tail): ...{row['previous_tail'][-400:]}")
+            print("-" * 80)
+            print(f"REPLY: {row['reply'][:1500]}")
+            print(f"heuristic={'revise' if row['heuristic'] else 'keep'}")
+            answer = input("Rehash worth a rewrite? [y]es / [n]o / [s]kip / [q]uit: ").strip().lower()
+            if answer == "q":
+                break
+            if answer in ("y", "n"):
+                row["label"] = 1 if answer == "y" else 0
+    finally:
+        write_rows(eval_path, rows)
+
+
+def labeled_rows(eval_path):
+    return [(row["features"], int(row["label"]), row["heuristic"])
+            for row in read_rows(eval_path) if row.get("label") is not None]
+
+
+def best_threshold(scorer, rows):
+    """Threshold with the best F1 on rows (ties go to the higher, cheaper threshold)"""
+    labels = [y for _, y, _ in rows]
+    scores = [scorer.score(f) for f, _, _ in rows]
+    best = (0.0, scorer.threshold)
+    for step in range(5, 100, 5):
+        threshold = step / 100
+        f1 = confusion([s >= threshold for s in scores], labels)["f1"]
+        if f1 >= best[0]:
+            best = (f1, threshold)
+    return best[1]
+
+
+def report(scorer, rows):
+    labels = [y for _, y, _ in rows]
+    heuristic = confusion([h for _, _, h in rows], labels)
+    model = confusion([scorer.score(f) >= scorer.threshold for f, _, _ in rows], labels)
+    print(f"\n{len(rows)} labeled rows, {sum(labels)} positive")
+    print(f"{'':10} {'precision':>10} {'recall':>8} {'f1':>6} {'critic calls':>13}")
+    for name, m in (("heuristic", heuristic), (f"model@{scorer.threshold:.2f}", model)):
+        print(f"{name:10} {m['precision']:>10.2f} {m['recall']:>8.2f} {m['f1']:>6.2f} {m['flag_rate']:>12.0%}")
+    if heuristic["flag_rate"]:
+        print(f"\nCritic calls vs heuristic: {model['flag_rate'] / heuristic['flag_rate']:.0%}")
+    return {"heuristic": heuristic, "model": model}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluation set and calibration for the rehash scorer")
+    parser.add_argument("command", choices=["build-eval", "label", "evaluate", "fit"])
+    parser.add_argument("--audit", default=DEFAULT_AUDIT, help="Audit log (rotated .gz files are included)")
+    parser.add_argument("--eval", dest="eval_path", default=DEFAULT_EVAL)
+    parser.add_argument("--weights", default=REHASH_WEIGHTS)
+    parser.add_argument("--out", help="fit: where to write the weights (default: --weights)")
+    parser.add_argument("--min-rows", type=int, default=30, help="fit: refuse to fit on fewer labeled rows")
+    args = parser.parse_args()
+
+    if args.command == "build-eval":
+        build_eval(args.audit, args.eval_path)
+        return 0
+    if args.command == "label":
+        label(args.eval_path)
+        return 0
+
+    rows = labeled_rows(args.eval_path)
+    if not rows:
+        print(f"No labeled rows in {args.eval_path}; run build-eval and label first.")
+        return 1
+
+    if args.command == "evaluate":
+        report(load_scorer(args.weights), rows)
+        return 0
+
+    if len(rows) < args.min_rows:
+        print(f"Only {len(rows)} labeled rows (need {args.min_rows}); label more before fitting.")
+        return 1
+    scorer = fit([(f, y) for f, y, _ in rows])
+    scorer.threshold = best_threshold(scorer, rows)
+    report(scorer, rows)
+    out = args.out or args.weights
+    scorer.save(out)
+    print(f"\nWeights for {', '.join(FEATURES)} saved to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Import-time and startup profiler for each entry point.
+
+Imports every entry point in a fresh interpreter with `python -X importtime`, against a
+scratch directory and a throwaway SQLite database, and reports the most expensive
+top-level imports plus the per-phase init breakdown from startup_timing (web_app).
+
+    python tests/startup_profile.py                       # report all entry points
+    python tests/startup_profile.py --entry chat --top 20
+    python tests/startup_profile.py --check               # exit 1 if tests/startup_budget.json is exceeded
+
+The budget has a generous import-time ceiling per entry point (timings vary by machine)
+and a list of modules that must not be imported at startup, which is exact anywhere.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(REPO_ROOT, "tests", "startup_budget.json")
+ENTRY_POINTS = ("web_app", "chat", "simple_web", "upload_story")
+RESULT_MARKER = "STARTUP_PROFILE_RESULT "
+
+# Runs inside the child interpreter
+CHILD_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+module = __import__(%r)
+elapsed_ms = (time.perf_counter() - started) * 1000
+timer = getattr(module, 'startup', None)
+print(%r + json.dumps({
+    'import_ms': elapsed_ms,
+    'phases': timer.breakdown() if hasattr(timer, 'breakdown') else None,
+    'modules': sorted(sys.modules),
+}), flush=True)
+"""
+
+
+def parse_importtime(stderr):
+    """[(name, self_us, cumulative_us, depth)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+            rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_entry(entry, workdir):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, entry + '.db')}",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT % (entry, RESULT_MARKER)],
+                          cwd=workdir, env=env, capture_output=True, text=True, timeout=120)
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+    if result is None:
+        raise RuntimeError(f"{entry} failed to import:\n{proc.stderr[-2000:]}")
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def profile(entries, runs):
+    """Best (fastest) of `runs` fresh imports per entry point"""
+    workdir = tempfile.mkdtemp(prefix="grok-startup-")
+    results = {}
+    for entry in entries:
+        best = None
+        for _ in range(runs):
+            result = profile_entry(entry, workdir)
+            if best is None or result["import_ms"] < best["import_ms"]:
+                best = result
+        results[entry] = best
+    return results
+
+
+def entry_subtree(rows, entry):
+    """Rows imported by `entry` itself (importtime prints children before their parent)"""
+    for end in range(len(rows) - 1, -1, -1):
+        if rows[end][0] == entry and rows[end][3] == 0:
+            start = end
+            while start > 0 and rows[start - 1][3] > 0:
+                start -= 1
+            return rows[start:end + 1]
+    return rows
+
+
+def top_imports(result, entry, limit, max_depth=2):
+    """Most expensive imports near the top of the entry's tree (where a lazy import would help)"""
+    rows = [r for r in entry_subtree(result["imports"], entry) if r[3] <= max_depth]
+    return sorted(rows, key=lambda r: r[2], reverse=True)[:limit]
+
+
+def check_budget(results, budget):
+    """[(entry, message)] for every budget violation"""
+    violations = []
+    for entry, result in results.items():
+        limits = budget.get("entry_points", {}).get(entry)
+        if not limits:
+            continue
+        max_ms = limits.get("max_import_ms")
+        if max_ms is not None and result["import_ms"] > max_ms:
+            violations.append((entry, f"import took {result['import_ms']:.0f}ms (budget {max_ms}ms)"))
+        loaded = set(result["modules"])
+        for module in limits.get("forbidden_modules", []):
+            if module in loaded:
+                violations.append((entry, f"imports '{module}' at startup (should be lazy)"))
+    return violations
+
+
+def print_report(results, limit):
+    for entry, result in results.items():
+        print(f"\n=== {entry}: {result['import_ms']:.0f}ms to import, {len(result['modules'])} modules ===")
+        for name, self_us, cumulative_us, depth in top_imports(result, entry, limit):
+            print(f"  {'  ' * depth}{name:<{48 - 2 * depth}} {cumulative_us / 1000:>8.1f}ms  (self {self_us / 1000:.1f}ms)")
+        phases = result.get("phases")
+        if phases:
+            parts = ", ".join(f"{phase} {ms:.0f}ms" for phase, ms in phases["phases_ms"].items())
+            print(f"  init phases: {parts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time and startup phases per entry point")
+    parser.add_argument("--entry", action="append", choices=ENTRY_POINTS,
+                        help="Entry point to profile (repeatable; default all)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per entry point (best is kept)")
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--budget", default=DEFAULT_BUDGET)
+    parser.add_argument("--check", action="store_true", help="Exit 1 if the budget is exceeded")
+    parser.add_argument("--json", dest="json_out", help="Also write results (without the raw import tree) here")
+    args = parser.parse_args()
+
+    results = profile(args.entry or ENTRY_POINTS, args.runs)
+    print_report(results, args.top)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({entry: {"import_ms": round(r["import_ms"], 1), "phases": r["phases"],
+                               "top_imports": [{"module": n, "cumulative_ms": round(c / 1000, 1)}
+                                               for n, _, c, _ in top_imports(r, entry, args.top)]}
+                       for entry, r in results.items()}, f, indent=2)
+
+    if not args.check:
+        return 0
+    with open(args.budget, "r", encoding="utf-8") as f:
+        budget = json.load(f)
+    violations = check_budget(results, budget)
+    if violations:
+        print(f"\n❌ {len(violations)} startup budget violation(s):")
+        for entry, message in violations:
+            print(f"  {entry}: {message}")
+        return 1
+    print(f"\n✅ Startup within budget ({', '.join(results)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,14 @@ import tempfile
 import subprocess
 import requests
 import time
-from elevenlabs import ElevenLabs
+import threading
+from shared_state import shared_state
+from log_helper import get_logger
+from metrics import record_upstream
+
+log = get_logger('tts')
+
+ELEVENLABS_API_BASE = os.getenv("ELEVENLABS_API_BASE", "https://api.elevenlabs.io").rstrip("/")
 
 class TTSHelper:
     def __init__(self):
@@ -18,16 +25,13 @@ class TTSHelper:
         # Voice model cache to avoid repeated API calls
         self._voice_models_cache = {}
         
-        # Initialize client if API key is available
+        # The ElevenLabs SDK takes over a second to import, so the client is built on first use
+        self._client = None
+        self._client_lock = threading.Lock()
         if self.api_key:
-            try:
-                self.client = ElevenLabs(api_key=self.api_key)
-                print(f"🎤 TTS API key found - ready to enable")
-            except Exception as e:
-                print(f"⚠️ TTS API key invalid: {e}")
-                self.api_key = None
+            log.info(f"TTS API key found - ready to enable")
         else:
-            print("🔇 TTS disabled - no API key set")
+            log.info("TTS disabled - no API key set")
         
         # Create default files if they don't exist to avoid startup messages
         self._ensure_default_files()
@@ -40,11 +44,21 @@ class TTSHelper:
                 default_voice = os.getenv("ELEVENLABS_VOICE_ID", "pNInz6obpgDQGcFmaJgB")
                 with open("tts_voice_id.txt", "w") as f:
                     f.write(default_voice)
-                print(f"🔍 Debug: Created default voice ID file: {default_voice}")
+                log.debug(f"Created default voice ID file: {default_voice}")
                 
         except Exception as e:
-            print(f"🔍 Debug: Error creating default files: {e}")
+            log.warning(f"Error creating default files: {e}")
     
+    @property
+    def client(self):
+        """ElevenLabs client, created on first synthesis"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from elevenlabs import ElevenLabs
+                    self._client = ElevenLabs(api_key=self.api_key, base_url=ELEVENLABS_API_BASE)
+        return self._client
+
     @property
     def enabled(self):
         """TTS is enabled if we have an API key"""
@@ -57,22 +71,22 @@ class TTSHelper:
         
         try:
             # Use direct API call to get detailed voice information
-            print(f"🔍 Debug: Fetching voices from ElevenLabs API...")
-            print(f"🔍 Debug: API Key: {self.api_key[:10]}...{self.api_key[-4:] if len(self.api_key) > 14 else '***'}")
+            log.debug(f"Fetching voices from ElevenLabs API...")
+            log.debug(f"API Key: {self.api_key[:10]}...{self.api_key[-4:] if len(self.api_key) > 14 else '***'}")
             
             headers = {"xi-api-key": self.api_key}
             start_time = time.time()
             
-            response = requests.get("https://api.elevenlabs.io/v1/voices", headers=headers)
+            response = requests.get(f"{ELEVENLABS_API_BASE}/v1/voices", headers=headers)
             response.raise_for_status()
             
             end_time = time.time()
             duration = end_time - start_time
-            print(f"🔍 Debug: Voices API call completed in {duration:.2f} seconds")
-            print(f"🔍 Debug: Response status: {response.status_code}")
+            log.debug(f"Voices API call completed in {duration:.2f} seconds")
+            log.debug(f"Response status: {response.status_code}")
             
             voices_data = response.json()
-            print(f"🔍 Debug: Found {len(voices_data.get('voices', []))} voices")
+            log.debug(f"Found {len(voices_data.get('voices', []))} voices")
             voices = []
             
             for voice in voices_data.get("voices", []):
@@ -91,7 +105,7 @@ class TTSHelper:
             
             return voices
         except Exception as e:
-            print(f"⚠️ Could not fetch voices: {e}")
+            log.warning(f"Could not fetch voices: {e}")
             return []
     
     def _get_best_model_for_voice(self, voice_data):
@@ -132,7 +146,7 @@ class TTSHelper:
         try:
             # Fetch voice details
             headers = {"xi-api-key": self.api_key}
-            response = requests.get(f"https://api.elevenlabs.io/v1/voices/{voice_id}", headers=headers)
+            response = requests.get(f"{ELEVENLABS_API_BASE}/v1/voices/{voice_id}", headers=headers)
             response.raise_for_status()
             
             voice_data = response.json()
@@ -141,53 +155,63 @@ class TTSHelper:
             # Cache the result
             self._voice_models_cache[voice_id] = best_model
             
-            print(f"🔍 Debug: Voice {voice_id} using model: {best_model}")
+            log.debug(f"Voice {voice_id} using model: {best_model}")
             return best_model
             
         except Exception as e:
-            print(f"⚠️ Could not get model for voice {voice_id}: {e}")
+            log.warning(f"Could not get model for voice {voice_id}: {e}")
             return "eleven_monolingual_v1"  # Default fallback
     
     def _load_voice_id(self):
-        """Load voice ID from file for persistence"""
+        """Load voice ID from shared state (all workers), falling back to the local file"""
+        try:
+            voice_id = shared_state.get("tts:voice_id")
+            if voice_id:
+                return voice_id
+        except Exception as e:
+            log.warning(f"Error reading shared voice ID: {e}")
         try:
             if os.path.exists("tts_voice_id.txt"):
                 with open("tts_voice_id.txt", "r") as f:
                     voice_id = f.read().strip()
                     if voice_id:
-                        print(f"🔍 Debug: Loaded voice ID from file: {voice_id}")
+                        log.debug(f"Loaded voice ID from file: {voice_id}")
                         return voice_id
                     else:
-                        print(f"🔍 Debug: Voice ID file is empty, using default")
+                        log.debug(f"Voice ID file is empty, using default")
             else:
-                print(f"🔍 Debug: No voice ID file found, using default")
+                log.debug(f"No voice ID file found, using default")
         except Exception as e:
-            print(f"🔍 Debug: Error loading voice ID: {e}")
+            log.warning(f"Error loading voice ID: {e}")
         
         # Default to environment variable or fallback
         return os.getenv("ELEVENLABS_VOICE_ID", "pNInz6obpgDQGcFmaJgB")  # Adam voice
     
     def _save_voice_id(self, voice_id):
-        """Save voice ID to file for persistence"""
+        """Save voice ID to shared state and file for persistence"""
+        try:
+            shared_state.set("tts:voice_id", voice_id)
+        except Exception as e:
+            log.warning(f"Error saving shared voice ID: {e}")
         try:
-            print(f"🔍 Debug: Saving voice ID to file: {voice_id}")
+            log.debug(f"Saving voice ID to file: {voice_id}")
             with open("tts_voice_id.txt", "w") as f:
                 f.write(voice_id)
-            print(f"🔍 Debug: Voice ID saved to file successfully")
+            log.debug(f"Voice ID saved to file successfully")
         except Exception as e:
-            print(f"🔍 Debug: Error saving voice ID: {e}")
+            log.warning(f"Error saving voice ID: {e}")
     
     def set_voice(self, voice_id):
         """Change the voice ID"""
         self.voice_id = voice_id
-        print(f"🎤 Voice changed to: {voice_id}")
+        log.info(f"Voice changed to: {voice_id}")
         
         # Save voice ID to file for persistence
         self._save_voice_id(voice_id)
         
         # Get and log the model for this voice
         model = self.get_voice_model(voice_id)
-        print(f"🎤 Voice {voice_id} will use model: {model}")
+        log.info(f"Voice {voice_id} will use model: {model}")
     
     def get_mode_display(self):
         """Get human-readable mode description"""
@@ -203,7 +227,7 @@ class TTSHelper:
         
         # Ensure voice ID is loaded fresh from file before each TTS generation
         self.voice_id = self._load_voice_id()
-        print(f"🔍 Debug: TTS speak() called with voice_id: {self.voice_id}")
+        log.debug(f"TTS speak() called with voice_id: {self.voice_id}")
         
         try:
             # Clean text for TTS (remove markdown, etc.)
@@ -211,19 +235,19 @@ class TTSHelper:
             
             # Get the best model for this voice
             model_id = self.get_voice_model(self.voice_id)
-            print(f"🔍 Debug: Using model {model_id} for voice {self.voice_id}")
-            print(f"🔍 Debug: TTS speak() called with voice_id: {self.voice_id}")
+            log.debug(f"Using model {model_id} for voice {self.voice_id}")
+            log.debug(f"TTS speak() called with voice_id: {self.voice_id}")
             
             # Generate audio using the new API with detailed logging
-            print(f"🔍 Debug: Calling ElevenLabs API for text length: {len(clean_text)}")
-            print(f"🔍 Debug: ElevenLabs API call details:")
-            print(f"  - Voice ID: {self.voice_id}")
-            print(f"  - Model ID: {model_id}")
-            print(f"  - Text preview: {clean_text[:100]}{'...' if len(clean_text) > 100 else ''}")
-            print(f"  - API Key: {self.api_key[:10]}...{self.api_key[-4:] if len(self.api_key) > 14 else '***'}")
+            log.debug(f"Calling ElevenLabs API for text length: {len(clean_text)}")
+            log.debug(f"ElevenLabs API call details:")
+            log.debug(f"  - Voice ID: {self.voice_id}")
+            log.debug(f"  - Model ID: {model_id}")
+            log.debug(f"  - Text preview: {clean_text[:100]}{'...' if len(clean_text) > 100 else ''}")
+            log.debug(f"  - API Key: {self.api_key[:10]}...{self.api_key[-4:] if len(self.api_key) > 14 else '***'}")
             
             try:
-                print(f"🔍 Debug: Making ElevenLabs API request...")
+                log.debug(f"Making ElevenLabs API request...")
                 start_time = time.time()
                 
                 audio = self.client.text_to_speech.convert(
@@ -234,16 +258,15 @@ class TTSHelper:
                 
                 end_time = time.time()
                 duration = end_time - start_time
-                print(f"🔍 Debug: ElevenLabs API call completed successfully!")
-                print(f"  - Duration: {duration:.2f} seconds")
-                print(f"  - Model used: {model_id}")
-                print(f"  - Response type: {type(audio)}")
+                record_upstream("elevenlabs", "ok", duration)
+                log.debug(f"ElevenLabs API call completed successfully!")
+                log.debug(f"  - Duration: {duration:.2f} seconds")
+                log.debug(f"  - Model used: {model_id}")
+                log.debug(f"  - Response type: {type(audio)}")
                 
             except Exception as api_error:
-                print(f"🔍 Debug: ElevenLabs API error: {api_error}")
-                print(f"🔍 Debug: API error type: {type(api_error).__name__}")
-                import traceback
-                print(f"🔍 Debug: API error traceback: {traceback.format_exc()}")
+                record_upstream("elevenlabs", "error", time.time() - start_time)
+                log.exception(f"ElevenLabs API error ({type(api_error).__name__}): {api_error}")
                 return None
             
             # Determine if we should save or play based on save_audio parameter
@@ -252,12 +275,12 @@ class TTSHelper:
             if should_save:
                 # Create audio directory if it doesn't exist
                 audio_dir = "audio"
-                print(f"🔍 Debug: Creating audio directory: {audio_dir}")
+                log.debug(f"Creating audio directory: {audio_dir}")
                 try:
                     os.makedirs(audio_dir, exist_ok=True)
-                    print(f"🔍 Debug: Audio directory ready: {os.path.exists(audio_dir)}")
+                    log.debug(f"Audio directory ready: {os.path.exists(audio_dir)}")
                 except Exception as dir_error:
-                    print(f"🔍 Debug: Error creating audio directory: {dir_error}")
+                    log.warning(f"Error creating audio directory: {dir_error}")
                     return None
                 
                 # Save to a timestamped file in audio directory
@@ -265,65 +288,61 @@ class TTSHelper:
                 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"grok_response_{timestamp}.mp3"
                 filepath = os.path.join(audio_dir, filename)
-                print(f"🔍 Debug: Saving audio to: {filepath}")
+                log.debug(f"Saving audio to: {filepath}")
                 
                 try:
                     # Debug the audio data
-                    print(f"🔍 Debug: Audio data type: {type(audio)}")
-                    print(f"🔍 Debug: Audio data length: {len(audio) if hasattr(audio, '__len__') else 'Unknown'}")
+                    log.debug(f"Audio data type: {type(audio)}")
+                    log.debug(f"Audio data length: {len(audio) if hasattr(audio, '__len__') else 'Unknown'}")
                     
                     # Convert audio to bytes if it's not already
                     try:
                         if hasattr(audio, 'read'):
                             # It's a file-like object
                             audio_bytes = audio.read()
-                            print(f"🔍 Debug: Read {len(audio_bytes)} bytes from audio stream")
+                            log.debug(f"Read {len(audio_bytes)} bytes from audio stream")
                         elif hasattr(audio, '__iter__') and not isinstance(audio, (bytes, str)):
                             # It's a generator or iterable
                             audio_bytes = b''.join(chunk for chunk in audio)
-                            print(f"🔍 Debug: Consumed generator into {len(audio_bytes)} bytes")
+                            log.debug(f"Consumed generator into {len(audio_bytes)} bytes")
                         elif isinstance(audio, (list, tuple)):
                             # It's a list of chunks
                             audio_bytes = b''.join(chunk for chunk in audio)
-                            print(f"🔍 Debug: Combined {len(audio)} chunks into {len(audio_bytes)} bytes")
+                            log.debug(f"Combined {len(audio)} chunks into {len(audio_bytes)} bytes")
                         else:
                             # Assume it's already bytes
                             audio_bytes = audio
-                            print(f"🔍 Debug: Using audio as bytes: {len(audio_bytes)} bytes")
+                            log.debug(f"Using audio as bytes: {len(audio_bytes)} bytes")
                     except Exception as convert_error:
-                        print(f"🔍 Debug: Error converting audio data: {convert_error}")
-                        import traceback
-                        print(f"🔍 Debug: Convert error traceback: {traceback.format_exc()}")
+                        log.exception(f"Error converting audio data: {convert_error}")
                         return None
                     
                     # Validate that we have actual audio data
                     if len(audio_bytes) < 100:
-                        print(f"🔍 Debug: Warning: Audio file seems too small ({len(audio_bytes)} bytes)")
+                        log.warning(f"Warning: Audio file seems too small ({len(audio_bytes)} bytes)")
                     
                     # Check for MP3 header
                     if audio_bytes.startswith(b'ID3') or audio_bytes.startswith(b'\xff\xfb'):
-                        print(f"🔍 Debug: Valid MP3 header detected")
+                        log.debug(f"Valid MP3 header detected")
                     else:
-                        print(f"🔍 Debug: Warning: No valid MP3 header detected")
-                        print(f"🔍 Debug: First 20 bytes: {audio_bytes[:20]}")
+                        log.warning(f"Warning: No valid MP3 header detected")
+                        log.debug(f"First 20 bytes: {audio_bytes[:20]}")
                     
                     with open(filepath, "wb") as f:
                         f.write(audio_bytes)
                     
-                    print(f"💾 Audio saved to: {filepath}")
-                    print(f"🔍 Debug: File exists after save: {os.path.exists(filepath)}")
-                    print(f"🔍 Debug: File size: {os.path.getsize(filepath)} bytes")
+                    log.debug(f"Audio saved to: {filepath}")
+                    log.debug(f"File exists after save: {os.path.exists(filepath)}")
+                    log.debug(f"File size: {os.path.getsize(filepath)} bytes")
                     
                     # Verify the file is valid
                     if os.path.getsize(filepath) == 0:
-                        print(f"🔍 Debug: Error: File is empty after save")
+                        log.warning(f"Error: File is empty after save")
                         return None
                     
                     return filepath
                 except Exception as save_error:
-                    print(f"🔍 Debug: Error saving audio file: {save_error}")
-                    import traceback
-                    print(f"🔍 Debug: Save error traceback: {traceback.format_exc()}")
+                    log.exception(f"Error saving audio file: {save_error}")
                     return None
             else:
                 # Play audio directly
@@ -336,7 +355,7 @@ class TTSHelper:
                     os.unlink(f.name)
                     
         except Exception as e:
-            print(f"⚠️ TTS error: {e}")
+            log.warning(f"TTS error: {e}")
     
     def _clean_text_for_tts(self, text):
         """Clean text for better TTS quality"""
@@ -380,10 +399,10 @@ class TTSHelper:
                 except (subprocess.CalledProcessError, FileNotFoundError):
                     continue
             
-            print("⚠️ No audio player found. Install afplay (macOS), mpg123, mpv, or vlc")
+            log.warning("No audio player found. Install afplay (macOS), mpg123, mpv, or vlc")
             
         except Exception as e:
-            print(f"⚠️ Audio playback error: {e}")
+            log.warning(f"Audio playback error: {e}")
 
 # Global TTS instance
 tts = TTSHelper()
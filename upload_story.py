@@ -1,108 +1,85 @@
 #!/usr/bin/env python3
 """
-Script to upload local story files to the database
+Upload local story files to the database (bulk, one transaction per batch).
+
+    python upload_story.py                                  # story_farm_romance.json
+    python upload_story.py stories/ extra_story.json --user <google id>
+    python upload_story.py --ndjson library.ndjson          # one story per line ('-' for stdin)
+
+Stories are validated in a process pool and upserted in batches (see story_import);
+the exit status is 1 if any item failed.
 """
 
 import os
-import json
 import sys
-from datetime import datetime
+import argparse
 
 # Add the current directory to Python path so we can import from web_app
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-try:
-    from web_app import app, db, Story, User, DATABASE_AVAILABLE
-    print("✅ Successfully imported database models")
-except ImportError as e:
-    print(f"❌ Failed to import database models: {e}")
-    sys.exit(1)
-
-def upload_story_to_database(story_filename, user_google_id="109988614139550624643"):
-    """Upload a local story file to the database"""
-    
-    if not DATABASE_AVAILABLE:
-        print("❌ Database not available")
-        return False
-    
-    if not os.path.exists(story_filename):
-        print(f"❌ Story file not found: {story_filename}")
-        return False
-    
-    try:
-        # Read the story file
-        with open(story_filename, 'r', encoding='utf-8') as f:
-            story_data = json.load(f)
-        
-        print(f"📖 Read story: {story_data.get('title', 'Unknown')}")
-        print(f"📝 Story ID: {story_data.get('story_id', 'Unknown')}")
-        
-        with app.app_context():
-            # Force recreate tables with correct schema
-            print("🔄 Recreating local database tables with correct schema...")
-            db.drop_all()
-            db.create_all()
-            print("✅ Local database tables recreated")
-            
-            # Check if story already exists
-            story_id = story_data.get('story_id', 'unknown')
-            existing_story = Story.query.filter_by(story_id=story_id, user_id=user_google_id).first()
-            
-            if existing_story:
-                print(f"⚠️ Story {story_id} already exists for user {user_google_id}")
-                print("Updating existing story...")
-                existing_story.content = story_data
-                existing_story.title = story_data.get('title', story_id)
-                existing_story.updated_at = datetime.utcnow()
-                db.session.commit()
-                print(f"✅ Updated story: {story_id}")
-            else:
-                # Create new story
-                new_story = Story(
-                    story_id=story_id,
-                    title=story_data.get('title', story_id),
-                    user_id=user_google_id,
-                    content=story_data,
-                    is_public=False,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                
-                db.session.add(new_story)
-                db.session.commit()
-                print(f"✅ Created new story: {story_id}")
-            
-            return True
-            
-    except Exception as e:
-        print(f"❌ Error uploading story: {e}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        return False
+from story_import import (StoryImporter, STORY_IMPORT_BATCH, STORY_IMPORT_WORKERS, iter_directory, iter_ndjson,
+                          parse_all, summarize)
+
+DEFAULT_STORY = "story_farm_romance.json"
+DEFAULT_USER = "109988614139550624643"
+
+
+def collect_items(paths, ndjson_path=None):
+    """(name, text) items from files, directories and an optional NDJSON file"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_directory(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield os.path.basename(path), f.read()
+    if ndjson_path == '-':
+        yield from iter_ndjson(sys.stdin)
+    elif ndjson_path:
+        with open(ndjson_path, 'r', encoding='utf-8') as f:
+            yield from iter_ndjson(f)
+
 
 def main():
-    """Main function"""
+    parser = argparse.ArgumentParser(description="Bulk-upload story JSON files to the database")
+    parser.add_argument('paths', nargs='*', help="Story files or directories of *.json stories")
+    parser.add_argument('--ndjson', help="NDJSON file with one story per line ('-' for stdin)")
+    parser.add_argument('--user', default=DEFAULT_USER, help="Google id that will own the stories")
+    parser.add_argument('--batch-size', type=int, default=STORY_IMPORT_BATCH)
+    parser.add_argument('--workers', type=int, default=STORY_IMPORT_WORKERS, help="Validation processes (0: per CPU)")
+    args = parser.parse_args()
+    paths = args.paths or ([] if args.ndjson else [DEFAULT_STORY])
+
     print("🚀 Story Upload Script")
     print("=" * 50)
-    
-    # Upload the farm romance story
-    story_file = "story_farm_romance.json"
-    user_id = "109988614139550624643"  # Your Google ID from the logs
-    
-    print(f"📁 Uploading: {story_file}")
-    print(f"👤 User ID: {user_id}")
+
+    try:
+        parsed = parse_all(collect_items(paths, args.ndjson), workers=args.workers)
+    except OSError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"📖 Read {len(parsed)} stories for user {args.user}")
+
+    try:
+        from web_app import app, db, Story, Scene, DATABASE_AVAILABLE, ensure_tables_exist
+    except ImportError as e:
+        print(f"❌ Failed to import database models: {e}")
+        return 1
+    if not DATABASE_AVAILABLE or not ensure_tables_exist():
+        print("❌ Database not available")
+        return 1
+
+    with app.app_context():
+        results = StoryImporter(db, Story, Scene, batch_size=args.batch_size).run(parsed, args.user)
+
+    for result in results:
+        icon = '✅' if result['status'] in ('created', 'updated') else '❌'
+        detail = f" - {'; '.join(result['errors'])}" if result['errors'] else ''
+        print(f"{icon} {result['item']}: {result['story_id'] or '?'} {result['status']}{detail}")
+    counts = summarize(results)
     print()
-    
-    success = upload_story_to_database(story_file, user_id)
-    
-    if success:
-        print()
-        print("🎉 Story upload completed successfully!")
-        print("You can now test /loadstory Farm_romance on Render")
-    else:
-        print()
-        print("❌ Story upload failed")
-        sys.exit(1)
+    print("📊 " + ", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+    return 0 if not (counts.get('invalid') or counts.get('error')) else 1
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timedelta
+
+from log_helper import get_logger
+
+log = get_logger('usage')
+
+# Token usage ledger (all optional):
+#   USAGE_LEDGER               = 1      0 stops recording per-call usage to the database
+#   USAGE_FLUSH_SECONDS        = 5      calls are collected this long and written in one transaction ...
+#   USAGE_BATCH_SIZE           = 200    ... or as soon as this many are waiting
+#   USAGE_EVENT_RETENTION_DAYS = 30     per-call rows older than this are pruned; daily rollups are kept
+USAGE_LEDGER = os.getenv('USAGE_LEDGER', '1').lower() in ('1', 'true', 'yes')
+USAGE_FLUSH_SECONDS = float(os.getenv('USAGE_FLUSH_SECONDS', '5'))
+USAGE_BATCH_SIZE = int(os.getenv('USAGE_BATCH_SIZE', '200'))
+USAGE_EVENT_RETENTION_DAYS = int(os.getenv('USAGE_EVENT_RETENTION_DAYS', '30'))
+USAGE_QUEUE_SIZE = 10000
+PRUNE_INTERVAL_SECONDS = 3600
+
+ROLLUP_KEY = ('day', 'user_id', 'story_id', 'stage', 'model')
+ROLLUP_SUMS = ('calls', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'latency_ms')
+
+
+def _tokens(value):
+    return int(value) if isinstance(value, (int, float)) and value > 0 else 0
+
+
+def usage_event(user_id, story_id, stage, model, usage, seconds, finish_reason=None, created_at=None):
+    """One call's ledger row from a chat completion's usage dict"""
+    usage = usage if isinstance(usage, dict) else {}
+    details = usage.get('prompt_tokens_details')
+    return {
+        'created_at': created_at or datetime.utcnow(),
+        'user_id': str(user_id or 'system')[:120],
+        'story_id': str(story_id or '')[:80],
+        'stage': str(stage or 'other')[:40],
+        'model': str(model or 'unknown')[:80],
+        'prompt_tokens': _tokens(usage.get('prompt_tokens')),
+        'completion_tokens': _tokens(usage.get('completion_tokens')),
+        'cached_tokens': _tokens(details.get('cached_tokens')) if isinstance(details, dict) else 0,
+        'latency_ms': int(round(max(0.0, seconds) * 1000)),
+        'finish_reason': str(finish_reason or 'unknown')[:20],
+    }
+
+
+def rollup(events):
+    """Sum events per (day, user, story, stage, model): {key tuple: {calls, prompt_tokens, ...}}"""
+    totals = {}
+    for event in events:
+        key = (event['created_at'].date(),) + tuple(event[k] for k in ROLLUP_KEY[1:])
+        sums = totals.setdefault(key, dict.fromkeys(ROLLUP_SUMS, 0))
+        sums['calls'] += 1
+        for column in ROLLUP_SUMS[1:]:
+            sums[column] += event[column]
+    return totals
+
+
+class ModelSink:
+    """Writes a batch as per-call rows plus increments to the daily rollup rows, in one transaction"""
+
+    def __init__(self, app, db, event_model, daily_model, retention_days=USAGE_EVENT_RETENTION_DAYS):
+        self.app = app
+        self.db = db
+        self.event_model = event_model
+        self.daily_model = daily_model
+        self.retention_days = retention_days
+        self._pruned_at = 0.0
+
+    def write(self, events):
+        with self.app.app_context():
+            try:
+                self._write(events)
+            except Exception:
+                # Most likely another worker inserted the same rollup row first; the retry's UPDATE finds it
+                self.db.session.rollback()
+                self._write(events)
+            self._maybe_prune()
+
+    def _write(self, events):
+        session = self.db.session
+        try:
+            session.add_all([self.event_model(**event) for event in events])
+            for key, sums in rollup(events).items():
+                self._increment(session, dict(zip(ROLLUP_KEY, key)), sums)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    def _increment(self, session, key, sums):
+        """Add to a rollup row in the database (column = column + n), so concurrent workers never lose counts"""
+        table = self.daily_model.__table__
+        values = {column: self.db.func.coalesce(table.c[column], 0) + value for column, value in sums.items()}
+        updated = session.execute(table.update().where(*(table.c[k] == v for k, v in key.items())).values(values))
+        if not updated.rowcount:
+            session.execute(table.insert().values(**key, **sums))
+
+    def _maybe_prune(self):
+        if not self.retention_days or time.monotonic() - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        try:
+            deleted = self.db.session.query(self.event_model).filter(self.event_model.created_at < cutoff).delete()
+            self.db.session.commit()
+            if deleted:
+                log.info(f"Pruned {deleted} usage events older than {self.retention_days} days")
+        except Exception as e:
+            self.db.session.rollback()
+            log.warning(f"Usage event pruning failed: {e}")
+
+
+class UsageLedger:
+    """Per-call token usage, written to a sink in batches by a background thread.
+
+    record() only enqueues, so request threads never wait on the database. The writer
+    collects events for flush_interval seconds (or batch_size events) and hands them to
+    sink.write() in one call. A failed write is logged and its events dropped: the
+    ledger is accounting, not the source of truth for anything the user sees.
+    """
+
+    def __init__(self, sink=None, enabled=USAGE_LEDGER, flush_interval=USAGE_FLUSH_SECONDS,
+                 batch_size=USAGE_BATCH_SIZE):
+        self.sink = sink
+        self.enabled = enabled and sink is not None
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.dropped = 0
+        self.stats = {'recorded': 0, 'written': 0, 'batches': 0, 'errors': 0}
+        self._queue = queue.Queue(maxsize=USAGE_QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def record(self, event):
+        """Queue one usage_event(); never blocks the caller"""
+        if not self.enabled:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(event)
+            self.stats['recorded'] += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far has been written"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='usage-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush, 2.0)
+
+    def _next_batch(self):
+        """Block for the first item, then collect until the window closes, the batch is full or a flush waits"""
+        batch, waiters = [], []
+        item = self._queue.get()
+        window_ends = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                break
+            batch.append(item)
+            remaining = window_ends - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch, waiters
+
+    def _run(self):
+        while True:
+            batch, waiters = self._next_batch()
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        try:
+            self.sink.write(batch)
+            self.stats['batches'] += 1
+            self.stats['written'] += len(batch)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.dropped += len(batch)
+            log.warning(f"Usage ledger write failed: {e}", events=len(batch))
+
+
+# Global ledger; the web app configures the database sink once its models exist
+ledger = UsageLedger()
+
+
+def configure(sink):
+    global ledger
+    ledger = UsageLedger(sink)
+    return ledger
@@ -8,35 +8,62 @@ import signal
 import atexit
 import threading
 import time
+from startup_timing import StartupTimer
+startup = StartupTimer('web_app')  # started before the heavy imports below
 import hashlib
+import base64
+import importlib.util
 import secrets
-from flask import Flask, render_template, request, jsonify, session, send_from_directory, redirect, url_for
-from grok_remote import chat_with_grok
-from story_state_manager import StoryStateManager
+import uuid
+from flask import Flask, render_template, request, jsonify, session, send_from_directory, redirect, url_for, g, Response, stream_with_context, has_request_context
+from grok_remote import chat_with_grok, add_usage_listener
+from resilience import CircuitOpenError
+import model_routing
+import story_state_manager
+from story_state_manager import StoryStateManager, SCENE_STATE_TRACKING
+import scene_state_store
+import usage_ledger
+import continuity_ledger
+from conversation_journal import ConversationJournal
+from streaming_export import banner, chunked, file_pieces, json_pieces, ndjson
+from story_import import StoryImporter, iter_ndjson, parse_all, summarize
+from opener_catalog import opener_catalog
+from admission import admission, Rejected as AdmissionRejected
+from scene_fingerprint import SceneFingerprint
+from rehash_scorer import REHASH_GATE, extract_features, heuristic_decision, load_scorer
 from tts_helper import tts
+from shared_state import shared_state
+from audit_log import AuditLog
+import profiling
+from metrics import (REGISTRY, CONTENT_TYPE, CHAT_STAGE_SECONDS, HTTP_REQUEST_SECONDS, QUEUE_DEPTH, STARTUP_SECONDS,
+                     stage_timer, timed_stage, record_tokens, metrics_token_ok)
+from log_helper import get_logger, set_debug_override, reset_debug_override, bind_request_fields, reset_request_fields
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 import json as _json
 
+log = get_logger('web')
+chat_log = get_logger('chat')
+
 # Try to import database packages, but don't fail if they're not available
 try:
     from flask_sqlalchemy import SQLAlchemy
-    from flask_migrate import Migrate
     DATABASE_AVAILABLE = True
 except ImportError as e:
-    print(f"⚠️ Database packages not available: {e}")
+    log.warning(f"Database packages not available: {e}")
     DATABASE_AVAILABLE = False
     SQLAlchemy = None
-    Migrate = None
 
-# Try to import OAuth packages
-try:
-    from authlib.integrations.flask_client import OAuth
-    OAUTH_AVAILABLE = True
-except ImportError as e:
-    print(f"⚠️ OAuth packages not available: {e}")
-    OAUTH_AVAILABLE = False
-    OAuth = None
+# authlib is only imported on first login (see get_google)
+OAUTH_AVAILABLE = importlib.util.find_spec('authlib') is not None
+if not OAUTH_AVAILABLE:
+    log.warning("OAuth packages not available: authlib not installed")
+
+def _running_db_cli():
+    """True under `flask db ...` (or when flask_migrate was imported to drive migrations)"""
+    return 'flask_migrate' in sys.modules or (os.path.basename(sys.argv[0]) == 'flask' and 'db' in sys.argv[1:])
+
+startup.mark('imports')
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "grok-playground-secret-key")
@@ -55,16 +82,11 @@ def _safe_preview(text, limit=120):
     t = _safe_text(text)
     return t if len(t) <= limit else (t[:limit] + '…')
 
+audit = AuditLog(AUDIT_PATH, enabled=DEBUG_AUDIT)
+
 def _audit_write(entry: dict):
-    if not DEBUG_AUDIT:
-        return
-    try:
-        entry['ts'] = datetime.utcnow().isoformat()
-        os.makedirs(os.path.dirname(AUDIT_PATH), exist_ok=True)
-        with open(AUDIT_PATH, 'a', encoding='utf-8') as f:
-            f.write(_json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        print(f"🔍 Debug: audit write failed: {e}")
+    """Queue an audit event; the batching writer thread puts it on disk"""
+    audit.write(entry)
 
 # Database configuration (only if database packages are available)
 if DATABASE_AVAILABLE:
@@ -88,84 +110,73 @@ if DATABASE_AVAILABLE:
         'max_overflow': 0,      # Don't allow overflow connections
     }
 
-    # Initialize database
+    # Initialize database. No connection or DDL happens here: the schema is owned by
+    # migrations/ (flask db upgrade) and checked lazily by ensure_tables_exist().
     db = SQLAlchemy(app)
-    migrate = Migrate(app, db)
-    print("✅ Database initialized successfully")
-    
-    # Initialize database tables immediately
-    try:
-        with app.app_context():
-            # Test database connection first
-            from sqlalchemy import text
-            with db.engine.connect() as conn:
-                conn.execute(text('SELECT 1'))
-            print("✅ Database connection test successful")
-            
-            # Force recreate tables to ensure correct schema
-            print("🔄 Recreating database tables with correct schema...")
-            db.drop_all()
-            db.create_all()
-            print("✅ Database tables recreated successfully")
-            # Force connection refresh to ensure new schema is used
-            db.engine.dispose()
-            
-            # Verify tables exist and check schema
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            print(f"✅ Database tables verified: {tables}")
-            
-            # Check the actual schema of the stories table
-            if 'stories' in tables:
-                columns = inspector.get_columns('stories')
-                for col in columns:
-                    if col['name'] == 'user_id':
-                        print(f"✅ Stories.user_id column type: {col['type']}")
-                        break
-            
-            # Check if scenes table exists
-            if 'scenes' in tables:
-                print("✅ Scenes table exists")
-            else:
-                print("⚠️ Scenes table missing - will be created on next request")
-            
-    except Exception as e:
-        print(f"❌ Database table creation failed: {e}")
-        import traceback
-        print(f"Database error traceback: {traceback.format_exc()}")
+    # Flask-Migrate pulls in alembic (~170ms); the server never needs it, only `flask db`
+    if _running_db_cli():
+        from flask_migrate import Migrate
+        migrate = Migrate(app, db)
+    else:
+        migrate = None
+    log.info("Database initialized successfully")
 else:
-    print("⚠️ Database not available - running without database features")
+    log.warning("Database not available - running without database features")
     db = None
     migrate = None
 
+# Schema handling on first database use:
+#   migrate - schema is managed by `flask db upgrade` (release step); the app never runs DDL
+#   create  - create missing tables (non-destructive); default for the local SQLite fallback
+#   reset   - drop and recreate every table once per process (destroys data; local debugging only)
+STARTUP_SCHEMA_MODE = os.getenv('STARTUP_SCHEMA_MODE', 'migrate' if os.getenv('DATABASE_URL') else 'create').lower()
+
+startup.mark('database')
+
 # OAuth configuration (only if OAuth packages are available)
-if OAUTH_AVAILABLE:
-    # Google OAuth configuration
-    GOOGLE_CLIENT_ID = os.getenv('GOOGLE_OAUTH_CLIENT_ID')
-    GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
-    
-    if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
-        # Create OAuth client
-        oauth = OAuth(app)
-        google = oauth.register(
-            name='google',
-            client_id=GOOGLE_CLIENT_ID,
-            client_secret=GOOGLE_CLIENT_SECRET,
-            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-            client_kwargs={
-                'scope': 'openid email profile'
-            }
-        )
-        print("✅ Google OAuth configured successfully")
-    else:
-        print("⚠️ Google OAuth credentials not found in environment variables")
-        oauth = None
-        google = None
-else:
-    print("⚠️ OAuth not available - running without authentication features")
-    oauth = None
-    google = None
+GOOGLE_CLIENT_ID = os.getenv('GOOGLE_OAUTH_CLIENT_ID')
+GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
+GOOGLE_OAUTH_CONFIGURED = OAUTH_AVAILABLE and bool(GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET)
+_google_client = None
+_google_lock = threading.Lock()
+
+def get_google():
+    """Google OAuth client, registered on first login rather than at import"""
+    global _google_client
+    if _google_client is None and GOOGLE_OAUTH_CONFIGURED:
+        with _google_lock:
+            if _google_client is None:
+                from authlib.integrations.flask_client import OAuth
+                oauth = OAuth(app)
+                _google_client = oauth.register(
+                    name='google',
+                    client_id=GOOGLE_CLIENT_ID,
+                    client_secret=GOOGLE_CLIENT_SECRET,
+                    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+                    client_kwargs={
+                        'scope': 'openid email profile'
+                    }
+                )
+                log.info("Google OAuth configured successfully")
+    return _google_client
+
+if not OAUTH_AVAILABLE:
+    log.warning("OAuth not available - running without authentication features")
+elif not GOOGLE_OAUTH_CONFIGURED:
+    log.warning("Google OAuth credentials not found in environment variables")
+
+startup.mark('oauth')
+
+def story_summary(content):
+    """Catalog columns derived from a story's content (kept on the row so listings skip the JSON)"""
+    content = content if isinstance(content, dict) else {}
+    characters = content.get('characters')
+    return {
+        'character_count': len(characters) if isinstance(characters, (dict, list)) else 0,
+        'story_type': str(content.get('story_type') or 'Unknown')[:80],
+        'maturity_level': str(content.get('maturity_level') or 'unknown')[:40],
+        'content_size': len(json.dumps(content, ensure_ascii=False).encode('utf-8')),
+    }
 
 # Database Models (only if database is available)
 if DATABASE_AVAILABLE:
@@ -197,6 +208,21 @@ if DATABASE_AVAILABLE:
         is_public = db.Column(db.Boolean, default=False)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+        # Summary of content for the catalog, maintained whenever content is assigned
+        character_count = db.Column(db.Integer, default=0)
+        story_type = db.Column(db.String(80))
+        maturity_level = db.Column(db.String(40))
+        content_size = db.Column(db.Integer, default=0)  # bytes of content JSON
+        
+        __table_args__ = (
+            db.Index('ix_stories_user_updated', 'user_id', 'updated_at', 'id'),
+        )
+        
+        @db.validates('content')
+        def _summarize_content(self, key, content):
+            for column, value in story_summary(content).items():
+                setattr(self, column, value)
+            return content
 
     class Scene(db.Model):
         """Scene model for storing story scenes linked to stories"""
@@ -213,8 +239,66 @@ if DATABASE_AVAILABLE:
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
         
+        # Scene listing: per user, case-insensitive story, newest first (keyset pages)
+        __table_args__ = (
+            db.Index('ix_scenes_user_story_updated', 'user_id', db.text('lower(story_id)'), 'updated_at', 'id'),
+        )
+        
         def __repr__(self):
             return f'<Scene {self.title} ({self.story_id})>'
+
+    class SceneState(db.Model):
+        """Tracked scene state per user/story/scene, written in batches by scene_state_store"""
+        __tablename__ = 'scene_states'
+        
+        key = db.Column(db.String(400), primary_key=True)  # scene_state_key(user, story, scene)
+        user_id = db.Column(db.String(120), nullable=False, index=True)
+        story_id = db.Column(db.String(80))
+        scene_id = db.Column(db.String(40))
+        state = db.Column(db.JSON, nullable=False)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    class UsageEvent(db.Model):
+        """One model call's token usage and latency, written in batches by usage_ledger"""
+        __tablename__ = 'usage_events'
+        
+        id = db.Column(db.Integer, primary_key=True)
+        created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+        user_id = db.Column(db.String(120), nullable=False)  # Google ID, or 'system' outside requests
+        story_id = db.Column(db.String(80), nullable=False, default='')
+        stage = db.Column(db.String(40), nullable=False)  # model_routing call class
+        model = db.Column(db.String(80), nullable=False)
+        prompt_tokens = db.Column(db.Integer, default=0)
+        completion_tokens = db.Column(db.Integer, default=0)
+        cached_tokens = db.Column(db.Integer, default=0)
+        latency_ms = db.Column(db.Integer, default=0)
+        finish_reason = db.Column(db.String(20))
+        
+        __table_args__ = (
+            db.Index('ix_usage_events_user_created', 'user_id', 'created_at'),
+            db.Index('ix_usage_events_created', 'created_at'),
+        )
+
+    class UsageDaily(db.Model):
+        """Daily usage totals per user/story/stage/model, maintained with each ledger batch"""
+        __tablename__ = 'usage_daily'
+        
+        id = db.Column(db.Integer, primary_key=True)
+        day = db.Column(db.Date, nullable=False)
+        user_id = db.Column(db.String(120), nullable=False)
+        story_id = db.Column(db.String(80), nullable=False, default='')
+        stage = db.Column(db.String(40), nullable=False)
+        model = db.Column(db.String(80), nullable=False)
+        calls = db.Column(db.Integer, default=0)
+        prompt_tokens = db.Column(db.BigInteger, default=0)
+        completion_tokens = db.Column(db.BigInteger, default=0)
+        cached_tokens = db.Column(db.BigInteger, default=0)
+        latency_ms = db.Column(db.BigInteger, default=0)
+        
+        __table_args__ = (
+            db.UniqueConstraint('day', 'user_id', 'story_id', 'stage', 'model', name='uq_usage_daily_key'),
+            db.Index('ix_usage_daily_user_day', 'user_id', 'day'),
+        )
 else:
     # Dummy classes when database is not available
     class User:
@@ -223,14 +307,50 @@ else:
         pass
     class Scene:
         pass
+    class SceneState:
+        pass
+    class UsageEvent:
+        pass
+    class UsageDaily:
+        pass
+
+# Scene state is cached in memory and flushed to the database in batches
+if DATABASE_AVAILABLE and scene_state_store.SCENE_STATE_BACKEND in ('auto', 'db'):
+    scene_state_store.configure(scene_state_store.ModelBackend(app, db, SceneState))
+
+# Per-call token usage is queued and written to usage_events/usage_daily in batches
+if DATABASE_AVAILABLE and usage_ledger.USAGE_LEDGER:
+    usage_ledger.configure(usage_ledger.ModelSink(app, db, UsageEvent, UsageDaily))
+
+startup.mark('models')
 
-# Request deduplication tracking
-active_requests = {}  # Track active requests to prevent duplicates
-tts_generation_tracker = {}  # Track TTS generations to prevent duplicates
+# Coordination state (request dedup, TTS jobs, debug payloads, story points) lives in
+# shared_state so it stays consistent across gunicorn workers when SHARED_STATE_URL is set.
+REQUEST_DEDUP_TTL = 30       # seconds a request ID counts as in flight
+AI_PAYLOAD_TTL = 24 * 3600   # keep debug payloads for a day
 
-# Debug payload storage
-last_ai_payloads = {}  # Store last AI payloads for debugging
-story_points_cache = {}  # Store story points for incremental updates
+def _payload_key(google_id, exchange_type=''):
+    return f"payloads:{google_id}:{exchange_type}"
+
+def iter_ai_payloads(google_id):
+    """Yield (exchange_type, payload_data) for a user's last AI exchanges, loading one at a time"""
+    for key in shared_state.keys(_payload_key(google_id)):
+        data = shared_state.get_json(key)
+        if data is not None:
+            yield key.rsplit(':', 1)[-1], data
+
+def get_ai_payloads(google_id):
+    """Return {exchange_type: payload_data} for a user's last AI exchanges"""
+    return dict(iter_ai_payloads(google_id))
+
+def update_ai_payload(google_id, exchange_type, **fields):
+    """Patch fields of an already stored payload (e.g. attach the final reply)"""
+    key = _payload_key(google_id, exchange_type)
+    data = shared_state.get_json(key)
+    if data is None:
+        return
+    data.update(fields)
+    shared_state.set_json(key, data, ttl=AI_PAYLOAD_TTL)
 
 def store_ai_payload(exchange_type, payload, response=None, usage=None, finish_reason=None):
     """Store AI payload for debugging"""
@@ -239,63 +359,105 @@ def store_ai_payload(exchange_type, payload, response=None, usage=None, finish_r
         if not google_id:
             return
 
-        if google_id not in last_ai_payloads:
-            last_ai_payloads[google_id] = {}
-
         # Handle both string responses and dict responses with usage info
         response_text = response
         if isinstance(response, dict):
             response_text = response.get('text', str(response))
             usage = response.get('usage', usage)
             finish_reason = response.get('finish_reason', finish_reason)
+        record_tokens(usage, exchange_type=exchange_type)
+        if isinstance(usage, dict):
+            charge_admission(usage.get('total_tokens') or
+                             (usage.get('prompt_tokens') or 0) + (usage.get('completion_tokens') or 0))
 
-        last_ai_payloads[google_id][exchange_type] = {
+        shared_state.set_json(_payload_key(google_id, exchange_type), {
             'payload': payload,
             'response': response_text,
             'usage': usage or {},
             'finish_reason': finish_reason or 'unknown',
             'timestamp': datetime.utcnow().isoformat(),
             'payload_size': len(str(payload))
-        }
+        }, ttl=AI_PAYLOAD_TTL)
 
-        print(f"🔍 Debug: Stored {exchange_type} payload for user {google_id}")
+        log.debug(f"Stored {exchange_type} payload for user {google_id}")
     except Exception as e:
-        print(f"🔍 Debug: Error storing AI payload: {e}")
+        log.warning(f"Error storing AI payload: {e}")
+
+story_state_manager.payload_recorder = store_ai_payload
 
 def get_story_points(google_id):
     """Get existing story points for incremental updates"""
-    return story_points_cache.get(google_id, [])
+    return shared_state.get_json(f"story_points:{google_id}", [])
 
 def update_story_points(google_id, new_story_points):
     """Update story points cache with new points"""
-    story_points_cache[google_id] = new_story_points
-    print(f"🔍 Debug: Updated story points cache for user {google_id} with {len(new_story_points)} points")
+    shared_state.set_json(f"story_points:{google_id}", new_story_points)
+    log.debug(f"Updated story points cache for user {google_id} with {len(new_story_points)} points")
 
 # === Continuity helpers (lightweight ledger, preflight, cutoff handling, critic) ===
 
+# Ledger phrases worth remembering per reply (the ledger keeps no reply text, see continuity_ledger)
+RESTATE_KEYWORDS = (
+    'naked', 'bikini', 'sun-warmed cushion', 'pontoon', 'lake', 'south dakota',
+    'gorgeous pink nipples', 'landing strip', 'long inner labia', 'narrow ass',
+    'breeze', 'warmth', 'cabin'
+)
+NAKED_PATTERNS = ('already naked', 'completely naked', 'totally naked', 'she is naked', 'nothing on')
+BIKINI_REMOVED_PHRASES = (
+    'removed her bikini', 'took off her bikini', 'took her bikini off', 'slid her bikini off',
+    'untied her bikini', 'kicked her bikini aside', 'bikini top fell', 'bikini bottoms off'
+)
+LEDGER_FACT_PHRASES = RESTATE_KEYWORDS + NAKED_PATTERNS + BIKINI_REMOVED_PHRASES
+
+ledger_store = continuity_ledger.LedgerStore(shared_state)
+
 def get_continuity_ledger():
-    """Return a per-session continuity ledger stored in Flask session (JSON-serializable)."""
+    """Return the scene's continuity ledger (server-side; the session only holds its scene key).
+
+    Loaded once per request and cached on g, so every consumer reads the same object.
+    """
     try:
-        ledger = session.get('continuity_ledger')
-        if not ledger:
-            ledger = {
-                'scene_step': 0,
-                'summaries': [],            # short bullet summaries per step
-                'anchor_tail': '',          # last ~400 chars of prior assistant reply
-                'ban_phrases': [],          # phrases to avoid repeating verbatim
-                'last_two_replies': []      # lowercased bodies of last 2 assistant replies
-            }
-            session['continuity_ledger'] = ledger
+        ledger = g.get('continuity_ledger')
+        if ledger is not None:
+            return ledger
+        legacy = session.pop('continuity_ledger', None)
+        ledger = ledger_store.load(session.get('ledger_key'))
+        if ledger is None:
+            ledger = continuity_ledger.from_legacy(legacy, LEDGER_FACT_PHRASES) if legacy else continuity_ledger.new_ledger()
+            ledger_store.save(ledger)
+            session['ledger_key'] = ledger['scene_key']
+        g.continuity_ledger = ledger
         return ledger
     except Exception:
-        # Fallback to stateless ledger if session access fails
-        return {
-            'scene_step': 0,
-            'summaries': [],
-            'anchor_tail': '',
-            'ban_phrases': [],
-            'last_two_replies': []
-        }
+        # Fallback to a stateless ledger outside a request (or if shared_state fails)
+        return continuity_ledger.new_ledger()
+
+def reset_continuity_ledger():
+    """Start a new scene: drop the stored ledger and its key"""
+    ledger_store.delete(session.pop('ledger_key', None))
+    session.pop('continuity_ledger', None)
+    g.pop('continuity_ledger', None)
+
+# Whole-scene repetition index (scene_fingerprint), kept in shared_state per ledger scene
+FINGERPRINT_TTL = 7 * 24 * 3600
+FINGERPRINT_REPEAT_THRESHOLD = float(os.getenv('FINGERPRINT_REPEAT_THRESHOLD', '0.35'))
+FINGERPRINT_NEAR_DUPLICATE = float(os.getenv('FINGERPRINT_NEAR_DUPLICATE', '0.92'))
+
+# Gates the critic rewrite (see rehash_scorer; REHASH_GATE=shadow only logs the score)
+rehash_model = load_scorer()
+
+def load_scene_fingerprint(ledger):
+    """Fingerprint index for the ledger's scene (empty if none yet)"""
+    data = shared_state.get_json(f"fingerprint:{ledger.get('scene_key', '-')}")
+    if data:
+        try:
+            return SceneFingerprint.from_dict(data)
+        except Exception as e:
+            log.debug(f"Discarding unreadable scene fingerprint: {e}")
+    return SceneFingerprint()
+
+def save_scene_fingerprint(ledger, fingerprint):
+    shared_state.set_json(f"fingerprint:{ledger.get('scene_key', '-')}", fingerprint.to_dict(), ttl=FINGERPRINT_TTL)
 
 def _safe_text(text):
     return (text or '').strip()
@@ -375,7 +537,7 @@ def build_prompt_from_ledger(ledger):
         parts.append("If you must refer back, keep it in 1 short clause and then advance.")
         return '\n'.join(parts)
     except Exception as e:
-        print(f"🔍 Debug: build_prompt_from_ledger error: {e}")
+        log.warning(f"build_prompt_from_ledger error: {e}")
         return ""
 
 def _looks_cutoff(reply):
@@ -392,7 +554,8 @@ def _looks_cutoff(reply):
     ]
     return any(tail.endswith(t) for t in incomplete_tails)
 
-def auto_complete_if_cutoff(context_messages, reply, finish_reason, model, temperature):
+@timed_stage('auto_complete')
+def auto_complete_if_cutoff(context_messages, reply, finish_reason, temperature):
     """If reply is cut off or looks incomplete, ask model to continue exactly where it left off."""
     try:
         if finish_reason == 'length' or _looks_cutoff(reply):
@@ -404,15 +567,18 @@ def auto_complete_if_cutoff(context_messages, reply, finish_reason, model, tempe
             continuation_messages.append({"role": "assistant", "content": reply})
             continuation_messages.append({"role": "system", "content": continuation_instruction})
 
+            route = model_route('continuation')
             cont_response = chat_with_grok(
                 continuation_messages,
-                model=model,
+                model=route.model,
                 temperature=temperature,
-                max_tokens=400,
+                max_tokens=route.limit(400),
                 top_p=0.8,
                 hide_thinking=True,
                 return_usage=True,
-                stop=["\n\n\n", "---", "***", "END OF SCENE"]
+                stop=["\n\n\n", "---", "***", "END OF SCENE"],
+                timeout=route.timeout,
+                call_class='continuation'
             )
 
             if isinstance(cont_response, dict):
@@ -430,32 +596,38 @@ def auto_complete_if_cutoff(context_messages, reply, finish_reason, model, tempe
             return new_reply, True
         return reply, False
     except Exception as e:
-        print(f"🔍 Debug: auto_complete_if_cutoff error: {e}")
+        log.warning(f"auto_complete_if_cutoff error: {e}")
         return reply, False
 
-def continuity_critic(context_messages, reply, ledger, model, temperature):
+@timed_stage('continuity_critic')
+def continuity_critic(context_messages, reply, ledger, temperature):
     """Detect obvious rehash; if detected, request a single corrective rewrite that advances the scene."""
     try:
-        anchor_tail = ledger.get('anchor_tail', '').lower()
-        last_two = ' '.join(ledger.get('last_two_replies', [])).lower()
-        reply_lc = (reply or '').lower()
-
-        # n-gram overlap heuristic
-        prev_ngrams = set(_extract_ngrams(last_two, n=3, max_phrases=32))
-        curr_ngrams = set(_extract_ngrams(reply_lc, n=3, max_phrases=32))
-        overlap = len(prev_ngrams & curr_ngrams)
-
-        rehash_detected = False
-        if anchor_tail and anchor_tail[:120] in reply_lc:
-            rehash_detected = True
-        if overlap >= 4:
-            rehash_detected = True
-
-        # Clothing redo: if already naked and reply contains undressing
-        already_naked = ('already naked' in anchor_tail) or ('naked' in last_two)
-        clothing_redo = any(k in reply_lc for k in ['remove her bikini', 'sliding the fabric', 'tugs at the strings', 'peeling the bikini', 'kicking them aside'])
-        if already_naked and clothing_redo:
-            rehash_detected = True
+        # Local features: last-two overlap, recap at the start, whole-scene repetition
+        # (fingerprint index), established-state keywords, clothing redo
+        features = extract_features(
+            reply,
+            continuity_ledger.previous_shingles(ledger),
+            ledger.get('anchor_tail', ''),
+            load_scene_fingerprint(ledger) if ledger.get('scene_key') else None,
+            _extract_do_not_restate_keywords(ledger),
+            continuity_ledger.established_facts(ledger),
+        )
+        heuristic = heuristic_decision(features, FINGERPRINT_REPEAT_THRESHOLD, FINGERPRINT_NEAR_DUPLICATE)
+        score = rehash_model.score(features)
+        rehash_detected = score >= rehash_model.threshold if REHASH_GATE == 'model' else heuristic
+        chat_log.debug(f"Rehash check: score={score:.2f} heuristic={heuristic} gate={REHASH_GATE} revise={rehash_detected}")
+        _audit_write({
+            'event': 'rehash_check',
+            'request_id': g.get('request_id'),
+            'gate': REHASH_GATE,
+            'features': {k: round(v, 4) for k, v in features.items()},
+            'score': round(score, 4),
+            'heuristic': heuristic,
+            'revise': rehash_detected,
+            'reply': (reply or '')[:4000],
+            'previous_tail': ledger.get('anchor_tail', ''),
+        })
 
         if not rehash_detected:
             return reply, False
@@ -477,15 +649,18 @@ def continuity_critic(context_messages, reply, ledger, model, temperature):
         critic_messages.append({"role": "assistant", "content": reply})
         critic_messages.append({"role": "system", "content": critic_instruction})
 
+        route = model_route('critic')
         critic_response = chat_with_grok(
             critic_messages,
-            model=model,
+            model=route.model,
             temperature=temperature,
-            max_tokens=min(800, session.get('max_tokens', 1500)),
+            max_tokens=route.limit(session.get('max_tokens', 1500)),
             top_p=0.8,
             hide_thinking=True,
             return_usage=True,
-            stop=["\n\n\n", "---", "***", "END OF SCENE"]
+            stop=["\n\n\n", "---", "***", "END OF SCENE"],
+            timeout=route.timeout,
+            call_class='critic'
         )
 
         if isinstance(critic_response, dict):
@@ -502,7 +677,7 @@ def continuity_critic(context_messages, reply, ledger, model, temperature):
             return revised, True
         return reply, False
     except Exception as e:
-        print(f"🔍 Debug: continuity_critic error: {e}")
+        log.warning(f"continuity_critic error: {e}")
         return reply, False
 
 def update_ledger_after_reply(ledger, reply):
@@ -510,50 +685,35 @@ def update_ledger_after_reply(ledger, reply):
     try:
         # Skip ledger updates for fallback/system errors
         if (reply or '').startswith("I'm having trouble connecting right now."):
-            print("🔍 Debug: Skipping ledger update for fallback reply")
+            log.debug("Skipping ledger update for fallback reply")
             return
         reply = _safe_text(reply)
-        ledger['scene_step'] = int(ledger.get('scene_step', 0)) + 1
 
         # Cheap summary: first sentence trimmed
         sentences = _split_sentences(reply)
-        if sentences:
-            summary = sentences[0]
-            if len(summary) > 140:
-                summary = summary[:137] + '...'
-            summaries = ledger.get('summaries', [])
-            summaries.append(summary)
-            ledger['summaries'] = summaries[-12:]
-
-        # Anchor tail is last 400 chars
-        ledger['anchor_tail'] = reply[-400:]
-
-        # Ban phrases from this reply
-        ban_list = ledger.get('ban_phrases', [])
-        ban_list = (ban_list + _extract_ban_phrases_from_reply(reply))[:12]
-        ledger['ban_phrases'] = ban_list
-
-        # Maintain last two replies (lowercased)
-        last_two = ledger.get('last_two_replies', [])
-        last_two.append(reply.lower())
-        ledger['last_two_replies'] = last_two[-2:]
-
-        session['continuity_ledger'] = ledger
+        summary = sentences[0] if sentences else None
+        if summary and len(summary) > 140:
+            summary = summary[:137] + '...'
+
+        continuity_ledger.record_reply(ledger, reply, summary, _extract_ban_phrases_from_reply(reply),
+                                       LEDGER_FACT_PHRASES)
+
+        # Add the reply to the scene's fingerprint index
+        if ledger.get('scene_key'):
+            fingerprint = load_scene_fingerprint(ledger)
+            fingerprint.add(reply)
+            save_scene_fingerprint(ledger, fingerprint)
+
+        ledger_store.save(ledger)
+        session['ledger_key'] = ledger['scene_key']
     except Exception as e:
-        print(f"🔍 Debug: update_ledger_after_reply error: {e}")
+        log.warning(f"update_ledger_after_reply error: {e}")
     
 def _extract_do_not_restate_keywords(ledger):
     """Return short keywords that we don't want re-described every turn."""
-    baseline_tokens = [
-        'naked', 'bikini', 'sun-warmed cushion', 'pontoon', 'lake', 'south dakota',
-        'gorgeous pink nipples', 'landing strip', 'long inner labia', 'narrow ass',
-        'breeze', 'warmth', 'cabin'
-    ]
-    combined = (ledger.get('anchor_tail', '') + ' ' + ' '.join(ledger.get('last_two_replies', []))).lower()
-    present = []
-    for tok in baseline_tokens:
-        if tok in combined:
-            present.append(tok)
+    facts = continuity_ledger.established_facts(ledger)
+    anchor = ledger.get('anchor_tail', '').lower()
+    present = [tok for tok in RESTATE_KEYWORDS if tok in facts or tok in anchor]
     # Return up to 8 for brevity
     return present[:8]
 
@@ -621,7 +781,7 @@ def build_event_focus_from_last_user(history_messages):
         )
         return '\n'.join(lines)
     except Exception as e:
-        print(f"🔍 Debug: build_event_focus_from_last_user error: {e}")
+        log.warning(f"build_event_focus_from_last_user error: {e}")
         return ''
 
 def build_cast_location_constraints_from_history(history_messages):
@@ -663,7 +823,7 @@ def build_cast_location_constraints_from_history(history_messages):
         header = "CAST/LOCATION CONSTRAINTS:"
         return header + "\n" + "\n".join(constraints)
     except Exception as e:
-        print(f"🔍 Debug: build_cast_location_constraints_from_history error: {e}")
+        log.warning(f"build_cast_location_constraints_from_history error: {e}")
         return ''
 
 def build_physical_state_assertions_from_history(history_messages):
@@ -677,11 +837,11 @@ def build_physical_state_assertions_from_history(history_messages):
         except Exception:
             ledger = {}
 
-        ledger_text = (ledger.get('anchor_tail', '') + ' ' + ' '.join(ledger.get('last_two_replies', []))).lower().strip()
+        # Ledger: fact phrases seen in the last two replies plus the anchor tail
+        facts = continuity_ledger.established_facts(ledger)
+        source_text = ledger.get('anchor_tail', '').lower()
 
-        if ledger_text:
-            source_text = ledger_text
-        else:
+        if not facts and not source_text:
             # Fallback: assistant-only from recent history (exclude all user messages)
             assistant_texts = [
                 _safe_text(m.get('content')) for m in (history_messages or [])[-8:]
@@ -689,25 +849,15 @@ def build_physical_state_assertions_from_history(history_messages):
             ]
             source_text = ' '.join(assistant_texts).lower()
 
-        source_text = source_text or ''
+        def asserted(phrases):
+            return any(p in facts or p in source_text for p in phrases)
 
         # Already naked only if explicitly asserted previously by assistant
-        naked_patterns = [
-            'already naked',
-            'completely naked',
-            'totally naked',
-            'she is naked',
-            'nothing on',
-        ]
-        if any(pat in source_text for pat in naked_patterns):
+        if asserted(NAKED_PATTERNS):
             assertions.append("- Physical State: She is already naked. Do NOT narrate removing clothing. Start from this state.")
 
         # Bikini removed previously (avoid redoing removal) — require removal verbs around bikini
-        bikini_removed_phrases = [
-            'removed her bikini', 'took off her bikini', 'took her bikini off', 'slid her bikini off',
-            'untied her bikini', 'kicked her bikini aside', 'bikini top fell', 'bikini bottoms off'
-        ]
-        if any(p in source_text for p in bikini_removed_phrases):
+        if asserted(BIKINI_REMOVED_PHRASES):
             assertions.append("- Clothing: Bikini already removed. Do NOT narrate removing it again.")
 
         if not assertions:
@@ -715,7 +865,7 @@ def build_physical_state_assertions_from_history(history_messages):
         header = "PHYSICAL STATE ASSERTIONS:"
         return header + "\n" + "\n".join(assertions)
     except Exception as e:
-        print(f"🔍 Debug: build_physical_state_assertions_from_history error: {e}")
+        log.warning(f"build_physical_state_assertions_from_history error: {e}")
         return ''
 
 # Resource cleanup functions
@@ -723,13 +873,13 @@ def cleanup_resources():
     """Clean up resources to prevent memory leaks"""
     try:
         gc.collect()  # Force garbage collection
-        print("🧹 Cleanup: Garbage collection completed")
+        log.debug("Cleanup: Garbage collection completed")
     except Exception as e:
-        print(f"⚠️ Cleanup error: {e}")
+        log.warning(f"Cleanup error: {e}")
 
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
-    print(f"🛑 Received signal {signum}, cleaning up...")
+    log.info(f"Received signal {signum}, cleaning up...")
     cleanup_resources()
 
 # Register cleanup handlers
@@ -743,100 +893,77 @@ def generate_request_id(user_input, command=None):
     return hashlib.md5(content.encode()).hexdigest()[:8]
 
 def is_request_duplicate(request_id):
-    """Check if this request is already being processed"""
-    if request_id in active_requests:
-        # Check if the request is still active (within 30 seconds)
-        if time.time() - active_requests[request_id] < 30:
-            return True
-        else:
-            # Remove stale request
-            del active_requests[request_id]
-    return False
+    """Check if this request is already being processed (entries expire after 30 seconds)"""
+    return shared_state.get(f"dedup:{request_id}") is not None
 
 def track_request(request_id):
-    """Track an active request"""
-    active_requests[request_id] = time.time()
+    """Track an active request. Returns False if another worker already tracks it."""
+    return shared_state.add(f"dedup:{request_id}", time.time(), ttl=REQUEST_DEDUP_TTL)
 
 def untrack_request(request_id):
     """Remove request from tracking"""
-    if request_id in active_requests:
-        del active_requests[request_id]
+    shared_state.delete(f"dedup:{request_id}")
 
 def generate_tts_async(text, save_audio=True, request_id=None):
     """Generate TTS audio in background thread with deduplication"""
     # Create a unique TTS generation ID that includes voice and content
     tts_id = hashlib.md5(f"{text[:100]}:{save_audio}:{tts.voice_id}:{request_id}".encode()).hexdigest()[:8]
-    
-    # Check if this TTS generation is already in progress
-    if tts_id in tts_generation_tracker:
-        print(f"🔍 Debug: TTS generation {tts_id} already in progress, skipping duplicate")
-        return "generating"
-    
-    # Track this TTS generation with timeout
-    tts_generation_tracker[tts_id] = time.time()
-    
-    # Set a timeout for TTS generation (2 minutes)
+
+    # Set a timeout for TTS generation (2 minutes); the tracking key expires on its own
     TTS_TIMEOUT = 120
-    
+
+    # Track this TTS generation; skip if it is already in progress on any worker
+    if not shared_state.add(f"tts:job:{tts_id}", time.time(), ttl=TTS_TIMEOUT):
+        log.debug(f"TTS generation {tts_id} already in progress, skipping duplicate")
+        return "generating"
+
     def tts_worker():
         try:
-            print(f"🔍 Debug: Starting async TTS generation {tts_id} for {len(text)} characters")
+            log.debug(f"Starting async TTS generation {tts_id} for {len(text)} characters")
             start_time = time.time()
             
             # Ensure voice ID is loaded fresh from file before generating TTS
-            print(f"🔍 Debug: Ensuring voice ID is loaded from file before async TTS generation")
+            log.debug(f"Ensuring voice ID is loaded from file before async TTS generation")
             tts.voice_id = tts._load_voice_id()
-            print(f"🔍 Debug: Using voice ID for async TTS: {tts.voice_id}")
+            log.debug(f"Using voice ID for async TTS: {tts.voice_id}")
             
             # Always save audio files when TTS is enabled
-            print(f"🔍 Debug: TTS mode - generating .mp3 file")
-            print(f"🔍 Debug: Text to convert: {text[:100]}{'...' if len(text) > 100 else ''}")
-            print(f"🔍 Debug: Text length: {len(text)} characters")
-            audio_file = tts.speak(text, save_audio=True)
+            log.debug(f"TTS mode - generating .mp3 file")
+            log.debug(f"Text to convert: {text[:100]}{'...' if len(text) > 100 else ''}")
+            log.debug(f"Text length: {len(text)} characters")
+            with stage_timer('tts'):
+                audio_file = tts.speak(text, save_audio=True)
             
             end_time = time.time()
             duration = end_time - start_time
             
             if audio_file:
-                print(f"🔍 Debug: Async TTS {tts_id} completed in {duration:.2f}s: {audio_file}")
+                log.debug(f"Async TTS {tts_id} completed in {duration:.2f}s: {audio_file}")
                 # Verify file exists after generation
                 if os.path.exists(audio_file):
                     file_size = os.path.getsize(audio_file)
-                    print(f"🔍 Debug: Async TTS {tts_id} file verified: {audio_file} ({file_size} bytes)")
+                    log.debug(f"Async TTS {tts_id} file verified: {audio_file} ({file_size} bytes)")
                     
                     # Audio file ready for download/playback
-                    print(f"🔍 Debug: Audio file ready: {audio_file}")
+                    log.debug(f"Audio file ready: {audio_file}")
                     # The frontend will detect the new file via polling
                 else:
-                    print(f"🔍 Debug: Async TTS {tts_id} file missing after generation: {audio_file}")
+                    log.debug(f"Async TTS {tts_id} file missing after generation: {audio_file}")
             else:
-                print(f"🔍 Debug: Async TTS {tts_id} failed after {duration:.2f}s")
+                log.warning(f"Async TTS {tts_id} failed after {duration:.2f}s")
                 
         except Exception as e:
-            print(f"🔍 Debug: Async TTS {tts_id} error: {e}")
-            import traceback
-            print(f"🔍 Debug: Async TTS {tts_id} error traceback: {traceback.format_exc()}")
+            log.exception(f"Async TTS {tts_id} error: {e}")
         finally:
             # Remove from tracking when done
-            if tts_id in tts_generation_tracker:
-                del tts_generation_tracker[tts_id]
-                print(f"🔍 Debug: TTS generation {tts_id} removed from tracking")
-    
-    # Start TTS generation in background thread with timeout
+            shared_state.delete(f"tts:job:{tts_id}")
+            log.debug(f"TTS generation {tts_id} removed from tracking")
+
+    # Start TTS generation in background thread
     thread = threading.Thread(target=tts_worker, daemon=True)
     thread.start()
-    print(f"🔍 Debug: TTS generation {tts_id} started in background thread")
-    
-    # Set a timer to clean up if TTS takes too long
-    def timeout_cleanup():
-        time.sleep(TTS_TIMEOUT)
-        if tts_id in tts_generation_tracker:
-            print(f"🔍 Debug: TTS generation {tts_id} timed out after {TTS_TIMEOUT}s")
-            del tts_generation_tracker[tts_id]
-    
-    timeout_thread = threading.Thread(target=timeout_cleanup, daemon=True)
-    timeout_thread.start()
-    
+    log.debug(f"TTS generation {tts_id} started in background thread")
+
     return "generating"  # Return placeholder to indicate TTS is being generated
 
 # Import the edging functions from chat.py
@@ -896,76 +1023,55 @@ def log_edge_trigger(text: str, start: int, end: int):
             f.write(f"  Context: {log_entry['full_context']}\n")
             f.write(f"  {'='*80}\n")
     except Exception as e:
-        print(f"⚠️ Could not log edge trigger: {e}")
+        log.warning(f"Could not log edge trigger: {e}")
     
     return log_entry
 
-# Conversation persistence
-CONVERSATIONS_DIR = "conversations"
-
-def ensure_conversations_dir():
-    """Ensure the conversations directory exists"""
-    if not os.path.exists(CONVERSATIONS_DIR):
-        os.makedirs(CONVERSATIONS_DIR)
-        print(f"🔍 Debug: Created conversations directory: {CONVERSATIONS_DIR}")
+# Conversation persistence: append-only JSONL journal per user and story (see conversation_journal)
+conversation_journal = ConversationJournal(state=shared_state)
 
-def get_conversation_filename(story_id=None):
-    """Generate filename for conversation history"""
-    if story_id:
-        return f"conversation_{story_id}_{datetime.now().strftime('%Y%m%d')}.json"
-    else:
-        return f"conversation_general_{datetime.now().strftime('%Y%m%d')}.json"
+def journal_stream(story_id=None):
+    """Journal stream of the session user's conversation in a story; users never share a stream or its head"""
+    user_id = (session.get('user_id') if has_request_context() else None) or 'anonymous'
+    return f"{user_id}:{story_id or 'general'}"
 
 def save_conversation_history(history, story_id=None, user_input=None, ai_response=None):
-    """Save conversation history to file"""
+    """Append the conversation's new messages to its journal (constant cost per turn)"""
     try:
-        ensure_conversations_dir()
-        
-        # Add current interaction if provided
-        current_conversation = history.copy()
-        if user_input:
-            current_conversation.append({"role": "user", "content": user_input, "timestamp": datetime.now().isoformat()})
-        if ai_response:
-            current_conversation.append({"role": "assistant", "content": ai_response, "timestamp": datetime.now().isoformat()})
-        
-        # Create conversation data
-        conversation_data = {
-            "story_id": story_id,
-            "last_updated": datetime.now().isoformat(),
-            "message_count": len(current_conversation),
-            "history": current_conversation
-        }
-        
-        # Save to file
-        filename = get_conversation_filename(story_id)
-        filepath = os.path.join(CONVERSATIONS_DIR, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, indent=2, ensure_ascii=False)
-        
-        print(f"🔍 Debug: Saved conversation history to {filepath} ({len(current_conversation)} messages)")
+        messages = history
+        if user_input or ai_response:
+            messages = list(history)
+            if user_input:
+                messages.append({"role": "user", "content": user_input, "timestamp": datetime.now().isoformat()})
+            if ai_response:
+                messages.append({"role": "assistant", "content": ai_response, "timestamp": datetime.now().isoformat()})
+        stream = journal_stream(story_id)
+        queued = conversation_journal.sync(stream, messages)
+        log.debug(f"Journaled {queued} of {len(messages)} messages to {stream}")
         return True
-        
     except Exception as e:
-        print(f"🔍 Debug: Error saving conversation history: {e}")
+        log.warning(f"Error saving conversation history: {e}")
         return False
 
 def load_conversation_history(story_id=None):
     """Load conversation history from active scene in database"""
     try:
+        if not DATABASE_AVAILABLE and story_id:
+            # No database: rebuild the history from the conversation journal
+            return conversation_journal.read_history(journal_stream(story_id))
         if not DATABASE_AVAILABLE or not story_id:
-            print(f"🔍 Debug: No conversation history - DATABASE_AVAILABLE: {DATABASE_AVAILABLE}, story_id: {story_id}")
+            log.debug(f"No conversation history - DATABASE_AVAILABLE: {DATABASE_AVAILABLE}, story_id: {story_id}")
             return []
         
         # Ensure tables exist
         if not ensure_tables_exist():
-            print(f"🔍 Debug: Database tables not available for conversation history")
+            log.debug(f"Database tables not available for conversation history")
             return []
         
         # Get current user from session
         google_id = session.get('user_id')
         if not google_id:
-            print(f"🔍 Debug: No user ID in session for conversation history")
+            log.debug(f"No user ID in session for conversation history")
             return []
         
         # Find the active scene for this story
@@ -976,19 +1082,19 @@ def load_conversation_history(story_id=None):
         ).first()
         
         if not active_scene:
-            print(f"🔍 Debug: No active scene found for story {story_id}, user {google_id}")
+            log.debug(f"No active scene found for story {story_id}, user {google_id}")
             return []
         
         history = active_scene.history or []
-        print(f"🔍 Debug: Loaded conversation history from active scene {active_scene.id} ({len(history)} messages)")
-        print(f"🔍 Debug: Active scene is_active: {active_scene.is_active}")
-        print(f"🔍 Debug: Active scene title: {active_scene.title}")
+        log.debug(f"Loaded conversation history from active scene {active_scene.id} ({len(history)} messages)")
+        log.debug(f"Active scene is_active: {active_scene.is_active}")
+        log.debug(f"Active scene title: {active_scene.title}")
         if history:
-            print(f"🔍 Debug: First message: {history[0].get('content', '')[:100]}...")
+            log.debug(f"First message: {history[0].get('content', '')[:100]}...")
         return history
         
     except Exception as e:
-        print(f"🔍 Debug: Error loading conversation history: {e}")
+        log.warning(f"Error loading conversation history: {e}")
         return []
 
 def get_current_story_id():
@@ -1014,27 +1120,51 @@ def get_current_story_id():
                         return session['history'][0].get('story_id')
         return None
     except Exception as e:
-        print(f"🔍 Debug: Error getting current story ID: {e}")
+        log.warning(f"Error getting current story ID: {e}")
         return None
 
+def get_active_scene_id(story_id):
+    """Id (as a string) of the session user's active scene in story_id, or None"""
+    google_id = session.get('user_id')
+    if not DATABASE_AVAILABLE or not story_id or not google_id or not ensure_tables_exist():
+        return None
+    try:
+        scene_id = db.session.query(Scene.id).filter(
+            Scene.story_id == story_id,
+            Scene.user_id == google_id,
+            Scene.is_active == True
+        ).scalar()
+        return str(scene_id) if scene_id is not None else None
+    except Exception as e:
+        log.warning(f"Error getting active scene: {e}")
+        return None
+
+def scene_state_manager(story_id=None, scene_id=None):
+    """StoryStateManager for the session user's story and scene (defaults: the current story and its active scene)"""
+    story_id = story_id or get_current_story_id()
+    if scene_id is None:
+        scene_id = get_active_scene_id(story_id)
+    return StoryStateManager(session_id=session.get('user_id', 'default'), story_id=story_id, scene_id=scene_id)
+
+@timed_stage('update_active_scene')
 def update_active_scene(history, story_id, user_input=None, ai_response=None):
     """Update the active scene with new conversation"""
-    print(f"🔍 Debug: update_active_scene called with story_id: {story_id}, history length: {len(history)}")
+    log.debug(f"update_active_scene called with story_id: {story_id}, history length: {len(history)}")
     
     if not DATABASE_AVAILABLE or not story_id:
-        print(f"🔍 Debug: update_active_scene early return - DATABASE_AVAILABLE: {DATABASE_AVAILABLE}, story_id: {story_id}")
+        log.debug(f"update_active_scene early return - DATABASE_AVAILABLE: {DATABASE_AVAILABLE}, story_id: {story_id}")
         return
     
     try:
         # Get current user from session
         google_id = session.get('user_id')
         if not google_id:
-            print("🔍 Debug: No user ID in session for active scene update")
+            log.debug("No user ID in session for active scene update")
             return
         
         # Ensure tables exist
         if not ensure_tables_exist():
-            print("🔍 Debug: Database tables not available for active scene update")
+            log.debug("Database tables not available for active scene update")
             return
         
         # Find the active scene for this story and user
@@ -1045,7 +1175,7 @@ def update_active_scene(history, story_id, user_input=None, ai_response=None):
         ).first()
         
         if not active_scene:
-            print(f"🔍 Debug: No active scene found for story {story_id}, user {google_id}")
+            log.debug(f"No active scene found for story {story_id}, user {google_id}")
             return
         
         # Update the active scene with new history
@@ -1055,10 +1185,10 @@ def update_active_scene(history, story_id, user_input=None, ai_response=None):
         
         db.session.commit()
         
-        print(f"🔍 Debug: Updated active scene {active_scene.id} with {len(history)} messages")
+        log.debug(f"Updated active scene {active_scene.id} with {len(history)} messages")
         
     except Exception as e:
-        print(f"🔍 Debug: Error updating active scene: {e}")
+        log.warning(f"Error updating active scene: {e}")
         # Don't fail the chat request if scene update fails
 
 def extract_key_story_points(history):
@@ -1102,13 +1232,16 @@ RULES:
         story_points_payload = [{"role": "user", "content": extraction_prompt}]
         
         # Call AI to extract story points
+        route = model_route('analysis')
         ai_response = chat_with_grok(
             story_points_payload,
-            model="grok-3",
+            model=route.model,
             temperature=0.1,  # Low temperature for consistent extraction
-            max_tokens=300,
+            max_tokens=route.limit(300),
             hide_thinking=True,
-            return_usage=True
+            return_usage=True,
+            timeout=route.timeout,
+            call_class='analysis'
         )
         
         # Extract response text and usage info
@@ -1142,21 +1275,21 @@ RULES:
                         seen.add(point)
                         unique_points.append(point)
                 
-                print(f"🔍 Debug: AI extracted {len(unique_points)} key story points")
+                log.debug(f"AI extracted {len(unique_points)} key story points")
                 return unique_points[:5]  # Limit to 5 most important points
             else:
-                print(f"🔍 Debug: AI response was not a list: {type(key_points)}")
+                log.debug(f"AI response was not a list: {type(key_points)}")
                 return []
                 
         except json.JSONDecodeError as json_error:
-            print(f"🔍 Debug: JSON parsing failed for story points: {json_error}")
-            print(f"🔍 Debug: Raw response: {response}")
+            log.warning(f"JSON parsing failed for story points: {json_error}")
+            log.debug(f"Raw response: {response}")
             
             # Fallback to simple keyword extraction if AI fails
             return extract_key_story_points_fallback(history)
         
     except Exception as e:
-        print(f"🔍 Debug: Error extracting key story points: {e}")
+        log.warning(f"Error extracting key story points: {e}")
         return extract_key_story_points_fallback(history)
 
 def extract_key_story_points_incremental(existing_story_points, immediate_history):
@@ -1205,13 +1338,16 @@ RULES:
         story_points_payload = [{"role": "user", "content": extraction_prompt}]
         
         # Call AI to extract story points
+        route = model_route('analysis')
         ai_response = chat_with_grok(
             story_points_payload,
-            model="grok-3",
+            model=route.model,
             temperature=0.1,  # Low temperature for consistent extraction
-            max_tokens=300,
+            max_tokens=route.limit(300),
             hide_thinking=True,
-            return_usage=True
+            return_usage=True,
+            timeout=route.timeout,
+            call_class='analysis'
         )
         
         # Extract response text and usage info
@@ -1232,17 +1368,17 @@ RULES:
             import json
             story_points = json.loads(response.strip())
             if isinstance(story_points, list):
-                print(f"🔍 Debug: Extracted {len(story_points)} incremental story points")
+                log.debug(f"Extracted {len(story_points)} incremental story points")
                 return story_points
             else:
-                print(f"🔍 Debug: Invalid story points format: {type(story_points)}")
+                log.debug(f"Invalid story points format: {type(story_points)}")
                 return existing_story_points
         except json.JSONDecodeError as e:
-            print(f"🔍 Debug: JSON decode error in story points: {e}")
+            log.warning(f"JSON decode error in story points: {e}")
             return existing_story_points
             
     except Exception as e:
-        print(f"🔍 Debug: Error in incremental story points extraction: {e}")
+        log.warning(f"Error in incremental story points extraction: {e}")
         return existing_story_points
 
 def extract_key_story_points_fallback(history):
@@ -1287,11 +1423,11 @@ def extract_key_story_points_fallback(history):
                 seen.add(point)
                 unique_points.append(point)
         
-        print(f"🔍 Debug: Fallback extracted {len(unique_points)} key story points")
+        log.debug(f"Fallback extracted {len(unique_points)} key story points")
         return unique_points[:5]  # Limit to 5 most important points
         
     except Exception as e:
-        print(f"🔍 Debug: Error in fallback story point extraction: {e}")
+        log.warning(f"Error in fallback story point extraction: {e}")
         return []
 
 def extract_location_from_content(content):
@@ -1309,6 +1445,7 @@ def extract_location_from_content(content):
     else:
         return "Various locations"
 
+@timed_stage('core_story_context')
 def get_core_story_context(story_id):
     """Get compressed core story context that should always be included"""
     try:
@@ -1318,27 +1455,27 @@ def get_core_story_context(story_id):
         # Get current user from session
         google_id = session.get('user_id')
         if not google_id:
-            print(f"🔍 Debug: No user ID in session for core story context")
+            log.debug(f"No user ID in session for core story context")
             return None
         
         if not DATABASE_AVAILABLE:
-            print(f"🔍 Debug: Database not available for core story context")
+            log.debug(f"Database not available for core story context")
             return None
         
         # Ensure tables exist
         if not ensure_tables_exist():
-            print(f"🔍 Debug: Database tables not available for core story context")
+            log.debug(f"Database tables not available for core story context")
             return None
         
         # Get story from database (case-insensitive)
         story = Story.query.filter_by(user_id=google_id).filter(Story.story_id.ilike(story_id)).first()
         
         if not story:
-            print(f"🔍 Debug: Story {story_id} not found in database for user {google_id}")
+            log.debug(f"Story {story_id} not found in database for user {google_id}")
             return None
         
         story_data = story.content
-        print(f"🔍 Debug: Loaded story {story_id} from database for core context")
+        log.debug(f"Loaded story {story_id} from database for core context")
         
         # Build compressed core context
         core_parts = []
@@ -1349,7 +1486,7 @@ def get_core_story_context(story_id):
             for char_key, char_data in story_data['characters'].items():
                 # Skip inactive characters
                 if char_data.get('active', True) == False:
-                    print(f"🔍 Debug: Skipping inactive character: {char_data.get('name', 'Unknown')}")
+                    log.debug(f"Skipping inactive character: {char_data.get('name', 'Unknown')}")
                     continue
                     
                 name = char_data.get('name', 'Unknown')
@@ -1391,7 +1528,7 @@ def get_core_story_context(story_id):
                 
                 if intimate_parts:
                     char_summary += f" | Intimate: {'; '.join(intimate_parts)}"
-                    print(f"🔍 Debug: Added full intimate descriptions for {name}: {'; '.join(intimate_parts)}")
+                    log.debug(f"Added full intimate descriptions for {name}: {'; '.join(intimate_parts)}")
                 
                 char_summaries.append(char_summary)
             
@@ -1428,13 +1565,123 @@ def get_core_story_context(story_id):
                 core_parts.append(f"PACING: {guidelines['pacing']}")
         
         core_context = "\n".join(core_parts)
-        print(f"🔍 Debug: Core story context length: {len(core_context)} chars")
+        log.debug(f"Core story context length: {len(core_context)} chars")
         
         return core_context
         
     except Exception as e:
-        print(f"🔍 Debug: Error getting core story context: {e}")
+        log.warning(f"Error getting core story context: {e}")
+        return None
+
+def _test_api_key_ok():
+    """True if the request carries the TEST_API_KEY (Bearer or X-Test-Api-Key)"""
+    test_api_key = os.getenv('TEST_API_KEY')
+    if not test_api_key:
+        return False
+    auth_header = request.headers.get('Authorization', '')
+    test_header = request.headers.get('X-Test-Api-Key', '')
+    provided = ''
+    if auth_header.startswith('Bearer '):
+        provided = auth_header[len('Bearer '):].strip()
+    elif test_header:
+        provided = test_header.strip()
+    return bool(provided) and secrets.compare_digest(provided, test_api_key)
+
+def _profile_requested():
+    """Explicit profiling: X-Profile header, ?profile=1, or an admin toggle for this user/all users"""
+    if not (session.get('logged_in') or _test_api_key_ok()):
+        return False
+    if request.headers.get('X-Profile', '').lower() in ('1', 'true', 'yes') or request.args.get('profile') == '1':
+        return True
+    return profiling.toggle_enabled(shared_state, session.get('user_id'))
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    if startup.first_request_ms is None:
+        cold_start_ms = startup.first_request()
+        if cold_start_ms is not None:
+            STARTUP_SECONDS.labels(phase='first_request').set(cold_start_ms / 1000)
+    g.request_id = profiling.safe_request_id(request.headers.get('X-Request-ID')) or uuid.uuid4().hex[:16]
+    if request.endpoint == 'static':
+        return  # static files are never profiled (and cost no shared-state reads)
+    try:
+        explicit = _profile_requested()
+        if explicit or profiling.PROFILE_SLOW_MS > 0:
+            g.request_profile = profiling.RequestProfile(profiling.new_profile_id(), deterministic=explicit)
+    except Exception as e:
+        log.warning(f"Could not start request profile: {e}")
+
+@app.after_request
+def _record_request_latency(response):
+    started = getattr(g, 'request_started', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if started is not None:
+        HTTP_REQUEST_SECONDS.labels(route=route, method=request.method, status=response.status_code).observe(
+            time.perf_counter() - started)
+    request_profile = g.pop('request_profile', None)
+    if request_profile is not None:
+        try:
+            saved = request_profile.finish({'route': route, 'method': request.method, 'path': request.path,
+                                            'status': response.status_code, 'user': session.get('user_id'),
+                                            'request_id': g.get('request_id')})
+            if saved:
+                response.headers['X-Profile-Id'] = saved['profile_id']
+        except Exception as e:
+            log.warning(f"Could not save request profile: {e}")
+    if getattr(g, 'request_id', None):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def _abandon_request_profile(exc=None):
+    request_profile = g.pop('request_profile', None)
+    if request_profile is not None:
+        request_profile.abandon()
+
+# Queue depths are computed when /metrics is scraped
+QUEUE_DEPTH.labels(queue='audit').set_function(lambda: audit._queue.qsize())
+QUEUE_DEPTH.labels(queue='usage').set_function(lambda: usage_ledger.ledger.pending())
+QUEUE_DEPTH.labels(queue='chat_in_flight').set_function(lambda: len(shared_state.keys('dedup:')))
+QUEUE_DEPTH.labels(queue='tts_jobs').set_function(lambda: len(shared_state.keys('tts:job:')))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (Bearer METRICS_TOKEN required when set)"""
+    if not metrics_token_ok(request.headers.get('Authorization', '')):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+LOG_DEBUG_DEFAULT_MINUTES = 30
+
+def _admin_ids():
+    return {a.strip() for a in os.getenv('ADMIN_USER_IDS', '').split(',') if a.strip()}
+
+def is_admin():
+    """True if the logged-in user is listed in ADMIN_USER_IDS (google ids or emails)"""
+    admins = _admin_ids()
+    return bool(admins) and (session.get('user_id') in admins or session.get('user_email') in admins)
+
+# X-Test-User identities a TEST_API_KEY harness may take (e.g. one per loadgen client)
+TEST_USER_PREFIXES = ('loadgen-', 'test-')
+
+def _test_user_header():
+    """The X-Test-User header if it names a harness identity: prefixed, and never an admin"""
+    test_user = request.headers.get('X-Test-User', '').strip()[:120]
+    if not test_user.startswith(TEST_USER_PREFIXES) or test_user in _admin_ids():
         return None
+    return test_user
+
+def _call_with_log_context(f, *args, **kwargs):
+    """Run a view with the user's debug-log override and request fields bound"""
+    google_id = session.get('user_id')
+    debug_token = set_debug_override(bool(google_id) and shared_state.get(f"log:debug:{google_id}") is not None)
+    fields_token = bind_request_fields(user=google_id, request_id=getattr(g, 'request_id', None))
+    try:
+        return f(*args, **kwargs)
+    finally:
+        reset_debug_override(debug_token)
+        reset_request_fields(fields_token)
 
 def require_auth(f):
     """Decorator to require authentication for protected routes"""
@@ -1442,31 +1689,90 @@ def require_auth(f):
         # Test automation bypass: allow API key auth for CI/scripts without Google OAuth.
         # Enabled only when TEST_API_KEY is set in the environment.
         try:
-            test_api_key = os.getenv('TEST_API_KEY')
-            if test_api_key:
-                auth_header = request.headers.get('Authorization', '')
-                test_header = request.headers.get('X-Test-Api-Key', '')
-                provided = ''
-                if auth_header.startswith('Bearer '):
-                    provided = auth_header[len('Bearer '):].strip()
-                elif test_header:
-                    provided = test_header.strip()
-                if provided and secrets.compare_digest(provided, test_api_key):
-                    # Minimal session priming for routes that expect a user
-                    session['logged_in'] = True
-                    session.setdefault('user_id', 'test_automation')
-                    session.setdefault('user_email', 'automation@example.com')
-                    session.setdefault('user_name', 'Automation Harness')
-                    session.setdefault('user_avatar', '')
-                    return f(*args, **kwargs)
+            if _test_api_key_ok():
+                # Minimal session priming for routes that expect a user; an OAuth session keeps its user
+                oauth_session = session.get('logged_in') and not session.get('test_session')
+                session['logged_in'] = True
+                if not oauth_session:
+                    session['test_session'] = True
+                    test_user = _test_user_header()
+                    if test_user:
+                        session['user_id'] = test_user
+                session.setdefault('user_id', 'test_automation')
+                session.setdefault('user_email', 'automation@example.com')
+                session.setdefault('user_name', 'Automation Harness')
+                session.setdefault('user_avatar', '')
+                return _call_with_log_context(f, *args, **kwargs)
         except Exception as _e:
             pass
         if not session.get('logged_in'):
             return jsonify({'error': 'Authentication required', 'login_url': '/auth/google'}), 401
-        return f(*args, **kwargs)
+        return _call_with_log_context(f, *args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# /api/chat commands answered without an upstream call (not counted against admission budgets)
+LOCAL_CHAT_COMMANDS = {'new', 'raw', 'edge', 'payoff', 'ooc apply'}
+
+def _chat_admission_policy():
+    """OOC rewrites have their own budget; story turns and openers share the chat budget"""
+    data = request.get_json(silent=True) or {}
+    command = str(data.get('command') or '')
+    message = str(data.get('message') or '').strip()
+    if message.startswith('/'):
+        command = message[1:]
+    if command in LOCAL_CHAT_COMMANDS or command.split(' ', 1)[0] in LOCAL_CHAT_COMMANDS:
+        return None
+    return 'rewrite' if command.startswith('ooc') else 'chat'
+
+def admission_control(policy):
+    """Decorator: admit the request through the per-user budgets for policy (a route class
+    or a function returning one), else answer 429 with Retry-After. Goes below require_auth."""
+    def decorator(f):
+        def decorated_function(*args, **kwargs):
+            name = policy() if callable(policy) else policy
+            try:
+                ticket = admission.admit(session.get('user_id') or request.remote_addr, name)
+            except AdmissionRejected as e:
+                response = jsonify({'error': 'Too many requests, please slow down.', 'reason': e.reason,
+                                    'retry_after': e.retry_after})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            g.admission_ticket = ticket
+            try:
+                return f(*args, **kwargs)
+            finally:
+                g.pop('admission_ticket', None)
+                if ticket is not None:
+                    ticket.release()
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
+
+def model_route(call_class):
+    """model_routing route for a call class, with the loaded story's "model_routing" overrides"""
+    return model_routing.route(call_class, g.get('model_routing') if has_request_context() else None)
+
+def _record_usage(call_class, model, usage, seconds, finish_reason):
+    """grok_remote usage listener: charge the call to the session's user and story"""
+    user_id, story_id = 'system', None
+    if has_request_context():
+        user_id = session.get('user_id') or 'anonymous'
+        story_id = get_current_story_id()
+    usage_ledger.ledger.record(usage_ledger.usage_event(user_id, story_id, call_class, model, usage, seconds, finish_reason))
+    if has_request_context() and call_class and call_class.endswith('_hedge') and isinstance(usage, dict):
+        # A hedge's losing call: its caller only charged the winner's tokens
+        charge_admission(usage.get('total_tokens') or (usage.get('prompt_tokens') or 0) + (usage.get('completion_tokens') or 0))
+
+add_usage_listener(_record_usage)
+
+def charge_admission(amount):
+    """Charge upstream cost (LLM tokens, TTS characters) to the current request's budget"""
+    ticket = g.get('admission_ticket')
+    if ticket is not None:
+        ticket.charge(amount)
+
 @app.route('/')
 def index():
     # Check if user is logged in
@@ -1485,7 +1791,7 @@ def oauth_test():
     """Test endpoint to check OAuth availability"""
     return jsonify({
         'oauth_available': OAUTH_AVAILABLE,
-        'google_available': google is not None if OAUTH_AVAILABLE else False,
+        'google_available': GOOGLE_OAUTH_CONFIGURED,
         'client_id_set': bool(os.getenv('GOOGLE_OAUTH_CLIENT_ID')),
         'client_secret_set': bool(os.getenv('GOOGLE_OAUTH_CLIENT_SECRET'))
     })
@@ -1497,9 +1803,9 @@ if OAUTH_AVAILABLE:
         """Initiate Google OAuth login"""
         try:
             redirect_uri = 'https://grok-playground.onrender.com/auth/google/callback'
-            return google.authorize_redirect(redirect_uri)
+            return get_google().authorize_redirect(redirect_uri)
         except Exception as e:
-            print(f"🔍 Debug: Google login error: {e}")
+            log.error(f"Google login error: {e}")
             return jsonify({'error': f'Google login failed: {str(e)}'}), 500
 
     @app.route('/auth/google/callback')
@@ -1507,15 +1813,15 @@ if OAUTH_AVAILABLE:
         """Handle Google OAuth callback"""
         try:
             # Get the authorization code from the callback
-            token = google.authorize_access_token()
+            token = get_google().authorize_access_token()
             user_info = token.get('userinfo')
             
             if not user_info:
                 return jsonify({'error': 'Failed to get user info from Google'}), 400
             
-            print(f"🔍 Debug: Google user info: {user_info}")
-            print(f"🔍 Debug: Google user info keys: {list(user_info.keys()) if user_info else 'None'}")
-            print(f"🔍 Debug: Full token response: {token}")
+            log.debug(f"Google user info: {user_info}")
+            log.debug(f"Google user info keys: {list(user_info.keys()) if user_info else 'None'}")
+            log.debug(f"Full token response: {token}")
             
             # Extract user data
             google_id = user_info.get('sub')
@@ -1523,7 +1829,7 @@ if OAUTH_AVAILABLE:
             name = user_info.get('name')
             avatar_url = user_info.get('picture')
             
-            print(f"🔍 Debug: Extracted data - ID: {google_id}, Email: {email}, Name: {name}")
+            log.debug(f"Extracted data - ID: {google_id}, Email: {email}, Name: {name}")
             
             if not google_id or not email:
                 return jsonify({'error': 'Invalid user data from Google'}), 400
@@ -1551,37 +1857,35 @@ if OAUTH_AVAILABLE:
                         )
                         db.session.add(user)
                         db.session.commit()
-                        print(f"🔍 Debug: Created new user: {name} ({email}) with ID: {user.id}")
-                        print(f"🔍 Debug: User email in database: {user.email}")
+                        log.debug(f"Created new user: {name} ({email}) with ID: {user.id}")
+                        log.debug(f"User email in database: {user.email}")
                     else:
                         # Update existing user
                         user.email = email
                         user.name = name
                         user.avatar_url = avatar_url
                         db.session.commit()
-                        print(f"🔍 Debug: Updated existing user: {name} ({email}) with ID: {user.id}")
-                        print(f"🔍 Debug: User email in database after update: {user.email}")
+                        log.debug(f"Updated existing user: {name} ({email}) with ID: {user.id}")
+                        log.debug(f"User email in database after update: {user.email}")
                     
                     session['db_user_id'] = user.id
-                    print(f"🔍 Debug: Set session db_user_id to: {user.id}")
+                    log.debug(f"Set session db_user_id to: {user.id}")
                     
                 except Exception as db_error:
-                    print(f"🔍 Debug: Database error during user save: {db_error}")
-                    import traceback
-                    print(f"🔍 Debug: Database error traceback: {traceback.format_exc()}")
+                    log.exception(f"Database error during user save: {db_error}")
                     # Continue without database save
                     session['db_user_id'] = None
             else:
-                print("🔍 Debug: Database not available, setting db_user_id to None")
+                log.debug("Database not available, setting db_user_id to None")
                 session['db_user_id'] = None
             
-            print(f"🔍 Debug: User logged in successfully: {name} ({email})")
+            log.debug(f"User logged in successfully: {name} ({email})")
             
             # Redirect to main page
             return redirect('/')
             
         except Exception as e:
-            print(f"🔍 Debug: OAuth callback error: {e}")
+            log.error(f"OAuth callback error: {e}")
             return jsonify({'error': f'OAuth callback failed: {str(e)}'}), 500
     
     @app.route('/auth/logout')
@@ -1590,7 +1894,7 @@ if OAUTH_AVAILABLE:
         try:
             # Clear session
             session.clear()
-            print("🔍 Debug: User logged out")
+            log.debug("User logged out")
             
             return jsonify({
                 'success': True,
@@ -1598,7 +1902,7 @@ if OAUTH_AVAILABLE:
             })
             
         except Exception as e:
-            print(f"🔍 Debug: Logout error: {e}")
+            log.error(f"Logout error: {e}")
             return jsonify({'error': f'Logout failed: {str(e)}'}), 500
     
     @app.route('/auth/status')
@@ -1621,37 +1925,40 @@ if OAUTH_AVAILABLE:
                 })
                 
         except Exception as e:
-            print(f"🔍 Debug: Auth status error: {e}")
+            log.error(f"Auth status error: {e}")
             return jsonify({'error': f'Auth status check failed: {str(e)}'}), 500
 
 @app.route('/api/chat', methods=['POST'])
 @require_auth
+@admission_control(_chat_admission_policy)
 def chat():
-    print(f"🔍 Debug: === NEW REQUEST START ===")
-    print(f"🔍 Debug: /api/chat endpoint called")
-    print(f"🔍 Debug: Session ID: {session.get('_id', 'No session ID')}")
-    print(f"🔍 Debug: Session keys: {list(session.keys())}")
+    chat_log.debug(f"=== NEW REQUEST START ===")
+    chat_log.debug(f"/api/chat endpoint called")
+    chat_log.debug(f"Session ID: {session.get('_id', 'No session ID')}")
+    chat_log.debug(f"Session keys: {list(session.keys())}")
     if 'history' in session:
-        print(f"🔍 Debug: Session history exists with {len(session['history'])} messages")
-        for i, msg in enumerate(session['history']):
-            print(f"🔍 Debug: Session history {i}: {msg['role']} - {msg['content'][:50]}...")
+        chat_log.debug(f"Session history exists with {len(session['history'])} messages")
+        if chat_log.debug_enabled():
+            for i, msg in enumerate(session['history']):
+                chat_log.debug(f"Session history {i}: {msg['role']} - {msg['content'][:50]}...")
     else:
-        print(f"🔍 Debug: No session history found")
+        chat_log.debug(f"No session history found")
     
     # Check memory usage
-    try:
-        import psutil
-        memory_info = psutil.virtual_memory()
-        print(f"🔍 Debug: Memory usage: {memory_info.percent}% ({memory_info.used / 1024 / 1024:.1f}MB used)")
-    except ImportError:
-        print("🔍 Debug: psutil not available for memory monitoring")
+    if chat_log.debug_enabled():
+        try:
+            import psutil
+            memory_info = psutil.virtual_memory()
+            chat_log.debug(f"Memory usage: {memory_info.percent}% ({memory_info.used / 1024 / 1024:.1f}MB used)")
+        except ImportError:
+            chat_log.debug("psutil not available for memory monitoring")
     
     # Generate request ID for deduplication
     request_id = None
     
     try:
         data = request.get_json()
-        print(f"🔍 Debug: Request data: {data}")
+        chat_log.debug("Request data: %s", data)
         user_input = data.get('message', '').strip()
         command = data.get('command', '')
         # Coerce token_count to int to avoid type errors downstream
@@ -1666,7 +1973,7 @@ def chat():
         except Exception:
             beats = 1
         session['beats'] = beats
-        print(f"🔍 Debug: Parsed beats from request: {beats}")
+        chat_log.debug(f"Parsed beats from request: {beats}")
         
         # Parse commands from user input if they start with /
         if user_input.startswith('/'):
@@ -1717,16 +2024,18 @@ def chat():
                         {"role": "assistant", "content": last_assistant}
                     ]
 
-                    model_env = os.getenv('XAI_MODEL', 'grok-3')
+                    route = model_route('rewrite')
                     ai_response = chat_with_grok(
                         rewrite_messages,
-                        model=model_env,
+                        model=route.model,
                         temperature=0.5,
-                        max_tokens=min(1800, session.get('max_tokens', 1200)),
+                        max_tokens=route.limit(session.get('max_tokens', 1200)),
                         top_p=0.8,
                         hide_thinking=True,
                         return_usage=True,
-                        stop=["\n\n\n", "---", "***", "END OF SCENE"]
+                        stop=["\n\n\n", "---", "***", "END OF SCENE"],
+                        timeout=route.timeout,
+                        call_class='rewrite'
                     )
 
                     preview_text = ai_response['text'] if isinstance(ai_response, dict) else str(ai_response)
@@ -1776,20 +2085,17 @@ def chat():
                 if request_id: untrack_request(request_id)
                 return jsonify({'type': 'ooc', 'error': f'OOC handler failed: {e}'})
         
-        print(f"🔍 Debug: user_input='{user_input}', command='{command}', token_count={token_count}")
+        chat_log.debug(f"user_input='{user_input}', command='{command}', token_count={token_count}")
         
         # Generate request ID for deduplication
         request_id = generate_request_id(user_input, command)
-        print(f"🔍 Debug: Request ID: {request_id}")
+        chat_log.debug(f"Request ID: {request_id}")
         
-        # Check for duplicate requests
-        if is_request_duplicate(request_id):
-            print(f"🔍 Debug: Duplicate request detected: {request_id}")
+        # Check for duplicate requests and track this one atomically (shared across workers)
+        if not track_request(request_id):
+            chat_log.debug(f"Duplicate request detected: {request_id}")
             return jsonify({'error': 'Request already being processed. Please wait...'})
-        
-        # Track this request
-        track_request(request_id)
-        print(f"🔍 Debug: Request tracked: {request_id}")
+        chat_log.debug(f"Request tracked: {request_id}")
         # Audit: before snapshot
         try:
             ledger_before = dict(get_continuity_ledger())
@@ -1809,12 +2115,12 @@ def chat():
                 'summaries': ledger_before.get('summaries', [])[-3:],
                 'anchor_tail': _safe_preview(ledger_before.get('anchor_tail', ''), 160),
                 'ban_phrases': ledger_before.get('ban_phrases', [])[:6],
-                'last_two_replies': ledger_before.get('last_two_replies', [])[-2:],
+                'recent_facts': sorted(continuity_ledger.established_facts(ledger_before)),
             }
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Error parsing request data: {e}")
+        chat_log.warning(f"Error parsing request data: {e}")
         return jsonify({'error': f'Invalid request data: {str(e)}'})
     
     if not user_input and not command:
@@ -1836,13 +2142,13 @@ def chat():
         session['history'] = session['history'][:2]
         # Reset continuity ledger for a fresh scene
         try:
-            session['continuity_ledger'] = {}
-            print("🔍 Debug: Continuity ledger reset for /new command")
+            reset_continuity_ledger()
+            chat_log.debug("Continuity ledger reset for /new command")
         except Exception:
             pass
         # Reset beats to default (1) for tight enactment
         session['beats'] = 1
-        print("🔍 Debug: Beats reset to 1 for new scene")
+        chat_log.debug("Beats reset to 1 for new scene")
         if request_id:
             untrack_request(request_id)
         return jsonify({'message': '🧹 New scene. Priming kept.', 'type': 'system'})
@@ -1868,42 +2174,24 @@ def chat():
         return jsonify({'message': '✅ Payoff: both allowed.', 'type': 'system'})
     
     elif command == 'loadopener':
-        print(f"🔍 Debug: loadopener command detected")
+        chat_log.debug(f"loadopener command detected")
         # Handle /loadopener command - get filename from parsed command
         filename = data.get('loadopener', 'opener.txt')
-        print(f"🔍 Debug: filename='{filename}'")
+        chat_log.debug(f"filename='{filename}'")
         
         try:
-            abs_path = os.path.abspath(filename)
-            print(f"🔍 Debug: abs_path='{abs_path}'")
+            abs_path = os.path.abspath(os.path.join(opener_catalog.directory, os.path.basename(filename)))
             
-            # Check if file exists
-            if not os.path.exists(filename):
-                print(f"🔍 Debug: File {filename} does not exist, creating default opener")
+            # Openers are served from the in-memory catalog (only catalog files, never arbitrary paths)
+            entry = opener_catalog.get(filename)
+            if entry is None:
+                chat_log.debug(f"Opener {filename} not in catalog, using default opener")
                 # Create a simple default opener
                 opener = """A woman sat at her desk after hours, hearing footsteps in the hall. Her lips curled into a small smile as she'd been flirting with her colleague all day and knew he was taking her bait. The building's hum filled the quiet. She quickly removed her panties and shoved them in the drawer just before he entered her office. The smell of his cologne signaled his impending entrance..."""
-                print(f"🔍 Debug: Using default opener, length={len(opener)}")
+                chat_log.debug(f"Using default opener, length={len(opener)}")
             else:
-                # Try to read file with better error handling
-                try:
-                    with open(filename, "r", encoding="utf-8") as f:
-                        opener = f.read()
-                    print(f"🔍 Debug: opener length={len(opener)}")
-                except UnicodeDecodeError as e:
-                    print(f"🔍 Debug: Unicode decode error: {e}")
-                    if request_id:
-                        untrack_request(request_id)
-                    return jsonify({'error': f'File encoding error: {str(e)}'})
-                except PermissionError as e:
-                    print(f"🔍 Debug: Permission error: {e}")
-                    if request_id:
-                        untrack_request(request_id)
-                    return jsonify({'error': f'Permission denied reading {filename}: {str(e)}'})
-                except Exception as e:
-                    print(f"🔍 Debug: File read error: {e}")
-                    if request_id:
-                        untrack_request(request_id)
-                    return jsonify({'error': f'Error reading {filename}: {str(e)}'})
+                opener = entry['content']
+                chat_log.debug(f"opener length={len(opener)}")
             
             byte_len = len(opener.encode("utf-8"))
             if byte_len == 0 or not any(ch.strip() for ch in opener):
@@ -1915,20 +2203,19 @@ def chat():
             session['history'] = []  # Clear old history completely
             # Reset continuity ledger on scene reset
             try:
-                session['continuity_ledger'] = {}
-                print("🔍 Debug: Continuity ledger reset for loadopener")
+                reset_continuity_ledger()
+                chat_log.debug("Continuity ledger reset for loadopener")
             except Exception:
                 pass
             session['history'].append({"role": "user", "content": opener})
-            print(f"🔍 Debug: Cleared old history and added opener content")
+            chat_log.debug(f"Cleared old history and added opener content")
             
             # Get AI-powered scene state reminder (create locally to avoid session serialization issues)
             try:
-                google_id = session.get('user_id', 'default')
-                state_manager = StoryStateManager(session_id=google_id)
+                state_manager = scene_state_manager()
                 scene_state_reminder = state_manager.get_state_as_prompt()
             except Exception as e:
-                print(f"🔍 Debug: State manager error, using fallback: {e}")
+                chat_log.warning(f"State manager error, using fallback: {e}")
                 scene_state_reminder = """
 CURRENT SCENE STATE (maintain this continuity):
 - No characters tracked yet
@@ -1954,14 +2241,14 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             }
             
             # TTS will be generated on-demand via button, not automatically for opener text
-            print(f"🔍 Debug: TTS enabled: {tts.enabled}")
-            print(f"🔍 Debug: Opener text length: {len(opener)}")
-            print(f"🔍 Debug: TTS will be generated on-demand when user clicks 'Play TTS' button")
+            chat_log.debug(f"TTS enabled: {tts.enabled}")
+            chat_log.debug(f"Opener text length: {len(opener)}")
+            chat_log.debug(f"TTS will be generated on-demand when user clicks 'Play TTS' button")
             
             # Generate AI response to continue the story
             try:
-                print(f"🔍 Debug: Generating AI response for opener...")
-                model_env = os.getenv('XAI_MODEL', 'grok-3')
+                chat_log.debug(f"Generating AI response for opener...")
+                route = model_route('story')
                 # AI call for loadopener with proper continuity
                 opener_context = [
                     {"role": "system", "content": "You are an explicit erotic storyteller. Write with vivid, sensual language that captures the intensity and passion of intimate moments. Use descriptive, evocative terms for physical sensations, emotions, and actions. Be bold and unflinching in your descriptions while maintaining the story's narrative flow and character development.\n\nIMPORTANT: Always end your response at a natural stopping point (end of sentence, paragraph, or scene). Never cut off mid-sentence or mid-thought. Complete your thoughts and actions before ending.\n\nEFFICIENCY: Avoid repeating descriptions, memories, or events already established in the conversation history. Only reference past events if they directly impact the current scene. Focus on NEW actions, thoughts, and developments rather than rehashing what's already been described."},
@@ -1970,13 +2257,15 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 
                 ai_response = chat_with_grok(
                     opener_context,
-                    model=model_env,
+                    model=route.model,
                     temperature=0.7,
-                    max_tokens=1500,  # Increased to prevent cutoffs and back-skipping
+                    max_tokens=route.limit(1500),  # Increased to prevent cutoffs and back-skipping
                     top_p=0.8,
                     hide_thinking=True,
                     return_usage=True,
-                    stop=["\n\n\n", "---", "***", "END OF SCENE"]  # Stop at natural break points
+                    stop=["\n\n\n", "---", "***", "END OF SCENE"],  # Stop at natural break points
+                    timeout=route.timeout,
+                    call_class='story'
                 )
                 
                 # Extract response text and usage info
@@ -1988,24 +2277,25 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                     reply = ai_response
                     usage = {}
                     finish_reason = 'unknown'
-                print(f"🔍 Debug: AI response generated, length={len(reply)}")
+                chat_log.debug(f"AI response generated, length={len(reply)}")
                 
                 # Store payload for debugging
                 store_ai_payload('story_generation', opener_context, reply, usage, finish_reason)
                 
                 # Add response to history
                 session['history'].append({"role": "assistant", "content": reply})
-                print(f"🔍 Debug: After opener response - session history has {len(session['history'])} messages")
-                for i, msg in enumerate(session['history']):
-                    print(f"🔍 Debug: Opener history {i}: {msg['role']} - {msg['content'][:100]}...")
+                chat_log.debug(f"After opener response - session history has {len(session['history'])} messages")
+                if chat_log.debug_enabled():
+                    for i, msg in enumerate(session['history']):
+                        chat_log.debug(f"Opener history {i}: {msg['role']} - {msg['content'][:100]}...")
                 
                 # TTS will be generated on-demand via button, not automatically
-                print(f"🔍 Debug: TTS enabled: {tts.enabled}")
-                print(f"🔍 Debug: Reply length: {len(reply)}")
-                print(f"🔍 Debug: TTS will be generated on-demand when user clicks 'Play TTS' button")
+                chat_log.debug(f"TTS enabled: {tts.enabled}")
+                chat_log.debug(f"Reply length: {len(reply)}")
+                chat_log.debug(f"TTS will be generated on-demand when user clicks 'Play TTS' button")
                 
                 # State extraction disabled to prevent back-skipping
-                print(f"🔍 Debug: State extraction disabled to prevent back-skipping")
+                chat_log.debug(f"State extraction disabled to prevent back-skipping")
                 
                 # Update initial response with AI response (no audio file yet)
                 initial_response['ai_response'] = reply
@@ -2015,7 +2305,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 return jsonify(initial_response)
                 
             except Exception as ai_error:
-                print(f"🔍 Debug: AI response generation failed: {ai_error}")
+                chat_log.warning(f"AI response generation failed: {ai_error}")
                 # Update initial response with fallback AI response
                 initial_response['ai_response'] = 'Click "Send" to continue the story...'
                 initial_response['response_type'] = 'system'
@@ -2032,12 +2322,12 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             return jsonify({'error': f"Couldn't read {filename}: {e}"})
     
     elif command == 'loadstory':
-        print(f"🔍 Debug: loadstory command detected")
+        chat_log.debug(f"loadstory command detected")
         # Handle /loadstory command - get story ID from parsed command
         story_id = data.get('loadstory', 'farm_romance')
-        print(f"🔍 Debug: story_id='{story_id}'")
-        print(f"🔍 Debug: data keys: {list(data.keys())}")
-        print(f"🔍 Debug: user_input: {user_input}")
+        chat_log.debug(f"story_id='{story_id}'")
+        chat_log.debug(f"data keys: {list(data.keys())}")
+        chat_log.debug(f"user_input: {user_input}")
         
         try:
             # Get current user from session
@@ -2048,7 +2338,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                     untrack_request(request_id)
                 return jsonify({'error': 'User not found in session'})
             
-            print(f"🔍 Debug: Using Google ID: {google_id}")
+            chat_log.debug(f"Using Google ID: {google_id}")
             user_id = google_id
             
             # Load story from database only
@@ -2058,13 +2348,13 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 return jsonify({'error': 'Database not available'})
             
             # Ensure tables exist before querying
-            print(f"🔍 Debug: About to call ensure_tables_exist() for loadstory")
+            chat_log.debug(f"About to call ensure_tables_exist() for loadstory")
             if not ensure_tables_exist():
-                print(f"🔍 Debug: ensure_tables_exist() returned False")
+                chat_log.debug(f"ensure_tables_exist() returned False")
                 if request_id:
                     untrack_request(request_id)
                 return jsonify({'error': 'Database tables not available'})
-            print(f"🔍 Debug: ensure_tables_exist() returned True, proceeding with query")
+            chat_log.debug(f"ensure_tables_exist() returned True, proceeding with query")
             
             story = Story.query.filter_by(user_id=user_id).filter(Story.story_id.ilike(story_id)).first()
             
@@ -2074,12 +2364,12 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 return jsonify({'error': f'Story not found: {story_id}'})
             
             story_data = story.content
-            print(f"🔍 Debug: Loaded story from database: {story.title}")
+            chat_log.debug(f"Loaded story from database: {story.title}")
             
-            print(f"🔍 Debug: Loaded story: {story_data.get('title', story_id)}")
-            print(f"🔍 Debug: Story data keys: {list(story_data.keys())}")
-            print(f"🔍 Debug: Story data type: {type(story_data)}")
-            print(f"🔍 Debug: Story data content preview: {str(story_data)[:200]}...")
+            chat_log.debug(f"Loaded story: {story_data.get('title', story_id)}")
+            chat_log.debug(f"Story data keys: {list(story_data.keys())}")
+            chat_log.debug(f"Story data type: {type(story_data)}")
+            chat_log.debug(f"Story data content preview: {str(story_data)[:200]}...")
             
             # Extract story components (data is flat, not nested under 'story' key)
             opener_text = story_data.get('opener_text', '')
@@ -2087,11 +2377,11 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             setting = story_data.get('setting', {})
             narrative_guidelines = story_data.get('narrative_guidelines', {})
             
-            print(f"🔍 Debug: Story data structure - story keys: {list(story_data.keys())}")
-            print(f"🔍 Debug: Opener text length: {len(opener_text)}")
-            print(f"🔍 Debug: Characters count: {len(characters)}")
-            print(f"🔍 Debug: Setting keys: {list(setting.keys())}")
-            print(f"🔍 Debug: Narrative guidelines keys: {list(narrative_guidelines.keys())}")
+            chat_log.debug(f"Story data structure - story keys: {list(story_data.keys())}")
+            chat_log.debug(f"Opener text length: {len(opener_text)}")
+            chat_log.debug(f"Characters count: {len(characters)}")
+            chat_log.debug(f"Setting keys: {list(setting.keys())}")
+            chat_log.debug(f"Narrative guidelines keys: {list(narrative_guidelines.keys())}")
             
             # Build comprehensive system prompt from story data
             system_prompt_parts = []
@@ -2102,7 +2392,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 for char_key, char_data in characters.items():
                     # Skip inactive characters
                     if char_data.get('active', True) == False:
-                        print(f"🔍 Debug: Skipping inactive character in chat: {char_data.get('name', 'Unknown')}")
+                        chat_log.debug(f"Skipping inactive character in chat: {char_data.get('name', 'Unknown')}")
                         continue
                         
                     char_name = char_data.get('name', 'Unknown')
@@ -2164,7 +2454,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             
             # Combine all parts
             comprehensive_system_prompt = "\n\n".join(system_prompt_parts)
-            print(f"🔍 Debug: Comprehensive system prompt length: {len(comprehensive_system_prompt)}")
+            chat_log.debug(f"Comprehensive system prompt length: {len(comprehensive_system_prompt)}")
             
             # Store story ID in session for persistence
             session['story_id'] = story_id
@@ -2174,7 +2464,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 user = User.query.filter_by(google_id=user_id).first()
                 if user:
                     user.active_story_id = story_id
-                    print(f"🔍 Debug: Set {story_id} as active story for user {user_id}")
+                    chat_log.debug(f"Set {story_id} as active story for user {user_id}")
                 
                 # Ensure the story's default scene is set as active
                 if story.default_scene_id:
@@ -2189,12 +2479,12 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         
                         # Set the default scene as active
                         default_scene.is_active = True
-                        print(f"🔍 Debug: Set default scene {default_scene.id} as active for story {story_id}")
+                        chat_log.debug(f"Set default scene {default_scene.id} as active for story {story_id}")
                 
                 db.session.commit()
-                print(f"🔍 Debug: Successfully committed active story and scene changes")
+                chat_log.debug(f"Successfully committed active story and scene changes")
             except Exception as db_error:
-                print(f"🔍 Debug: Error setting active story/scene: {db_error}")
+                chat_log.warning(f"Error setting active story/scene: {db_error}")
                 db.session.rollback()
                 # Don't fail the loadstory command if active story setting fails
             
@@ -2206,18 +2496,18 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 session['history'] = existing_history
                 # Reset continuity ledger when switching stories/scenes
                 try:
-                    session['continuity_ledger'] = {}
-                    print("🔍 Debug: Continuity ledger reset for loadstory (existing history)")
+                    reset_continuity_ledger()
+                    chat_log.debug("Continuity ledger reset for loadstory (existing history)")
                 except Exception:
                     pass
-                print(f"🔍 Debug: Loaded existing conversation history ({len(existing_history)} messages)")
+                chat_log.debug(f"Loaded existing conversation history ({len(existing_history)} messages)")
             else:
                 # Start fresh with the story setup
                 session['history'] = []
                 # Reset continuity ledger for fresh story setup
                 try:
-                    session['continuity_ledger'] = {}
-                    print("🔍 Debug: Continuity ledger reset for loadstory (fresh)")
+                    reset_continuity_ledger()
+                    chat_log.debug("Continuity ledger reset for loadstory (fresh)")
                 except Exception:
                     pass
                 
@@ -2229,9 +2519,9 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 if opener_text:
                     session['history'].append({"role": "user", "content": opener_text})
                 
-                print(f"🔍 Debug: Started fresh conversation history")
+                chat_log.debug(f"Started fresh conversation history")
             
-            print(f"🔍 Debug: Session history now has {len(session['history'])} messages")
+            chat_log.debug(f"Session history now has {len(session['history'])} messages")
             
             # Return story content immediately
             initial_response = {
@@ -2246,8 +2536,9 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             
             # Generate AI response to continue the story
             try:
-                print(f"🔍 Debug: Generating AI response for story...")
-                model_env = os.getenv('XAI_MODEL', 'grok-3')
+                chat_log.debug(f"Generating AI response for story...")
+                g.model_routing = story_data.get('model_routing')
+                route = model_route('story')
                 
                 # Build context for AI call
                 context_messages = []
@@ -2255,26 +2546,29 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 # Add comprehensive system prompt
                 if comprehensive_system_prompt:
                     context_messages.append({"role": "system", "content": f"You are an explicit erotic storyteller. Write with vivid, sensual language that captures the intensity and passion of intimate moments. Use descriptive, evocative terms for physical sensations, emotions, and actions. Be bold and unflinching in your descriptions while maintaining the story's narrative flow and character development.\n\n{comprehensive_system_prompt}"})
-                    print(f"🔍 Debug: Added comprehensive system prompt to AI context")
+                    chat_log.debug(f"Added comprehensive system prompt to AI context")
                 else:
                     context_messages.append({"role": "system", "content": "You are an explicit erotic storyteller. Write with vivid, sensual language that captures the intensity and passion of intimate moments. Use descriptive, evocative terms for physical sensations, emotions, and actions. Be bold and unflinching in your descriptions while maintaining the story's narrative flow and character development. Continue the story naturally from the opener text."})
-                    print(f"🔍 Debug: Added fallback system prompt to AI context")
+                    chat_log.debug(f"Added fallback system prompt to AI context")
                 
                 # Add opener text
                 if opener_text:
                     context_messages.append({"role": "user", "content": f"Continue this story from where it left off:\n\n{opener_text}"})
-                    print(f"🔍 Debug: Added opener text to AI context")
+                    chat_log.debug(f"Added opener text to AI context")
                 
-                print(f"🔍 Debug: AI context messages count: {len(context_messages)}")
-                for i, msg in enumerate(context_messages):
-                    print(f"🔍 Debug: AI context {i}: {msg['role']} - {msg['content'][:200]}...")
+                chat_log.debug(f"AI context messages count: {len(context_messages)}")
+                if chat_log.debug_enabled():
+                    for i, msg in enumerate(context_messages):
+                        chat_log.debug(f"AI context {i}: {msg['role']} - {msg['content'][:200]}...")
                 
                 ai_response = chat_with_grok(
                     context_messages,
-                    model=model_env,
+                    model=route.model,
                     temperature=0.7,
-                    max_tokens=session.get('max_tokens', 1200),
-                    return_usage=True
+                    max_tokens=route.limit(session.get('max_tokens', 1200)),
+                    return_usage=True,
+                    timeout=route.timeout,
+                    call_class='story'
                 )
                 
                 # Extract response text and usage info
@@ -2294,19 +2588,19 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                     # Add AI response to session history
                     session['history'].append({"role": "assistant", "content": reply})
                     
-                    # Update scene state with AI response
-                    try:
-                        google_id = session.get('user_id', 'default')
-                        state_manager = StoryStateManager(session_id=google_id)
-                        state_manager.update_state_from_response(reply)
-                        print(f"🔍 Debug: Updated scene state from AI response")
-                    except Exception as e:
-                        print(f"🔍 Debug: State manager error: {e}")
+                    # Update scene state with AI response (one combined analysis call)
+                    if SCENE_STATE_TRACKING:
+                        try:
+                            state_manager = scene_state_manager()
+                            state_manager.update_state_from_response(reply, session['history'])
+                            chat_log.debug(f"Updated scene state from AI response")
+                        except Exception as e:
+                            chat_log.warning(f"State manager error: {e}")
                     
-                    # Save conversation history for persistence
-                    save_conversation_history(session['history'], story_id, None, reply)
+                    # Save conversation history for persistence (the reply is already in history)
+                    save_conversation_history(session['history'], story_id)
                     
-                    print(f"🔍 Debug: AI response generated, length={len(reply)}")
+                    chat_log.debug(f"AI response generated, length={len(reply)}")
                 else:
                     initial_response['ai_response'] = 'Click "Send" to continue the story...'
                     initial_response['response_type'] = 'system'
@@ -2316,7 +2610,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 return jsonify(initial_response)
                 
             except Exception as ai_error:
-                print(f"🔍 Debug: AI response generation failed: {ai_error}")
+                chat_log.warning(f"AI response generation failed: {ai_error}")
                 initial_response['ai_response'] = 'Click "Send" to continue the story...'
                 initial_response['response_type'] = 'system'
                 
@@ -2351,41 +2645,43 @@ Continue the story while maintaining this physical state. Do not have clothes ma
     # Robust session management to prevent cookie overflow
     if 'history' not in session:
         session['history'] = []
-        print(f"🔍 Debug: Created new session history")
+        chat_log.debug(f"Created new session history")
     else:
-        print(f"🔍 Debug: Session history exists with {len(session['history'])} messages")
-        for i, msg in enumerate(session['history']):
-            print(f"🔍 Debug: Existing history {i}: {msg['role']} - {msg['content'][:50]}...")
+        chat_log.debug(f"Session history exists with {len(session['history'])} messages")
+        if chat_log.debug_enabled():
+            for i, msg in enumerate(session['history']):
+                chat_log.debug(f"Existing history {i}: {msg['role']} - {msg['content'][:50]}...")
     
-    print(f"🔍 Debug: Before adding user input - session history has {len(session['history'])} messages")
+    chat_log.debug(f"Before adding user input - session history has {len(session['history'])} messages")
     
     # Keep only last 10 messages to prevent cookie overflow
     if len(session['history']) > 10:
-        print(f"🔍 Debug: Truncating history from {len(session['history'])} to 10 messages to prevent cookie overflow")
+        chat_log.debug(f"Truncating history from {len(session['history'])} to 10 messages to prevent cookie overflow")
         session['history'] = session['history'][-10:]
         # Force session cleanup
         session.modified = True
     
     # Add user message to history
     session['history'].append({"role": "user", "content": user_input})
-    print(f"🔍 Debug: After adding user input - session history has {len(session['history'])} messages")
+    chat_log.debug(f"After adding user input - session history has {len(session['history'])} messages")
     
     try:
-        # Get model from environment
-        model_env = os.getenv("XAI_MODEL", "grok-3")
+        # Model for the story turn (the story's own routing is applied once it is loaded below)
+        story_route = model_route('story')
+        model_env = story_route.model
         api_key = os.getenv("XAI_API_KEY")
         
-        print(f"🔍 Debug: Model: {model_env}")
-        print(f"🔍 Debug: API Key set: {'Yes' if api_key else 'No'}")
-        print(f"🔍 Debug: Starting AI call with {len(session['history'])} messages")
+        chat_log.debug(f"Model: {model_env}")
+        chat_log.debug(f"API Key set: {'Yes' if api_key else 'No'}")
+        chat_log.debug(f"Starting AI call with {len(session['history'])} messages")
         
                             # Limit history length for memory management
         if len(session['history']) > 12:  # Increased for paid tier
-            print(f"🔍 Debug: Truncating history from {len(session['history'])} to 12 messages")
+            chat_log.debug(f"Truncating history from {len(session['history'])} to 12 messages")
             # Keep the most recent 12 messages to preserve chronological order
             # This avoids duplicates and maintains proper message sequence
             session['history'] = session['history'][-12:]
-            print(f"🔍 Debug: History truncated to {len(session['history'])} messages")
+            chat_log.debug(f"History truncated to {len(session['history'])} messages")
             
             # Force garbage collection after history cleanup
             cleanup_resources()
@@ -2393,9 +2689,10 @@ Continue the story while maintaining this physical state. Do not have clothes ma
         # Try AI call with basic continuity for stability
         max_retries = 1  # Single attempt only
         try:
-            print(f"🔍 Debug: Attempting AI call with continuity...")
+            chat_log.debug(f"Attempting AI call with continuity...")
             
             # Build context with hybrid approach: core story context + scene state + key memories + recent history
+            context_build_started = time.perf_counter()
             context_messages = []
             
             # 1. Consolidated system prompt (combines all previous system prompts)
@@ -2444,12 +2741,12 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         "role": "system", 
                         "content": f"CORE STORY CONTEXT:\n{core_story_context}"
                     })
-                    print(f"🔍 Debug: Added core story context to AI context ({len(core_story_context)} chars)")
-                    print(f"🔍 Debug: CORE STORY CONTEXT CONTENT:\n{core_story_context}")
+                    chat_log.debug(f"Added core story context to AI context ({len(core_story_context)} chars)")
+                    chat_log.debug(f"CORE STORY CONTEXT CONTENT:\n{core_story_context}")
                 else:
-                    print(f"🔍 Debug: No core story context available, skipping core context injection")
+                    chat_log.debug(f"No core story context available, skipping core context injection")
             except Exception as e:
-                print(f"🔍 Debug: Error getting core story context: {e}")
+                chat_log.warning(f"Error getting core story context: {e}")
             
             # 2b. Continuity guardrails (preflight) from lightweight ledger
             try:
@@ -2460,9 +2757,9 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         "role": "system",
                         "content": guardrails
                     })
-                    print(f"🔍 Debug: Added continuity guardrails to AI context")
+                    chat_log.debug(f"Added continuity guardrails to AI context")
             except Exception as e:
-                print(f"🔍 Debug: Error adding continuity guardrails: {e}")
+                chat_log.warning(f"Error adding continuity guardrails: {e}")
 
             # 2c. Cast/Location constraints derived from recent history (preflight)
             try:
@@ -2472,9 +2769,9 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         "role": "system",
                         "content": constraints
                     })
-                    print(f"🔍 Debug: Added cast/location constraints to AI context")
+                    chat_log.debug(f"Added cast/location constraints to AI context")
             except Exception as e:
-                print(f"🔍 Debug: Error adding cast/location constraints: {e}")
+                chat_log.warning(f"Error adding cast/location constraints: {e}")
 
             # 2c.1 Physical state assertions (prevent redo of undressing)
             try:
@@ -2484,29 +2781,30 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         "role": "system",
                         "content": phys_state
                     })
-                    print(f"🔍 Debug: Added physical state assertions to AI context")
+                    chat_log.debug(f"Added physical state assertions to AI context")
             except Exception as e:
-                print(f"🔍 Debug: Error adding physical state assertions: {e}")
+                chat_log.warning(f"Error adding physical state assertions: {e}")
 
             # 2d. Event focus (disabled) — allow model to derive cues from user message directly
             try:
-                print("🔍 Debug: Event focus injection disabled; relying on model to derive focus from user input")
+                chat_log.debug("Event focus injection disabled; relying on model to derive focus from user input")
             except Exception:
                 pass
 
             # 3. Scene state (DISABLED - was causing back-skipping issues)
             # Simple approach: just use the conversation history without complex state tracking
-            print(f"🔍 Debug: Scene state tracking disabled to prevent back-skipping")
+            chat_log.debug(f"Scene state tracking disabled to prevent back-skipping")
             
             # 4. Key story points (DISABLED - was causing back-skipping issues)
             # Story points system disabled to prevent conflicting information
-            print(f"🔍 Debug: Story points system disabled to prevent back-skipping")
+            chat_log.debug(f"Story points system disabled to prevent back-skipping")
             
             # 5. Anchor with last assistant → then current user (deterministic)
             if len(session['history']) > 0:
-                print(f"🔍 Debug: Session history has {len(session['history'])} messages")
-                for i, msg in enumerate(session['history']):
-                    print(f"🔍 Debug: Message {i}: {msg['role']} - {msg['content'][:100]}...")
+                chat_log.debug(f"Session history has {len(session['history'])} messages")
+                if chat_log.debug_enabled():
+                    for i, msg in enumerate(session['history']):
+                        chat_log.debug(f"Message {i}: {msg['role']} - {msg['content'][:100]}...")
                 
                 # Find the most recent assistant reply explicitly
                 last_assistant_msg = None
@@ -2516,10 +2814,10 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         break
                 if last_assistant_msg:
                     context_messages.append(last_assistant_msg)
-                    print("🔍 Debug: Added last assistant message to context anchor")
+                    chat_log.debug("Added last assistant message to context anchor")
                 # Always place current user input last
                 context_messages.append({"role": "user", "content": user_input})
-                print("🔍 Debug: Appended current user_input as final context message")
+                chat_log.debug("Appended current user_input as final context message")
                 
                 # Store payload for debugging (after history is added)
                 store_ai_payload('story_generation', context_messages)
@@ -2529,20 +2827,22 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             try:
                 if user_input:
                     # No post-user directive; guidance lives in consolidated system blocks
-                    print("🔍 Debug: Skipped post-user incorporation directive to keep user last")
+                    chat_log.debug("Skipped post-user incorporation directive to keep user last")
             except Exception:
                 pass
             
-            print(f"🔍 Debug: Using {len(context_messages)} messages for context")
-            for i, msg in enumerate(context_messages):
-                print(f"🔍 Debug: Context {i}: {msg['role']} - {msg['content'][:100]}...")
+            chat_log.debug(f"Using {len(context_messages)} messages for context")
+            if chat_log.debug_enabled():
+                for i, msg in enumerate(context_messages):
+                    chat_log.debug(f"Context {i}: {msg['role']} - {msg['content'][:100]}...")
             
             # Log the complete AI payload for debugging
-            print(f"🔍 Debug: COMPLETE AI PAYLOAD:")
-            for i, msg in enumerate(context_messages):
-                print(f"🔍 Debug: Message {i} ({msg['role']}):")
-                print(f"🔍 Debug: {msg['content']}")
-                print(f"🔍 Debug: ---")
+            chat_log.debug(f"COMPLETE AI PAYLOAD:")
+            if chat_log.debug_enabled():
+                for i, msg in enumerate(context_messages):
+                    chat_log.debug(f"Message {i} ({msg['role']}):")
+                    chat_log.debug(f"{msg['content']}")
+                    chat_log.debug(f"---")
             # Audit: context summary
             _audit_write({
                 'event': 'ai_payload',
@@ -2561,20 +2861,20 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             # Use user-specified token count for story generation
             max_tokens_for_call = max(200, min(2000, token_count))  # Use user-specified token count
             
-            print(f"🔍 Debug: About to call AI with {len(context_messages)} messages")
-            print(f"🔍 Debug: Model: {model_env}")
-            print(f"🔍 Debug: Command: {command}")
-            print(f"🔍 Debug: Max tokens: {max_tokens_for_call}")
-            print(f"🔍 Debug: Is /cont command? {command == 'cont'}")
+            chat_log.debug(f"About to call AI with {len(context_messages)} messages")
+            chat_log.debug(f"Model: {model_env}")
+            chat_log.debug(f"Command: {command}")
+            chat_log.debug(f"Max tokens: {max_tokens_for_call}")
+            chat_log.debug(f"Is /cont command? {command == 'cont'}")
             try:
                 last_ctx_user = next((m for m in reversed(context_messages) if m.get('role') == 'user'), None)
-                print(f"🔍 Debug: Last context user message: {(_safe_text(last_ctx_user.get('content'))[:120] if last_ctx_user else 'None')}")
+                chat_log.debug(f"Last context user message: {(_safe_text(last_ctx_user.get('content'))[:120] if last_ctx_user else 'None')}")
             except Exception:
                 pass
             
             # Add timeout handling for /cont commands
             if command == 'cont':
-                print(f"🔍 Debug: /cont command detected - allowing longer processing time")
+                chat_log.debug(f"/cont command detected - allowing longer processing time")
                 # Force cleanup before AI call
                 cleanup_resources()
             
@@ -2588,9 +2888,12 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                         story = Story.query.filter_by(user_id=google_id).filter(Story.story_id.ilike(current_story_id)).first()
                         if story and story.content:
                             story_temperature = story.content.get('ai_temperature', 0.7)
-                            print(f"🔍 Debug: Using story-specific temperature: {story_temperature}")
+                            chat_log.debug(f"Using story-specific temperature: {story_temperature}")
+                            g.model_routing = story.content.get('model_routing')
+                            story_route = model_route('story')
+                            model_env = story_route.model
             except Exception as e:
-                print(f"🔍 Debug: Error getting story temperature, using default: {e}")
+                chat_log.warning(f"Error getting story temperature, using default: {e}")
             
             # Coerce AI params to correct numeric types and guard against bad values
             try:
@@ -2606,18 +2909,23 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             except Exception:
                 coerced_max_tokens = 1200
 
-            print(f"🔍 Debug: Calling AI with max_tokens={coerced_max_tokens} temperature={coerced_temperature} top_p={coerced_top_p}")
-            ai_response = chat_with_grok(
-                context_messages,
-                model=model_env,
-                temperature=coerced_temperature,
-                max_tokens=coerced_max_tokens,
-                top_p=coerced_top_p,
-                hide_thinking=True,
-                return_usage=True,
-                stop=["\n\n\n", "---", "***", "END OF SCENE"]  # Stop at natural break points
-            )
-            print(f"🔍 Debug: AI call completed, response type: {type(ai_response)}")
+            CHAT_STAGE_SECONDS.labels(stage='context_build').observe(time.perf_counter() - context_build_started)
+            chat_log.debug(f"Calling AI with max_tokens={coerced_max_tokens} temperature={coerced_temperature} top_p={coerced_top_p}")
+            with stage_timer('story_generation'):
+                ai_response = chat_with_grok(
+                    context_messages,
+                    model=model_env,
+                    temperature=coerced_temperature,
+                    max_tokens=story_route.limit(coerced_max_tokens),
+                    top_p=coerced_top_p,
+                    hide_thinking=True,
+                    return_usage=True,
+                    stop=["\n\n\n", "---", "***", "END OF SCENE"],  # Stop at natural break points
+                    hedge=True,  # the turn the user waits on; hedged when XAI_HEDGE is on
+                    timeout=story_route.timeout,
+                    call_class='story'
+                )
+            chat_log.debug(f"AI call completed, response type: {type(ai_response)}")
             
             # Extract response text and usage info
             if isinstance(ai_response, dict):
@@ -2632,24 +2940,25 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             # Update the stored payload with the response and usage info
             try:
                 google_id = session.get('user_id')
-                if google_id and google_id in last_ai_payloads and 'story_generation' in last_ai_payloads[google_id]:
-                    last_ai_payloads[google_id]['story_generation']['response'] = reply
-                    last_ai_payloads[google_id]['story_generation']['usage'] = usage
-                    last_ai_payloads[google_id]['story_generation']['finish_reason'] = finish_reason
+                if google_id:
+                    update_ai_payload(google_id, 'story_generation',
+                                      response=reply, usage=usage, finish_reason=finish_reason)
+                record_tokens(usage, exchange_type='story_generation')
+                charge_admission((usage or {}).get('total_tokens') or 0)
             except:
                 pass
             
-            print(f"🔍 Debug: AI response received, length: {len(reply)}")
-            print(f"🔍 Debug: AI response starts with: {reply[:200]}...")
+            chat_log.debug(f"AI response received, length: {len(reply)}")
+            chat_log.debug(f"AI response starts with: {reply[:200]}...")
             
-            print(f"🔍 Debug: AI call successful, reply length={len(reply)}")
+            chat_log.debug(f"AI call successful, reply length={len(reply)}")
         except Exception as ai_error:
-            print(f"🔍 Debug: AI call failed: {ai_error}")
+            chat_log.warning(f"AI call failed: {ai_error}")
             _audit_write({'event': 'ai_error', 'request_id': request_id, 'error': str(ai_error)})
-            print(f"🔍 Debug: Error type: {type(ai_error)}")
+            chat_log.debug(f"Error type: {type(ai_error)}")
             try:
                 import traceback as _tb
-                print(f"🔍 Debug: Traceback:\n{_tb.format_exc()}")
+                chat_log.debug(f"Traceback:\n{_tb.format_exc()}")
             except Exception:
                 pass
             
@@ -2657,7 +2966,11 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             cleanup_resources()
             
             # Return a simple fallback response
-            reply = "I'm having trouble connecting right now. Please try again in a moment."
+            if isinstance(ai_error, CircuitOpenError):
+                reply = (f"I'm having trouble connecting right now. The AI service is recovering; "
+                         f"please try again in {int(ai_error.retry_in) + 1}s.")
+            else:
+                reply = "I'm having trouble connecting right now. Please try again in a moment."
         
         # If reply is fallback error, do NOT update ledger/history/scene
         FALLBACK_PREFIX = "I'm having trouble connecting right now."
@@ -2682,22 +2995,20 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 context_messages,
                 final_reply,
                 locals().get('finish_reason', 'unknown'),
-                model_env,
                 locals().get('story_temperature', 0.7)
             )
             if did_cont:
-                print("🔍 Debug: Applied auto-continuation to complete cutoff response")
+                chat_log.debug("Applied auto-continuation to complete cutoff response")
 
             # Continuity critic revision
             final_reply, did_revise = continuity_critic(
                 context_messages,
                 final_reply,
                 get_continuity_ledger(),
-                model_env,
                 locals().get('story_temperature', 0.7)
             )
             if did_revise:
-                print("🔍 Debug: Applied continuity critic revision to reduce back-skipping")
+                chat_log.debug("Applied continuity critic revision to reduce back-skipping")
 
             # Final sanitize: trim leading recap paragraph if it re-describes established setup
             try:
@@ -2708,7 +3019,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                     # Drop the first paragraph if it looks like recap
                     if first_para_end != -1:
                         final_reply = final_reply[first_para_end+2:]
-                        print("🔍 Debug: Removed recap first paragraph")
+                        chat_log.debug("Removed recap first paragraph")
                 # Remove meta-acknowledgements like "as requested"
                 meta_prefixes = [
                     'as requested,', 'as requested', 'per your request,', 'per your request',
@@ -2725,7 +3036,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                             trimmed = trimmed[cut+1:].lstrip()
                         else:
                             trimmed = ''
-                        print("🔍 Debug: Stripped meta-acknowledgement prefix")
+                        chat_log.debug("Stripped meta-acknowledgement prefix")
                         break
                 if trimmed:
                     final_reply = trimmed
@@ -2738,56 +3049,58 @@ Continue the story while maintaining this physical state. Do not have clothes ma
             # Ensure debug payload reflects final reply
             try:
                 google_id = session.get('user_id')
-                if google_id and google_id in last_ai_payloads and 'story_generation' in last_ai_payloads[google_id]:
-                    last_ai_payloads[google_id]['story_generation']['response'] = final_reply
+                if google_id:
+                    update_ai_payload(google_id, 'story_generation', response=final_reply)
             except Exception:
                 pass
 
             reply = final_reply
         except Exception as post_e:
-            print(f"🔍 Debug: Postflight continuity handlers error: {post_e}")
+            chat_log.warning(f"Postflight continuity handlers error: {post_e}")
 
         # Add response to history with overflow protection
         session['history'].append({"role": "assistant", "content": reply})
-        print(f"🔍 Debug: Added AI response to session history - now has {len(session['history'])} messages")
-        for i, msg in enumerate(session['history']):
-            print(f"🔍 Debug: Final history {i}: {msg['role']} - {msg['content'][:50]}...")
+        chat_log.debug(f"Added AI response to session history - now has {len(session['history'])} messages")
+        if chat_log.debug_enabled():
+            for i, msg in enumerate(session['history']):
+                chat_log.debug(f"Final history {i}: {msg['role']} - {msg['content'][:50]}...")
         
         # Update active scene with new conversation
         current_story_id = get_current_story_id()
-        print(f"🔍 Debug: About to update active scene for story: {current_story_id}")
-        print(f"🔍 Debug: History length: {len(session['history'])}")
+        chat_log.debug(f"About to update active scene for story: {current_story_id}")
+        chat_log.debug(f"History length: {len(session['history'])}")
         update_active_scene(session['history'], current_story_id, user_input, reply)
-        print(f"🔍 Debug: Finished updating active scene")
+        chat_log.debug(f"Finished updating active scene")
         
         # Clean up session to prevent cookie overflow
         if len(session['history']) > 12:
-            print(f"🔍 Debug: Cleaning up session history to prevent cookie overflow")
+            chat_log.debug(f"Cleaning up session history to prevent cookie overflow")
             session['history'] = session['history'][-12:]
             session.modified = True
         
         # State tracking disabled to prevent back-skipping issues
-        print(f"🔍 Debug: State tracking disabled to prevent back-skipping")
+        chat_log.debug(f"State tracking disabled to prevent back-skipping")
         
         # Clean up session if it gets too large
         if len(session['history']) > 12:  # Increased for paid tier
-            print(f"🔍 Debug: Session cleanup - history has {len(session['history'])} messages")
+            chat_log.debug(f"Session cleanup - history has {len(session['history'])} messages")
             # Keep the most recent 12 messages to preserve chronological order
             # This avoids duplicates and maintains proper message sequence
             session['history'] = session['history'][-12:]
-            print(f"🔍 Debug: Session cleaned up to {len(session['history'])} messages")
+            chat_log.debug(f"Session cleaned up to {len(session['history'])} messages")
         
         # TTS will be generated on-demand via button, not automatically
-        print(f"🔍 Debug: TTS enabled: {tts.enabled}")
-        print(f"🔍 Debug: Reply length: {len(reply)}")
-        print(f"🔍 Debug: TTS will be generated on-demand when user clicks 'Play TTS' button")
+        chat_log.debug(f"TTS enabled: {tts.enabled}")
+        chat_log.debug(f"Reply length: {len(reply)}")
+        chat_log.debug(f"TTS will be generated on-demand when user clicks 'Play TTS' button")
         
         # Debug session state at end of request
-        print(f"🔍 Debug: === REQUEST END ===")
-        print(f"🔍 Debug: Final session history has {len(session['history'])} messages")
-        for i, msg in enumerate(session['history']):
-            print(f"🔍 Debug: Final session history {i}: {msg['role']} - {msg['content'][:50]}...")
-        print(f"🔍 Debug: Session modified: {session.modified}")
+        chat_log.debug(f"=== REQUEST END ===")
+        chat_log.debug(f"Final session history has {len(session['history'])} messages")
+        if chat_log.debug_enabled():
+            for i, msg in enumerate(session['history']):
+                chat_log.debug(f"Final session history {i}: {msg['role']} - {msg['content'][:50]}...")
+        chat_log.debug(f"Session modified: {session.modified}")
         
         # Audit: after snapshot
         try:
@@ -2807,7 +3120,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
                 'summaries': ledger_after.get('summaries', [])[-3:],
                 'anchor_tail': _safe_preview(ledger_after.get('anchor_tail', ''), 160),
                 'ban_phrases': ledger_after.get('ban_phrases', [])[:6],
-                'last_two_replies': ledger_after.get('last_two_replies', [])[-2:],
+                'recent_facts': sorted(continuity_ledger.established_facts(ledger_after)),
             }
         })
         # Clean up before sending response
@@ -2816,7 +3129,7 @@ Continue the story while maintaining this physical state. Do not have clothes ma
         # Clean up request tracking before sending response
         if request_id:
             untrack_request(request_id)
-            print(f"🔍 Debug: Request untracked: {request_id}")
+            chat_log.debug(f"Request untracked: {request_id}")
         
         return jsonify({
             'message': reply,
@@ -2827,20 +3140,18 @@ Continue the story while maintaining this physical state. Do not have clothes ma
         
     except Exception as e:
         error_msg = str(e)
-        print(f"🔍 Debug: Exception in chat: {error_msg}")
+        chat_log.debug(f"Exception in chat: {error_msg}")
         if "timeout" in error_msg.lower():
             error_msg = "Request timed out. This may be due to Render free tier limitations. Try again or consider upgrading to a paid plan."
-        print(f"🔍 Debug: About to return main error response")
+        chat_log.debug(f"About to return main error response")
         
         # Clean up request tracking on error
         if request_id:
             untrack_request(request_id)
-            print(f"🔍 Debug: Request untracked on error: {request_id}")
+            chat_log.debug(f"Request untracked on error: {request_id}")
         
         # Log the full error for debugging
-        import traceback
-        print(f"🔍 Debug: Chat endpoint error: {error_msg}")
-        print(f"🔍 Debug: Error traceback: {traceback.format_exc()}")
+        chat_log.exception(f"Chat endpoint error: {error_msg}")
         
         return jsonify({'error': f'Request failed: {error_msg}'}), 500
 
@@ -2855,7 +3166,7 @@ def toggle_tts():
             'message': f"TTS: {tts.get_mode_display()}"
         })
     except Exception as e:
-        print(f"🔍 Debug: Error checking TTS status: {e}")
+        log.warning(f"Error checking TTS status: {e}")
         return jsonify({'error': f'Failed to check TTS status: {str(e)}'})
 
 # Old file-based conversations endpoint removed - using database-only scenes approach
@@ -2864,49 +3175,11 @@ def toggle_tts():
 
 @app.route('/api/opener-files', methods=['GET'])
 def get_opener_files():
-    """Get list of available opener files"""
+    """Get list of available opener files (metadata from the in-memory opener catalog)"""
     try:
-        import glob
-        opener_files = glob.glob("opener*.txt")
-        opener_files.sort()  # Sort alphabetically
-        
-        # Create a more user-friendly list with descriptions
-        opener_list = []
-        for filename in opener_files:
-            # Extract description from filename
-            name = filename.replace('.txt', '').replace('opener_', '').replace('_', ' ')
-            if name == '2char':
-                description = "2 characters - Generic office scenario"
-            elif name == '3char':
-                description = "3 characters - Emma, Alex & Jordan (threesome)"
-            elif name == '4char':
-                description = "4 characters - Rachel, Marcus, Sophia & David (foursome)"
-            elif name == '5char':
-                description = "5 characters - Isabella, James, Elena, Carlos & Maya (club VIP)"
-            elif name == 'office 3':
-                description = "3 characters - Jennifer, Mr. Thompson & Lisa (office)"
-            elif name == 'party 4':
-                description = "4 characters - Taylor, Chris, Ashley & Ryan (college party)"
-            elif name == 'swingers':
-                description = "4 characters - Michelle, Robert, Jessica & Michael (swingers)"
-            elif name == 'bachelorette':
-                description = "6 characters - Amanda, Brooke, Nicole, Vanessa, Tiffany & Destiny"
-            elif name == 'fantasy':
-                description = "6 characters - Aria, Thorne, Gimli, Pip, Grok & Zara (fantasy RPG)"
-            elif name == 'sarah mike':
-                description = "2 characters - Sarah & Mike (specific names)"
-            else:
-                description = f"{name} characters"
-            
-            opener_list.append({
-                'filename': filename,
-                'name': name.title(),
-                'description': description
-            })
-        
-        return jsonify({'opener_files': opener_list})
+        return jsonify({'opener_files': opener_catalog.list()})
     except Exception as e:
-        print(f"🔍 Debug: Error getting opener files: {e}")
+        log.warning(f"Error getting opener files: {e}")
         return jsonify({'error': f'Failed to get opener files: {str(e)}'})
 
 @app.route('/api/voices', methods=['GET'])
@@ -2929,22 +3202,21 @@ def tts_status():
 
 @app.route('/api/audit-tail')
 def audit_tail():
-    """Return the last N audit entries (parsed) when DEBUG_AUDIT=1"""
+    """Return the last N audit entries (parsed) when DEBUG_AUDIT=1.
+
+    Optional filters: ?request_id=...&event=...; ?rotated=1 also searches compressed files.
+    """
     try:
         limit = int(request.args.get('limit', '50'))
         if not DEBUG_AUDIT:
             return jsonify({'error': 'Audit disabled'}), 403
-        if not os.path.exists(AUDIT_PATH):
-            return jsonify({'entries': []})
-        with open(AUDIT_PATH, 'r', encoding='utf-8') as f:
-            lines = f.readlines()[-max(1, min(500, limit)):]  # cap at 500
-        entries = []
-        for ln in lines:
-            try:
-                entries.append(_json.loads(ln))
-            except Exception:
-                continue
-        return jsonify({'entries': entries})
+        entries = audit.tail(
+            limit=max(1, min(500, limit)),  # cap at 500
+            request_id=request.args.get('request_id') or None,
+            event=request.args.get('event') or None,
+            include_rotated=request.args.get('rotated') == '1',
+        )
+        return jsonify({'entries': entries, 'dropped': audit.dropped})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2967,10 +3239,11 @@ def set_tts_voice():
             'message': f'Voice changed to: {voice_id}'
         })
     except Exception as e:
-        print(f"🔍 Debug: Error setting TTS voice: {e}")
+        log.warning(f"Error setting TTS voice: {e}")
         return jsonify({'error': f'Failed to set TTS voice: {str(e)}'})
 
 @app.route('/api/tts-generate', methods=['POST'])
+@admission_control('tts')
 def generate_tts_on_demand():
     """Generate TTS for a specific message content on demand"""
     try:
@@ -2992,21 +3265,23 @@ def generate_tts_on_demand():
                 return jsonify({'error': 'No AI response found to generate TTS for'})
             
             message_content = assistant_messages[-1]['content']
-            print(f"🔍 Debug: No specific message provided, using most recent AI response (length: {len(message_content)})")
+            log.debug(f"No specific message provided, using most recent AI response (length: {len(message_content)})")
         else:
-            print(f"🔍 Debug: Generating TTS for specific message content (length: {len(message_content)})")
+            log.debug(f"Generating TTS for specific message content (length: {len(message_content)})")
+        
+        charge_admission(len(message_content))  # ElevenLabs bills by character
         
         # Ensure voice ID is loaded fresh from file before generating TTS
-        print(f"🔍 Debug: Ensuring voice ID is loaded from file before TTS generation")
+        log.debug(f"Ensuring voice ID is loaded from file before TTS generation")
         tts.voice_id = tts._load_voice_id()
-        print(f"🔍 Debug: Using voice ID: {tts.voice_id}")
+        log.debug(f"Using voice ID: {tts.voice_id}")
         
         # Generate TTS for the response
         if len(message_content) < 2000:  # Short responses - generate immediately
-            print(f"🔍 Debug: Short response - using immediate TTS")
+            log.debug(f"Short response - using immediate TTS")
             audio_file = tts.speak(message_content, save_audio=True)
             if audio_file:
-                print(f"🔍 Debug: TTS generated immediately: {audio_file}")
+                log.debug(f"TTS generated immediately: {audio_file}")
                 return jsonify({
                     'success': True,
                     'audio_file': audio_file,
@@ -3015,12 +3290,12 @@ def generate_tts_on_demand():
             else:
                 return jsonify({'error': 'Failed to generate TTS'})
         else:  # Long responses - generate asynchronously
-            print(f"🔍 Debug: Long response - using async TTS")
+            log.debug(f"Long response - using async TTS")
             # Create a simple request ID for TTS generation
             request_id = hashlib.md5(f"tts_on_demand:{len(message_content)}:{time.time()}".encode()).hexdigest()[:8]
             audio_file = generate_tts_async(message_content, save_audio=True, request_id=request_id)
             if audio_file == "generating":
-                print(f"🔍 Debug: Async TTS started for on-demand request")
+                log.debug(f"Async TTS started for on-demand request")
                 return jsonify({
                     'success': True,
                     'audio_file': 'generating',
@@ -3030,9 +3305,7 @@ def generate_tts_on_demand():
                 return jsonify({'error': 'Failed to start TTS generation'})
                 
     except Exception as e:
-        print(f"🔍 Debug: Error generating TTS on-demand: {e}")
-        import traceback
-        print(f"🔍 Debug: TTS on-demand error traceback: {traceback.format_exc()}")
+        log.exception(f"Error generating TTS on-demand: {e}")
         return jsonify({'error': f'Failed to generate TTS: {str(e)}'})
 
 @app.route('/api/debug-info', methods=['GET'])
@@ -3052,6 +3325,9 @@ def get_debug_info():
                 'REQUEST_TIMEOUT': os.getenv('REQUEST_TIMEOUT', 'Not Set'),
                 'WORKER_TIMEOUT': os.getenv('WORKER_TIMEOUT', 'Not Set')
             },
+            'model_routing': model_routing.routing_table(),
+            'usage_ledger': dict(usage_ledger.ledger.stats, enabled=usage_ledger.ledger.enabled,
+                                 pending=usage_ledger.ledger.pending(), dropped=usage_ledger.ledger.dropped),
             'tts_status': {
                 'enabled': tts.enabled,
                 'api_key_set': bool(tts.api_key)
@@ -3070,7 +3346,7 @@ def get_debug_info():
         
         return jsonify(debug_info)
     except Exception as e:
-        print(f"🔍 Debug: Error getting debug info: {e}")
+        log.exception(f"Error getting debug info: {e}")
         import traceback
         return jsonify({
             'error': f'Failed to get debug info: {str(e)}',
@@ -3156,7 +3432,7 @@ def load_conversation():
         if history:
             # Update session with loaded history
             session['history'] = history
-            print(f"🔍 Debug: Loaded conversation history into session ({len(history)} messages)")
+            log.debug(f"Loaded conversation history into session ({len(history)} messages)")
             
             return jsonify({
                 'success': True,
@@ -3170,7 +3446,7 @@ def load_conversation():
             })
             
     except Exception as e:
-        print(f"🔍 Debug: Error loading conversation: {e}")
+        log.exception(f"Error loading conversation: {e}")
         import traceback
         return jsonify({
             'error': f'Failed to load conversation: {str(e)}',
@@ -3200,7 +3476,7 @@ def save_conversation():
         if success:
             # Update session with the saved history
             session['history'] = history
-            print(f"🔍 Debug: Saved and updated session with {len(history)} messages")
+            log.debug(f"Saved and updated session with {len(history)} messages")
             
             return jsonify({
                 'success': True,
@@ -3211,7 +3487,7 @@ def save_conversation():
             return jsonify({'error': 'Failed to save conversation to file'})
             
     except Exception as e:
-        print(f"🔍 Debug: Error saving conversation: {e}")
+        log.exception(f"Error saving conversation: {e}")
         import traceback
         return jsonify({
             'error': f'Failed to save conversation: {str(e)}',
@@ -3226,8 +3502,8 @@ def clear_scene():
         session['history'] = []
         # Reset continuity ledger to avoid stale preflight context
         try:
-            session['continuity_ledger'] = {}
-            print("🔍 Debug: Continuity ledger reset for clear-scene")
+            reset_continuity_ledger()
+            log.debug("Continuity ledger reset for clear-scene")
         except Exception:
             pass
         
@@ -3237,7 +3513,7 @@ def clear_scene():
         if 'story_id' in session:
             del session['story_id']
         
-        print("🔍 Debug: Cleared scene from session")
+        log.debug("Cleared scene from session")
         
         return jsonify({
             'success': True,
@@ -3245,17 +3521,57 @@ def clear_scene():
         })
             
     except Exception as e:
-        print(f"🔍 Debug: Error clearing scene: {e}")
+        log.exception(f"Error clearing scene: {e}")
         import traceback
         return jsonify({
             'error': f'Failed to clear scene: {str(e)}',
             'traceback': traceback.format_exc()
         })
 
+# Listing pages (scenes, story catalog): newest first, keyset-paginated on (updated_at, id)
+PAGE_DEFAULT = 100
+PAGE_MAX = 500
+
+def _encode_keyset_cursor(updated_at, row_id):
+    raw = json.dumps([updated_at.isoformat() if updated_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_keyset_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    updated_at, row_id = json.loads(raw)
+    return (datetime.fromisoformat(updated_at) if updated_at else None), int(row_id)
+
+def _keyset_page(query, model):
+    """Apply ?cursor= and ?limit= to a query over model; returns (rows, next_cursor).
+    Raises ValueError for a malformed cursor."""
+    limit = max(1, min(request.args.get('limit', PAGE_DEFAULT, type=int), PAGE_MAX))
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_updated, after_id = _decode_keyset_cursor(cursor)
+        except Exception:
+            raise ValueError('Invalid cursor')
+        query = query.filter(db.or_(
+            model.updated_at < after_updated,
+            db.and_(model.updated_at == after_updated, model.id < after_id)
+        ))
+    rows = query.order_by(model.updated_at.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = _encode_keyset_cursor(rows[limit - 1].updated_at, rows[limit - 1].id)
+    return rows[:limit], next_cursor
+
+def _conditional_json(payload):
+    """JSON response with an ETag of its body; answers If-None-Match with 304"""
+    response = jsonify(payload)
+    response.set_etag(hashlib.md5(response.get_data()).hexdigest())
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/scenes/<story_id>', methods=['GET'])
 @require_auth
 def get_story_scenes(story_id):
-    """Get all scenes for a specific story"""
+    """List a story's scenes (titles and counts only; ?limit=&cursor= pages, ETag for 304s)"""
     try:
         # Get current user from session
         google_id = session.get('user_id')
@@ -3269,28 +3585,35 @@ def get_story_scenes(story_id):
         if not ensure_tables_exist():
             return jsonify({'error': 'Database tables not available'}), 500
         
-        # Get scenes for this story and user (case-insensitive)
-        scenes = Scene.query.filter(
-            Scene.story_id.ilike(story_id),
-            Scene.user_id == google_id
-        ).order_by(Scene.updated_at.desc()).all()
+        # Listing columns only: the history JSON is never read here (see get_story_scene).
+        # Case-insensitive story match served by ix_scenes_user_story_updated.
+        query = db.session.query(
+            Scene.id, Scene.title, Scene.message_count, Scene.created_at, Scene.updated_at
+        ).filter(
+            Scene.user_id == google_id,
+            db.func.lower(Scene.story_id) == story_id.lower()
+        )
+        try:
+            rows, next_cursor = _keyset_page(query, Scene)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         scene_list = []
-        for scene in scenes:
+        for row in rows:
             scene_list.append({
-                'id': scene.id,
-                'title': scene.title,
-                'message_count': scene.message_count,
-                'created_at': scene.created_at.isoformat() if scene.created_at else None,
-                'updated_at': scene.updated_at.isoformat() if scene.updated_at else None
+                'id': row.id,
+                'title': row.title,
+                'message_count': row.message_count,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'updated_at': row.updated_at.isoformat() if row.updated_at else None
             })
         
-        print(f"🔍 Debug: Found {len(scene_list)} scenes for story {story_id} (user: {google_id})")
-        print(f"🔍 Debug: Query was for story_id='{story_id}' (case-insensitive)")
-        return jsonify({'scenes': scene_list})
+        log.debug(f"Found {len(scene_list)} scenes for story {story_id} (user: {google_id}, more: {bool(next_cursor)})")
+        # The page body changes whenever a listed scene does, so its hash is the ETag
+        return _conditional_json({'scenes': scene_list, 'next_cursor': next_cursor})
         
     except Exception as e:
-        print(f"🔍 Debug: Error getting story scenes: {e}")
+        log.error(f"Error getting story scenes: {e}")
         return jsonify({'error': f'Could not get scenes: {e}'}), 500
 
 @app.route('/api/scenes/<story_id>/<int:scene_id>', methods=['GET'])
@@ -3324,7 +3647,7 @@ def get_story_scene(story_id, scene_id):
         session['history'] = scene.history
         session['current_story_id'] = story_id
         
-        print(f"🔍 Debug: Loaded scene {scene_id} for story {story_id}")
+        log.debug(f"Loaded scene {scene_id} for story {story_id}")
         
         return jsonify({
             'success': True,
@@ -3339,9 +3662,82 @@ def get_story_scene(story_id, scene_id):
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Error getting scene: {e}")
+        log.error(f"Error getting scene: {e}")
         return jsonify({'error': f'Could not get scene: {e}'}), 500
 
+def _scene_export_pieces(scene_ids, fmt):
+    """Scenes one at a time: each row is loaded, written out and released before the next"""
+    for scene_id in scene_ids:
+        scene = db.session.get(Scene, scene_id)
+        if scene is None:
+            continue
+        meta = {
+            'id': scene.id,
+            'story_id': scene.story_id,
+            'title': scene.title,
+            'message_count': scene.message_count,
+            'created_at': scene.created_at.isoformat() if scene.created_at else None,
+            'updated_at': scene.updated_at.isoformat() if scene.updated_at else None
+        }
+        if fmt == 'ndjson':
+            yield ndjson({'type': 'scene', **meta})
+        else:
+            yield banner(f"SCENE {scene.id}: {scene.title}")
+            yield f"Messages: {scene.message_count}  Updated: {meta['updated_at']}\n"
+        for i, message in enumerate(scene.history or []):
+            if fmt == 'ndjson':
+                yield ndjson({'type': 'message', 'scene_id': scene.id, 'index': i,
+                              'role': message.get('role', 'unknown'), 'content': message.get('content', '')})
+            else:
+                yield f"\n--- Message {i+1} ---\nRole: {message.get('role', 'unknown')}\nContent: {message.get('content', '')}\n"
+        yield "\n" if fmt != 'ndjson' else ''
+        db.session.expunge(scene)
+
+@app.route('/api/scenes/<story_id>/export', methods=['GET'])
+@require_auth
+def export_story_scenes(story_id):
+    """Download a story's scenes (or ?scene_id=N) as a streamed text or NDJSON (?format=ndjson) file"""
+    try:
+        google_id = session.get('user_id')
+        if not google_id:
+            return jsonify({'error': 'User not found in session'}), 401
+        
+        if not DATABASE_AVAILABLE:
+            return jsonify({'error': 'Database not available'}), 500
+        
+        if not ensure_tables_exist():
+            return jsonify({'error': 'Database tables not available'}), 500
+        
+        # Ids only; histories are loaded scene by scene while streaming
+        query = db.session.query(Scene.id).filter(
+            Scene.story_id.ilike(story_id),
+            Scene.user_id == google_id
+        )
+        scene_id = request.args.get('scene_id', type=int)
+        if scene_id is not None:
+            query = query.filter(Scene.id == scene_id)
+        scene_ids = [row.id for row in query.order_by(Scene.created_at.asc(), Scene.id.asc())]
+        if not scene_ids:
+            return jsonify({'error': 'Scene not found' if scene_id is not None else 'No scenes found'}), 404
+
+        fmt = _export_format()
+        extension, mimetype = ('ndjson', 'application/x-ndjson') if fmt == 'ndjson' else ('txt', 'text/plain')
+        safe_story = re.sub(r'[^A-Za-z0-9_.-]', '_', story_id)
+        filename = f"scenes_{safe_story}{'_' + str(scene_id) if scene_id is not None else ''}.{extension}"
+        log.debug(f"Streaming {len(scene_ids)} scenes of story {story_id} as {fmt}")
+        return Response(
+            stream_with_context(chunked(_scene_export_pieces(scene_ids, fmt))),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Content-Type': f'{mimetype}; charset=utf-8'
+            }
+        )
+        
+    except Exception as e:
+        log.error(f"Error exporting scenes: {e}")
+        return jsonify({'error': f'Could not export scenes: {e}'}), 500
+
 @app.route('/api/active-session', methods=['GET'])
 @require_auth
 def get_active_session():
@@ -3395,7 +3791,7 @@ def get_active_session():
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Error getting active session: {e}")
+        log.error(f"Error getting active session: {e}")
         return jsonify({'error': f'Could not get active session: {e}'}), 500
 
 @app.route('/api/set-active-story', methods=['POST'])
@@ -3425,7 +3821,7 @@ def set_active_story():
         user = User.query.filter_by(google_id=google_id).first()
         if user:
             user.active_story_id = story_id
-            print(f"🔍 Debug: Set {story_id} as active story for user {google_id}")
+            log.debug(f"Set {story_id} as active story for user {google_id}")
         
         # Find or create the active scene for this story
         active_scene = Scene.query.filter(
@@ -3440,7 +3836,7 @@ def set_active_story():
                 active_scene = Scene.query.filter_by(id=story.default_scene_id).first()
                 if active_scene:
                     active_scene.is_active = True
-                    print(f"🔍 Debug: Set default scene {active_scene.id} as active for story {story_id}")
+                    log.debug(f"Set default scene {active_scene.id} as active for story {story_id}")
         
         db.session.commit()
         
@@ -3452,11 +3848,12 @@ def set_active_story():
             'message': f'Active story set to {story_id}'
         })
     except Exception as e:
-        print(f"🔍 Debug: Error setting active story: {e}")
+        log.error(f"Error setting active story: {e}")
         return jsonify({'error': f'Could not set active story: {e}'}), 500
 
 @app.route('/api/clear-active-scene', methods=['POST'])
 @require_auth
+@admission_control('chat')
 def clear_active_scene():
     """Clear the active scene and reset to the Opening scene"""
     try:
@@ -3489,7 +3886,7 @@ def clear_active_scene():
             default_scene.is_active = True
             default_scene.history = []  # Clear the history
             default_scene.message_count = 0
-            print(f"🔍 Debug: Reset to Opening scene {default_scene.id} for story {user.active_story_id}")
+            log.debug(f"Reset to Opening scene {default_scene.id} for story {user.active_story_id}")
         
         db.session.commit()
         
@@ -3502,30 +3899,29 @@ def clear_active_scene():
             session['history'] = []
             # Reset continuity ledger so no prior guardrails leak into the new scene
             try:
-                session['continuity_ledger'] = {}
-                print("🔍 Debug: Continuity ledger reset for clear-active-scene")
+                reset_continuity_ledger()
+                log.debug("Continuity ledger reset for clear-active-scene")
             except Exception:
                 pass
             session['history'].append({"role": "user", "content": opener_text})
-            print(f"🔍 Debug: Added opener content to session for cleared scene")
+            log.debug(f"Added opener content to session for cleared scene")
             
             # Reset the story state manager to clear old state
             try:
-                google_id = session.get('user_id', 'default')
-                state_manager = StoryStateManager(session_id=google_id)
+                state_manager = scene_state_manager(user.active_story_id, str(default_scene.id))
                 state_manager.reset_state()
-                print(f"🔍 Debug: Reset story state manager to clear old state")
+                log.debug(f"Reset story state manager to clear old state")
             except Exception as e:
-                print(f"🔍 Debug: Error resetting story state manager: {e}")
+                log.warning(f"Error resetting story state manager: {e}")
             
             # Update the active scene with the opener content
             default_scene.history = session['history']
             default_scene.message_count = 1
             db.session.commit()
             
-            print(f"🔍 Debug: Updated default scene {default_scene.id} with opener content")
-            print(f"🔍 Debug: Default scene history length: {len(default_scene.history)}")
-            print(f"🔍 Debug: Default scene is_active: {default_scene.is_active}")
+            log.debug(f"Updated default scene {default_scene.id} with opener content")
+            log.debug(f"Default scene history length: {len(default_scene.history)}")
+            log.debug(f"Default scene is_active: {default_scene.is_active}")
             
             # Also clear the current story ID from session to force reload
             if 'story_id' in session:
@@ -3533,11 +3929,12 @@ def clear_active_scene():
             if 'current_story_id' in session:
                 del session['current_story_id']
             
-            print(f"🔍 Debug: Cleared story ID from session to force reload")
+            log.debug(f"Cleared story ID from session to force reload")
             
             # Generate an initial AI response from the opener (mirror /loadstory behavior)
             try:
-                model_env = os.getenv('XAI_MODEL', 'grok-3')
+                g.model_routing = story_content.get('model_routing')
+                route = model_route('story')
                 # Build a minimal context: consolidated system prompt + opener
                 consolidated_system = (
                     "You are an explicit, uncensored erotic storyteller assisting users in exploration of their sexual fantasies and breaking of taboos. Write with vivid, sensual language that captures the intensity, visceral physical response,  and passion of intimate moments. Use descriptive, evocative terms for erotic visual elements, physical sensations, emotions, and actions. Be bold and unflinching in your descriptions while maintaining the story's narrative flow and character development.\n\n"
@@ -3585,10 +3982,12 @@ def clear_active_scene():
 
                 ai_response = chat_with_grok(
                     context_messages,
-                    model=model_env,
+                    model=route.model,
                     temperature=story_temperature,
-                    max_tokens=session.get('max_tokens', 1200),
-                    return_usage=True
+                    max_tokens=route.limit(session.get('max_tokens', 1200)),
+                    return_usage=True,
+                    timeout=route.timeout,
+                    call_class='story'
                 )
 
                 if isinstance(ai_response, dict):
@@ -3639,7 +4038,7 @@ def clear_active_scene():
                 'message': f'Active scene cleared and reset to Opening (no opener content)'
             })
     except Exception as e:
-        print(f"🔍 Debug: Error clearing active scene: {e}")
+        log.error(f"Error clearing active scene: {e}")
         return jsonify({'error': f'Could not clear active scene: {e}'}), 500
 
 @app.route('/api/current-story-id', methods=['GET'])
@@ -3659,7 +4058,7 @@ def get_current_story_id_api():
                 'message': 'No story currently loaded'
             })
     except Exception as e:
-        print(f"🔍 Debug: Error getting current story ID: {e}")
+        log.error(f"Error getting current story ID: {e}")
         return jsonify({'error': f'Could not get current story ID: {e}'}), 500
 
 @app.route('/api/scenes/<story_id>', methods=['POST'])
@@ -3704,7 +4103,7 @@ def save_story_scene(story_id):
             existing.message_count = len(history)
             existing.updated_at = datetime.utcnow()
             db.session.commit()
-            print(f"🔍 Debug: Overwrote scene '{title}' (id={existing.id}) for story '{story_id}' with {len(history)} messages")
+            log.debug(f"Overwrote scene '{title}' (id={existing.id}) for story '{story_id}' with {len(history)} messages")
             return jsonify({
                 'success': True,
                 'message': 'Scene updated successfully',
@@ -3721,7 +4120,7 @@ def save_story_scene(story_id):
             )
             db.session.add(new_scene)
             db.session.commit()
-            print(f"🔍 Debug: Created scene '{title}' (id={new_scene.id}) for story '{story_id}' with {len(history)} messages")
+            log.debug(f"Created scene '{title}' (id={new_scene.id}) for story '{story_id}' with {len(history)} messages")
             return jsonify({
                 'success': True,
                 'message': 'Scene created successfully',
@@ -3730,9 +4129,130 @@ def save_story_scene(story_id):
             })
         
     except Exception as e:
-        print(f"🔍 Debug: Error saving scene: {e}")
+        log.error(f"Error saving scene: {e}")
         return jsonify({'error': f'Could not save scene: {e}'}), 500
 
+@app.route('/api/log-debug', methods=['GET', 'POST'])
+@require_auth
+def log_debug_toggle():
+    """Switch verbose debug logging on/off for one user at runtime (expires automatically)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        target = data.get('user_id') or request.args.get('user_id') or session.get('user_id')
+        if target != session.get('user_id') and not is_admin():
+            return jsonify({'error': 'Only admins can change debug logging for other users'}), 403
+
+        key = f"log:debug:{target}"
+        if request.method == 'POST':
+            if data.get('enabled'):
+                minutes = max(1, min(24 * 60, int(data.get('minutes', LOG_DEBUG_DEFAULT_MINUTES))))
+                shared_state.set(key, datetime.utcnow().isoformat(), ttl=minutes * 60)
+                log.info(f"Debug logging enabled for {minutes} minutes", target=target)
+            else:
+                shared_state.delete(key)
+                log.info("Debug logging disabled", target=target)
+
+        return jsonify({'success': True, 'user_id': target, 'debug': shared_state.get(key) is not None})
+    except Exception as e:
+        log.error(f"Error toggling debug logging: {e}")
+        return jsonify({'error': f'Could not toggle debug logging: {e}'}), 500
+
+# /api/usage group_by names -> usage_daily columns
+USAGE_GROUPS = {'day': 'day', 'user': 'user_id', 'story': 'story_id', 'stage': 'stage', 'model': 'model'}
+
+@app.route('/api/usage', methods=['GET'])
+@require_auth
+def usage_report():
+    """Token and latency totals from the daily usage rollups, largest first.
+
+    ?days=7 (up to 366), ?group_by=stage (any of day,user,story,stage,model, comma separated),
+    ?story_id= limits to one story. Own usage only; admins may pass ?user=<id> or ?user=all.
+    """
+    if not DATABASE_AVAILABLE or not ensure_tables_exist():
+        return jsonify({'error': 'Database not available'}), 500
+    try:
+        days = max(1, min(366, int(request.args.get('days', '7'))))
+    except ValueError:
+        return jsonify({'error': 'days must be a number'}), 400
+    groups = [name.strip() for name in request.args.get('group_by', 'stage').split(',') if name.strip()]
+    if not groups or any(name not in USAGE_GROUPS for name in groups):
+        return jsonify({'error': f"group_by must be some of {', '.join(USAGE_GROUPS)}"}), 400
+    user_id = session.get('user_id')
+    requested = request.args.get('user')
+    if requested and requested != user_id:
+        if not is_admin():
+            return jsonify({'error': 'Admin access required'}), 403
+        user_id = None if requested == 'all' else requested
+
+    usage_ledger.ledger.flush(timeout=1.0)  # include calls still waiting for the writer
+    since = (datetime.utcnow() - timedelta(days=days - 1)).date()
+    columns = [getattr(UsageDaily, USAGE_GROUPS[name]) for name in groups]
+    sums = [db.func.sum(getattr(UsageDaily, column)) for column in usage_ledger.ROLLUP_SUMS]
+    try:
+        query = db.session.query(*columns, *sums).filter(UsageDaily.day >= since)
+        if user_id:
+            query = query.filter(UsageDaily.user_id == user_id)
+        if request.args.get('story_id'):
+            query = query.filter(UsageDaily.story_id == request.args['story_id'])
+        rows = query.group_by(*columns).all()
+    except Exception as e:
+        log.warning(f"Usage report failed: {e}")
+        return jsonify({'error': 'Usage tables not available - run `flask --app web_app db upgrade`'}), 500
+
+    report = []
+    totals = dict.fromkeys(usage_ledger.ROLLUP_SUMS, 0)
+    for row in rows:
+        entry = {name: value.isoformat() if hasattr(value, 'isoformat') else value
+                 for name, value in zip(groups, row[:len(groups)])}
+        for column, value in zip(usage_ledger.ROLLUP_SUMS, row[len(groups):]):
+            entry[column] = int(value or 0)
+            totals[column] += entry[column]
+        report.append(entry)
+    for entry in report + [totals]:
+        entry['total_tokens'] = entry['prompt_tokens'] + entry['completion_tokens']
+        entry['avg_latency_ms'] = entry['latency_ms'] // entry['calls'] if entry['calls'] else 0
+    report.sort(key=lambda entry: (entry['total_tokens'], entry['latency_ms']), reverse=True)
+    return _conditional_json({'success': True, 'since': since.isoformat(), 'days': days, 'group_by': groups,
+                              'user': user_id or 'all', 'rows': report, 'totals': totals})
+
+@app.route('/api/profiles', methods=['GET'])
+@require_auth
+def list_request_profiles():
+    """List stored request profiles (own profiles; admins see all)"""
+    google_id = session.get('user_id')
+    limit = max(1, min(200, int(request.args.get('limit', '50'))))
+    return jsonify({'success': True, 'profiles': profiling.list_profiles(user=None if is_admin() else google_id, limit=limit)})
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+@require_auth
+def download_request_profile(profile_id):
+    """Download a stored profile: ?format=txt (default), prof (pstats) or folded (flamegraph stacks)"""
+    meta = profiling.get_profile(profile_id)
+    if not meta or (meta.get('user') != session.get('user_id') and not is_admin()):
+        return jsonify({'error': 'Profile not found'}), 404
+    fmt = request.args.get('format', 'txt')
+    path = profiling.profile_path(profile_id, fmt)
+    if not path:
+        return jsonify({'error': f'Format {fmt} not available', 'formats': meta.get('formats', [])}), 404
+    return send_from_directory(os.path.abspath(profiling.PROFILE_DIR), os.path.basename(path),
+                               as_attachment=fmt != 'txt', mimetype='text/plain' if fmt != 'prof' else None)
+
+@app.route('/api/profile-toggle', methods=['POST'])
+@require_auth
+def profile_toggle():
+    """Admin: profile every request of one user (or all users) for a while without redeploying"""
+    if not is_admin():
+        return jsonify({'error': 'Admin only'}), 403
+    data = request.get_json(silent=True) or {}
+    key = 'profile:all' if data.get('all') else f"profile:user:{data.get('user_id') or session.get('user_id')}"
+    if data.get('enabled'):
+        minutes = max(1, min(240, int(data.get('minutes', 15))))
+        shared_state.set(key, datetime.utcnow().isoformat(), ttl=minutes * 60)
+    else:
+        shared_state.delete(key)
+    profiling.forget_toggle(key)
+    return jsonify({'success': True, 'key': key, 'enabled': shared_state.get(key) is not None})
+
 @app.route('/api/debug-payload', methods=['GET'])
 @require_auth
 def get_debug_payload():
@@ -3742,167 +4262,160 @@ def get_debug_payload():
         if not google_id:
             return jsonify({'error': 'User not found in session'}), 401
         
-        user_payloads = last_ai_payloads.get(google_id, {})
+        user_payloads = get_ai_payloads(google_id)
         
         return jsonify({
             'success': True,
-            'payloads': user_payloads
+            'payloads': user_payloads,
+            'profiles': profiling.list_profiles(user=None if is_admin() else google_id, limit=20)
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Error getting debug payload: {e}")
+        log.error(f"Error getting debug payload: {e}")
         return jsonify({'error': f'Could not get debug payload: {e}'}), 500
 
+def _export_format():
+    """'ndjson' or 'text', from ?format= or the JSON body"""
+    body = request.get_json(silent=True) or {}
+    fmt = (request.args.get('format') or body.get('format') or 'text').lower()
+    return 'ndjson' if fmt in ('ndjson', 'jsonl') else 'text'
+
+def _server_info():
+    return {
+        'python_version': sys.version,
+        'current_directory': os.getcwd(),
+        'tts_enabled': tts.enabled,
+        'tts_status': tts.get_mode_display(),
+        'api_key_set': bool(os.getenv('XAI_API_KEY')),
+        'model': os.getenv('XAI_MODEL', 'grok-3'),
+    }
+
+def _debug_export_text(google_id, history, ledger, profiles, server):
+    """Text debug report, one section (and one stored payload) at a time"""
+    yield banner("GROK PLAYGROUND DEBUG EXPORT")
+    yield f"Export Date: {datetime.now().isoformat()}\nUser ID: {google_id}\n\n"
+
+    yield banner("CHAT HISTORY")
+    if history:
+        for i, message in enumerate(history):
+            yield f"\n--- Message {i+1} ---\nRole: {message.get('role', 'unknown')}\nContent: {message.get('content', '')}\n\n"
+    else:
+        yield "No chat history found.\n"
+    yield "\n"
+
+    # Story points and state extraction are disabled to prevent back-skipping
+    yield banner("STORY POINTS")
+    yield "1. Story points system disabled to prevent back-skipping issues\n\n"
+    yield banner("CURRENT STORY STATE")
+    yield from json_pieces({"message": "State extraction disabled to prevent back-skipping issues"})
+    yield "\n\n"
+
+    yield banner("AI PAYLOADS")
+    found = False
+    for payload_type, payload_data in iter_ai_payloads(google_id):
+        found = True
+        yield f"\n--- {payload_type.upper()} ---\n"
+        yield f"Timestamp: {payload_data.get('timestamp', 'unknown')}\n"
+        yield f"Payload Size: {payload_data.get('payload_size', 'unknown')} chars\n\n"
+        yield "PAYLOAD (INPUT):\n"
+        yield from json_pieces(payload_data.get('payload', {}))
+        yield "\n\n"
+        if payload_data.get('response'):
+            yield "RESPONSE (OUTPUT):\n"
+            yield payload_data['response']
+            yield "\n\n"
+        if payload_data.get('usage'):
+            yield "USAGE INFO:\n"
+            yield from json_pieces(payload_data['usage'])
+            yield "\n\n"
+        if payload_data.get('finish_reason'):
+            yield f"FINISH REASON: {payload_data['finish_reason']}\n\n"
+        yield "-" * 60 + "\n"
+    if not found:
+        yield "No AI payloads found.\n"
+    yield "\n"
+
+    yield banner("CONTINUITY LEDGER")
+    yield from json_pieces(ledger)
+    yield "\n\n"
+
+    # Request profiles (newest first, with their text summaries)
+    yield banner("REQUEST PROFILES")
+    for meta in profiles:
+        yield (f"\n--- {meta.get('profile_id')} {meta.get('method', '')} {meta.get('path', '')} "
+               f"({meta.get('kind')}, {meta.get('duration_ms')} ms, {meta.get('created')}) ---\n")
+        summary_path = profiling.profile_path(meta.get('profile_id'), 'txt')
+        if summary_path:
+            yield from file_pieces(summary_path)
+            yield "\n"
+    if not profiles:
+        yield "No request profiles found.\n"
+    yield "\n"
+
+    yield banner("SERVER INFORMATION")
+    yield (f"Python Version: {server['python_version']}\n"
+           f"Current Directory: {server['current_directory']}\n"
+           f"TTS Enabled: {server['tts_enabled']}\n"
+           f"TTS Status: {server['tts_status']}\n"
+           f"API Key Set: {'Yes' if server['api_key_set'] else 'No'}\n"
+           f"Model: {server['model']}\n\n")
+
+def _debug_export_ndjson(google_id, history, ledger, profiles, server):
+    """Same report as NDJSON: one record per message, payload and profile"""
+    yield ndjson({'section': 'export', 'exported_at': datetime.now().isoformat(), 'user_id': google_id})
+    for i, message in enumerate(history):
+        yield ndjson({'section': 'history', 'index': i, 'role': message.get('role', 'unknown'),
+                      'content': message.get('content', '')})
+    for payload_type, payload_data in iter_ai_payloads(google_id):
+        yield ndjson({'section': 'payload', 'type': payload_type, **payload_data})
+    yield ndjson({'section': 'ledger', **ledger})
+    for meta in profiles:
+        summary_path = profiling.profile_path(meta.get('profile_id'), 'txt')
+        summary = ''.join(file_pieces(summary_path)) if summary_path else None
+        yield ndjson({'section': 'profile', **meta, 'summary': summary})
+    yield ndjson({'section': 'server', **server})
+
 @app.route('/api/export-debug-data', methods=['POST'])
 @require_auth
 def export_debug_data():
-    """Export complete debug data including chat history and payloads"""
+    """Export complete debug data including chat history and payloads (streamed; ?format=ndjson for NDJSON)"""
     try:
         google_id = session.get('user_id')
         if not google_id:
             return jsonify({'error': 'User not found in session'}), 401
-        
-        # Get current session history
-        session_history = session.get('history', [])
-        
-        # Get user payloads
-        user_payloads = last_ai_payloads.get(google_id, {})
-        
-        # Story points disabled to prevent back-skipping
-        story_points = ["Story points system disabled to prevent back-skipping issues"]
-        
-        # Get current story state (extract from current conversation, not from persisted file)
-        # State extraction disabled to prevent back-skipping
-        current_state = {"message": "State extraction disabled to prevent back-skipping issues"}
-        
-        # Generate timestamp for filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"debug_export_{timestamp}.txt"
-        
-        # Build export content
-        export_content = []
-        export_content.append("=" * 80)
-        export_content.append("GROK PLAYGROUND DEBUG EXPORT")
-        export_content.append("=" * 80)
-        export_content.append(f"Export Date: {datetime.now().isoformat()}")
-        export_content.append(f"User ID: {google_id}")
-        export_content.append("")
-        
-        # Session History
-        export_content.append("=" * 80)
-        export_content.append("CHAT HISTORY")
-        export_content.append("=" * 80)
-        if session_history:
-            for i, message in enumerate(session_history):
-                export_content.append(f"\n--- Message {i+1} ---")
-                export_content.append(f"Role: {message.get('role', 'unknown')}")
-                export_content.append(f"Content: {message.get('content', '')}")
-                export_content.append("")
-        else:
-            export_content.append("No chat history found.")
-        export_content.append("")
-        
-        # Story Points
-        export_content.append("=" * 80)
-        export_content.append("STORY POINTS")
-        export_content.append("=" * 80)
-        if story_points:
-            for i, point in enumerate(story_points):
-                export_content.append(f"{i+1}. {point}")
-        else:
-            export_content.append("No story points found.")
-        export_content.append("")
-        
-        # Current State
-        export_content.append("=" * 80)
-        export_content.append("CURRENT STORY STATE")
-        export_content.append("=" * 80)
-        export_content.append(json.dumps(current_state, indent=2))
-        export_content.append("")
-        
-        # AI Payloads
-        export_content.append("=" * 80)
-        export_content.append("AI PAYLOADS")
-        export_content.append("=" * 80)
-        if user_payloads:
-            for payload_type, payload_data in user_payloads.items():
-                export_content.append(f"\n--- {payload_type.upper()} ---")
-                export_content.append(f"Timestamp: {payload_data.get('timestamp', 'unknown')}")
-                export_content.append(f"Payload Size: {payload_data.get('payload_size', 'unknown')} chars")
-                export_content.append("")
-                
-                # Payload (Input)
-                export_content.append("PAYLOAD (INPUT):")
-                export_content.append(json.dumps(payload_data.get('payload', {}), indent=2))
-                export_content.append("")
-                
-                # Response (Output)
-                if payload_data.get('response'):
-                    export_content.append("RESPONSE (OUTPUT):")
-                    export_content.append(payload_data['response'])
-                    export_content.append("")
-                
-                # Usage Info
-                if payload_data.get('usage'):
-                    export_content.append("USAGE INFO:")
-                    export_content.append(json.dumps(payload_data['usage'], indent=2))
-                    export_content.append("")
-                
-                # Finish Reason
-                if payload_data.get('finish_reason'):
-                    export_content.append(f"FINISH REASON: {payload_data['finish_reason']}")
-                    export_content.append("")
-                
-                export_content.append("-" * 60)
-        else:
-            export_content.append("No AI payloads found.")
-        export_content.append("")
 
-        # Continuity Ledger
+        # Everything that needs the session is read up front; stored payloads and
+        # profile summaries are read one at a time while streaming
+        session_history = list(session.get('history', []))
         try:
-            export_content.append("=" * 80)
-            export_content.append("CONTINUITY LEDGER")
-            export_content.append("=" * 80)
-            ledger = session.get('continuity_ledger', {})
-            export_content.append(json.dumps(ledger, indent=2))
-            export_content.append("")
+            ledger = continuity_ledger.describe(get_continuity_ledger())
         except Exception as le:
-            export_content.append(f"(Could not include continuity ledger: {le})")
-            export_content.append("")
-        
-        # Server Info
-        export_content.append("=" * 80)
-        export_content.append("SERVER INFORMATION")
-        export_content.append("=" * 80)
-        export_content.append(f"Python Version: {sys.version}")
-        export_content.append(f"Current Directory: {os.getcwd()}")
-        export_content.append(f"TTS Enabled: {tts.enabled}")
-        export_content.append(f"TTS Status: {tts.get_mode_display()}")
-        export_content.append(f"API Key Set: {'Yes' if os.getenv('XAI_API_KEY') else 'No'}")
-        export_content.append(f"Model: {os.getenv('XAI_MODEL', 'grok-3')}")
-        export_content.append("")
-        
-        # Join all content
-        full_content = "\n".join(export_content)
-        
-        # Create response with file download
-        from flask import Response
-        response = Response(
-            full_content,
-            mimetype='text/plain',
+            ledger = {'error': f'Could not include continuity ledger: {le}'}
+        profiles = profiling.list_profiles(user=google_id, limit=5)
+        fmt = _export_format()
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if fmt == 'ndjson':
+            filename = f"debug_export_{timestamp}.ndjson"
+            body = _debug_export_ndjson(google_id, session_history, ledger, profiles, _server_info())
+            mimetype = 'application/x-ndjson'
+        else:
+            filename = f"debug_export_{timestamp}.txt"
+            body = _debug_export_text(google_id, session_history, ledger, profiles, _server_info())
+            mimetype = 'text/plain'
+
+        log.debug(f"Streaming debug export file: {filename}")
+        return Response(
+            chunked(body),
+            mimetype=mimetype,
             headers={
                 'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'text/plain; charset=utf-8'
+                'Content-Type': f'{mimetype}; charset=utf-8'
             }
         )
         
-        print(f"🔍 Debug: Generated debug export file: {filename} ({len(full_content)} chars)")
-        return response
-        
     except Exception as e:
-        print(f"🔍 Debug: Error exporting debug data: {e}")
-        import traceback
-        print(f"🔍 Debug: Export error traceback: {traceback.format_exc()}")
+        log.exception(f"Error exporting debug data: {e}")
         return jsonify({'error': f'Could not export debug data: {e}'}), 500
 
 @app.route('/api/server-logs', methods=['GET'])
@@ -3973,7 +4486,7 @@ def test_database():
             # Test database connection
             db.session.execute('SELECT 1')
             db_info['connection_test'] = True
-            print(f"🔍 Debug: Database connection successful")
+            log.debug(f"Database connection successful")
             
             # Check if tables exist (works for both SQLite and PostgreSQL)
             if 'sqlite' in app.config.get('SQLALCHEMY_DATABASE_URI', ''):
@@ -3992,22 +4505,22 @@ def test_database():
             tables = [row[0] for row in result.fetchall()]
             db_info['tables_exist'] = len(tables) == 2
             db_info['existing_tables'] = tables
-            print(f"🔍 Debug: Tables found: {tables}")
+            log.debug(f"Tables found: {tables}")
             
             # Count records
             if 'users' in tables:
                 user_count = db.session.execute('SELECT COUNT(*) FROM users').scalar()
                 db_info['user_count'] = user_count
-                print(f"🔍 Debug: User count: {user_count}")
+                log.debug(f"User count: {user_count}")
             
             if 'stories' in tables:
                 story_count = db.session.execute('SELECT COUNT(*) FROM stories').scalar()
                 db_info['story_count'] = story_count
-                print(f"🔍 Debug: Story count: {story_count}")
+                log.debug(f"Story count: {story_count}")
                 
         except Exception as db_error:
             db_info['database_error'] = str(db_error)
-            print(f"🔍 Debug: Database test failed: {db_error}")
+            log.warning(f"Database test failed: {db_error}")
         
         return jsonify({
             'success': True,
@@ -4016,7 +4529,7 @@ def test_database():
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Database test error: {e}")
+        log.warning(f"Database test error: {e}")
         return jsonify({'error': f'Database test failed: {str(e)}'})
 
 @app.route('/api/test-api', methods=['GET'])
@@ -4026,18 +4539,18 @@ def test_api():
         api_key = os.getenv('XAI_API_KEY')
         model_env = os.getenv('XAI_MODEL', 'grok-3')
         
-        print(f"🔍 Debug: Test API - Model: {model_env}")
-        print(f"🔍 Debug: Test API - API Key set: {'Yes' if api_key else 'No'}")
+        log.debug(f"Test API - Model: {model_env}")
+        log.debug(f"Test API - API Key set: {'Yes' if api_key else 'No'}")
         
         # Test file system access
-        print(f"🔍 Debug: Test API - Testing file system...")
+        log.debug(f"Test API - Testing file system...")
         test_file_info = {}
         
         try:
             # Test current directory
             current_dir = os.getcwd()
             test_file_info['current_dir'] = current_dir
-            print(f"🔍 Debug: Test API - Current directory: {current_dir}")
+            log.debug(f"Test API - Current directory: {current_dir}")
             
             # Test if we can create a test file
             test_filename = "test_file_system.txt"
@@ -4046,47 +4559,47 @@ def test_api():
             with open(test_filename, "w") as f:
                 f.write(test_content)
             test_file_info['test_file_created'] = True
-            print(f"🔍 Debug: Test API - Test file created: {test_filename}")
+            log.debug(f"Test API - Test file created: {test_filename}")
             
             # Test if we can read the file back
             with open(test_filename, "r") as f:
                 read_content = f.read()
             test_file_info['test_file_read'] = (read_content == test_content)
-            print(f"🔍 Debug: Test API - Test file read: {test_file_info['test_file_read']}")
+            log.debug(f"Test API - Test file read: {test_file_info['test_file_read']}")
             
             # Test audio directory
             audio_dir = "audio"
             if os.path.exists(audio_dir):
                 test_file_info['audio_dir_exists'] = True
                 test_file_info['audio_dir_files'] = len([f for f in os.listdir(audio_dir) if f.endswith('.mp3')])
-                print(f"🔍 Debug: Test API - Audio directory exists with {test_file_info['audio_dir_files']} MP3 files")
+                log.debug(f"Test API - Audio directory exists with {test_file_info['audio_dir_files']} MP3 files")
             else:
                 test_file_info['audio_dir_exists'] = False
-                print(f"🔍 Debug: Test API - Audio directory does not exist")
+                log.debug(f"Test API - Audio directory does not exist")
                 
                 # Try to create it
                 try:
                     os.makedirs(audio_dir, exist_ok=True)
                     test_file_info['audio_dir_created'] = True
-                    print(f"🔍 Debug: Test API - Audio directory created successfully")
+                    log.debug(f"Test API - Audio directory created successfully")
                 except Exception as create_error:
                     test_file_info['audio_dir_created'] = False
                     test_file_info['audio_dir_error'] = str(create_error)
-                    print(f"🔍 Debug: Test API - Failed to create audio directory: {create_error}")
+                    log.warning(f"Test API - Failed to create audio directory: {create_error}")
             
             # Clean up test file
             try:
                 os.remove(test_filename)
                 test_file_info['test_file_cleaned'] = True
-                print(f"🔍 Debug: Test API - Test file cleaned up")
+                log.debug(f"Test API - Test file cleaned up")
             except Exception as cleanup_error:
                 test_file_info['test_file_cleaned'] = False
                 test_file_info['cleanup_error'] = str(cleanup_error)
-                print(f"🔍 Debug: Test API - Failed to clean up test file: {cleanup_error}")
+                log.warning(f"Test API - Failed to clean up test file: {cleanup_error}")
                 
         except Exception as fs_error:
             test_file_info['file_system_error'] = str(fs_error)
-            print(f"🔍 Debug: Test API - File system test failed: {fs_error}")
+            log.warning(f"Test API - File system test failed: {fs_error}")
         
         if not api_key:
             return jsonify({
@@ -4100,9 +4613,9 @@ def test_api():
         ]
         
         try:
-            print(f"🔍 Debug: Test API - Attempting simple call...")
+            log.debug(f"Test API - Attempting simple call...")
             response = chat_with_grok(test_messages, max_tokens=50)
-            print(f"🔍 Debug: Test API - Success: {response}")
+            log.debug(f"Test API - Success: {response}")
             return jsonify({
                 'success': True,
                 'response': response,
@@ -4111,8 +4624,8 @@ def test_api():
                 'file_system_test': test_file_info
             })
         except Exception as api_error:
-            print(f"🔍 Debug: Test API - Error: {api_error}")
-            print(f"🔍 Debug: Test API - Error type: {type(api_error)}")
+            log.warning(f"Test API - Error: {api_error}")
+            log.debug(f"Test API - Error type: {type(api_error)}")
             return jsonify({
                 'success': False,
                 'error': str(api_error),
@@ -4122,7 +4635,7 @@ def test_api():
             })
             
     except Exception as e:
-        print(f"🔍 Debug: Test API - Outer error: {e}")
+        log.warning(f"Test API - Outer error: {e}")
         return jsonify({'error': f'Test failed: {str(e)}'})
 
 @app.route('/api/edge-log', methods=['GET'])
@@ -4144,13 +4657,13 @@ def serve_audio(filename):
         audio_dir = "audio"
         file_path = os.path.join(audio_dir, filename)
         
-        print(f"🔍 Debug: Serving audio file: {filename}")
-        print(f"🔍 Debug: File path: {file_path}")
-        print(f"🔍 Debug: File exists: {os.path.exists(file_path)}")
+        log.debug(f"Serving audio file: {filename}")
+        log.debug(f"File path: {file_path}")
+        log.debug(f"File exists: {os.path.exists(file_path)}")
         
         if os.path.exists(file_path) and os.path.isfile(file_path):
             file_size = os.path.getsize(file_path)
-            print(f"🔍 Debug: File size: {file_size} bytes")
+            log.debug(f"File size: {file_size} bytes")
             
             # Set proper headers for audio files
             response = send_from_directory(audio_dir, filename, as_attachment=False)
@@ -4158,13 +4671,13 @@ def serve_audio(filename):
             response.headers['Accept-Ranges'] = 'bytes'
             response.headers['Cache-Control'] = 'no-cache'
             
-            print(f"🔍 Debug: Audio file served successfully")
+            log.debug(f"Audio file served successfully")
             return response
         else:
-            print(f"🔍 Debug: Audio file not found: {file_path}")
+            log.debug(f"Audio file not found: {file_path}")
             return jsonify({'error': 'Audio file not found'}), 404
     except Exception as e:
-        print(f"🔍 Debug: Error serving audio file: {e}")
+        log.error(f"Error serving audio file: {e}")
         return jsonify({'error': f'Could not serve audio file: {e}'}), 500
 
 @app.route('/api/audio-files', methods=['GET'])
@@ -4172,17 +4685,17 @@ def list_audio_files():
     """List all available audio files"""
     try:
         audio_dir = "audio"
-        print(f"🔍 Debug: Checking audio directory: {audio_dir}")
-        print(f"🔍 Debug: Current working directory: {os.getcwd()}")
-        print(f"🔍 Debug: Audio directory exists: {os.path.exists(audio_dir)}")
+        log.debug(f"Checking audio directory: {audio_dir}")
+        log.debug(f"Current working directory: {os.getcwd()}")
+        log.debug(f"Audio directory exists: {os.path.exists(audio_dir)}")
         
         if not os.path.exists(audio_dir):
-            print(f"🔍 Debug: Audio directory does not exist, creating it")
+            log.debug(f"Audio directory does not exist, creating it")
             try:
                 os.makedirs(audio_dir, exist_ok=True)
-                print(f"🔍 Debug: Audio directory created successfully")
+                log.debug(f"Audio directory created successfully")
             except Exception as create_error:
-                print(f"🔍 Debug: Failed to create audio directory: {create_error}")
+                log.error(f"Failed to create audio directory: {create_error}")
                 return jsonify({'error': f'Could not create audio directory: {create_error}'}), 500
         
         files = []
@@ -4198,22 +4711,22 @@ def list_audio_files():
                         'created': file_time,
                         'url': f'/audio/{filename}'
                     })
-                    print(f"🔍 Debug: Found audio file: {filename} ({file_size} bytes)")
+                    log.debug(f"Found audio file: {filename} ({file_size} bytes)")
         except Exception as list_error:
-            print(f"🔍 Debug: Error listing audio files: {list_error}")
+            log.error(f"Error listing audio files: {list_error}")
             return jsonify({'error': f'Could not list audio files: {list_error}'}), 500
         
         # Sort by creation time (newest first)
         files.sort(key=lambda x: x['created'], reverse=True)
-        print(f"🔍 Debug: Total audio files found: {len(files)}")
+        log.debug(f"Total audio files found: {len(files)}")
         
         # List all files for debugging
         for i, file in enumerate(files[:5]):  # Show first 5 files
-            print(f"🔍 Debug: File {i+1}: {file['filename']} ({file['size']} bytes)")
+            log.debug(f"File {i+1}: {file['filename']} ({file['size']} bytes)")
         
         return jsonify({'files': files})
     except Exception as e:
-        print(f"🔍 Debug: Unexpected error in list_audio_files: {e}")
+        log.error(f"Unexpected error in list_audio_files: {e}")
         return jsonify({'error': f'Could not list audio files: {e}'}), 500
 
 # Story Editor Routes
@@ -4234,7 +4747,7 @@ def list_story_files():
         if not google_id:
             return jsonify({'error': 'User not found in session'}), 401
         
-        print(f"🔍 Debug: Using Google ID: {google_id}")
+        log.debug(f"Using Google ID: {google_id}")
         user_id = google_id
         
         if not DATABASE_AVAILABLE:
@@ -4244,26 +4757,34 @@ def list_story_files():
         if not ensure_tables_exist():
             return jsonify({'error': 'Database tables not available'}), 500
         
-        # Get user's stories from database
-        user_stories = Story.query.filter_by(user_id=user_id).order_by(Story.updated_at.desc()).all()
+        # Summary columns only: the content JSON is never read for the catalog
+        query = db.session.query(
+            Story.id, Story.story_id, Story.title, Story.character_count, Story.story_type,
+            Story.maturity_level, Story.content_size, Story.is_public, Story.created_at, Story.updated_at
+        ).filter(Story.user_id == user_id)
+        try:
+            rows, next_cursor = _keyset_page(query, Story)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         story_list = []
-        for story in user_stories:
-            content = story.content or {}
+        for story in rows:
             story_list.append({
                 'story_id': story.story_id,
                 'title': story.title,
-                'characters': len(content.get('characters', {})),
-                'type': content.get('story_type', 'Unknown'),
+                'characters': story.character_count or 0,
+                'type': story.story_type or 'Unknown',
+                'maturity': story.maturity_level,
+                'size': story.content_size or 0,
                 'is_public': story.is_public,
                 'created_at': story.created_at.isoformat() if story.created_at else None,
                 'updated_at': story.updated_at.isoformat() if story.updated_at else None
             })
         
-        print(f"🔍 Debug: Listed {len(story_list)} stories for user {user_id}")
-        return jsonify({'story_files': story_list})
+        log.debug(f"Listed {len(story_list)} stories for user {user_id} (more: {bool(next_cursor)})")
+        return _conditional_json({'story_files': story_list, 'next_cursor': next_cursor})
     except Exception as e:
-        print(f"🔍 Debug: Error listing story files: {e}")
+        log.error(f"Error listing story files: {e}")
         return jsonify({'error': f'Could not list story files: {e}'}), 500
 
 @app.route('/api/story-files/<story_id>', methods=['GET'])
@@ -4277,7 +4798,7 @@ def get_story_file(story_id):
         if not google_id:
             return jsonify({'error': 'User not found in session'}), 401
         
-        print(f"🔍 Debug: Using Google ID: {google_id}")
+        log.debug(f"Using Google ID: {google_id}")
         user_id = google_id
         
         if not DATABASE_AVAILABLE:
@@ -4293,7 +4814,7 @@ def get_story_file(story_id):
         if not story:
             return jsonify({'error': f'Story not found: {story_id}'}), 404
         
-        print(f"🔍 Debug: Retrieved story {story_id} for user {user_id}")
+        log.debug(f"Retrieved story {story_id} for user {user_id}")
         
         return jsonify({
             'success': True,
@@ -4306,7 +4827,7 @@ def get_story_file(story_id):
             }
         })
     except Exception as e:
-        print(f"🔍 Debug: Error reading story {story_id}: {e}")
+        log.error(f"Error reading story {story_id}: {e}")
         return jsonify({'error': f'Could not read story: {e}'}), 500
 
 @app.route('/api/story-files/<story_id>', methods=['PATCH'])
@@ -4327,8 +4848,8 @@ def update_story_metadata(story_id):
         if not ensure_tables_exist():
             return jsonify({'error': 'Database tables not available'}), 500
         
-        # Get story from database
-        story = Story.query.filter_by(story_id=story_id, user_id=google_id).first()
+        # Get story from database (metadata only; content and its summary columns are unchanged)
+        story = Story.query.options(db.defer(Story.content)).filter_by(story_id=story_id, user_id=google_id).first()
         
         if not story:
             return jsonify({'error': f'Story not found: {story_id}'}), 404
@@ -4349,7 +4870,7 @@ def update_story_metadata(story_id):
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Error updating story {story_id}: {e}")
+        log.error(f"Error updating story {story_id}: {e}")
         return jsonify({'error': f'Could not update story: {e}'}), 500
 
 @app.route('/api/story-files/<story_id>', methods=['DELETE'])
@@ -4386,7 +4907,7 @@ def delete_story(story_id):
         })
         
     except Exception as e:
-        print(f"🔍 Debug: Error deleting story {story_id}: {e}")
+        log.error(f"Error deleting story {story_id}: {e}")
         return jsonify({'error': f'Could not delete story: {e}'}), 500
 
 @app.route('/dashboard')
@@ -4468,9 +4989,47 @@ def upload_story_from_file():
             })
             
     except Exception as e:
-        print(f"🔍 Debug: Error uploading story: {e}")
+        log.error(f"Error uploading story: {e}")
         return jsonify({'error': f'Could not upload story: {e}'}), 500
 
+@app.route('/api/bulk-import-stories', methods=['POST'])
+@require_auth
+def bulk_import_stories():
+    """Import many stories at once: an NDJSON body (one story per line) or a JSON list / {"stories": [...]}"""
+    try:
+        google_id = session.get('user_id')
+        if not google_id:
+            return jsonify({'error': 'User not found in session'}), 401
+        
+        if not DATABASE_AVAILABLE:
+            return jsonify({'error': 'Database not available'}), 500
+        
+        if not ensure_tables_exist():
+            return jsonify({'error': 'Database tables not available'}), 500
+        
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            items = iter_ndjson(request.stream)
+        else:
+            body = request.get_json(silent=True)
+            stories = body.get('stories') if isinstance(body, dict) else body
+            if not isinstance(stories, list):
+                return jsonify({'error': 'Send NDJSON, a JSON list of stories or {"stories": [...]}'}), 400
+            items = ((f'item {i + 1}', story) for i, story in enumerate(stories))
+        
+        # Validation runs inline here (no process pool inside a web worker)
+        results = StoryImporter(db, Story, Scene).run(parse_all(items, workers=1), google_id)
+        counts = summarize(results)
+        log.debug(f"Bulk story import for {google_id}: {counts}")
+        return jsonify({
+            'success': not (counts.get('invalid') or counts.get('error')),
+            'counts': counts,
+            'results': results
+        })
+        
+    except Exception as e:
+        log.error(f"Error in bulk story import: {e}")
+        return jsonify({'error': f'Could not import stories: {e}'}), 500
+
 @app.route('/api/story-files', methods=['POST'])
 @require_auth
 def save_story_file():
@@ -4487,7 +5046,7 @@ def save_story_file():
         if not google_id:
             return jsonify({'error': 'User not found in session'}), 401
         
-        print(f"🔍 Debug: Using Google ID: {google_id}")
+        log.debug(f"Using Google ID: {google_id}")
         user_id = google_id
         
         # Extract story information
@@ -4520,7 +5079,7 @@ def save_story_file():
             existing_story.updated_at = datetime.utcnow()
             db.session.commit()
             
-            print(f"🔍 Debug: Story updated in database: {story_id} by user {user_id}")
+            log.debug(f"Story updated in database: {story_id} by user {user_id}")
             
             return jsonify({
                 'success': True,
@@ -4560,12 +5119,12 @@ def save_story_file():
             user = User.query.filter_by(google_id=user_id).first()
             if user:
                 user.active_story_id = story_id
-                print(f"🔍 Debug: Set {story_id} as active story for user {user_id}")
+                log.debug(f"Set {story_id} as active story for user {user_id}")
             
             db.session.commit()
             
-            print(f"🔍 Debug: Story saved to database: {story_id} by user {user_id}")
-            print(f"🔍 Debug: Created Opening scene (ID: {opening_scene.id}) for story {story_id}")
+            log.debug(f"Story saved to database: {story_id} by user {user_id}")
+            log.debug(f"Created Opening scene (ID: {opening_scene.id}) for story {story_id}")
             
             return jsonify({
                 'success': True,
@@ -4574,128 +5133,62 @@ def save_story_file():
                 'action': 'created'
             })
     except Exception as e:
-        print(f"🔍 Debug: Error saving story file: {e}")
+        log.error(f"Error saving story file: {e}")
         return jsonify({'error': f'Could not save story file: {e}'}), 500
 
+REQUIRED_TABLES = ('users', 'stories', 'scenes')
+_schema_ready = False
+_schema_lock = threading.Lock()
+
 def ensure_tables_exist():
-    """Ensure database tables exist with correct schema"""
+    """Check (once per process) that the schema is usable, applying STARTUP_SCHEMA_MODE"""
+    global _schema_ready
     if not DATABASE_AVAILABLE:
         return False
-        
-    try:
-        with app.app_context():
-            # Test database connection first
-            from sqlalchemy import text
-            try:
-                with db.engine.connect() as conn:
-                    conn.execute(text('SELECT 1'))
-            except Exception as conn_error:
-                print(f"❌ Database connection failed: {conn_error}")
-                return False
-            
-            # Check if tables exist first
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            existing_tables = inspector.get_table_names()
-            
-            # Check if we have the old 'conversations' table that needs to be migrated to 'scenes'
-            if 'conversations' in existing_tables and 'scenes' not in existing_tables:
-                print("🔄 Migrating 'conversations' table to 'scenes' table...")
-                db.drop_all()
-                db.create_all()
-                print("✅ Database tables migrated from 'conversations' to 'scenes'")
-                # Force connection refresh to ensure new schema is used
-                db.engine.dispose()
-                return True
-            
-            if 'stories' in existing_tables and 'users' in existing_tables and 'scenes' in existing_tables:
-                # Tables exist, check if schema is correct
-                try:
-                    # Check stories table for new columns
-                    story_columns = [col['name'] for col in inspector.get_columns('stories')]
-                    user_columns = [col['name'] for col in inspector.get_columns('users')]
-                    scene_columns = [col['name'] for col in inspector.get_columns('scenes')]
-                    
-                    # Check for all required new columns
-                    required_story_cols = ['default_scene_id']
-                    required_user_cols = ['active_story_id']
-                    required_scene_cols = ['is_default', 'is_active']
-                    
-                    missing_cols = []
-                    if not all(col in story_columns for col in required_story_cols):
-                        missing_cols.extend([f'stories.{col}' for col in required_story_cols if col not in story_columns])
-                    if not all(col in user_columns for col in required_user_cols):
-                        missing_cols.extend([f'users.{col}' for col in required_user_cols if col not in user_columns])
-                    if not all(col in scene_columns for col in required_scene_cols):
-                        missing_cols.extend([f'scenes.{col}' for col in required_scene_cols if col not in scene_columns])
-                    
-                    if missing_cols:
-                        print(f"⚠️ Schema mismatch: Missing columns {missing_cols}")
-                        print("🔄 Schema mismatch detected, recreating tables...")
-                        db.drop_all()
-                        db.create_all()
-                        print("✅ Database tables recreated with correct schema")
-                        # Force connection refresh to ensure new schema is used
-                        db.engine.dispose()
-                        return True
-                    else:
-                        print("✅ Database tables exist with correct schema")
-                        return True
-                except Exception as schema_error:
-                    print(f"❌ Schema check failed: {schema_error}")
-                    # Try to recreate tables
-                    print("🔄 Attempting to recreate tables due to schema error...")
-                    db.drop_all()
-                    db.create_all()
-                    print("✅ Database tables recreated")
-                    # Force connection refresh to ensure new schema is used
-                    db.engine.dispose()
-                    return True
-            else:
-                # Tables don't exist, create them
-                print("🔄 Creating missing database tables...")
-                db.create_all()
-                print("✅ Database tables created")
-                return True
-                
-    except Exception as e:
-        print(f"❌ Failed to ensure tables exist: {e}")
-        import traceback
-        print(f"Database error traceback: {traceback.format_exc()}")
-        
-        # Try one more time with a fresh connection
+    if _schema_ready:
+        return True
+
+    with _schema_lock:
+        if _schema_ready:
+            return True
+        started = time.perf_counter()
         try:
-            print("🔄 Attempting database recovery...")
             with app.app_context():
-                db.drop_all()
-                db.create_all()
-                print("✅ Database recovery successful")
-                # Force connection refresh to ensure new schema is used
-                db.engine.dispose()
-                return True
-        except Exception as recovery_error:
-            print(f"❌ Database recovery failed: {recovery_error}")
+                from sqlalchemy import inspect
+                if STARTUP_SCHEMA_MODE == 'reset':
+                    log.info("STARTUP_SCHEMA_MODE=reset: recreating database tables...")
+                    db.drop_all()
+                    db.create_all()
+                elif STARTUP_SCHEMA_MODE == 'create':
+                    db.create_all()  # only creates missing tables, never drops
+
+                missing = [t for t in REQUIRED_TABLES if t not in inspect(db.engine).get_table_names()]
+                if missing:
+                    log.error(f"Database schema is missing tables {missing} - run `flask --app web_app db upgrade`")
+                    return False
+        except Exception as e:
+            log.exception(f"Failed to ensure tables exist: {e}")
             return False
 
+        _schema_ready = True
+        log.info(f"Database schema ready (mode={STARTUP_SCHEMA_MODE}, {(time.perf_counter() - started) * 1000:.0f}ms)")
+        return True
+
 def init_database():
-    """Initialize database and run migrations"""
+    """Initialize database according to STARTUP_SCHEMA_MODE"""
     if not DATABASE_AVAILABLE:
-        print("⚠️ Database not available - skipping database initialization")
+        log.warning("Database not available - skipping database initialization")
         return
-        
-    try:
-        print("🗄️ Initializing database...")
-        
-        # Create all tables
-        with app.app_context():
-            db.create_all()
-            print("✅ Database tables created successfully")
-                
-    except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
+
+    log.info("Initializing database...")
+    if not ensure_tables_exist():
         # Don't fail the app startup, just log the error
-        import traceback
-        print(f"Database error traceback: {traceback.format_exc()}")
+        log.error("Database initialization failed")
+
+startup.mark('routes')
+startup.report()
+for _phase, _ms in startup.phases:
+    STARTUP_SECONDS.labels(phase=_phase).set(_ms / 1000)
 
 if __name__ == '__main__':
     # Initialize database before starting the app
@@ -4705,7 +5198,7 @@ if __name__ == '__main__':
     import signal
     
     def timeout_handler(signum, frame):
-        print("⏰ Request timeout - cleaning up...")
+        log.warning("Request timeout - cleaning up...")
         cleanup_resources()
         raise TimeoutError("Request timeout")
     
@@ -4713,7 +5206,7 @@ if __name__ == '__main__':
     signal.signal(signal.SIGALRM, timeout_handler)
     
     port = int(os.environ.get('PORT', 8080))
-    print(f"🎭 Starting Grok Playground Web Interface on port {port}")
-    print(f"📍 Local: http://localhost:{port}")
-    print(f"🌐 Network: http://0.0.0.0:{port}")
+    log.info(f"Starting Grok Playground Web Interface on port {port}")
+    log.info(f"Local: http://localhost:{port}")
+    log.info(f"Network: http://0.0.0.0:{port}")
     app.run(host='0.0.0.0', port=port, debug=False, threaded=True)